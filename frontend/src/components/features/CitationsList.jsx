@@ -2,14 +2,22 @@
  * Componente que exibe as citações/fontes da resposta
  *
  * Props:
- * - citations: Array de citações { source, excerpt }
+ * - citations: Array de citações { source, excerpt, page_start, page_end }
  *
  * Exemplo de citation:
  * {
  *   source: "GESTAO_DE_ESTOQUES.pdf",
- *   excerpt: "Gestão de estoques é o processo de..."
+ *   excerpt: "Gestão de estoques é o processo de...",
+ *   page_start: 3,
+ *   page_end: 4
  * }
  */
+function formatPages({ page_start, page_end }) {
+  if (!page_start) return null;
+  if (!page_end || page_end === page_start) return `p. ${page_start}`;
+  return `pp. ${page_start}-${page_end}`;
+}
+
 export default function CitationsList({ citations = [] }) {
   if (!citations || citations.length === 0) {
     return null;
@@ -40,8 +48,27 @@ export default function CitationsList({ citations = [] }) {
                   <div className="font-bold text-sm mb-2 flex items-center gap-2">
                     <span>📄</span>
                     <span>{citation.source}</span>
+                    {formatPages(citation) && (
+                      <span className="badge badge-ghost badge-sm">
+                        {formatPages(citation)}
+                      </span>
+                    )}
                   </div>
 
+                  {/* Outras fontes com o mesmo trecho */}
+                  {citation.also_in?.length > 0 && (
+                    <div className="text-xs text-base-content/60 mb-2">
+                      Também em:{" "}
+                      {citation.also_in
+                        .map((ref) =>
+                          formatPages(ref)
+                            ? `${ref.source} (${formatPages(ref)})`
+                            : ref.source
+                        )
+                        .join(", ")}
+                    </div>
+                  )}
+
                   {/* Trecho do texto (excerpt) */}
                   <p className="text-sm text-base-content/80 italic">
                     "{citation.excerpt}"
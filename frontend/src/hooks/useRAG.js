@@ -1,5 +1,5 @@
 import { useState } from "react";
-import { askQuestion } from "../services/api";
+import { askQuestion, askQuestionStream } from "../services/api";
 
 /**
  * Hook customizado para gerenciar interação com RAG
@@ -15,6 +15,7 @@ import { askQuestion } from "../services/api";
  * - loading: boolean
  * - error: string | null
  * - submitQuestion: função para enviar pergunta
+ * - submitQuestionStream: envia pergunta e recebe a resposta token a token
  * - resetResponse: função para limpar resposta
  */
 export function useRAG() {
@@ -48,6 +49,57 @@ export function useRAG() {
     }
   }
 
+  /**
+   * Envia pergunta usando o endpoint de streaming (/ask/stream)
+   *
+   * O loading termina no primeiro evento recebido; a partir daí a resposta
+   * parcial chega por onUpdate a cada token.
+   *
+   * @param {string} question - Pergunta do usuário
+   * @param {Function} onUpdate - Recebe { answer, citations, metrics, ... } parcial
+   * @returns {Promise<Object|null>} Resposta completa ao final do stream
+   */
+  async function submitQuestionStream(question, onUpdate = () => {}) {
+    if (!question || question.trim() === "") {
+      setError("Por favor, digite uma pergunta");
+      return;
+    }
+
+    setError(null);
+    setLoading(true);
+
+    const result = {
+      answer: "",
+      citations: [],
+      metrics: null,
+      is_blocked: false,
+      block_reason: null,
+      block_message: null,
+    };
+
+    const update = (changes) => {
+      Object.assign(result, changes);
+      setLoading(false);
+      onUpdate({ ...result });
+    };
+
+    try {
+      await askQuestionStream(question, {
+        onCitations: (citations) => update({ citations }),
+        onToken: ({ text }) => update({ answer: result.answer + text }),
+        onBlocked: (blocked) => update({ is_blocked: true, ...blocked }),
+        onMetrics: (metrics) => update({ metrics }),
+      });
+
+      return result;
+    } catch (err) {
+      setError(err.message || "Erro ao processar pergunta");
+      return null;
+    } finally {
+      setLoading(false);
+    }
+  }
+
   /**
    * Limpa resposta e erros
    */
@@ -59,6 +111,7 @@ export function useRAG() {
     loading,
     error,
     submitQuestion,
+    submitQuestionStream,
     resetResponse,
   };
 }
@@ -34,6 +34,76 @@ export async function askQuestion(question) {
   }
 }
 
+/**
+ * Envia uma pergunta e consome a resposta em streaming (SSE)
+ *
+ * Eventos recebidos do endpoint /ask/stream:
+ * - citations: lista de citações (logo após o retrieval)
+ * - token: trecho da resposta ({ text })
+ * - blocked: pergunta bloqueada ({ block_reason, block_message })
+ * - metrics: métricas completas, incluindo time_to_first_token_ms
+ *
+ * @param {string} question - Pergunta do usuário
+ * @param {Object} handlers - Callbacks { onCitations, onToken, onBlocked, onMetrics }
+ * @returns {Promise<void>} Resolve quando o stream termina
+ */
+export async function askQuestionStream(question, handlers = {}) {
+  const response = await fetch(`${API_BASE_URL}/ask/stream`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      Accept: "text/event-stream",
+    },
+    body: JSON.stringify({ question }),
+  });
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.detail || "Erro ao processar pergunta");
+  }
+
+  const callbacks = {
+    citations: handlers.onCitations,
+    token: handlers.onToken,
+    blocked: handlers.onBlocked,
+    metrics: handlers.onMetrics,
+  };
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+
+    // Eventos SSE são separados por linha em branco
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf("\n\n");
+
+      let eventName = "message";
+      let data = "";
+      for (const line of rawEvent.split("\n")) {
+        if (line.startsWith("event: ")) eventName = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+
+      const payload = data ? JSON.parse(data) : null;
+
+      if (eventName === "error") {
+        throw new Error(payload?.detail || "Erro ao processar pergunta");
+      }
+
+      callbacks[eventName]?.(payload);
+    }
+  }
+}
+
 /**
  * Verifica se o backend está online
  *
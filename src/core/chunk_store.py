@@ -0,0 +1,292 @@
+"""
+Armazenamento colunar dos chunks indexados, lido via mmap.
+
+Substitui o docstore em pickle do LangChain (index.pkl), que obriga cada
+worker a desserializar e manter sua própria cópia de todos os Documents.
+Aqui os textos ficam em um único blob UTF-8 contíguo e os metadados em
+colunas NumPy; tudo é aberto com mmap, então os workers do uvicorn
+compartilham as mesmas páginas do page cache e a inicialização não cresce
+com o tamanho do corpus.
+
+Arquivos gravados na pasta da geração do índice (src/core/index_generation.py;
+a linha i corresponde ao vetor i do FAISS):
+- chunks.bin: textos concatenados em UTF-8
+- chunk_offsets.npy / chunk_lengths.npy: posição e tamanho (em bytes)
+- chunk_source_ids.npy: índice da fonte de cada chunk em chunk_sources.npy
+- chunk_sources.npy: nomes distintos das fontes
+- chunk_ids.npy / chunk_totals.npy: chunk_id e total_chunks originais
+- chunk_spans.npy: matriz n x 4 com page_start, page_end, char_start e
+  char_end de cada chunk (-1 = desconhecido); opcional, ausente em stores
+  gravados antes do chunking por página
+- chunk_duplicates.json: origem (fonte, chunk_id, páginas) das quase
+  duplicatas absorvidas por cada linha; opcional, só existe se a
+  deduplicação removeu algum chunk
+
+Para converter um índice antigo (só index.pkl):
+    python -m src.core.chunk_store vector_index
+"""
+
+import json
+import mmap
+import os
+import sys
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from .faiss_index import index_labels
+
+CHUNK_BLOB_FILE = "chunks.bin"
+CHUNK_COLUMNS = (
+    "chunk_offsets",
+    "chunk_lengths",
+    "chunk_source_ids",
+    "chunk_sources",
+    "chunk_ids",
+    "chunk_totals",
+)
+SPAN_COLUMN = "chunk_spans"
+SPAN_FIELDS = ("page_start", "page_end", "char_start", "char_end")
+DUPLICATES_FILE = "chunk_duplicates.json"
+
+
+class ChunkStore:
+    """
+    Chunks do índice em formato colunar, mapeados em memória.
+    """
+
+    def __init__(self, index_path: str):
+        """
+        Abre o armazenamento de chunks de um índice.
+
+        Args:
+            index_path: Diretório do índice
+
+        Raises:
+            FileNotFoundError: Se o índice não tiver chunk store
+        """
+
+        self.index_path = index_path
+
+        blob_path = os.path.join(index_path, CHUNK_BLOB_FILE)
+        with open(blob_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size > 0:
+                self._blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                # mmap não aceita arquivos vazios
+                self._blob = b""
+
+        columns = {
+            name: np.load(os.path.join(index_path, f"{name}.npy"), mmap_mode="r")
+            for name in CHUNK_COLUMNS
+        }
+        self.offsets = columns["chunk_offsets"]
+        self.lengths = columns["chunk_lengths"]
+        self.source_ids = columns["chunk_source_ids"]
+        self.sources = columns["chunk_sources"]
+        self.chunk_ids = columns["chunk_ids"]
+        self.totals = columns["chunk_totals"]
+
+        spans_path = os.path.join(index_path, f"{SPAN_COLUMN}.npy")
+        self.spans = (
+            np.load(spans_path, mmap_mode="r") if os.path.exists(spans_path) else None
+        )
+
+        duplicates_path = os.path.join(index_path, DUPLICATES_FILE)
+        self.duplicates: Dict[int, List[Dict]] = {}
+        if os.path.exists(duplicates_path):
+            with open(duplicates_path, "r", encoding="utf-8") as f:
+                self.duplicates = {int(row): v for row, v in json.load(f).items()}
+
+    @staticmethod
+    def exists(index_path: str) -> bool:
+        """
+        Indica se o diretório do índice tem um chunk store completo.
+        """
+
+        names = [CHUNK_BLOB_FILE] + [f"{name}.npy" for name in CHUNK_COLUMNS]
+        return all(os.path.exists(os.path.join(index_path, n)) for n in names)
+
+    @staticmethod
+    def write(
+        index_path: str,
+        chunks: Iterable[Dict],
+        duplicates: Optional[Dict[int, List[Dict]]] = None,
+    ) -> int:
+        """
+        Grava os chunks no formato colunar.
+
+        Cada arquivo é escrito em um temporário e movido com os.replace, então
+        um leitor nunca vê um arquivo pela metade. chunks pode ser um gerador:
+        os textos vão direto para o disco e só as colunas numéricas ficam em
+        memória.
+
+        Args:
+            index_path: Diretório do índice
+            chunks: Chunks na mesma ordem dos vetores do FAISS, com as chaves
+                    content, source, chunk_id e total_chunks
+            duplicates: Origem das duplicatas absorvidas, por linha. Só é
+                        lido depois de consumir chunks, então pode ser
+                        preenchido pelo próprio gerador (NearDuplicateFilter).
+                        Chunks com a chave "duplicates" também são gravados.
+
+        Returns:
+            Número de chunks gravados
+        """
+
+        os.makedirs(index_path, exist_ok=True)
+
+        offsets, lengths, source_ids, chunk_ids, totals, spans = [], [], [], [], [], []
+        provenance: Dict[int, List[Dict]] = {}
+        sources: Dict[str, int] = {}
+
+        blob_path = os.path.join(index_path, CHUNK_BLOB_FILE)
+        position = 0
+        with open(f"{blob_path}.tmp", "wb") as f:
+            for chunk in chunks:
+                data = chunk["content"].encode("utf-8")
+                f.write(data)
+
+                offsets.append(position)
+                lengths.append(len(data))
+                position += len(data)
+
+                source = chunk.get("source", "unknown")
+                source_ids.append(sources.setdefault(source, len(sources)))
+                chunk_ids.append(int(chunk.get("chunk_id", 0)))
+                totals.append(int(chunk.get("total_chunks", 0)))
+                spans.append([int(chunk.get(key, -1)) for key in SPAN_FIELDS])
+                if chunk.get("duplicates"):
+                    provenance[len(offsets) - 1] = chunk["duplicates"]
+
+        source_names = np.array(list(sources), dtype=str)
+        if not len(source_names):
+            source_names = np.zeros(0, dtype="<U1")
+
+        arrays = {
+            "chunk_offsets": np.array(offsets, dtype=np.int64),
+            "chunk_lengths": np.array(lengths, dtype=np.int32),
+            "chunk_source_ids": np.array(source_ids, dtype=np.int32),
+            "chunk_sources": source_names,
+            "chunk_ids": np.array(chunk_ids, dtype=np.int32),
+            "chunk_totals": np.array(totals, dtype=np.int32),
+            SPAN_COLUMN: np.array(spans, dtype=np.int32).reshape(-1, len(SPAN_FIELDS)),
+        }
+        for name, array in arrays.items():
+            path = os.path.join(index_path, f"{name}.npy")
+            with open(f"{path}.tmp", "wb") as f:
+                np.save(f, array)
+            os.replace(f"{path}.tmp", path)
+
+        provenance.update(duplicates or {})
+        duplicates_path = os.path.join(index_path, DUPLICATES_FILE)
+        if provenance:
+            with open(f"{duplicates_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump({str(row): v for row, v in sorted(provenance.items())}, f)
+            os.replace(f"{duplicates_path}.tmp", duplicates_path)
+        elif os.path.exists(duplicates_path):
+            os.remove(duplicates_path)
+
+        # O blob é movido por último: exists() só fica verdadeiro no fim
+        os.replace(f"{blob_path}.tmp", blob_path)
+
+        return len(offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def content(self, row: int) -> str:
+        """
+        Retorna o texto de um chunk, lido direto do blob mapeado.
+        """
+
+        start = int(self.offsets[row])
+        end = start + int(self.lengths[row])
+        return self._blob[start:end].decode("utf-8")
+
+    def get(self, row: int) -> Dict:
+        """
+        Retorna um chunk no formato usado pelo pipeline.
+        """
+
+        chunk = {
+            "content": self.content(row),
+            "source": str(self.sources[self.source_ids[row]]),
+            "chunk_id": int(self.chunk_ids[row]),
+        }
+        if self.spans is not None:
+            chunk.update(
+                (key, int(value))
+                for key, value in zip(SPAN_FIELDS, self.spans[row])
+                if value >= 0
+            )
+        if row in self.duplicates:
+            chunk["duplicates"] = self.duplicates[row]
+        return chunk
+
+    def close(self) -> None:
+        """
+        Libera o mapeamento do blob de textos.
+        """
+
+        if isinstance(self._blob, mmap.mmap):
+            self._blob.close()
+
+
+def migrate_langchain_index(index_path: str, embeddings=None) -> int:
+    """
+    Gera o chunk store a partir do docstore em pickle de um índice antigo.
+
+    Args:
+        index_path: Diretório com index.faiss e index.pkl do LangChain
+        embeddings: Cliente de embeddings (não é chamado; só exigido pelo
+                    load_local)
+
+    Returns:
+        Número de chunks gravados
+    """
+
+    from langchain_community.vectorstores import FAISS
+
+    vector_store = FAISS.load_local(
+        index_path, embeddings, allow_dangerous_deserialization=True
+    )
+
+    chunks = _chunks_from_vector_store(vector_store)
+    ChunkStore.write(index_path, chunks)
+
+    return len(chunks)
+
+
+def _chunks_from_vector_store(vector_store) -> List[Dict]:
+    chunks = []
+    for label in index_labels(vector_store.index):
+        doc_id = vector_store.index_to_docstore_id[int(label)]
+        doc = vector_store.docstore.search(doc_id)
+        chunk = {
+            "content": doc.page_content,
+            "source": doc.metadata.get("source", "unknown"),
+            "chunk_id": doc.metadata.get("chunk_id", 0),
+            "total_chunks": doc.metadata.get("total_chunks", 0),
+        }
+        chunk.update(
+            {k: doc.metadata[k] for k in SPAN_FIELDS + ("duplicates",) if k in doc.metadata}
+        )
+        chunks.append(chunk)
+    return chunks
+
+
+def load_chunk_store(index_path: str) -> Optional[ChunkStore]:
+    """
+    Abre o chunk store do índice, ou retorna None se ele não existir.
+    """
+
+    if not ChunkStore.exists(index_path):
+        return None
+    return ChunkStore(index_path)
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "vector_index"
+    total = migrate_langchain_index(path)
+    print(f"    Chunk store gravado em {path}: {total} chunks.")
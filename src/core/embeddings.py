@@ -0,0 +1,260 @@
+"""
+Provedores de embeddings usados na indexação e no retrieval.
+
+Todos os provedores expõem a interface de Embeddings do LangChain
+(embed_query, embed_documents e as versões assíncronas), então podem ser
+usados tanto pelo FAISS do LangChain quanto diretamente.
+
+Provedores disponíveis:
+- "openai": API compatível com OpenAI (OpenRouter), via OpenAIEmbeddings
+- "local": modelo sentence-transformers rodando na CPU, com quantização
+  int8, inferência em lotes e pool de threads
+
+Novos provedores podem ser registrados com register_embedding_provider().
+
+O provedor "openai" pode receber os clientes HTTP compartilhados com o LLM
+(ver src/core/http_client.py).
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+from dotenv import load_dotenv
+
+from .http_client import HttpClients
+
+load_dotenv()
+
+
+DEFAULT_LOCAL_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+@dataclass
+class EmbeddingProvider:
+    """
+    Provedor de embeddings configurado.
+
+    Attributes:
+        name: Nome do provedor ("openai", "local", ...)
+        model: Modelo usado pelo provedor
+        embeddings: Cliente com a interface de Embeddings do LangChain
+        dimension: Dimensão dos vetores, quando conhecida sem chamar a API
+    """
+
+    name: str
+    model: str
+    embeddings: Embeddings
+    dimension: Optional[int] = None
+
+    @property
+    def cache_key(self) -> str:
+        """Identificador usado nas chaves de cache de embeddings."""
+        return f"{self.name}:{self.model}"
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    Embeddings calculados localmente na CPU com sentence-transformers.
+
+    Backends:
+    - "torch" (padrão): PyTorch com quantização dinâmica int8 das camadas
+      lineares
+    - "onnx": ONNX Runtime via sentence-transformers (requer o pacote
+      optimum[onnxruntime]); com quantize=True usa o modelo ONNX int8
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_LOCAL_MODEL,
+        backend: str = "torch",
+        quantize: bool = True,
+        batch_size: int = 32,
+        num_threads: Optional[int] = None,
+        max_workers: int = 2,
+    ):
+        """
+        Args:
+            model_name: Modelo sentence-transformers (Hugging Face)
+            backend: "torch" ou "onnx"
+            quantize: Se True, usa pesos int8
+            batch_size: Textos por lote de inferência
+            num_threads: Threads intra-op da inferência (None = padrão)
+            max_workers: Threads do pool usado pelas chamadas assíncronas
+        """
+
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+
+        if backend == "onnx":
+            model_kwargs = (
+                {"file_name": "onnx/model_qint8_avx512_vnni.onnx"} if quantize else None
+            )
+            self.model = SentenceTransformer(
+                model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs
+            )
+        elif backend == "torch":
+            import torch
+
+            if num_threads:
+                torch.set_num_threads(num_threads)
+
+            self.model = SentenceTransformer(model_name, device="cpu")
+            if quantize:
+                torch.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+                )
+        else:
+            raise ValueError(
+                f"Backend de embeddings local inválido: '{backend}'. "
+                f"Use 'torch' ou 'onnx'."
+            )
+
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="local-embeddings"
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Gera embeddings de vários textos, em lotes de batch_size.
+        """
+
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        )
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Gera o embedding de uma query.
+        """
+
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Versão assíncrona de embed_documents(), executada no pool de threads.
+        """
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        Versão assíncrona de embed_query(), executada no pool de threads.
+        """
+
+        return (await self.aembed_documents([text]))[0]
+
+
+def _create_openai_provider(
+    model: Optional[str], http_clients: Optional[HttpClients] = None
+) -> EmbeddingProvider:
+    model = model or os.getenv("EMBEDDING_MODEL", "openai/text-embedding-3-small")
+
+    client_kwargs = {}
+    if http_clients is not None:
+        client_kwargs = {
+            "http_client": http_clients.sync_client,
+            "http_async_client": http_clients.async_client,
+            "max_retries": http_clients.max_retries,
+        }
+
+    embeddings = OpenAIEmbeddings(
+        model=model,
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        openai_api_base=os.getenv("OPENAI_API_BASE_URL"),
+        **client_kwargs,
+    )
+
+    return EmbeddingProvider(name="openai", model=model, embeddings=embeddings)
+
+
+def _create_local_provider(
+    model: Optional[str], http_clients: Optional[HttpClients] = None
+) -> EmbeddingProvider:
+    model = model or os.getenv("LOCAL_EMBEDDING_MODEL", DEFAULT_LOCAL_MODEL)
+    num_threads = int(os.getenv("LOCAL_EMBEDDING_THREADS", 0)) or None
+
+    embeddings = LocalEmbeddings(
+        model_name=model,
+        backend=os.getenv("LOCAL_EMBEDDING_BACKEND", "torch"),
+        quantize=os.getenv("LOCAL_EMBEDDING_QUANTIZE", "true").lower() == "true",
+        batch_size=int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", 32)),
+        num_threads=num_threads,
+    )
+
+    return EmbeddingProvider(
+        name="local",
+        model=model,
+        embeddings=embeddings,
+        dimension=embeddings.dimension,
+    )
+
+
+EMBEDDING_PROVIDERS: Dict[str, Callable[..., EmbeddingProvider]] = {
+    "openai": _create_openai_provider,
+    "local": _create_local_provider,
+}
+
+
+def register_embedding_provider(
+    name: str, factory: Callable[..., EmbeddingProvider]
+) -> None:
+    """
+    Registra um novo provedor de embeddings.
+
+    Args:
+        name: Nome usado em EMBEDDING_PROVIDER
+        factory: Função que recebe o modelo (ou None) e retorna o provedor.
+                 Se get_embedding_provider receber http_clients, eles são
+                 repassados como argumento nomeado http_clients.
+    """
+
+    EMBEDDING_PROVIDERS[name] = factory
+
+
+def get_embedding_provider(
+    name: Optional[str] = None,
+    model: Optional[str] = None,
+    http_clients: Optional[HttpClients] = None,
+) -> EmbeddingProvider:
+    """
+    Cria o provedor de embeddings configurado.
+
+    Args:
+        name: Nome do provedor (padrão: EMBEDDING_PROVIDER ou "openai")
+        model: Modelo (padrão: definido por cada provedor via ambiente)
+        http_clients: Clientes HTTP compartilhados (padrão: os do SDK)
+
+    Returns:
+        EmbeddingProvider pronto para uso
+
+    Raises:
+        ValueError: Se o provedor não estiver registrado
+    """
+
+    name = name or os.getenv("EMBEDDING_PROVIDER", "openai")
+
+    factory = EMBEDDING_PROVIDERS.get(name)
+    if factory is None:
+        raise ValueError(
+            f"Provedor de embeddings desconhecido: '{name}'. "
+            f"Disponíveis: {', '.join(sorted(EMBEDDING_PROVIDERS))}"
+        )
+
+    if http_clients is None:
+        return factory(model)
+    return factory(model, http_clients=http_clients)
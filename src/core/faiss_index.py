@@ -0,0 +1,363 @@
+"""
+Construção e configuração dos índices FAISS.
+
+Tipos suportados (VECTOR_INDEX_TYPE):
+- "flat": busca exata (IndexFlatL2), padrão e referência de recall
+- "ivf_flat": IVF com vetores completos; busca em nprobe listas
+- "ivf_pq": IVF com Product Quantization; menos memória, recall menor
+- "hnsw": grafo HNSW; sem treino, busca controlada por efSearch
+
+Os índices IVF são treinados nos próprios embeddings dos chunks. Os
+parâmetros de construção e de busca ficam em index_meta.json (chave
+"index") e nprobe/efSearch podem ser sobrescritos na consulta por
+FAISS_NPROBE e FAISS_EF_SEARCH.
+
+Relatório de recall x latência contra o Flat:
+    python -m src.core.faiss_index vector_index
+    python -m src.core.faiss_index --synthetic 50000
+"""
+
+import math
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+
+DEFAULT_INDEX_PARAMS = {
+    "flat": {},
+    "ivf_flat": {"nlist": None, "nprobe": 8},
+    "ivf_pq": {"nlist": None, "nprobe": 8, "pq_m": None, "pq_nbits": 8},
+    "hnsw": {"hnsw_m": 32, "ef_construction": 200, "ef_search": 64},
+}
+
+# Pontos de treino por centróide recomendados pelo FAISS
+_MIN_POINTS_PER_CENTROID = 39
+
+# Parâmetros que só afetam a busca (não exigem reconstruir o índice)
+_SEARCH_KEYS = ("nprobe", "ef_search")
+
+
+def resolve_index_params(
+    index_type: str, num_vectors: int, dimension: int, **overrides
+) -> Dict:
+    """
+    Completa os parâmetros de um tipo de índice para um corpus.
+
+    nlist padrão: 4 * sqrt(n), limitado para haver ao menos 39 vetores de
+    treino por lista. pq_m padrão: maior divisor de d que deixa sub-vetores
+    de pelo menos 16 dimensões. pq_nbits é reduzido se o corpus for pequeno
+    demais para treinar 2^nbits centróides (também 39 vetores por centróide).
+
+    Args:
+        index_type: Um de INDEX_TYPES
+        num_vectors: Número de vetores usados no treino
+        dimension: Dimensão dos vetores
+        **overrides: Parâmetros explícitos (None = padrão)
+
+    Returns:
+        Dicionário com "type" e todos os parâmetros do tipo
+
+    Raises:
+        ValueError: Se o tipo for desconhecido
+    """
+
+    if index_type not in INDEX_TYPES:
+        raise ValueError(
+            f"Tipo de índice desconhecido: '{index_type}'. "
+            f"Disponíveis: {', '.join(INDEX_TYPES)}"
+        )
+
+    params = dict(DEFAULT_INDEX_PARAMS[index_type])
+    params.update({k: v for k, v in overrides.items() if k in params and v is not None})
+
+    if "nlist" in params and params["nlist"] is None:
+        suggested = int(4 * math.sqrt(max(num_vectors, 1)))
+        params["nlist"] = max(
+            1, min(suggested, num_vectors // _MIN_POINTS_PER_CENTROID)
+        )
+
+    if index_type == "ivf_pq":
+        if params["pq_m"] is None:
+            params["pq_m"] = _largest_divisor(dimension, max(1, dimension // 16))
+        trainable = max(num_vectors // _MIN_POINTS_PER_CENTROID, 2)
+        max_nbits = int(math.log2(trainable))
+        params["pq_nbits"] = max(1, min(params["pq_nbits"], max_nbits))
+
+    return {"type": index_type, **params}
+
+
+def build_index(vectors: np.ndarray, params: Dict) -> faiss.Index:
+    """
+    Cria e treina (se necessário) um índice com os vetores dados.
+
+    Args:
+        vectors: Matriz float32 n x d com os embeddings dos chunks
+        params: Parâmetros retornados por resolve_index_params()
+
+    Returns:
+        Índice FAISS com os vetores adicionados (ids = linhas)
+    """
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = create_empty_index(vectors.shape[1], params)
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+
+    apply_search_params(index, params)
+    return index
+
+
+def create_empty_index(dimension: int, params: Dict) -> faiss.Index:
+    """
+    Cria um índice vazio (ainda não treinado) do tipo indicado em params.
+    """
+
+    index_type = params["type"]
+
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dimension)
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, params["hnsw_m"])
+        index.hnsw.efConstruction = params["ef_construction"]
+        return index
+
+    quantizer = faiss.IndexFlatL2(dimension)
+    if index_type == "ivf_flat":
+        return faiss.IndexIVFFlat(quantizer, dimension, params["nlist"])
+
+    return faiss.IndexIVFPQ(
+        quantizer, dimension, params["nlist"], params["pq_m"], params["pq_nbits"]
+    )
+
+
+def apply_search_params(
+    index: faiss.Index,
+    params: Optional[Dict],
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> None:
+    """
+    Ajusta os parâmetros de busca de um índice carregado.
+
+    Funciona também com índices envolvidos por IndexIDMap.
+
+    Args:
+        index: Índice FAISS
+        params: Parâmetros persistidos (ou None para índices antigos)
+        nprobe: Sobrescreve o nprobe dos índices IVF
+        ef_search: Sobrescreve o efSearch dos índices HNSW
+    """
+
+    params = params or {}
+
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    if ivf is not None:
+        ivf.nprobe = min(nprobe or params.get("nprobe") or ivf.nprobe, ivf.nlist)
+        return
+
+    base = index.index if hasattr(index, "id_map") else index
+    base = faiss.downcast_index(base)
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = ef_search or params.get("ef_search") or base.hnsw.efSearch
+
+
+def index_labels(index: faiss.Index) -> np.ndarray:
+    """
+    Ids retornados pela busca para cada linha do índice, na ordem das linhas.
+
+    Em índices comuns o id é a própria linha; com IndexIDMap, vem de id_map.
+    """
+
+    id_map = getattr(index, "id_map", None)
+    if id_map is None:
+        return np.arange(index.ntotal, dtype=np.int64)
+
+    return faiss.vector_to_array(id_map).astype(np.int64)
+
+
+def search_params_from_env() -> Dict[str, Optional[int]]:
+    """
+    Lê FAISS_NPROBE e FAISS_EF_SEARCH (0 ou vazio = usar o persistido).
+    """
+
+    return {
+        "nprobe": int(os.getenv("FAISS_NPROBE") or 0) or None,
+        "ef_search": int(os.getenv("FAISS_EF_SEARCH") or 0) or None,
+    }
+
+
+def recall_latency_report(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    configs: List[Dict],
+    top_k: int = 10,
+) -> List[Dict]:
+    """
+    Mede recall@k e latência de cada configuração contra o Flat.
+
+    Args:
+        vectors: Matriz n x d usada para construir os índices
+        queries: Matriz q x d de queries
+        configs: Lista de dicionários com "type", parâmetros de construção e
+                 opcionalmente "nprobe"/"ef_search" de busca
+        top_k: k usado na busca e no recall
+
+    Returns:
+        Uma linha por configuração com recall, latência média por query,
+        tempo de construção e tamanho do índice
+    """
+
+    queries = np.ascontiguousarray(queries, dtype=np.float32)
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(np.ascontiguousarray(vectors, dtype=np.float32))
+    _, truth = exact.search(queries, top_k)
+
+    built: Dict[str, tuple] = {}
+    rows = []
+    for config in configs:
+        build_params = {
+            k: v for k, v in config.items() if k not in _SEARCH_KEYS + ("type",)
+        }
+        params = resolve_index_params(
+            config["type"], len(vectors), vectors.shape[1], **build_params
+        )
+        key = repr(sorted((k, v) for k, v in params.items() if k not in _SEARCH_KEYS))
+
+        if key not in built:
+            start = time.perf_counter()
+            index = build_index(vectors, params)
+            built[key] = (index, (time.perf_counter() - start) * 1000)
+        index, build_ms = built[key]
+
+        apply_search_params(
+            index,
+            params,
+            nprobe=config.get("nprobe"),
+            ef_search=config.get("ef_search"),
+        )
+
+        start = time.perf_counter()
+        for query in queries:
+            index.search(query.reshape(1, -1), top_k)
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        _, found = index.search(queries, top_k)
+        recall = np.mean(
+            [len(set(f) & set(t)) / top_k for f, t in zip(found, truth)]
+        )
+
+        rows.append(
+            {
+                "config": _describe(params, config),
+                "recall": float(recall),
+                "latency_ms": latency_ms,
+                "build_ms": build_ms,
+                "size_mb": faiss.serialize_index(index).nbytes / 1e6,
+            }
+        )
+
+    return rows
+
+
+def default_report_configs() -> List[Dict]:
+    """
+    Configurações comparadas pelo relatório padrão.
+    """
+
+    return [
+        {"type": "flat"},
+        {"type": "ivf_flat", "nprobe": 1},
+        {"type": "ivf_flat", "nprobe": 8},
+        {"type": "ivf_flat", "nprobe": 32},
+        {"type": "ivf_pq", "nprobe": 8},
+        {"type": "ivf_pq", "nprobe": 32},
+        {"type": "hnsw", "ef_search": 16},
+        {"type": "hnsw", "ef_search": 64},
+        {"type": "hnsw", "ef_search": 256},
+    ]
+
+
+def format_report(rows: List[Dict]) -> str:
+    """
+    Formata o relatório como tabela Markdown.
+    """
+
+    lines = [
+        "| Índice | Recall@k | Latência (ms/query) | Construção (ms) | Tamanho (MB) |",
+        "|---|---|---|---|---|",
+    ]
+    for row in rows:
+        lines.append(
+            f"| {row['config']} | {row['recall']:.3f} | {row['latency_ms']:.3f} "
+            f"| {row['build_ms']:.0f} | {row['size_mb']:.2f} |"
+        )
+    return "\n".join(lines)
+
+
+def _describe(params: Dict, config: Dict) -> str:
+    index_type = params["type"]
+    if index_type == "flat":
+        return "flat"
+    if index_type == "hnsw":
+        ef = config.get("ef_search") or params["ef_search"]
+        return f"hnsw M={params['hnsw_m']} efSearch={ef}"
+    nprobe = config.get("nprobe") or params["nprobe"]
+    name = f"{index_type} nlist={params['nlist']} nprobe={nprobe}"
+    if index_type == "ivf_pq":
+        name += f" m={params['pq_m']} nbits={params['pq_nbits']}"
+    return name
+
+
+def _largest_divisor(n: int, limit: int) -> int:
+    for candidate in range(min(limit, n), 0, -1):
+        if n % candidate == 0:
+            return candidate
+    return 1
+
+
+def _synthetic_corpus(num_vectors: int, dimension: int, seed: int = 0) -> np.ndarray:
+    # Mistura de gaussianas: aproxima a estrutura em clusters de embeddings
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, num_vectors // 100), dimension))
+    labels = rng.integers(0, len(centers), size=num_vectors)
+    vectors = centers[labels] + 0.3 * rng.normal(size=(num_vectors, dimension))
+    return vectors.astype(np.float32)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    top_k = 10
+    rng = np.random.default_rng(1)
+
+    if args and args[0] == "--synthetic":
+        num_vectors = int(args[1]) if len(args) > 1 else 50_000
+        corpus = _synthetic_corpus(num_vectors + 200, 384)
+        vectors, queries = corpus[:num_vectors], corpus[num_vectors:]
+        origin = f"corpus sintético ({num_vectors} vetores, d=384)"
+    else:
+        from .index_generation import index_dir
+
+        path = args[0] if args else "vector_index"
+        flat = faiss.read_index(os.path.join(index_dir(path), "index.faiss"))
+        vectors = flat.reconstruct_n(0, flat.ntotal)
+        # Queries: chunks do próprio índice com ruído
+        picks = rng.integers(0, len(vectors), size=min(200, len(vectors)))
+        queries = vectors[picks] + rng.normal(
+            0, 0.01, size=(len(picks), vectors.shape[1])
+        ).astype(np.float32)
+        origin = f"{path} ({len(vectors)} vetores, d={vectors.shape[1]})"
+
+    print(f" Recall x latência, top_k={top_k}, {origin}\n")
+    rows = recall_latency_report(vectors, queries, default_report_configs(), top_k)
+    print(format_report(rows))
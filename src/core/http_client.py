@@ -0,0 +1,96 @@
+"""
+Clientes HTTP compartilhados pelas chamadas de embeddings e de LLM.
+
+Sem isso, OpenAIEmbeddings e ChatOpenAI criam cada um o seu cliente, com as
+configurações padrão do SDK. Aqui um par de clientes httpx (síncrono e
+assíncrono) é criado uma vez por processo e repassado aos dois, então as
+perguntas em um processo já aquecido reaproveitam as conexões TLS abertas
+com o provedor.
+
+Configuração (variáveis de ambiente):
+- HTTP_MAX_CONNECTIONS / HTTP_MAX_KEEPALIVE: tamanho do pool e conexões
+  ociosas mantidas (dimensionar pela concorrência da API)
+- HTTP_KEEPALIVE_EXPIRY_S: tempo que uma conexão ociosa fica aberta
+- HTTP_CONNECT_TIMEOUT_S / HTTP_READ_TIMEOUT_S / HTTP_POOL_TIMEOUT_S:
+  timeouts de conexão, de leitura e de espera por uma conexão livre
+- HTTP_MAX_RETRIES: tentativas extras do SDK (erros de conexão, 429 e 5xx,
+  com backoff)
+- HTTP2: usa HTTP/2 quando o pacote h2 estiver instalado
+"""
+
+import importlib.util
+import os
+from dataclasses import dataclass
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def http2_available() -> bool:
+    """
+    Indica se o httpx pode usar HTTP/2 (requer o pacote h2).
+    """
+
+    return importlib.util.find_spec("h2") is not None
+
+
+@dataclass
+class HttpClients:
+    """
+    Clientes httpx compartilhados e a política de retries.
+
+    Attributes:
+        sync_client: Cliente das chamadas síncronas
+        async_client: Cliente das chamadas assíncronas
+        max_retries: Tentativas extras repassadas aos clientes do SDK
+        http2: Se os clientes negociam HTTP/2
+    """
+
+    sync_client: httpx.Client
+    async_client: httpx.AsyncClient
+    max_retries: int = 2
+    http2: bool = False
+
+    @classmethod
+    def from_env(cls) -> "HttpClients":
+        """
+        Cria os clientes a partir das variáveis de ambiente.
+        """
+
+        limits = httpx.Limits(
+            max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS") or 64),
+            max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE") or 32),
+            keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY_S") or 30),
+        )
+        read_timeout = float(os.getenv("HTTP_READ_TIMEOUT_S") or 60)
+        timeout = httpx.Timeout(
+            read_timeout,
+            connect=float(os.getenv("HTTP_CONNECT_TIMEOUT_S") or 5),
+            pool=float(os.getenv("HTTP_POOL_TIMEOUT_S") or 10),
+        )
+        http2 = os.getenv("HTTP2", "true").lower() == "true" and http2_available()
+
+        return cls(
+            sync_client=httpx.Client(limits=limits, timeout=timeout, http2=http2),
+            async_client=httpx.AsyncClient(
+                limits=limits, timeout=timeout, http2=http2
+            ),
+            max_retries=int(os.getenv("HTTP_MAX_RETRIES") or 2),
+            http2=http2,
+        )
+
+    def close(self) -> None:
+        """
+        Fecha o cliente síncrono.
+        """
+
+        self.sync_client.close()
+
+    async def aclose(self) -> None:
+        """
+        Fecha o cliente assíncrono.
+        """
+
+        await self.async_client.aclose()
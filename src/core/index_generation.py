@@ -0,0 +1,152 @@
+"""
+Gerações do índice em disco, trocadas com um único os.replace.
+
+Uma indexação grava todos os arquivos do índice (index.faiss, chunk store,
+índice BM25, index_meta.json e, no incremental, manifest.json) em uma
+pasta nova, generation-<id>/, dentro do diretório do índice. Só no fim o
+ponteiro current.json passa a apontar para ela. Um leitor resolve o
+ponteiro uma vez (index_dir) e abre tudo da mesma pasta, então nunca junta
+vetores de uma indexação com chunks de outra; se a indexação falhar no
+meio, a geração anterior segue valendo.
+
+A geração anterior é mantida para quem acabou de ler o ponteiro antigo; as
+mais velhas são apagadas. Índices gravados antes (arquivos soltos no
+diretório, sem ponteiro) continuam sendo lidos, e os arquivos soltos são
+apagados quando a primeira geração é publicada.
+
+    with IndexGeneration("vector_index") as generation:
+        faiss.write_index(index, os.path.join(generation.path, "index.faiss"))
+        ChunkStore.write(generation.path, chunks)
+        generation.publish()
+"""
+
+import json
+import os
+import shutil
+import uuid
+from typing import Optional
+
+from .chunk_store import CHUNK_BLOB_FILE, CHUNK_COLUMNS, DUPLICATES_FILE, SPAN_COLUMN
+from .lexical_index import LEXICAL_COLUMNS, VOCAB_FILE
+
+POINTER_FILE = "current.json"
+GENERATION_PREFIX = "generation-"
+
+# Arquivos do formato antigo, gravados direto no diretório do índice
+LEGACY_FILES = (
+    ("index.faiss", "index.pkl", "index_meta.json", "manifest.json")
+    + (CHUNK_BLOB_FILE, DUPLICATES_FILE, f"{SPAN_COLUMN}.npy")
+    + tuple(f"{name}.npy" for name in CHUNK_COLUMNS)
+    + (VOCAB_FILE,)
+    + tuple(f"{name}.npy" for name in LEXICAL_COLUMNS)
+)
+
+
+def current_generation(index_path: str) -> Optional[str]:
+    """
+    Geração apontada por current.json, ou None (índice sem ponteiro).
+    """
+
+    try:
+        with open(os.path.join(index_path, POINTER_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)["generation"]
+    except (FileNotFoundError, ValueError, KeyError, TypeError):
+        return None
+
+
+def index_dir(index_path: str) -> str:
+    """
+    Pasta com os arquivos da geração atual do índice.
+
+    Chamar de novo com a pasta de uma geração devolve a mesma pasta (ela
+    não tem ponteiro), então funções de leitura podem resolver sempre.
+
+    Args:
+        index_path: Diretório do índice
+
+    Returns:
+        generation-<id>/ apontada por current.json, ou o próprio
+        index_path para índices no formato antigo
+    """
+
+    generation = current_generation(index_path)
+    if generation is None:
+        return index_path
+    return os.path.join(index_path, f"{GENERATION_PREFIX}{generation}")
+
+
+class IndexGeneration:
+    """
+    Geração nova do índice, fora do ponteiro até publish().
+
+    Usada como context manager: se o bloco terminar sem publish() (erro no
+    meio da indexação, por exemplo), a pasta é apagada e o índice em uso
+    não muda.
+    """
+
+    def __init__(self, index_path: str):
+        """
+        Cria a pasta da geração.
+
+        Args:
+            index_path: Diretório do índice
+        """
+
+        self.index_path = index_path
+        self.generation = uuid.uuid4().hex[:16]
+        self.path = os.path.join(index_path, f"{GENERATION_PREFIX}{self.generation}")
+        self.published = False
+        os.makedirs(self.path)
+
+    def publish(self) -> None:
+        """
+        Passa o ponteiro para esta geração (um os.replace) e apaga as
+        gerações antigas, menos a anterior.
+        """
+
+        previous = current_generation(self.index_path)
+
+        pointer_path = os.path.join(self.index_path, POINTER_FILE)
+        with open(f"{pointer_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"generation": self.generation}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{pointer_path}.tmp", pointer_path)
+        self.published = True
+
+        _remove_old_generations(self.index_path, keep={self.generation, previous})
+
+    def discard(self) -> None:
+        """
+        Apaga a geração sem publicá-la.
+        """
+
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self) -> "IndexGeneration":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        if not self.published:
+            self.discard()
+
+
+def _remove_old_generations(index_path: str, keep: set) -> None:
+    """
+    Apaga as gerações fora de keep e os arquivos soltos do formato antigo.
+
+    Leitores que ainda mapeiam esses arquivos continuam lendo: no Linux o
+    conteúdo só some quando o último mapeamento é fechado.
+    """
+
+    for name in os.listdir(index_path):
+        path = os.path.join(index_path, name)
+        if name.startswith(GENERATION_PREFIX) and os.path.isdir(path):
+            if name[len(GENERATION_PREFIX):] not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+    for name in LEGACY_FILES:
+        try:
+            os.remove(os.path.join(index_path, name))
+        except OSError:
+            pass
@@ -0,0 +1,108 @@
+"""
+Metadados do índice vetorial (index_meta.json).
+
+Registra como o índice foi construído (provedor e modelo de embeddings,
+dimensão dos vetores) para que o retriever recuse carregar um índice com
+um provedor incompatível: vetores de modelos diferentes não são comparáveis.
+"""
+
+import json
+import os
+from typing import Dict, Optional
+
+from .index_generation import index_dir
+
+INDEX_METADATA_FILE = "index_meta.json"
+
+
+def read_index_metadata(index_path: str) -> Optional[Dict]:
+    """
+    Lê os metadados de um índice.
+
+    Args:
+        index_path: Diretório do índice (lê a geração atual) ou a pasta de
+                    uma geração
+
+    Returns:
+        Dicionário com os metadados, ou None para índices antigos sem o arquivo
+    """
+
+    path = os.path.join(index_dir(index_path), INDEX_METADATA_FILE)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_index_metadata(index_path: str, metadata: Dict) -> None:
+    """
+    Grava os metadados de um índice de forma atômica.
+
+    Args:
+        index_path: Pasta onde gravar (a geração que está sendo montada)
+        metadata: Dicionário serializável em JSON
+    """
+
+    os.makedirs(index_path, exist_ok=True)
+
+    path = os.path.join(index_path, INDEX_METADATA_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def check_embedding_compatibility(
+    metadata: Optional[Dict],
+    provider: str,
+    model: str,
+    dimension: Optional[int],
+    index_dimension: Optional[int] = None,
+) -> None:
+    """
+    Verifica se o provedor de embeddings atual pode consultar o índice.
+
+    Índices sem metadados foram criados antes deste arquivo existir, sempre
+    com o provedor "openai"; para eles só o provedor é verificado.
+
+    Args:
+        metadata: Metadados lidos do índice (ou None)
+        provider: Provedor configurado no processo atual
+        model: Modelo configurado no processo atual
+        dimension: Dimensão dos vetores do provedor atual (se conhecida)
+        index_dimension: Dimensão dos vetores armazenados no FAISS
+
+    Raises:
+        ValueError: Se provedor, modelo ou dimensão não baterem
+    """
+
+    built_provider = (metadata or {}).get("embedding_provider", "openai")
+    if built_provider != provider:
+        raise ValueError(
+            f"O índice foi construído com o provedor de embeddings "
+            f"'{built_provider}', mas o provedor configurado é '{provider}'. "
+            f"Reindexe os documentos ou ajuste EMBEDDING_PROVIDER."
+        )
+
+    if metadata is not None:
+        built_model = metadata.get("embedding_model")
+        if built_model and _strip_vendor(built_model) != _strip_vendor(model):
+            raise ValueError(
+                f"O índice foi construído com o modelo '{built_model}', mas o "
+                f"modelo configurado é '{model}'."
+            )
+
+        index_dimension = index_dimension or metadata.get("dimension")
+
+    if dimension is not None and index_dimension is not None:
+        if dimension != index_dimension:
+            raise ValueError(
+                f"Dimensão dos embeddings ({dimension}) diferente da dimensão "
+                f"do índice ({index_dimension})."
+            )
+
+
+def _strip_vendor(model: str) -> str:
+    # "openai/text-embedding-3-small" (OpenRouter) == "text-embedding-3-small"
+    return model.split("/", 1)[1] if model.startswith("openai/") else model
@@ -0,0 +1,313 @@
+"""
+Índice lexical (BM25) gravado ao lado do índice FAISS.
+
+Os embeddings às vezes perdem termos exatos do domínio ("FIFO", "PEPS",
+"lote econômico", "curva ABC"); o BM25 acerta esses casos e não depende da
+API de embeddings, então também serve de modo degradado quando ela está
+lenta.
+
+Tokenização:
+- remove os marcadores de página, passa para minúsculas e tira os acentos
+  (NFKD), então "econômico" e "economico" são o mesmo termo
+- palavras (\\w+) fora da lista de stopwords do português
+- singular simples: remove o "s" final de palavras com mais de 3 letras
+  ("lotes" -> "lote")
+
+O índice invertido é guardado em arrays (formato CSR), com a linha i
+correspondendo ao vetor i do FAISS e ao chunk i do ChunkStore:
+- lexical_vocab.json: termos, na ordem dos ids
+- lexical_offsets.npy: início das postings de cada termo (V + 1 valores)
+- lexical_rows.npy / lexical_tf.npy: linha do chunk e frequência do termo
+- lexical_doc_lengths.npy: número de termos de cada chunk
+
+Os arrays são abertos com mmap, como no ChunkStore.
+"""
+
+import json
+import math
+import os
+import re
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..utils.text import WORD, fold_accents
+
+VOCAB_FILE = "lexical_vocab.json"
+LEXICAL_COLUMNS = (
+    "lexical_offsets",
+    "lexical_rows",
+    "lexical_tf",
+    "lexical_doc_lengths",
+)
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_PAGE_MARKER = re.compile(r"---\s*Página\s+\d+\s*---")
+
+# Stopwords do português, já sem acentos
+STOPWORDS = frozenset(
+    """
+    a ao aos aquela aquele aquilo as ate com como da das de dela dele deles
+    depois do dos e ela elas ele eles em entre era essa esse esta estao este
+    eu foi for ha isso isto ja la lhe mais mas me mesmo meu minha muito na
+    nao nas nem no nos nossa nosso num numa o os ou para pela pelas pelo
+    pelos por qual quais quando que quem se sem ser seu seus sua suas sao
+    so tambem te tem tu um uma umas uns voce
+    """.split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Termos de um texto, na mesma normalização usada na indexação.
+    """
+
+    text = fold_accents(_PAGE_MARKER.sub(" ", text).lower())
+    terms = []
+    for word in WORD.findall(text):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+class LexicalIndexBuilder:
+    """
+    Acumula as postings chunk a chunk e monta o LexicalIndex no final.
+
+    As postings ficam em três arrays planos (termo, linha, frequência), e
+    não em listas de objetos, para a indexação de corpora grandes não
+    crescer demais em memória.
+    """
+
+    def __init__(self):
+        self.vocabulary: Dict[str, int] = {}
+        self._terms = array("i")
+        self._rows = array("i")
+        self._tfs = array("i")
+        self._doc_lengths = array("i")
+
+    def add(self, text: str) -> None:
+        """
+        Adiciona o próximo chunk (linha len(self)).
+        """
+
+        row = len(self._doc_lengths)
+        counts: Dict[int, int] = {}
+        terms = tokenize(text)
+        for term in terms:
+            term_id = self.vocabulary.setdefault(term, len(self.vocabulary))
+            counts[term_id] = counts.get(term_id, 0) + 1
+
+        for term_id, tf in counts.items():
+            self._terms.append(term_id)
+            self._rows.append(row)
+            self._tfs.append(tf)
+        self._doc_lengths.append(len(terms))
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def build(self) -> "LexicalIndex":
+        terms = np.frombuffer(self._terms, dtype=np.int32)
+        # Ordenação estável: dentro de cada termo as linhas seguem crescentes
+        order = np.argsort(terms, kind="stable")
+        counts = np.bincount(terms, minlength=len(self.vocabulary))
+
+        offsets = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        return LexicalIndex(
+            list(self.vocabulary),
+            offsets,
+            np.frombuffer(self._rows, dtype=np.int32)[order],
+            np.frombuffer(self._tfs, dtype=np.int32)[order],
+            np.array(self._doc_lengths, dtype=np.int32),
+        )
+
+
+class LexicalIndex:
+    """
+    Índice invertido com ranking BM25.
+    """
+
+    def __init__(
+        self,
+        terms: List[str],
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        tfs: np.ndarray,
+        doc_lengths: np.ndarray,
+        k1: float = BM25_K1,
+        b: float = BM25_B,
+    ):
+        """
+        Args:
+            terms: Vocabulário, na ordem dos ids
+            offsets: Início das postings de cada termo (len(terms) + 1)
+            rows: Linha do chunk de cada posting
+            tfs: Frequência do termo em cada posting
+            doc_lengths: Número de termos de cada chunk
+            k1: Saturação da frequência do termo
+            b: Peso da normalização pelo tamanho do chunk
+        """
+
+        self.vocabulary = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.rows = rows
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+
+        n = len(doc_lengths)
+        self._avg_length = float(doc_lengths.mean()) if n else 0.0
+        # Fator de normalização por chunk: k1 * (1 - b + b * |d| / avgdl)
+        self._length_norm = (
+            k1 * (1 - b + b * doc_lengths / self._avg_length)
+            if self._avg_length
+            else np.full(n, k1)
+        ).astype(np.float32)
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> "LexicalIndex":
+        """
+        Indexa os textos; o i-ésimo texto vira a linha i.
+        """
+
+        builder = LexicalIndexBuilder()
+        for text in texts:
+            builder.add(text)
+        return builder.build()
+
+    @staticmethod
+    def exists(index_path: str) -> bool:
+        """
+        Indica se o diretório do índice tem um índice lexical completo.
+        """
+
+        names = [VOCAB_FILE] + [f"{name}.npy" for name in LEXICAL_COLUMNS]
+        return all(os.path.exists(os.path.join(index_path, n)) for n in names)
+
+    @classmethod
+    def load(cls, index_path: str) -> "LexicalIndex":
+        """
+        Abre o índice lexical gravado em index_path (arrays via mmap).
+        """
+
+        with open(os.path.join(index_path, VOCAB_FILE), "r", encoding="utf-8") as f:
+            terms = json.load(f)["terms"]
+
+        columns = {
+            name: np.load(os.path.join(index_path, f"{name}.npy"), mmap_mode="r")
+            for name in LEXICAL_COLUMNS
+        }
+        return cls(
+            terms,
+            columns["lexical_offsets"],
+            columns["lexical_rows"],
+            columns["lexical_tf"],
+            columns["lexical_doc_lengths"],
+        )
+
+    def save(self, index_path: str) -> None:
+        """
+        Grava o índice em index_path.
+
+        Cada arquivo é escrito em um temporário e movido com os.replace; o
+        vocabulário vai por último, então exists() só fica verdadeiro no fim.
+        """
+
+        os.makedirs(index_path, exist_ok=True)
+
+        arrays = {
+            "lexical_offsets": self.offsets,
+            "lexical_rows": self.rows,
+            "lexical_tf": self.tfs,
+            "lexical_doc_lengths": self.doc_lengths,
+        }
+        for name, values in arrays.items():
+            path = os.path.join(index_path, f"{name}.npy")
+            with open(f"{path}.tmp", "wb") as f:
+                np.save(f, np.asarray(values))
+            os.replace(f"{path}.tmp", path)
+
+        vocab_path = os.path.join(index_path, VOCAB_FILE)
+        with open(f"{vocab_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"terms": list(self.vocabulary)}, f, ensure_ascii=False)
+        os.replace(f"{vocab_path}.tmp", vocab_path)
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def idf(self, term_id: int) -> float:
+        """
+        IDF do BM25 (variante sempre positiva do Lucene).
+        """
+
+        df = int(self.offsets[term_id + 1] - self.offsets[term_id])
+        n = len(self.doc_lengths)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Busca os top_k chunks com maior score BM25.
+
+        Args:
+            query: Texto da query (tokenizado como os chunks)
+            top_k: Número máximo de resultados
+
+        Returns:
+            Tupla (scores, rows) em ordem decrescente de score; só entram
+            chunks com pelo menos um termo da query
+        """
+
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float32)
+        for term in dict.fromkeys(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            rows = self.rows[start:end]
+            tfs = self.tfs[start:end].astype(np.float32)
+            # As linhas de um termo são distintas: a soma indexada é segura
+            scores[rows] += (
+                self.idf(term_id) * tfs * (self.k1 + 1) / (tfs + self._length_norm[rows])
+            )
+
+        candidates = np.flatnonzero(scores)
+        if top_k <= 0:
+            candidates = candidates[:0]
+        elif len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        # Empates por linha, para o resultado ser determinístico
+        order = np.lexsort((candidates, -scores[candidates]))
+        rows = candidates[order]
+
+        return scores[rows], rows
+
+
+def write_lexical_index(index_path: str, texts: Iterable[str]) -> LexicalIndex:
+    """
+    Indexa os textos dos chunks (na ordem das linhas) e grava em index_path.
+    """
+
+    index = LexicalIndex.build(texts)
+    index.save(index_path)
+    return index
+
+
+def load_lexical_index(index_path: str) -> Optional[LexicalIndex]:
+    """
+    Abre o índice lexical, ou retorna None se ele não existir.
+    """
+
+    if not LexicalIndex.exists(index_path):
+        return None
+    return LexicalIndex.load(index_path)
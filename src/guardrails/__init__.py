@@ -25,6 +25,8 @@ from .input_validator import (
     validate_question,
     get_validator,
 )
+from .injection_scanner import InjectionMatch, InjectionScanner
+from .keyword_matcher import KeywordMatcher
 
 
 from .rules import (
@@ -45,6 +47,9 @@ __all__ = [
     "GuardrailsConfig",
     "validate_question",
     "get_validator",
+    "InjectionScanner",
+    "InjectionMatch",
+    "KeywordMatcher",
     "BlockingReason",
     "BLOCKING_MESSAGES",
     "PROMPT_INJECTION_PATTERNS",
@@ -7,15 +7,14 @@ em rules.py.
 """
 
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import Dict, Optional, List
 import re
 
 
+from .injection_scanner import InjectionScanner
+from .keyword_matcher import KeywordMatcher
 from .rules import (
-    COMPILED_INJECTION_PATTERNS,
-    OUT_OF_DOMAIN_KEYWORDS,
-    INAPPROPRIATE_CONTENT_KEYWORDS,
-    ALLOWED_DOMAIN_KEYWORDS,
+    KEYWORD_LISTS,
     BlockingReason,
     BLOCKING_MESSAGES,
     GuardrailsConfig,
@@ -71,9 +70,10 @@ class InputValidator:
 
         self.config = config or GuardrailsConfig()
 
-        self.out_of_domain_lower = [kw.lower() for kw in OUT_OF_DOMAIN_KEYWORDS]
-        self.inappropriate_lower = [kw.lower() for kw in INAPPROPRIATE_CONTENT_KEYWORDS]
-        self.allowed_domain_lower = [kw.lower() for kw in ALLOWED_DOMAIN_KEYWORDS]
+        # Todas as listas de palavras-chave em um autômato só
+        self.keyword_matcher = KeywordMatcher(KEYWORD_LISTS)
+        # Regras de injection de rules.py e de INJECTION_RULES_PATH
+        self.injection_scanner = InjectionScanner.from_env()
 
     def validate(self, question: str) -> ValidationResult:
         """
@@ -107,11 +107,16 @@ class InputValidator:
         if not injection_result.is_valid:
             return injection_result
 
-        inappropriate_result = self._detect_inappropriate_content(question)
+        # Uma passada pela pergunta encontra as palavras-chave das duas camadas
+        keyword_matches = self.keyword_matcher.find_all(question)
+
+        inappropriate_result = self._detect_inappropriate_content(
+            question, keyword_matches
+        )
         if not inappropriate_result.is_valid:
             return inappropriate_result
 
-        domain_result = self._validate_domain(question)
+        domain_result = self._validate_domain(question, keyword_matches)
         if not domain_result.is_valid:
             return domain_result
 
@@ -158,7 +163,8 @@ class InputValidator:
 
     def _detect_prompt_injection(self, question: str) -> ValidationResult:
         """
-        Detecta tentativas de prompt injection usando regex patterns.
+        Detecta tentativas de prompt injection usando regex patterns
+        (InjectionScanner).
 
         Verifica se a pergunta contém padrões suspeitos como:
         - "ignore as instruções"
@@ -172,26 +178,26 @@ class InputValidator:
             ValidationResult indicando se foi detectado prompt injection
         """
 
-        question_lower = question.lower()
-
-        for pattern in COMPILED_INJECTION_PATTERNS:
-
-            match = pattern.search(question_lower)
-
-            if match:
+        match = self.injection_scanner.scan(question)
 
-                matched_text = match.group(0)
-
-                return ValidationResult(
-                    is_valid=False,
-                    block_reason=BlockingReason.PROMPT_INJECTION,
-                    block_message=BLOCKING_MESSAGES[BlockingReason.PROMPT_INJECTION],
-                    details=f"Padrão de injection detectado: '{matched_text}'",
-                )
+        if match:
+            return ValidationResult(
+                is_valid=False,
+                block_reason=BlockingReason.PROMPT_INJECTION,
+                block_message=BLOCKING_MESSAGES[BlockingReason.PROMPT_INJECTION],
+                details=(
+                    f"Padrão de injection detectado: '{match.text}' "
+                    f"(regra {match.rule})"
+                ),
+            )
 
         return ValidationResult(is_valid=True)
 
-    def _detect_inappropriate_content(self, question: str) -> ValidationResult:
+    def _detect_inappropriate_content(
+        self,
+        question: str,
+        keyword_matches: Optional[Dict[str, List[str]]] = None,
+    ) -> ValidationResult:
         """
         Detecta conteúdo inadequado, ofensivo ou ilegal.
 
@@ -199,27 +205,32 @@ class InputValidator:
 
         Args:
             question: Texto da pergunta
+            keyword_matches: Resultado de keyword_matcher.find_all(question),
+                             se já calculado
 
         Returns:
             ValidationResult indicando se foi detectado conteúdo inadequado
         """
 
-        question_lower = question.lower()
+        if keyword_matches is None:
+            keyword_matches = self.keyword_matcher.find_all(question)
 
-        for keyword in self.inappropriate_lower:
-            if keyword in question_lower:
-                return ValidationResult(
-                    is_valid=False,
-                    block_reason=BlockingReason.INAPPROPRIATE_CONTENT,
-                    block_message=BLOCKING_MESSAGES[
-                        BlockingReason.INAPPROPRIATE_CONTENT
-                    ],
-                    details=f"Conteúdo inadequado detectado: '{keyword}'",
-                )
+        inappropriate = keyword_matches.get("inappropriate_content")
+        if inappropriate:
+            return ValidationResult(
+                is_valid=False,
+                block_reason=BlockingReason.INAPPROPRIATE_CONTENT,
+                block_message=BLOCKING_MESSAGES[BlockingReason.INAPPROPRIATE_CONTENT],
+                details=f"Conteúdo inadequado detectado: '{inappropriate[0]}'",
+            )
 
         return ValidationResult(is_valid=True)
 
-    def _validate_domain(self, question: str) -> ValidationResult:
+    def _validate_domain(
+        self,
+        question: str,
+        keyword_matches: Optional[Dict[str, List[str]]] = None,
+    ) -> ValidationResult:
         """
         Valida se a pergunta está dentro do domínio permitido (gestão de estoques).
 
@@ -229,27 +240,28 @@ class InputValidator:
 
         Args:
             question: Texto da pergunta
+            keyword_matches: Resultado de keyword_matcher.find_all(question),
+                             se já calculado
 
         Returns:
             ValidationResult indicando se a pergunta está dentro do domínio
         """
 
-        question_lower = question.lower()
+        if keyword_matches is None:
+            keyword_matches = self.keyword_matcher.find_all(question)
 
-        for keyword in self.out_of_domain_lower:
-            if keyword in question_lower:
-                return ValidationResult(
-                    is_valid=False,
-                    block_reason=BlockingReason.OUT_OF_DOMAIN,
-                    block_message=BLOCKING_MESSAGES[BlockingReason.OUT_OF_DOMAIN],
-                    details=f"Tópico fora do domínio detectado: '{keyword}'",
-                )
+        out_of_domain = keyword_matches.get("out_of_domain")
+        if out_of_domain:
+            return ValidationResult(
+                is_valid=False,
+                block_reason=BlockingReason.OUT_OF_DOMAIN,
+                block_message=BLOCKING_MESSAGES[BlockingReason.OUT_OF_DOMAIN],
+                details=f"Tópico fora do domínio detectado: '{out_of_domain[0]}'",
+            )
 
         if self.config.ENFORCE_DOMAIN_KEYWORDS:
 
-            domain_keywords_found = sum(
-                1 for keyword in self.allowed_domain_lower if keyword in question_lower
-            )
+            domain_keywords_found = len(keyword_matches.get("allowed_domain", []))
 
             if domain_keywords_found < self.config.MIN_DOMAIN_KEYWORDS_REQUIRED:
                 return ValidationResult(
@@ -0,0 +1,186 @@
+"""
+Busca das palavras-chave dos guardrails em uma única passada (Aho-Corasick).
+
+O validador percorria a pergunta uma vez para cada palavra-chave de cada
+lista (`keyword in question_lower`). O custo crescia com o tamanho das
+listas, e a busca por substring gerava falsos positivos como "rg" dentro de
+"carga".
+
+Aqui todas as listas de rules.py viram um único autômato, construído uma
+vez. A pergunta é normalizada e percorrida uma vez, e a busca devolve as
+ocorrências de todas as categorias ao mesmo tempo:
+- minúsculas e sem acentos ("Previsão" -> "previsao")
+- palavras (\\w+), então pontuação e hífen separam palavras
+  ("e-mail" -> "e mail")
+- singular simples, como no índice lexical ("lotes" -> "lote"), e
+  "ns" -> "m" ("armazéns" -> "armazem")
+
+O autômato trabalha com palavras inteiras, e não com caracteres, então
+uma palavra-chave só casa com palavras completas. As palavras-chave de
+várias palavras ("controle de estoque") casam com a mesma sequência de
+palavras na pergunta.
+
+A busca antiga por substring também pegava flexões ("abuso" em "abusou").
+Para isso uma palavra da palavra-chave pode terminar em "*" e casa com
+qualquer palavra que comece com ela: "abus*" casa com "abuso", "abusou" e
+"abusivo". Cada palavra da pergunta que começa com um desses radicais é
+trocada pelo radical (o mais longo) antes de entrar no autômato, e o mesmo
+vale para as palavras das outras palavras-chave.
+"""
+
+import re
+from typing import Dict, Iterable, List, Tuple
+
+from ..utils.text import WORD, fold_accents
+
+# Palavra de uma palavra-chave, com o "*" opcional de radical
+_KEYWORD_WORD = re.compile(r"\w+\*?")
+
+
+def _singular(word: str) -> str:
+    if len(word) > 3 and word.endswith("ns"):
+        return word[:-2] + "m"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def normalize_words(text: str) -> List[str]:
+    """
+    Palavras do texto na normalização usada pelo matcher.
+    """
+
+    return [_singular(word) for word in WORD.findall(fold_accents(text.casefold()))]
+
+
+class KeywordMatcher:
+    """
+    Autômato de Aho-Corasick sobre palavras, com uma categoria por lista.
+
+    Example:
+        >>> matcher = KeywordMatcher({"fora": ["rg", "cartão de crédito", "fraud*"]})
+        >>> matcher.find_all("Qual a carga do cartão de crédito?")
+        {'fora': ['cartão de crédito']}
+        >>> matcher.find_all("Um fornecedor fraudulento")
+        {'fora': ['fraud*']}
+    """
+
+    def __init__(self, categories: Dict[str, Iterable[str]]):
+        """
+        Args:
+            categories: Listas de palavras-chave, por categoria
+        """
+
+        # Estado 0 é a raiz; _goto[s] leva uma palavra ao próximo estado
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, str]]] = [[]]
+        self.categories = list(categories)
+        self.size = 0
+
+        keywords = [
+            (category, keyword, _KEYWORD_WORD.findall(fold_accents(keyword.casefold())))
+            for category, words in categories.items()
+            for keyword in words
+        ]
+
+        # Radicais ("abus" de "abus*"), agrupados por tamanho, do maior ao menor
+        stems: Dict[int, set] = {}
+        for _, _, words in keywords:
+            for word in words:
+                if word.endswith("*"):
+                    stems.setdefault(len(word) - 1, set()).add(word[:-1])
+        self._stems = sorted(stems.items(), reverse=True)
+
+        for category, keyword, words in keywords:
+            self._add(category, keyword, words)
+
+        self._build_failure_links()
+
+    def _stem(self, word: str) -> str:
+        """
+        Troca a palavra pelo maior radical com que ela começa ("abus*").
+        """
+
+        for length, stems in self._stems:
+            if word[:length] in stems:
+                return word[:length] + "*"
+        return word
+
+    def _add(self, category: str, keyword: str, words: List[str]) -> None:
+        words = [
+            word if word.endswith("*") else self._stem(_singular(word))
+            for word in words
+        ]
+        if not words:
+            return
+
+        state = 0
+        for word in words:
+            following = self._goto[state].get(word)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][word] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = following
+
+        if (category, keyword) not in self._output[state]:
+            self._output[state].append((category, keyword))
+            self.size += 1
+
+    def _build_failure_links(self) -> None:
+        """
+        Liga cada estado ao maior sufixo que também é prefixo de alguma
+        palavra-chave (busca em largura) e junta as saídas desse sufixo.
+        """
+
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for word, following in self._goto[state].items():
+                queue.append(following)
+
+                fallback = self._fail[state]
+                while fallback and word not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(word, 0)
+
+                self._fail[following] = target
+                self._output[following] = self._output[following] + self._output[target]
+
+    def find_all(self, text: str) -> Dict[str, List[str]]:
+        """
+        Palavras-chave encontradas no texto, por categoria.
+
+        Args:
+            text: Texto original (a normalização é feita aqui)
+
+        Returns:
+            Dicionário categoria -> palavras-chave (na forma original de
+            rules.py, na ordem em que aparecem, sem repetição). Categorias
+            sem ocorrência ficam de fora.
+        """
+
+        found: Dict[str, List[str]] = {}
+        goto, fail, output = self._goto, self._fail, self._output
+
+        words = normalize_words(text)
+        if self._stems:
+            words = [self._stem(word) for word in words]
+
+        state = 0
+        for word in words:
+            while state and word not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word, 0)
+
+            for category, keyword in output[state]:
+                keywords = found.setdefault(category, [])
+                if keyword not in keywords:
+                    keywords.append(keyword)
+
+        return found
+
+    def __len__(self) -> int:
+        return self.size
@@ -77,14 +77,16 @@ OUT_OF_DOMAIN_KEYWORDS: List[str] = [
 ]
 
 
+# As palavras-chave casam com palavras inteiras; "*" no fim de uma palavra
+# casa com as flexões ("abus*" -> "abuso", "abusou", "abusivo")
 INAPPROPRIATE_CONTENT_KEYWORDS: List[str] = [
     "xingamento",
     "palavrão",
-    "insulto",
+    "insult*",
     "como fazer bomba",
     "como invadir",
     "hack bancário",
-    "fraude",
+    "fraud*",
     "sonegação",
     "evasão fiscal",
     "tráfico",
@@ -94,7 +96,7 @@ INAPPROPRIATE_CONTENT_KEYWORDS: List[str] = [
     "como machucar",
     "suicídio",
     "autolesão",
-    "abuso",
+    "abus*",
     "violência doméstica",
 ]
 
@@ -149,6 +151,14 @@ ALLOWED_DOMAIN_KEYWORDS: List[str] = [
 ]
 
 
+# Listas de palavras-chave por categoria, buscadas juntas pelo KeywordMatcher
+KEYWORD_LISTS: Dict[str, List[str]] = {
+    "inappropriate_content": INAPPROPRIATE_CONTENT_KEYWORDS,
+    "out_of_domain": OUT_OF_DOMAIN_KEYWORDS,
+    "allowed_domain": ALLOWED_DOMAIN_KEYWORDS,
+}
+
+
 class BlockingReason:
     """
     Enum-like class para categorizar os motivos de bloqueio.
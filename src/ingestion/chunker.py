@@ -1,6 +1,18 @@
-from typing import List, Dict
+import os
+from bisect import bisect_right
+from typing import List, Dict, Optional, Sequence, Tuple, Union
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
+from src.utils.tokens import get_encoder
+
+CHUNKING_MODES = ("chars", "tokens")
+DEFAULT_CHUNK_TOKENS = 200
+DEFAULT_OVERLAP_TOKENS = 25
+
+# Posição de cada chunk no documento: páginas (1 = primeira página do PDF)
+# e caracteres [char_start, char_end) do conteúdo extraído
+SPAN_KEYS = ("page_start", "page_end", "char_start", "char_end")
+
 
 def chunk_documents(
     documents: List[Dict[str, str]],
@@ -18,44 +30,315 @@ def chunk_documents(
     Returns:
         Lista chunked com metadata preservada
     """
-    print("\n Iniciando chunking com:")
-    print(f" - Tamanho do chunk: {chunk_size}")
-    print(f" - Overlap do chunk: {chunk_overlap}\n")
+    text_splitter = create_text_splitter(chunk_size, chunk_overlap)
 
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=["\n\n", "\n", " ", ""],
-        length_function=len,
-    )
+    print("\n Iniciando chunking com:")
+    if isinstance(text_splitter, TokenTextChunker):
+        print(f" - Tamanho do chunk: {text_splitter.chunk_tokens} tokens")
+        print(f" - Overlap do chunk: {text_splitter.overlap_tokens} tokens\n")
+    else:
+        print(f" - Tamanho do chunk: {chunk_size}")
+        print(f" - Overlap do chunk: {chunk_overlap}\n")
 
     chunked_docs = []
 
     for document in documents:
-        chunks = text_splitter.split_text(document["content"])
+        chunks = split_document(document, text_splitter)
 
         print(f"\n {document['source']}:")
         print(f"    - {document['num_pages']} páginas -> {len(chunks)} chunks")
 
-        for i, chunk in enumerate(chunks):
-            chunked_docs.append(
-                {
-                    "content": chunk,
-                    "source": document["source"],
-                    "chunk_id": i,
-                    "total_chunks": len(chunks),
-                    "metadata": {
-                        "source_file": document["source"],
-                        "num_pages": document["num_pages"],
-                        "chunk_index": i,
-                    },
-                }
-            )
+        chunked_docs.extend(chunks)
 
     print(f"\n Total de chunks criados: {len(chunked_docs)}\n")
     return chunked_docs
 
 
+class TokenTextChunker:
+    """
+    Chunker que mede o tamanho em tokens do tiktoken.
+
+    Cada documento é codificado uma única vez; as posições de caractere de
+    cada token (decode_with_offsets) permitem cortar o texto direto nos
+    offsets, sem re-tokenizar cada pedaço candidato. O corte de cada chunk
+    recua, dentro da segunda metade da janela, até a melhor fronteira
+    disponível: parágrafo, quebra de linha ou espaço.
+    """
+
+    def __init__(
+        self,
+        chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+        overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+        encoder=None,
+        model: Optional[str] = None,
+    ):
+        """
+        Args:
+            chunk_tokens: Tamanho máximo de cada chunk em tokens
+            overlap_tokens: Tokens repetidos entre chunks consecutivos
+            encoder: tiktoken.Encoding (padrão: o do modelo)
+            model: Modelo cujo encoding é usado (padrão: MODEL_NAME)
+
+        Raises:
+            ValueError: Se o overlap não for menor que o chunk, ou se o
+                        encoding do tiktoken não estiver disponível
+        """
+
+        if overlap_tokens >= chunk_tokens:
+            raise ValueError("overlap_tokens deve ser menor que chunk_tokens")
+
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.encoder = encoder or get_encoder(model or os.getenv("MODEL_NAME"))
+        if self.encoder is None:
+            raise ValueError(
+                "CHUNKING_MODE=tokens requer o tiktoken com o encoding disponível"
+            )
+
+    @classmethod
+    def from_env(cls) -> "TokenTextChunker":
+        """
+        Cria o chunker a partir de CHUNK_SIZE_TOKENS e CHUNK_OVERLAP_TOKENS.
+        """
+
+        return cls(
+            chunk_tokens=int(os.getenv("CHUNK_SIZE_TOKENS") or DEFAULT_CHUNK_TOKENS),
+            overlap_tokens=int(
+                os.getenv("CHUNK_OVERLAP_TOKENS") or DEFAULT_OVERLAP_TOKENS
+            ),
+        )
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Divide o texto e retorna o intervalo [start, end) de cada chunk.
+        """
+
+        tokens = self.encoder.encode(text, disallowed_special=())
+        if not tokens:
+            return []
+        _, offsets = self.encoder.decode_with_offsets(tokens)
+        offsets.append(len(text))
+
+        spans = []
+        n = len(tokens)
+        start = 0
+        while start < n:
+            end = min(start + self.chunk_tokens, n)
+            if end < n:
+                end = self._best_cut(text, offsets, start, end)
+
+            span = _strip_span(text, offsets[start], offsets[end])
+            if span is not None:
+                spans.append(span)
+
+            if end >= n:
+                break
+            start = max(end - self.overlap_tokens, start + 1)
+
+        return spans
+
+    @staticmethod
+    def _best_cut(text: str, offsets: List[int], start: int, end: int) -> int:
+        """
+        Melhor token para cortar em (start + metade da janela, end].
+        """
+
+        best, best_rank = end, 0
+        for cut in range(end, start + (end - start) // 2, -1):
+            around = text[max(offsets[cut] - 1, 0) : offsets[cut] + 1]
+            if "\n\n" in text[max(offsets[cut] - 2, 0) : offsets[cut] + 2]:
+                rank = 3
+            elif "\n" in around:
+                rank = 2
+            elif around[-1:].isspace() or around[:1].isspace():
+                rank = 1
+            else:
+                rank = 0
+
+            if rank > best_rank:
+                best, best_rank = cut, rank
+                if rank == 3:
+                    break
+
+        return best
+
+    def config(self) -> Dict:
+        return {
+            "mode": "tokens",
+            "chunk_tokens": self.chunk_tokens,
+            "overlap_tokens": self.overlap_tokens,
+            "encoding": self.encoder.name,
+        }
+
+
+def create_text_splitter(
+    chunk_size: int = 800, chunk_overlap: int = 100, mode: Optional[str] = None
+) -> Union[RecursiveCharacterTextSplitter, TokenTextChunker]:
+    """
+    Cria o splitter usado no chunking dos documentos.
+
+    Args:
+        chunk_size: Tamanho dos chunks em caracteres (modo chars)
+        chunk_overlap: Overlap em caracteres (modo chars)
+        mode: "chars" ou "tokens" (padrão: CHUNKING_MODE); no modo tokens
+              os tamanhos vêm de CHUNK_SIZE_TOKENS e CHUNK_OVERLAP_TOKENS
+    """
+
+    mode = mode or os.getenv("CHUNKING_MODE") or "chars"
+    if mode not in CHUNKING_MODES:
+        raise ValueError(
+            f"CHUNKING_MODE desconhecido: '{mode}'. "
+            f"Disponíveis: {', '.join(CHUNKING_MODES)}"
+        )
+
+    if mode == "tokens":
+        return TokenTextChunker.from_env()
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=["\n\n", "\n", " ", ""],
+        length_function=len,
+    )
+
+
+def chunking_config(
+    chunk_size: int = 800, chunk_overlap: int = 100, mode: Optional[str] = None
+) -> Dict:
+    """
+    Descrição do chunking em uso (gravada no manifesto incremental; se
+    mudar, os arquivos são re-chunkados).
+    """
+
+    text_splitter = create_text_splitter(chunk_size, chunk_overlap, mode)
+    if isinstance(text_splitter, TokenTextChunker):
+        return text_splitter.config()
+    return {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+
+
+def split_document(
+    document: Dict[str, str], text_splitter: RecursiveCharacterTextSplitter
+) -> List[Dict[str, str]]:
+    """
+    Divide um único documento em chunks com metadata.
+
+    Se o documento tiver page_offsets (início de cada página no conteúdo,
+    calculado pelo loader), cada chunk recebe page_start/page_end e o
+    intervalo de caracteres que ocupa, sem reprocessar o texto depois.
+
+    Args:
+        document: Documento com source, content, num_pages e, opcionalmente,
+                  page_offsets
+        text_splitter: Splitter criado por create_text_splitter() (de
+                       caracteres ou TokenTextChunker)
+
+    Returns:
+        Chunks do documento, na ordem do texto
+    """
+
+    content = document["content"]
+    page_offsets = document.get("page_offsets")
+    if isinstance(text_splitter, TokenTextChunker):
+        # Os intervalos saem direto dos offsets dos tokens
+        spans = text_splitter.split_spans(content)
+        chunks = [content[start:end] for start, end in spans]
+    else:
+        chunks = text_splitter.split_text(content)
+        spans = chunk_spans(content, chunks) if page_offsets else None
+
+    chunked = []
+    for i, chunk in enumerate(chunks):
+        item = {
+            "content": chunk,
+            "source": document["source"],
+            "chunk_id": i,
+            "total_chunks": len(chunks),
+            "metadata": {
+                "source_file": document["source"],
+                "num_pages": document["num_pages"],
+                "chunk_index": i,
+            },
+        }
+        if page_offsets and spans and spans[i] is not None:
+            item.update(span_metadata(spans[i], page_offsets))
+        chunked.append(item)
+
+    return chunked
+
+
+def chunk_spans(
+    content: str, chunks: Sequence[str]
+) -> List[Optional[Tuple[int, int]]]:
+    """
+    Localiza cada chunk no conteúdo original.
+
+    Os chunks estão em ordem e cada um começa depois do início do anterior
+    (o overlap só os faz começar antes do fim), então a busca avança pelo
+    texto uma única vez.
+
+    Returns:
+        (char_start, char_end) de cada chunk, ou None se não for encontrado
+    """
+
+    spans = []
+    search_from = 0
+    for chunk in chunks:
+        start = content.find(chunk, search_from)
+        if start < 0:
+            spans.append(None)
+            continue
+        spans.append((start, start + len(chunk)))
+        search_from = start + 1
+
+    return spans
+
+
+def span_metadata(span: Tuple[int, int], page_offsets: Sequence[int]) -> Dict[str, int]:
+    """
+    Converte um intervalo de caracteres em páginas (busca binária nos
+    offsets das páginas).
+    """
+
+    char_start, char_end = span
+    return {
+        "page_start": bisect_right(page_offsets, char_start),
+        "page_end": bisect_right(page_offsets, max(char_start, char_end - 1)),
+        "char_start": char_start,
+        "char_end": char_end,
+    }
+
+
+def _strip_span(text: str, start: int, end: int) -> Optional[Tuple[int, int]]:
+    """
+    Remove espaços das pontas de um intervalo (None se ficar vazio).
+    """
+
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if start < end else None
+
+
+def chunk_metadata(chunk: Dict) -> Dict:
+    """
+    Metadata de um chunk gravada no índice (Document do LangChain).
+    """
+
+    metadata = {
+        "source": chunk["source"],
+        "chunk_id": chunk["chunk_id"],
+        "total_chunks": chunk["total_chunks"],
+    }
+    metadata.update({key: chunk[key] for key in SPAN_KEYS if key in chunk})
+    if chunk.get("duplicates"):
+        metadata["duplicates"] = chunk["duplicates"]
+    return metadata
+
+
 # Teste
 if __name__ == "__main__":
     from loader import load_pdfs_from_directory
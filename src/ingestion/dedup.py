@@ -0,0 +1,272 @@
+"""
+Remoção de chunks quase duplicados na indexação (MinHash + LSH).
+
+Os PDFs repetem muito conteúdo (definições de estoque, curva ABC, lote
+econômico...), e com o overlap do chunking o top_k costuma trazer trechos
+quase iguais, que só gastam tokens do prompt.
+
+Cada chunk vira um conjunto de shingles (sequências de 5 palavras, em
+minúsculas, sem acentos e sem os marcadores de página), cada shingle é
+hasheado uma vez com mmh3 e a assinatura MinHash (64 permutações) é
+calculada de forma vetorizada com NumPy. O LSH divide a assinatura em 16 faixas de 4 valores:
+chunks que coincidem em alguma faixa são candidatos, e a similaridade de
+Jaccard estimada pelas assinaturas decide se são duplicatas.
+
+O filtro funciona em streaming: cada chunk é comparado com os já mantidos;
+uma duplicata é descartada e a origem dela (fonte, chunk_id e páginas) é
+registrada no chunk mantido, para que as citações listem todas as fontes.
+"""
+
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import mmh3
+import numpy as np
+
+from src.utils.text import WORD, fold_accents
+
+NUM_PERM = 64
+BANDS = 16
+SHINGLE_SIZE = 5
+DEFAULT_THRESHOLD = 0.85
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_PAGE_MARKER = re.compile(r"---\s*Página\s+\d+\s*---")
+
+# Campos de origem guardados para cada duplicata removida
+PROVENANCE_KEYS = ("source", "chunk_id", "page_start", "page_end")
+
+
+@dataclass
+class DedupReport:
+    """
+    Resumo da remoção de duplicatas.
+
+    Attributes:
+        input_chunks: Chunks recebidos
+        kept_chunks: Chunks mantidos
+        removed_chunks: Duplicatas removidas
+        removed_chars: Caracteres removidos
+        merged_chunks: Chunks mantidos que absorveram alguma duplicata
+        elapsed_ms: Tempo gasto no filtro
+    """
+
+    input_chunks: int = 0
+    kept_chunks: int = 0
+    removed_chunks: int = 0
+    removed_chars: int = 0
+    merged_chunks: int = 0
+    elapsed_ms: float = 0.0
+
+    @property
+    def removed_ratio(self) -> float:
+        return self.removed_chunks / self.input_chunks if self.input_chunks else 0.0
+
+
+class NearDuplicateFilter:
+    """
+    Filtro de quase duplicatas com MinHash e LSH.
+
+    Attributes:
+        duplicates: Origem das duplicatas por posição do chunk mantido na
+                    saída (preenchido à medida que o filtro é consumido)
+        report: DedupReport atualizado durante a filtragem
+    """
+
+    def __init__(
+        self,
+        threshold: float = DEFAULT_THRESHOLD,
+        num_perm: int = NUM_PERM,
+        bands: int = BANDS,
+        shingle_size: int = SHINGLE_SIZE,
+        seed: int = 1,
+    ):
+        """
+        Args:
+            threshold: Similaridade de Jaccard mínima para considerar dois
+                       chunks duplicados
+            num_perm: Tamanho da assinatura MinHash
+            bands: Faixas do LSH (num_perm deve ser múltiplo de bands)
+            shingle_size: Palavras por shingle
+            seed: Semente das permutações
+        """
+
+        if num_perm % bands:
+            raise ValueError("num_perm deve ser múltiplo de bands")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(seed)
+        # a < 2^31 e h < 2^32: a * h + b cabe em uint64 sem overflow
+        self._a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+        self._signatures: List[np.ndarray] = []
+
+        self.duplicates: Dict[int, List[Dict]] = {}
+        self.report = DedupReport()
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """
+        Assinatura MinHash (num_perm valores uint32) de um texto, ou None se
+        o texto não tiver palavras.
+        """
+
+        hashes = np.fromiter(
+            (mmh3.hash(s, signed=False) for s in self.shingles(text)),
+            dtype=np.uint64,
+        )
+        if not len(hashes):
+            return None
+
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return (permuted & _MAX_HASH).min(axis=0).astype(np.uint32)
+
+    def shingles(self, text: str) -> set:
+        """
+        Shingles de palavras do texto normalizado.
+        """
+
+        words = WORD.findall(fold_accents(_PAGE_MARKER.sub(" ", text).lower()))
+        if len(words) <= self.shingle_size:
+            return {" ".join(words)} if words else set()
+        return {
+            " ".join(words[i : i + self.shingle_size])
+            for i in range(len(words) - self.shingle_size + 1)
+        }
+
+    def filter(self, chunks: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Gera os chunks que não são quase duplicatas de um chunk anterior.
+        """
+
+        start = time.perf_counter()
+        for chunk in chunks:
+            self.report.input_chunks += 1
+            signature = self.signature(chunk["content"])
+            if signature is None:
+                # Sem palavras (só marcador de página): nada a comparar
+                self._signatures.append(None)
+                self.report.kept_chunks += 1
+                yield chunk
+                continue
+            keys = self._band_keys(signature)
+
+            match = self._find_match(signature, keys)
+            if match is not None:
+                self._record_duplicate(match, chunk)
+                continue
+
+            position = len(self._signatures)
+            self._signatures.append(signature)
+            for band, key in enumerate(keys):
+                self._buckets[band].setdefault(key, []).append(position)
+
+            self.report.kept_chunks += 1
+            self.report.elapsed_ms = (time.perf_counter() - start) * 1000
+            yield chunk
+
+        self.report.elapsed_ms = (time.perf_counter() - start) * 1000
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows : (band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def _find_match(self, signature: np.ndarray, keys: List[bytes]) -> Optional[int]:
+        """
+        Chunk mantido mais parecido acima do limiar, entre os candidatos do LSH.
+        """
+
+        candidates = set()
+        for band, key in enumerate(keys):
+            candidates.update(self._buckets[band].get(key, ()))
+
+        best, best_similarity = None, self.threshold
+        for position in sorted(candidates):
+            similarity = float(np.mean(self._signatures[position] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = position, similarity
+
+        return best
+
+    def _record_duplicate(self, position: int, chunk: Dict) -> None:
+        if position not in self.duplicates:
+            self.duplicates[position] = []
+            self.report.merged_chunks += 1
+
+        self.duplicates[position].append(
+            {key: chunk[key] for key in PROVENANCE_KEYS if key in chunk}
+        )
+        self.report.removed_chunks += 1
+        self.report.removed_chars += len(chunk["content"])
+
+
+def deduplicate_chunks(
+    chunks: List[Dict], threshold: float = DEFAULT_THRESHOLD
+) -> Tuple[List[Dict], DedupReport]:
+    """
+    Remove quase duplicatas de uma lista de chunks.
+
+    Os chunks mantidos que absorveram duplicatas são copiados com a chave
+    "duplicates" (origem dos chunks removidos); a lista de entrada não é
+    alterada.
+
+    Args:
+        chunks: Saída de chunk_documents
+        threshold: Similaridade de Jaccard mínima para duplicatas
+
+    Returns:
+        Tupla (chunks mantidos, relatório)
+    """
+
+    dedup = NearDuplicateFilter(threshold)
+    kept = list(dedup.filter(chunks))
+    for position, duplicates in dedup.duplicates.items():
+        kept[position] = {**kept[position], "duplicates": duplicates}
+
+    return kept, dedup.report
+
+
+def format_report(report: DedupReport) -> str:
+    """
+    Resumo da deduplicação para o log da indexação.
+    """
+
+    return (
+        f"    Deduplicação: {report.removed_chunks}/{report.input_chunks} chunks "
+        f"removidos ({report.removed_ratio:.1%}, {report.removed_chars} "
+        f"caracteres), {report.merged_chunks} chunks com fontes mescladas, "
+        f"{report.elapsed_ms:.0f} ms"
+    )
+
+
+if __name__ == "__main__":
+    import sys
+
+    from src.ingestion.chunker import chunk_documents
+    from src.ingestion.loader import load_pdfs_from_directory
+
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "data"
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_THRESHOLD
+
+    kept, result = deduplicate_chunks(
+        chunk_documents(load_pdfs_from_directory(data_dir)), threshold
+    )
+
+    print(format_report(result))
+    for chunk in kept:
+        for duplicate in chunk.get("duplicates", []):
+            print(
+                f"    {chunk['source']}#{chunk['chunk_id']} <- "
+                f"{duplicate['source']}#{duplicate['chunk_id']}"
+            )
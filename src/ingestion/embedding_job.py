@@ -0,0 +1,299 @@
+"""
+Job de embeddings da indexação: lotes, concorrência, cota e checkpoints.
+
+Em vez de mandar o corpus inteiro em uma única chamada de embed_documents,
+o job:
+- divide os textos em lotes de batch_size
+- mantém até max_concurrency lotes em voo (threads), devolvendo os vetores
+  na ordem dos lotes
+- respeita uma cota de tokens por minuto (TokenRateLimiter)
+- repete lotes que falharam com backoff exponencial e jitter; erros de
+  requisição (400, 401, 403, 404, 422) não são repetidos
+- grava cada lote concluído em checkpoint_dir; numa nova execução, lotes
+  com o mesmo conteúdo são lidos do disco em vez de ir para a API
+- imprime o progresso (chunks/s e tokens/s) a cada progress_interval
+  segundos
+
+O nome de cada checkpoint inclui a posição do lote e o hash dos textos e do
+modelo, então um corpus alterado não reaproveita vetores errados.
+"""
+
+import hashlib
+import os
+import random
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.utils.rate_limit import TokenRateLimiter, limiter_from_tpm
+from src.utils.tokens import count_tokens
+
+CHECKPOINT_DIR = ".embedding_checkpoints"
+
+# Erros de requisição: repetir não adianta
+_NON_RETRYABLE_STATUS = (400, 401, 403, 404, 422)
+
+
+@dataclass
+class EmbeddingJobReport:
+    """
+    Progresso de um job de embeddings.
+
+    Attributes:
+        batches: Lotes concluídos (incluindo os lidos de checkpoint)
+        resumed_batches: Lotes lidos de checkpoint
+        chunks: Textos embeddados
+        tokens: Tokens enviados à API (lotes de checkpoint não contam)
+        retries: Tentativas repetidas após erro
+        rate_limited_s: Tempo esperando a cota de tokens
+        elapsed_s: Duração até o momento
+    """
+
+    batches: int = 0
+    resumed_batches: int = 0
+    chunks: int = 0
+    tokens: int = 0
+    retries: int = 0
+    rate_limited_s: float = 0.0
+    elapsed_s: float = 0.0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed_s if self.elapsed_s else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.tokens / self.elapsed_s if self.elapsed_s else 0.0
+
+
+class EmbeddingJob:
+    """
+    Executa embed_documents em lotes, com concorrência, cota e retomada.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        checkpoint_dir: Optional[str] = None,
+        batch_size: int = 256,
+        max_concurrency: int = 4,
+        tokens_per_minute: Optional[int] = None,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        model_key: str = "",
+        progress_interval: Optional[float] = 5.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Args:
+            embeddings: Cliente com embed_documents (interface do LangChain)
+            checkpoint_dir: Pasta dos checkpoints (None = sem checkpoints)
+            batch_size: Textos por chamada de embed_documents
+            max_concurrency: Lotes em voo ao mesmo tempo
+            tokens_per_minute: Cota de tokens por minuto (None = sem limite)
+            max_retries: Tentativas extras por lote antes de desistir
+            backoff_base: Espera (s) antes da primeira repetição; dobra a cada
+                          tentativa
+            backoff_max: Espera máxima (s) entre tentativas
+            model_key: Identificador do provedor/modelo, parte do hash dos
+                       checkpoints
+            progress_interval: Segundos entre linhas de progresso (None =
+                               silencioso)
+            sleep: Função de espera (substituível em testes)
+        """
+
+        self.embeddings = embeddings
+        self.checkpoint_dir = checkpoint_dir
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter: Optional[TokenRateLimiter] = limiter_from_tpm(
+            tokens_per_minute
+        )
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.model_key = model_key
+        self.progress_interval = progress_interval
+        self._sleep = sleep
+
+        self.report = EmbeddingJobReport()
+        self._report_lock = threading.Lock()
+        self._started = None
+        self._last_progress = 0.0
+
+    @classmethod
+    def from_env(
+        cls,
+        embeddings,
+        checkpoint_dir: Optional[str] = None,
+        model_key: str = "",
+        batch_size: Optional[int] = None,
+    ) -> "EmbeddingJob":
+        """
+        Cria o job a partir de INGEST_EMBED_BATCH_SIZE,
+        EMBED_MAX_CONCURRENCY, EMBED_TOKENS_PER_MINUTE e EMBED_MAX_RETRIES.
+        """
+
+        return cls(
+            embeddings,
+            checkpoint_dir=checkpoint_dir,
+            batch_size=batch_size or int(os.getenv("INGEST_EMBED_BATCH_SIZE") or 256),
+            max_concurrency=int(os.getenv("EMBED_MAX_CONCURRENCY") or 4),
+            tokens_per_minute=int(os.getenv("EMBED_TOKENS_PER_MINUTE") or 0) or None,
+            max_retries=int(os.getenv("EMBED_MAX_RETRIES") or 5),
+            model_key=model_key,
+        )
+
+    def run(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embedda uma lista de textos e retorna a matriz float32 (n, d).
+        """
+
+        batches = (
+            list(texts[i : i + self.batch_size])
+            for i in range(0, len(texts), self.batch_size)
+        )
+        vectors = [v for _, v in self.embed_batches(batches)]
+        if not vectors:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.ascontiguousarray(np.concatenate(vectors), dtype=np.float32)
+
+    def embed_batches(
+        self, batches: Iterable[List], text: Optional[Callable] = None
+    ) -> Iterator[Tuple[List, np.ndarray]]:
+        """
+        Embedda lotes vindos de um iterável, na ordem, com concorrência.
+
+        Args:
+            batches: Lotes de itens (no máximo max_concurrency são lidos
+                     adiante do consumidor)
+            text: Função item -> texto (padrão: o próprio item)
+
+        Yields:
+            Tuplas (lote, vetores float32 do lote)
+        """
+
+        text = text or (lambda item: item)
+        self._started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            in_flight = deque()
+            for position, batch in enumerate(batches):
+                texts = [text(item) for item in batch]
+                in_flight.append(
+                    (batch, executor.submit(self._embed_batch, position, texts))
+                )
+                if len(in_flight) >= self.max_concurrency:
+                    yield self._collect(in_flight.popleft())
+
+            while in_flight:
+                yield self._collect(in_flight.popleft())
+
+        self._print_progress(force=True)
+
+    def clear_checkpoints(self) -> None:
+        """
+        Remove os checkpoints (chamar depois que o índice foi gravado).
+        """
+
+        if self.checkpoint_dir and os.path.isdir(self.checkpoint_dir):
+            shutil.rmtree(self.checkpoint_dir)
+
+    def _collect(self, item) -> Tuple[List, np.ndarray]:
+        batch, future = item
+        vectors = future.result()
+        self.report.batches += 1
+        self.report.chunks += len(batch)
+        self.report.elapsed_s = time.perf_counter() - self._started
+        self._print_progress()
+        return batch, vectors
+
+    def _embed_batch(self, position: int, texts: List[str]) -> np.ndarray:
+        """
+        Embedda um lote (roda nas threads do job).
+        """
+
+        path = self._checkpoint_path(position, texts)
+        if path and os.path.exists(path):
+            with self._report_lock:
+                self.report.resumed_batches += 1
+            return np.load(path)
+
+        tokens = sum(count_tokens(t) for t in texts)
+        if self.rate_limiter is not None:
+            waited = self.rate_limiter.acquire(tokens)
+            with self._report_lock:
+                self.report.rate_limited_s += waited
+
+        vectors = self._call_with_retries(texts)
+        with self._report_lock:
+            self.report.tokens += tokens
+
+        if path:
+            os.makedirs(self.checkpoint_dir, exist_ok=True)
+            with open(f"{path}.tmp", "wb") as f:
+                np.save(f, vectors)
+            os.replace(f"{path}.tmp", path)
+
+        return vectors
+
+    def _call_with_retries(self, texts: List[str]) -> np.ndarray:
+        attempt = 0
+        while True:
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+                return np.asarray(vectors, dtype=np.float32)
+            except Exception as e:
+                status = getattr(e, "status_code", None)
+                if attempt >= self.max_retries or status in _NON_RETRYABLE_STATUS:
+                    raise
+
+                delay = min(self.backoff_max, self.backoff_base * 2**attempt)
+                delay *= random.uniform(0.5, 1.0)
+                attempt += 1
+                with self._report_lock:
+                    self.report.retries += 1
+                print(
+                    f"    Erro nos embeddings ({type(e).__name__}: {e}); "
+                    f"tentativa {attempt}/{self.max_retries} em {delay:.1f}s"
+                )
+                self._sleep(delay)
+
+    def _checkpoint_path(self, position: int, texts: List[str]) -> Optional[str]:
+        if not self.checkpoint_dir:
+            return None
+
+        digest = hashlib.sha256(self.model_key.encode("utf-8"))
+        for t in texts:
+            digest.update(t.encode("utf-8"))
+            digest.update(b"\0")
+        return os.path.join(
+            self.checkpoint_dir, f"{position:06d}_{digest.hexdigest()[:16]}.npy"
+        )
+
+    def _print_progress(self, force: bool = False) -> None:
+        if self._started is None:
+            return
+        if force:
+            self.report.elapsed_s = time.perf_counter() - self._started
+        if self.progress_interval is None:
+            return
+
+        now = time.perf_counter()
+        if not force and now - self._last_progress < self.progress_interval:
+            return
+        self._last_progress = now
+
+        r = self.report
+        print(
+            f"    Embeddings: {r.batches} lotes ({r.resumed_batches} de checkpoint), "
+            f"{r.chunks} chunks, {r.chunks_per_second:.1f} chunks/s, "
+            f"{r.tokens_per_second:.0f} tokens/s"
+        )
@@ -0,0 +1,455 @@
+"""
+Reindexação incremental guiada por hash de conteúdo.
+
+Um manifesto (vector_index/manifest.json) registra, para cada PDF, o hash
+do arquivo e a lista de chunks com o hash do texto e o id do vetor no FAISS:
+
+    {
+      "version": 1,
+      "next_id": 412,
+      "chunking": {"chunk_size": 800, "chunk_overlap": 100},
+      "files": {
+        "GESTAO_DE_ESTOQUES.pdf": {
+          "sha256": "...",
+          "chunks": [{"hash": "...", "id": 0}, ...]
+        }
+      }
+    }
+
+Numa atualização:
+- arquivos com o mesmo hash não são lidos nem re-chunkados
+- arquivos alterados são re-chunkados; chunks com texto idêntico mantêm o
+  vetor e só os novos vão para a API de embeddings
+- vetores de chunks ou arquivos removidos saem do índice (IndexIDMap2 +
+  remove_ids)
+- índice, chunk store, BM25, metadados e manifesto vão para uma geração
+  nova do índice, publicada de uma vez (src/core/index_generation.py)
+
+Uso:
+    python -m src.ingestion.incremental [data] [vector_index]
+"""
+
+import hashlib
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from src.core.chunk_store import ChunkStore, load_chunk_store
+from src.core.embeddings import get_embedding_provider
+from src.core.faiss_index import (
+    apply_search_params,
+    create_empty_index,
+    index_labels,
+    resolve_index_params,
+)
+from src.core.index_generation import IndexGeneration, index_dir
+from src.core.index_metadata import (
+    check_embedding_compatibility,
+    read_index_metadata,
+    write_index_metadata,
+)
+from src.core.lexical_index import write_lexical_index
+from src.ingestion.chunker import chunk_documents, chunk_metadata, chunking_config
+from src.ingestion.embedding_job import CHECKPOINT_DIR, EmbeddingJob
+from src.ingestion.loader import list_pdf_files, load_pdf
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class IncrementalUpdateReport:
+    """
+    Resumo de uma atualização incremental.
+
+    Attributes:
+        added_files: PDFs novos
+        changed_files: PDFs com conteúdo alterado
+        removed_files: PDFs que saíram da pasta
+        unchanged_files: Número de PDFs reaproveitados sem leitura
+        embedded_chunks: Chunks enviados à API de embeddings
+        reused_chunks: Chunks que mantiveram o vetor existente
+        removed_vectors: Vetores removidos do índice
+        total_chunks: Chunks no índice após a atualização
+        elapsed_ms: Duração total
+    """
+
+    added_files: List[str] = field(default_factory=list)
+    changed_files: List[str] = field(default_factory=list)
+    removed_files: List[str] = field(default_factory=list)
+    unchanged_files: int = 0
+    embedded_chunks: int = 0
+    reused_chunks: int = 0
+    removed_vectors: int = 0
+    total_chunks: int = 0
+    elapsed_ms: float = 0.0
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(
+            self.added_files
+            or self.changed_files
+            or self.removed_files
+            or self.removed_vectors
+        )
+
+
+def file_sha256(path: str) -> str:
+    """
+    Hash SHA-256 do conteúdo de um arquivo, lido em blocos.
+    """
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_sha256(content: str) -> str:
+    """
+    Hash SHA-256 do texto de um chunk.
+    """
+
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def read_manifest(index_path: str) -> Optional[Dict]:
+    """
+    Lê o manifesto da geração atual do índice, ou None se ela não veio de
+    uma reindexação incremental.
+    """
+
+    return _load_manifest(index_dir(index_path))
+
+
+def _load_manifest(directory: str) -> Optional[Dict]:
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def write_manifest(index_path: str, manifest: Dict) -> None:
+    """
+    Grava o manifesto em uma pasta do índice (a geração que está sendo
+    montada), via arquivo temporário + os.replace.
+
+    Args:
+        index_path: Pasta da geração
+        manifest: Conteúdo do manifesto
+    """
+
+    path = os.path.join(index_path, MANIFEST_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def update_vector_index(
+    data_dir: str = "data",
+    index_path: str = "vector_index",
+    provider: Optional[str] = None,
+    chunk_size: int = 800,
+    chunk_overlap: int = 100,
+    index_type: Optional[str] = None,
+) -> IncrementalUpdateReport:
+    """
+    Atualiza o índice com as mudanças da pasta de PDFs.
+
+    Na primeira execução (sem manifesto) todos os chunks são embeddados e o
+    índice é recriado como IndexIDMap2; nas seguintes, só o que mudou.
+
+    Args:
+        data_dir: Pasta com os PDFs
+        index_path: Diretório do índice
+        provider: Provedor de embeddings (padrão: EMBEDDING_PROVIDER)
+        chunk_size: Tamanho dos chunks (mudar força re-chunkar tudo)
+        chunk_overlap: Overlap dos chunks (mudar força re-chunkar tudo)
+        index_type: Tipo do índice em uma criação do zero (padrão:
+                    VECTOR_INDEX_TYPE)
+
+    Returns:
+        IncrementalUpdateReport com o que foi feito
+
+    Raises:
+        ValueError: Se o índice existente foi criado com outro provedor ou
+                    modelo de embeddings
+    """
+
+    start = time.time()
+    report = IncrementalUpdateReport()
+
+    embedding_provider = get_embedding_provider(provider)
+
+    chunking = chunking_config(chunk_size, chunk_overlap)
+    # Tudo é lido da mesma geração, resolvida uma vez
+    current = index_dir(index_path)
+    manifest = _load_manifest(current)
+    metadata = read_index_metadata(current)
+
+    first_run = manifest is None
+
+    if not first_run:
+        check_embedding_compatibility(
+            metadata,
+            provider=embedding_provider.name,
+            model=embedding_provider.model,
+            dimension=embedding_provider.dimension,
+        )
+        index = faiss.read_index(os.path.join(current, "index.faiss"))
+        old_chunks = _chunks_by_id(index, load_chunk_store(current))
+    else:
+        # Índice antigo (sem manifesto) ou inexistente: reconstrói do zero
+        manifest = {"next_id": 0, "chunking": chunking, "files": {}}
+        index = None
+        old_chunks = {}
+
+    same_chunking = manifest.get("chunking") == chunking
+    old_files: Dict = manifest["files"]
+    next_id = int(manifest["next_id"])
+
+    files: Dict[str, Dict] = {}
+    chunks_by_id: Dict[int, Dict] = {}
+    pending: List[Tuple[int, Dict]] = []
+    removed_ids: List[int] = []
+
+    pdf_files = list_pdf_files(data_dir)
+    if not pdf_files and first_run:
+        raise ValueError(f"Nenhum PDF encontrado na pasta: {data_dir}")
+
+    for pdf_file in pdf_files:
+        name = pdf_file.name
+        sha = file_sha256(str(pdf_file))
+        previous = old_files.get(name)
+
+        if previous and previous["sha256"] == sha and same_chunking:
+            files[name] = previous
+            report.unchanged_files += 1
+            report.reused_chunks += len(previous["chunks"])
+            for entry in previous["chunks"]:
+                chunks_by_id[entry["id"]] = old_chunks[entry["id"]]
+            continue
+
+        document = load_pdf(pdf_file)
+        if document is None:
+            # Arquivo ilegível: mantém a versão anterior, se houver
+            if previous:
+                files[name] = previous
+                for entry in previous["chunks"]:
+                    chunks_by_id[entry["id"]] = old_chunks[entry["id"]]
+            continue
+
+        (report.changed_files if previous else report.added_files).append(name)
+
+        # Vetores existentes deste arquivo, por hash de texto
+        reusable: Dict[str, List[int]] = {}
+        for entry in (previous or {}).get("chunks", []):
+            reusable.setdefault(entry["hash"], []).append(entry["id"])
+
+        entries = []
+        for chunk in chunk_documents([document], chunk_size, chunk_overlap):
+            digest = chunk_sha256(chunk["content"])
+            if reusable.get(digest):
+                vector_id = reusable[digest].pop(0)
+                report.reused_chunks += 1
+            else:
+                vector_id = next_id
+                next_id += 1
+                pending.append((vector_id, chunk))
+
+            entries.append({"hash": digest, "id": vector_id})
+            chunks_by_id[vector_id] = _stored_chunk(chunk)
+
+        removed_ids.extend(i for ids in reusable.values() for i in ids)
+        files[name] = {"sha256": sha, "chunks": entries}
+
+    for name, previous in old_files.items():
+        if name not in files:
+            report.removed_files.append(name)
+            removed_ids.extend(entry["id"] for entry in previous["chunks"])
+
+    job = EmbeddingJob.from_env(
+        embedding_provider.embeddings,
+        checkpoint_dir=os.path.join(index_path, CHECKPOINT_DIR),
+        model_key=embedding_provider.cache_key,
+    )
+    vectors = _embed_pending(job, pending)
+    report.embedded_chunks = len(pending)
+    report.removed_vectors = len(removed_ids)
+
+    if index is None:
+        params = resolve_index_params(
+            index_type or os.getenv("VECTOR_INDEX_TYPE") or "flat",
+            num_vectors=len(vectors),
+            dimension=vectors.shape[1] if len(vectors) else 0,
+        )
+        index = faiss.IndexIDMap2(create_empty_index(vectors.shape[1], params))
+        if not index.is_trained:
+            index.train(vectors)
+    else:
+        params = (metadata or {}).get("index") or {"type": "flat"}
+
+    index = _remove_vectors(index, removed_ids, params)
+    if len(pending):
+        index.add_with_ids(vectors, np.array([i for i, _ in pending], dtype=np.int64))
+    apply_search_params(index, params)
+
+    report.total_chunks = index.ntotal
+
+    if report.has_changes or first_run:
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "next_id": next_id,
+            "chunking": chunking,
+            "files": files,
+        }
+        with IndexGeneration(index_path) as generation:
+            _write_index(
+                generation.path, index, chunks_by_id, embedding_provider, params
+            )
+            write_manifest(generation.path, manifest)
+            generation.publish()
+    job.clear_checkpoints()
+
+    report.elapsed_ms = (time.time() - start) * 1000
+    return report
+
+
+def _stored_chunk(chunk: Dict) -> Dict:
+    return {"content": chunk["content"], **chunk_metadata(chunk)}
+
+
+def _chunks_by_id(index: faiss.Index, store: Optional[ChunkStore]) -> Dict[int, Dict]:
+    """
+    Chunks do índice atual, indexados pelo id do vetor.
+    """
+
+    if store is None:
+        return {}
+
+    chunks = {}
+    for row, vector_id in enumerate(index_labels(index)):
+        chunk = store.get(row)
+        chunk["total_chunks"] = int(store.totals[row])
+        chunks[int(vector_id)] = chunk
+    store.close()
+    return chunks
+
+
+def _embed_pending(job: EmbeddingJob, pending: List[Tuple[int, Dict]]) -> np.ndarray:
+    if not pending:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    print(f"\n Gerando embeddings para {len(pending)} chunks novos...")
+    return job.run([chunk["content"] for _, chunk in pending])
+
+
+def _remove_vectors(
+    index: faiss.Index, removed_ids: List[int], params: Dict
+) -> faiss.Index:
+    """
+    Remove vetores do índice pelos ids.
+
+    HNSW não suporta remoção: nesse caso o índice é reconstruído com os
+    vetores restantes (recuperados via reconstruct, sem chamar a API).
+    """
+
+    if not removed_ids:
+        return index
+
+    ids = np.array(removed_ids, dtype=np.int64)
+    try:
+        index.remove_ids(ids)
+        return index
+    except RuntimeError:
+        pass
+
+    removed = set(removed_ids)
+    kept = [int(i) for i in index_labels(index) if int(i) not in removed]
+    rebuilt = faiss.IndexIDMap2(create_empty_index(index.d, params))
+    if kept:
+        vectors = np.stack([index.reconstruct(i) for i in kept])
+        rebuilt.add_with_ids(vectors, np.array(kept, dtype=np.int64))
+    return rebuilt
+
+
+def _write_index(
+    index_path: str,
+    index: faiss.Index,
+    chunks_by_id: Dict[int, Dict],
+    embedding_provider,
+    params: Dict,
+) -> None:
+    """
+    Grava índice, docstore do LangChain, chunk store, índice lexical e
+    metadados na pasta de uma geração.
+
+    As linhas do chunk store seguem a ordem das linhas do índice.
+    """
+
+    labels = [int(i) for i in index_labels(index)]
+    chunks = [chunks_by_id[i] for i in labels]
+
+    # index.faiss + index.pkl compatíveis com FAISS.load_local
+    docstore = InMemoryDocstore(
+        {
+            str(i): Document(
+                page_content=chunk["content"], metadata=chunk_metadata(chunk)
+            )
+            for i, chunk in zip(labels, chunks)
+        }
+    )
+    FAISS(
+        embedding_function=embedding_provider.embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id={i: str(i) for i in labels},
+    ).save_local(index_path)
+
+    ChunkStore.write(index_path, chunks)
+    write_lexical_index(index_path, (chunk["content"] for chunk in chunks))
+
+    write_index_metadata(
+        index_path,
+        {
+            "embedding_provider": embedding_provider.name,
+            "embedding_model": embedding_provider.model,
+            "dimension": index.d,
+            "num_chunks": len(chunks),
+            "index": params,
+            "incremental": True,
+        },
+    )
+
+
+if __name__ == "__main__":
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "data"
+    index_path = sys.argv[2] if len(sys.argv) > 2 else "vector_index"
+
+    result = update_vector_index(data_dir, index_path)
+
+    print("\n Reindexação incremental concluída:")
+    print(f"    - Novos: {result.added_files or '-'}")
+    print(f"    - Alterados: {result.changed_files or '-'}")
+    print(f"    - Removidos: {result.removed_files or '-'}")
+    print(f"    - Sem mudança: {result.unchanged_files}")
+    print(f"    - Chunks embeddados: {result.embedded_chunks}")
+    print(f"    - Chunks reaproveitados: {result.reused_chunks}")
+    print(f"    - Vetores removidos: {result.removed_vectors}")
+    print(f"    - Total no índice: {result.total_chunks}")
+    print(f"    - Tempo: {result.elapsed_ms / 1000:.1f} s")
@@ -1,72 +1,140 @@
 import os
-from typing import List, Dict
-from langchain_openai import OpenAIEmbeddings
+from typing import List, Dict, Optional
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 from langchain_core.documents import Document
 
+from src.core.chunk_store import ChunkStore
+from src.core.embeddings import get_embedding_provider
+from src.core.faiss_index import build_index, resolve_index_params
+from src.core.index_generation import IndexGeneration
+from src.core.index_metadata import write_index_metadata
+from src.core.lexical_index import write_lexical_index
+from src.ingestion.chunker import chunk_metadata
+from src.ingestion.embedding_job import CHECKPOINT_DIR, EmbeddingJob
+
 
 def create_vector_index(
-    chunks: List[Dict[str, str]], index_path: str = "vector_index"
+    chunks: List[Dict[str, str]],
+    index_path: str = "vector_index",
+    provider: Optional[str] = None,
+    index_type: Optional[str] = None,
+    index_params: Optional[Dict] = None,
 ) -> FAISS:
-    """Create FAISS vector index from chunks."""
+    """
+    Create FAISS vector index from chunks.
+
+    Args:
+        chunks: Chunks gerados por chunk_documents
+        index_path: Diretório onde o índice será salvo
+        provider: Provedor de embeddings (padrão: EMBEDDING_PROVIDER)
+        index_type: flat, ivf_flat, ivf_pq ou hnsw (padrão: VECTOR_INDEX_TYPE)
+        index_params: Parâmetros do índice (padrão: variáveis FAISS_*)
+    """
     print("\n Gerando embeddings para", len(chunks), "chunks...")
 
     from dotenv import load_dotenv
 
     load_dotenv()
 
-    api_key = os.getenv("OPENAI_API_KEY")
-    base_url = os.getenv("OPENAI_API_BASE_URL")
-    embeddings_model = os.getenv("EMBEDDINGS_MODEL", "text-embedding-3-small")
-
-    embeddings = OpenAIEmbeddings(
-        model=embeddings_model, openai_api_key=api_key, openai_api_base=base_url
-    )
+    embedding_provider = get_embedding_provider(provider)
+    embeddings = embedding_provider.embeddings
+    embeddings_model = embedding_provider.model
 
     documents = []
     for chunk in chunks:
-        doc = Document(
-            page_content=chunk["content"],
-            metadata={
-                "source": chunk["source"],
-                "chunk_id": chunk["chunk_id"],
-                "total_chunks": chunk["total_chunks"],
-            },
-        )
+        doc = Document(page_content=chunk["content"], metadata=chunk_metadata(chunk))
         documents.append(doc)
 
-    print("    Criando indice vetorial FAISS...")
+    # Lotes com concorrência, cota de tokens, backoff e checkpoints: uma
+    # falha no meio não perde os lotes já concluídos
+    job = EmbeddingJob.from_env(
+        embeddings,
+        checkpoint_dir=os.path.join(index_path, CHECKPOINT_DIR),
+        model_key=embedding_provider.cache_key,
+    )
+    vectors = job.run([doc.page_content for doc in documents])
+
+    params = resolve_index_params(
+        index_type or os.getenv("VECTOR_INDEX_TYPE") or "flat",
+        num_vectors=len(vectors),
+        dimension=vectors.shape[1],
+        **(index_params if index_params is not None else _index_params_from_env()),
+    )
+
+    print(f"    Criando indice vetorial FAISS ({params['type']})...")
+
+    index = build_index(vectors, params)
 
-    vector_store = FAISS.from_documents(documents, embeddings)
+    doc_ids = [str(i) for i in range(len(documents))]
+    vector_store = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=InMemoryDocstore(dict(zip(doc_ids, documents))),
+        index_to_docstore_id=dict(enumerate(doc_ids)),
+    )
 
-    vector_store.save_local(index_path)
+    # Todos os arquivos vão para uma geração nova, publicada de uma vez. Ela
+    # não tem manifest.json: o índice novo não é IndexIDMap2, e o manifesto
+    # de uma reindexação incremental anterior apontaria para linhas erradas
+    with IndexGeneration(index_path) as generation:
+        vector_store.save_local(generation.path)
+
+        # Textos e metadados em formato colunar (mmap), lidos pelo retriever
+        # no lugar do docstore em pickle, na mesma ordem dos vetores.
+        ChunkStore.write(generation.path, chunks)
+        # Índice BM25 com as mesmas linhas, para a busca híbrida
+        write_lexical_index(generation.path, (chunk["content"] for chunk in chunks))
+
+        write_index_metadata(
+            generation.path,
+            {
+                "embedding_provider": embedding_provider.name,
+                "embedding_model": embeddings_model,
+                "dimension": vector_store.index.d,
+                "num_chunks": len(chunks),
+                "index": params,
+            },
+        )
+        generation.publish()
+
+    job.clear_checkpoints()
 
     print("    Indice salvo em:", index_path, "\n")
     print("    -", len(chunks), "chunks indexados.\n")
+    print("    - Provedor de embeddings:", embedding_provider.name)
     print("    - Modelo de embeddings:", embeddings_model)
+    print("    - Tipo de indice:", params["type"])
 
     return vector_store
 
 
-# Teste
-if __name__ == "__main__":
-    from loader import load_pdfs_from_directory
-    from chunker import chunk_documents
+def _index_params_from_env() -> Dict:
+    """
+    Parâmetros de construção do índice definidos por variáveis FAISS_*.
+    """
 
-    # 1 Carregar pdfs
-    docs = load_pdfs_from_directory("data")
+    names = {
+        "nlist": "FAISS_NLIST",
+        "nprobe": "FAISS_NPROBE",
+        "pq_m": "FAISS_PQ_M",
+        "pq_nbits": "FAISS_PQ_NBITS",
+        "hnsw_m": "FAISS_HNSW_M",
+        "ef_construction": "FAISS_EF_CONSTRUCTION",
+        "ef_search": "FAISS_EF_SEARCH",
+    }
+    return {key: int(os.getenv(env)) for key, env in names.items() if os.getenv(env)}
 
-    # 2 faz chunks
-    chunks = chunk_documents(docs, chunk_size=800, chunk_overlap=100)
 
-    # 3 cria indice de vetor
-    vector_index = create_vector_index(chunks, index_path="vector_index")
+# Teste
+if __name__ == "__main__":
+    from src.ingestion.streaming import ingest_directory
 
-    if chunks:
-        print("\n Primeiro de chunk:")
-        print("Fonte:", chunks[0]["source"])
-        print(
-            "Chunk", int(chunks[0]["chunk_id"]) + 1, "/", int(chunks[0]["total_chunks"])
-        )
-        print("\nConteúdo:")
-        print(chunks[0]["content"][:300] + "...")
+    # Extração paralela -> chunks -> embeddings em lotes -> índice
+    report = ingest_directory("data", index_path="vector_index")
+
+    print("\n Indice salvo em: vector_index")
+    print("    -", report.files, "PDFs,", report.pages, "páginas")
+    print("    -", report.chunks, "chunks indexados.")
+    print(f"    - Tempo: {report.elapsed_ms:.0f} ms")
@@ -1,50 +1,99 @@
 import os
 from pathlib import Path
 import fitz
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 
-def load_pdfs_from_directory(directory_path: str = "data") -> List[Dict[str, str]]:
-    """Load PDFs from a directory and extract text."""
-    documents = []
+def list_pdf_files(directory_path: str = "data") -> List[Path]:
+    """List the PDF files of a directory, sorted by name."""
     data_path = Path(directory_path)
+    return sorted(set(data_path.glob("*.pdf")) | set(data_path.glob("*.PDF")))
 
-    pdf_files = list(data_path.glob("*.pdf")) + list(data_path.glob("*.PDF"))
 
-    if not pdf_files:
-        raise ValueError(f"Nenhum PDF encontrado na pasta: {directory_path}")
+def format_page(page_num: int, text: str) -> str:
+    """Format the text of one page with the page marker used in the chunks."""
+    return f"\n\n--- Página {page_num} ---\n{text}"
 
-    print("Carregando", len(pdf_files), "arquivos PDF da pasta:", directory_path)
 
-    for pdf_file in pdf_files:
-        print(f"Processando arquivo: {pdf_file.name}")
+def join_pages(pages: List[str]) -> Tuple[str, List[int]]:
+    """
+    Join page texts with page markers.
+
+    Returns:
+        (content, page_offsets), onde page_offsets[i] é a posição em content
+        onde começa a página i (incluindo o marcador)
+    """
+    parts, page_offsets = [], []
+    position = 0
+    for page_num, text in enumerate(pages):
+        part = format_page(page_num, text)
+        page_offsets.append(position)
+        parts.append(part)
+        position += len(part)
+    return "".join(parts), page_offsets
+
+
+def count_pages(pdf_file: Path) -> int:
+    """Return the number of pages of a PDF without extracting any text."""
+    with fitz.open(pdf_file) as doc:
+        return len(doc)
+
+
+def extract_pages(pdf_file: Path, start: int = 0, stop: Optional[int] = None) -> List[str]:
+    """
+    Extract the text of the pages [start, stop) of a PDF.
+
+    Top-level function so it can run in a worker process.
+    """
+    with fitz.open(pdf_file) as doc:
+        stop = len(doc) if stop is None else min(stop, len(doc))
+        return [doc[page_num].get_text() for page_num in range(start, stop)]
 
-        try:
 
-            doc = fitz.open(pdf_file)
-            text_content = ""
-            num_pages = len(doc)
+def load_pdf(pdf_file: Path) -> Optional[Dict[str, str]]:
+    """
+    Extract the text of a single PDF.
 
-            for page_num in range(num_pages):
-                page = doc[page_num]
-                text = page.get_text()
-                text_content += f"\n\n--- Página {page_num} ---\n{text}"
+    Returns:
+        Documento com source, path, content, num_pages e page_offsets, ou
+        None se o arquivo não puder ser lido
+    """
+    print(f"Processando arquivo: {pdf_file.name}")
 
-            doc.close()
+    try:
 
-            documents.append(
-                {
-                    "source": pdf_file.name,
-                    "path": str(pdf_file),
-                    "content": text_content,
-                    "num_pages": num_pages,
-                }
-            )
+        pages = extract_pages(pdf_file)
+        num_pages = len(pages)
+        text_content, page_offsets = join_pages(pages)
 
         print(f"{pdf_file.name}: {num_pages} paginas extraídas.")
 
-        except Exception as e:
-            print(f"Erro ao processar {pdf_file.name}: {str(e)}")
-            continue
+        return {
+            "source": pdf_file.name,
+            "path": str(pdf_file),
+            "content": text_content,
+            "num_pages": num_pages,
+            "page_offsets": page_offsets,
+        }
+
+    except Exception as e:
+        print(f"Erro ao processar {pdf_file.name}: {str(e)}")
+        return None
+
+
+def load_pdfs_from_directory(directory_path: str = "data") -> List[Dict[str, str]]:
+    """Load PDFs from a directory and extract text."""
+    pdf_files = list_pdf_files(directory_path)
+
+    if not pdf_files:
+        raise ValueError(f"Nenhum PDF encontrado na pasta: {directory_path}")
+
+    print("Carregando", len(pdf_files), "arquivos PDF da pasta:", directory_path)
+
+    documents = []
+    for pdf_file in pdf_files:
+        document = load_pdf(pdf_file)
+        if document is not None:
+            documents.append(document)
 
     print(f"\n Total: {len(documents)} PDFs carregados com sucesso.")
     return documents
@@ -0,0 +1,464 @@
+"""
+Ingestão paralela e em streaming: PDFs -> páginas -> chunks -> embeddings.
+
+Cada etapa é um gerador, então só uma janela limitada de dados fica em
+memória, qualquer que seja o tamanho do corpus:
+- um pool de processos extrai o texto com PyMuPDF, dividindo cada PDF em
+  faixas de páginas (PDFs grandes também são paralelizados); no máximo
+  max_pending faixas ficam em voo e os resultados saem na ordem original
+- as páginas de um PDF são juntadas em um documento e divididas em chunks
+  assim que a última faixa chega; o documento é descartado em seguida
+- quase duplicatas são removidas (NearDuplicateFilter) antes de gerar
+  embeddings
+- os chunks seguem em lotes de batch_size para o EmbeddingJob (lotes
+  concorrentes, cota de tokens, backoff e checkpoints), os vetores vão
+  direto para o índice e os textos direto para o chunk store e para o
+  índice lexical (BM25)
+
+O índice gerado tem index.faiss, chunk store, índice lexical e
+index_meta.json (sem o docstore em pickle do LangChain, que exigiria todos
+os textos em memória); o retriever lê os chunks pelo chunk store.
+
+Uso:
+    python -m src.ingestion.streaming [data] [vector_index]
+"""
+
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from src.core.chunk_store import ChunkStore
+from src.core.embeddings import get_embedding_provider
+from src.core.faiss_index import (
+    apply_search_params,
+    build_index,
+    create_empty_index,
+    resolve_index_params,
+)
+from src.core.index_generation import IndexGeneration
+from src.core.index_metadata import write_index_metadata
+from src.core.lexical_index import LexicalIndexBuilder
+from src.ingestion.chunker import create_text_splitter, split_document
+from src.ingestion.dedup import (
+    DEFAULT_THRESHOLD,
+    DedupReport,
+    NearDuplicateFilter,
+    format_report,
+)
+from src.ingestion.embedding_job import CHECKPOINT_DIR, EmbeddingJob
+from src.ingestion.indexer import _index_params_from_env
+from src.ingestion.loader import count_pages, extract_pages, join_pages, list_pdf_files
+
+PAGES_PER_TASK = 32
+EMBED_BATCH_SIZE = 256
+
+# Tipos que precisam de todos os vetores para o treino (nlist depende de n)
+_TRAINED_TYPES = ("ivf_flat", "ivf_pq")
+
+
+@dataclass
+class IngestionReport:
+    """
+    Resumo de uma ingestão em streaming.
+
+    Attributes:
+        files: PDFs indexados
+        failed_files: PDFs que não puderam ser lidos
+        pages: Páginas extraídas
+        chunks: Chunks indexados
+        embedding_batches: Lotes de embeddings
+        resumed_batches: Lotes lidos de checkpoint de uma execução anterior
+        dedup: Resumo da remoção de quase duplicatas (None = desligada)
+        embedding_tokens: Tokens enviados à API de embeddings
+        workers: Processos de extração usados
+        elapsed_ms: Duração total
+    """
+
+    files: int = 0
+    failed_files: List[str] = field(default_factory=list)
+    pages: int = 0
+    chunks: int = 0
+    embedding_batches: int = 0
+    resumed_batches: int = 0
+    embedding_tokens: int = 0
+    workers: int = 1
+    dedup: Optional[DedupReport] = None
+    elapsed_ms: float = 0.0
+
+
+def page_ranges(
+    pdf_files: Iterable[Path], pages_per_task: int = PAGES_PER_TASK
+) -> Iterator[Tuple[Path, int, int, int]]:
+    """
+    Divide os PDFs em faixas de páginas para a extração paralela.
+
+    Yields:
+        Tuplas (pdf_file, start, stop, num_pages); PDFs ilegíveis aparecem
+        com start = stop = num_pages = -1
+    """
+
+    for pdf_file in pdf_files:
+        try:
+            num_pages = count_pages(pdf_file)
+        except Exception as e:
+            print(f"Erro ao processar {pdf_file.name}: {str(e)}")
+            yield pdf_file, -1, -1, -1
+            continue
+
+        for start in range(0, num_pages, pages_per_task):
+            yield pdf_file, start, min(start + pages_per_task, num_pages), num_pages
+
+
+def iter_documents(
+    pdf_files: Iterable[Path],
+    workers: Optional[int] = None,
+    pages_per_task: int = PAGES_PER_TASK,
+    max_pending: Optional[int] = None,
+    failed: Optional[List[str]] = None,
+) -> Iterator[Dict]:
+    """
+    Extrai os PDFs em paralelo e gera um documento por PDF, na ordem.
+
+    Args:
+        pdf_files: PDFs a processar
+        workers: Processos de extração (padrão: INGEST_WORKERS ou número de
+                 CPUs); 1 extrai no próprio processo
+        pages_per_task: Páginas por tarefa enviada ao pool
+        max_pending: Faixas em voo no pool (padrão: 2 * workers)
+        failed: Lista que recebe os nomes dos PDFs ilegíveis
+
+    Yields:
+        Documentos no formato de load_pdf (source, path, content, num_pages,
+        page_offsets)
+    """
+
+    workers = workers or _default_workers()
+    max_pending = max_pending or 2 * workers
+    ranges = page_ranges(pdf_files, pages_per_task)
+
+    if workers <= 1:
+        results = (
+            (task, _extract_or_none(task[0], task[1], task[2])) for task in ranges
+        )
+        yield from _assemble_documents(results, failed)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from _assemble_documents(
+            _ordered_results(executor, ranges, max_pending), failed
+        )
+
+
+def iter_chunks(
+    documents: Iterable[Dict], chunk_size: int = 800, chunk_overlap: int = 100
+) -> Iterator[Dict]:
+    """
+    Divide documentos em chunks à medida que eles chegam.
+    """
+
+    text_splitter = create_text_splitter(chunk_size, chunk_overlap)
+    for document in documents:
+        yield from split_document(document, text_splitter)
+
+
+def iter_batches(items: Iterable, batch_size: int) -> Iterator[List]:
+    """
+    Agrupa um iterável em listas de até batch_size itens.
+    """
+
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_directory(
+    data_dir: str = "data",
+    index_path: str = "vector_index",
+    provider: Optional[str] = None,
+    index_type: Optional[str] = None,
+    index_params: Optional[Dict] = None,
+    chunk_size: int = 800,
+    chunk_overlap: int = 100,
+    workers: Optional[int] = None,
+    pages_per_task: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    dedup: Optional[bool] = None,
+) -> IngestionReport:
+    """
+    Indexa uma pasta de PDFs com o pipeline em streaming.
+
+    Gera os mesmos chunks que load_pdfs_from_directory + chunk_documents +
+    create_vector_index, sem manter o corpus inteiro em memória.
+
+    Args:
+        data_dir: Pasta com os PDFs
+        index_path: Diretório onde o índice será salvo
+        provider: Provedor de embeddings (padrão: EMBEDDING_PROVIDER)
+        index_type: flat, ivf_flat, ivf_pq ou hnsw (padrão: VECTOR_INDEX_TYPE)
+        index_params: Parâmetros do índice (padrão: variáveis FAISS_*)
+        chunk_size: Tamanho máximo de cada chunk em caracteres
+        chunk_overlap: Overlap entre chunks
+        workers: Processos de extração (padrão: INGEST_WORKERS)
+        pages_per_task: Páginas por tarefa (padrão: INGEST_PAGES_PER_TASK)
+        batch_size: Chunks por chamada de embeddings (padrão:
+                    INGEST_EMBED_BATCH_SIZE)
+        dedup: Remove quase duplicatas antes dos embeddings (padrão:
+               DEDUP_CHUNKS, limiar DEDUP_THRESHOLD)
+
+    Returns:
+        IngestionReport com contagens e duração
+
+    Raises:
+        ValueError: Se a pasta não tiver PDFs ou nenhum chunk for gerado
+    """
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    start = time.time()
+
+    pdf_files = list_pdf_files(data_dir)
+    if not pdf_files:
+        raise ValueError(f"Nenhum PDF encontrado na pasta: {data_dir}")
+
+    workers = workers or _default_workers()
+    pages_per_task = pages_per_task or int(
+        os.getenv("INGEST_PAGES_PER_TASK") or PAGES_PER_TASK
+    )
+    batch_size = batch_size or int(os.getenv("INGEST_EMBED_BATCH_SIZE") or EMBED_BATCH_SIZE)
+
+    embedding_provider = get_embedding_provider(provider)
+    index_type = index_type or os.getenv("VECTOR_INDEX_TYPE") or "flat"
+    overrides = index_params if index_params is not None else _index_params_from_env()
+
+    report = IngestionReport(workers=workers)
+
+    print("Ingestão em streaming de", len(pdf_files), "PDFs da pasta:", data_dir)
+    print(f"    - {workers} processos, {pages_per_task} páginas por tarefa")
+    print(f"    - Lotes de embeddings: {batch_size} chunks")
+
+    def counted(documents):
+        for document in documents:
+            report.files += 1
+            report.pages += document["num_pages"]
+            print(f"    {document['source']}: {document['num_pages']} páginas")
+            yield document
+
+    documents = counted(
+        iter_documents(
+            pdf_files, workers, pages_per_task, failed=report.failed_files
+        )
+    )
+
+    builder = _StreamingIndexBuilder(index_type, overrides)
+    lexical = LexicalIndexBuilder()
+    job = EmbeddingJob.from_env(
+        embedding_provider.embeddings,
+        checkpoint_dir=os.path.join(index_path, CHECKPOINT_DIR),
+        model_key=embedding_provider.cache_key,
+        batch_size=batch_size,
+    )
+
+    def embedded(chunks):
+        # Os chunks passam para o chunk store depois que o lote foi
+        # embeddado, então a linha i do chunk store é o vetor i do índice
+        batches = iter_batches(chunks, batch_size)
+        for batch, vectors in job.embed_batches(batches, text=lambda c: c["content"]):
+            builder.add(vectors)
+            for chunk in batch:
+                lexical.add(chunk["content"])
+                yield chunk
+
+    chunks = iter_chunks(documents, chunk_size, chunk_overlap)
+    duplicates = None
+    if dedup is None:
+        dedup = os.getenv("DEDUP_CHUNKS", "true").lower() == "true"
+    if dedup:
+        # Duplicatas saem antes dos embeddings; a origem delas é anotada na
+        # posição do chunk mantido, que é a linha dele no chunk store
+        near_duplicates = NearDuplicateFilter(
+            float(os.getenv("DEDUP_THRESHOLD") or DEFAULT_THRESHOLD)
+        )
+        chunks = near_duplicates.filter(chunks)
+        duplicates = near_duplicates.duplicates
+        report.dedup = near_duplicates.report
+
+    # Todos os arquivos vão para uma geração nova, publicada só no fim: se
+    # nada for extraído ou algo falhar, o índice em uso continua inteiro
+    with IndexGeneration(index_path) as generation:
+        report.chunks = ChunkStore.write(generation.path, embedded(chunks), duplicates)
+        if report.dedup is not None:
+            print(format_report(report.dedup))
+        report.embedding_batches = job.report.batches
+        report.resumed_batches = job.report.resumed_batches
+        report.embedding_tokens = job.report.tokens
+        if not report.chunks:
+            raise ValueError(f"Nenhum chunk gerado a partir da pasta: {data_dir}")
+
+        index, params = builder.finish()
+
+        faiss.write_index(index, os.path.join(generation.path, "index.faiss"))
+        lexical.build().save(generation.path)
+
+        write_index_metadata(
+            generation.path,
+            {
+                "embedding_provider": embedding_provider.name,
+                "embedding_model": embedding_provider.model,
+                "dimension": index.d,
+                "num_chunks": report.chunks,
+                "index": params,
+            },
+        )
+        generation.publish()
+    job.clear_checkpoints()
+
+    report.elapsed_ms = (time.time() - start) * 1000
+    return report
+
+
+class _StreamingIndexBuilder:
+    """
+    Recebe os vetores em lotes e monta o índice FAISS.
+
+    Flat e HNSW recebem cada lote assim que ele chega. IVF precisa treinar
+    com o corpus inteiro (nlist depende de n), então os lotes são guardados
+    até finish().
+    """
+
+    def __init__(self, index_type: str, overrides: Dict):
+        self.index_type = index_type
+        self.overrides = overrides
+        self.index = None
+        self.params = None
+        self._pending: List[np.ndarray] = []
+
+    def add(self, vectors: np.ndarray) -> None:
+        if self.index_type in _TRAINED_TYPES:
+            self._pending.append(vectors)
+            return
+
+        if self.index is None:
+            self.params = resolve_index_params(
+                self.index_type, 0, vectors.shape[1], **self.overrides
+            )
+            self.index = create_empty_index(vectors.shape[1], self.params)
+        self.index.add(np.ascontiguousarray(vectors))
+
+    def finish(self) -> Tuple[faiss.Index, Dict]:
+        if self._pending:
+            vectors = np.concatenate(self._pending)
+            self._pending = []
+            self.params = resolve_index_params(
+                self.index_type, len(vectors), vectors.shape[1], **self.overrides
+            )
+            self.index = build_index(vectors, self.params)
+
+        apply_search_params(self.index, self.params)
+        return self.index, self.params
+
+
+def _ordered_results(executor, ranges, max_pending: int):
+    """
+    Envia as faixas ao pool com no máximo max_pending em voo e devolve os
+    resultados na ordem de envio.
+    """
+
+    in_flight = deque()
+    for task in ranges:
+        future = None
+        if task[1] >= 0:
+            future = executor.submit(_extract_or_none, task[0], task[1], task[2])
+        in_flight.append((task, future))
+
+        if len(in_flight) >= max_pending:
+            head, head_future = in_flight.popleft()
+            yield head, head_future.result() if head_future else None
+
+    while in_flight:
+        head, head_future = in_flight.popleft()
+        yield head, head_future.result() if head_future else None
+
+
+def _extract_or_none(pdf_file: Path, start: int, stop: int) -> Optional[List[str]]:
+    """
+    extract_pages que devolve None em caso de erro (roda nos workers).
+    """
+
+    if start < 0:
+        return None
+    try:
+        return extract_pages(pdf_file, start, stop)
+    except Exception as e:
+        print(f"Erro ao processar {pdf_file.name} (páginas {start}-{stop}): {str(e)}")
+        return None
+
+
+def _assemble_documents(results, failed: Optional[List[str]]) -> Iterator[Dict]:
+    """
+    Junta as faixas de páginas de cada PDF em um documento.
+    """
+
+    pages: List[str] = []
+    broken = False
+
+    for (pdf_file, start, stop, num_pages), texts in results:
+        if texts is None:
+            broken = True
+        elif not broken:
+            pages.extend(texts)
+
+        if stop != num_pages:
+            continue
+
+        if broken:
+            if failed is not None:
+                failed.append(pdf_file.name)
+        else:
+            content, page_offsets = join_pages(pages)
+            yield {
+                "source": pdf_file.name,
+                "path": str(pdf_file),
+                "content": content,
+                "num_pages": num_pages,
+                "page_offsets": page_offsets,
+            }
+
+        pages = []
+        broken = False
+
+
+def _default_workers() -> int:
+    return int(os.getenv("INGEST_WORKERS") or os.cpu_count() or 1)
+
+
+if __name__ == "__main__":
+    data_dir = sys.argv[1] if len(sys.argv) > 1 else "data"
+    index_path = sys.argv[2] if len(sys.argv) > 2 else "vector_index"
+
+    result = ingest_directory(data_dir, index_path)
+
+    print("\n Ingestão concluída")
+    print(f"    PDFs:               {result.files}")
+    print(f"    PDFs com erro:      {', '.join(result.failed_files) or '-'}")
+    print(f"    Páginas:            {result.pages}")
+    print(f"    Chunks:             {result.chunks}")
+    print(f"    Lotes de embedding: {result.embedding_batches}")
+    print(f"    De checkpoint:      {result.resumed_batches}")
+    print(f"    Tokens embeddados:  {result.embedding_tokens}")
+    print(f"    Processos:          {result.workers}")
+    print(f"    Tempo:              {result.elapsed_ms:.0f} ms")
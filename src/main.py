@@ -1,18 +1,25 @@
+import asyncio
+import json
 import os
-from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from dotenv import load_dotenv
 
-from src.schemas.request import QuestionRequest
-from src.schemas.response import QuestionResponse, ErrorResponse
+from src.schemas.request import BatchQuestionRequest, QuestionRequest
+from src.schemas.response import BatchQuestionResponse, QuestionResponse, ErrorResponse
+from src.rag.hedging import DeadlineExceeded
 from src.rag.pipeline import RAGPipeline
+from src.utils.concurrency import ConcurrencyLimiter, ConcurrencyLimitExceeded
 import logging
 
 load_dotenv()
 
 rag_pipeline = None
+request_limiter = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -20,11 +27,19 @@ async def lifespan(app: FastAPI):
     Gerencia o lifecycle do app
     Carrega o pipeline na inicialização e libera recursos no shutdown
     """
-    global rag_pipeline
+    global rag_pipeline, request_limiter
 
     print("Iniciando o Micro-RAG API...")
 
+    # Pool usado pelo run_in_executor (busca FAISS e chamadas síncronas)
+    executor = ThreadPoolExecutor(
+        max_workers=int(os.getenv("RAG_WORKER_THREADS", 16)),
+        thread_name_prefix="rag-worker",
+    )
+    asyncio.get_running_loop().set_default_executor(executor)
+
     rag_pipeline = RAGPipeline(index_path="vector_index")
+    request_limiter = ConcurrencyLimiter.from_env()
 
     print("API pronta para receber as requests.")
 
@@ -32,6 +47,10 @@ async def lifespan(app: FastAPI):
 
     print("Finalizando API...")
 
+    await rag_pipeline.aclose()
+
+    executor.shutdown(wait=False, cancel_futures=True)
+
 
 app = FastAPI(
     title="Micro-RAG API",
@@ -71,16 +90,36 @@ async def root():
     }
 
 
+@app.get("/cache/stats")
+async def cache_stats():
+    """
+    Contadores dos caches de resposta (exato e semântico).
+    """
+
+    if rag_pipeline is None:
+        raise HTTPException(status_code=503, detail="Pipeline não foi inicializado.")
+
+    return rag_pipeline.cache_stats()
+
+
 @app.post(
     "/ask",
     response_model=QuestionResponse,
     responses={
         200: {"description": "Resposta gerada com sucesso."},
         400: {"model": ErrorResponse, "description": "Requisição inválida."},
+        429: {
+            "model": ErrorResponse,
+            "description": "Servidor saturado, tente novamente.",
+        },
         500: {
             "model": ErrorResponse,
             "description": "Erro interno do servidor.",
         },
+        504: {
+            "model": ErrorResponse,
+            "description": "Prazo da pergunta esgotado sem resposta do LLM.",
+        },
     },
 )
 async def ask_question(request: QuestionRequest):
@@ -103,7 +142,10 @@ async def ask_question(request: QuestionRequest):
                 status_code=503, detail="Pipeline não foi inicializado."
             )
 
-        response = rag_pipeline.process_question(request.question)
+        async with request_limiter.slot():
+            response = await rag_pipeline.aprocess_question(
+                request.question, deadline_ms=request.deadline_ms
+            )
 
         if response.is_blocked:
             print(f"Pergunta BLOQUEADA: '{request.question[:50]}...'")
@@ -115,9 +157,189 @@ async def ask_question(request: QuestionRequest):
 
         return response
 
+    except ConcurrencyLimitExceeded as e:
+        raise _saturated_error(e)
+
+    except DeadlineExceeded as e:
+        logger.warning(f"Prazo esgotado: {str(e)}")
+        raise HTTPException(
+            status_code=504,
+            detail="O modelo não respondeu dentro do prazo da pergunta.",
+        )
+
+    except HTTPException:
+        raise
+
     except Exception as e:
         logger.error(f"Erro ao processar pergunta: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail=f"Erro interno ao processar a pergunta: {str(e)}",
         )
+
+
+@app.post(
+    "/ask/stream",
+    responses={
+        200: {
+            "content": {"text/event-stream": {}},
+            "description": (
+                "Stream SSE com os eventos citations, token e metrics."
+            ),
+        },
+        429: {
+            "model": ErrorResponse,
+            "description": "Servidor saturado, tente novamente.",
+        },
+    },
+)
+async def ask_question_stream(request: QuestionRequest):
+    """
+    Versão em streaming do /ask (Server-Sent Events).
+
+    Envia as citações assim que o retrieval termina, depois os tokens da
+    resposta conforme chegam do LLM e, por fim, as métricas completas.
+
+    Args:
+        request: QuestionRequest com a pergunta do usuário.
+
+    Returns:
+        StreamingResponse com media type text/event-stream.
+    """
+
+    logger.info(f"Recebida pergunta (stream): {request.question}")
+
+    if rag_pipeline is None:
+        raise HTTPException(status_code=503, detail="Pipeline não foi inicializado.")
+
+    # A vaga é reservada antes de abrir o stream para que a recusa seja um
+    # 429 normal, e liberada pela resposta quando ela termina (inclusive se
+    # o cliente desconectar antes de o corpo começar a ser lido).
+    stack = AsyncExitStack()
+    try:
+        await stack.enter_async_context(request_limiter.slot())
+    except ConcurrencyLimitExceeded as e:
+        raise _saturated_error(e)
+
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            async for event in rag_pipeline.astream_question(
+                request.question, deadline_ms=request.deadline_ms
+            ):
+                yield _format_sse(event["event"], event["data"])
+        except Exception as e:
+            logger.error(f"Erro no stream da pergunta: {str(e)}")
+            yield _format_sse(
+                "error",
+                {"detail": f"Erro interno ao processar a pergunta: {str(e)}"},
+            )
+
+    return SlotStreamingResponse(
+        event_stream(),
+        release=stack.aclose,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post(
+    "/ask/batch",
+    response_model=BatchQuestionResponse,
+    responses={
+        200: {"description": "Respostas geradas com sucesso."},
+        429: {
+            "model": ErrorResponse,
+            "description": "Servidor saturado, tente novamente.",
+        },
+        500: {
+            "model": ErrorResponse,
+            "description": "Erro interno do servidor.",
+        },
+    },
+)
+async def ask_batch(request: BatchQuestionRequest):
+    """
+    Processa várias perguntas em uma requisição (avaliações e prefetch).
+
+    Os embeddings são gerados em lote, a busca no índice é única e as
+    gerações rodam em paralelo até BATCH_MAX_CONCURRENCY. O lote ocupa uma
+    vaga do limitador de concorrência.
+
+    Args:
+        request: BatchQuestionRequest com a lista de perguntas.
+
+    Returns:
+        BatchQuestionResponse com as respostas (na ordem das perguntas) e
+        as métricas agregadas.
+    """
+
+    try:
+        logger.info(f"Recebido lote com {len(request.questions)} perguntas")
+
+        if rag_pipeline is None:
+            raise HTTPException(
+                status_code=503, detail="Pipeline não foi inicializado."
+            )
+
+        async with request_limiter.slot():
+            response = await rag_pipeline.aprocess_many(request.questions)
+
+        print(f"Lote processado: {response.metrics.questions} perguntas")
+        print(f"    Latencia: {response.metrics.total_latency_ms} ms")
+        print(f"    Tokens usados: {response.metrics.total_tokens}")
+
+        return response
+
+    except ConcurrencyLimitExceeded as e:
+        raise _saturated_error(e)
+
+    except HTTPException:
+        raise
+
+    except Exception as e:
+        logger.error(f"Erro ao processar lote: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erro interno ao processar o lote: {str(e)}",
+        )
+
+
+class SlotStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que libera a vaga do limitador ao terminar.
+
+    A liberação fica no finally de __call__, então acontece em qualquer
+    saída: fim do stream, desconexão do cliente (mesmo antes da primeira
+    leitura do corpo) ou erro ao enviar.
+    """
+
+    def __init__(self, content, release: Callable[[], Awaitable[None]], **kwargs):
+        super().__init__(content, **kwargs)
+        self._release = release
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self._release()
+
+
+def _format_sse(event: str, data) -> str:
+    """
+    Serializa um evento no formato Server-Sent Events.
+    """
+
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _saturated_error(error: ConcurrencyLimitExceeded) -> HTTPException:
+    """
+    Converte a recusa do limitador de concorrência em um HTTP 429.
+    """
+
+    logger.warning(f"Requisição recusada: {str(error)}")
+    return HTTPException(
+        status_code=429,
+        detail="Servidor ocupado. Tente novamente em instantes.",
+        headers={"Retry-After": "1"},
+    )
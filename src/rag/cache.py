@@ -0,0 +1,299 @@
+"""
+Cache de respostas do pipeline RAG.
+
+Perguntas repetidas (ou variações triviais, como diferenças de caixa,
+acentuação, espaços e pontuação) são respondidas a partir do cache, sem
+pagar embedding nem geração.
+
+A chave combina a pergunta normalizada com um namespace que identifica a
+versão do índice e a configuração de prompt/modelo; qualquer mudança nesses
+itens invalida naturalmente as entradas antigas.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from ..schemas.response import QuestionResponse
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normaliza uma pergunta para uso como chave de cache.
+
+    Remove acentos, converte para minúsculas, troca pontuação por espaço e
+    colapsa espaços repetidos.
+
+    Example:
+        >>> normalize_question("  O que é Gestão de Estoques?? ")
+        'o que e gestao de estoques'
+    """
+
+    decomposed = unicodedata.normalize("NFKD", question)
+    without_accents = "".join(
+        char for char in decomposed if not unicodedata.combining(char)
+    )
+
+    cleaned = "".join(
+        char if char.isalnum() else " " for char in without_accents.lower()
+    )
+
+    return " ".join(cleaned.split())
+
+
+class CacheBackend:
+    """
+    Interface de armazenamento do cache (chave -> valor serializado).
+
+    Implementações devem aplicar LRU com limite de entradas e expiração
+    por TTL.
+    """
+
+    def get(self, key: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class InMemoryCacheBackend(CacheBackend):
+    """
+    Backend em memória do processo (OrderedDict com LRU + TTL).
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl_seconds: float = 3600):
+        """
+        Args:
+            max_entries: Número máximo de entradas antes de descartar a
+                         menos usada recentemente
+            ttl_seconds: Tempo de vida de cada entrada (0 = sem expiração)
+        """
+
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires_at, value = entry
+            if expires_at and expires_at < time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        expires_at = time.time() + self.ttl_seconds if self.ttl_seconds else 0.0
+
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    Backend persistente em SQLite, que sobrevive a reinícios do processo.
+
+    A ordem LRU é mantida pela coluna last_access.
+    """
+
+    def __init__(
+        self,
+        path: str = ".cache/responses.sqlite3",
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600,
+    ):
+        """
+        Args:
+            path: Caminho do arquivo SQLite (criado se não existir)
+            max_entries: Número máximo de entradas
+            ttl_seconds: Tempo de vida de cada entrada (0 = sem expiração)
+        """
+
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+
+            value, expires_at = row
+            if expires_at and expires_at < now:
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+            self._conn.execute(
+                "UPDATE response_cache SET last_access = ? WHERE key = ?",
+                (now, key),
+            )
+            self._conn.commit()
+            return value
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        expires_at = now + self.ttl_seconds if self.ttl_seconds else 0.0
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache "
+                "(key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, now),
+            )
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                " SELECT key FROM response_cache"
+                " ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM response_cache"
+            ).fetchone()[0]
+
+
+class ResponseCache:
+    """
+    Cache de QuestionResponse indexado pela pergunta normalizada.
+    """
+
+    def __init__(self, backend: CacheBackend, namespace: str = ""):
+        """
+        Args:
+            backend: Armazenamento usado pelo cache
+            namespace: Identificador da versão do índice e da configuração
+                       de prompt/modelo, incluído em todas as chaves
+        """
+
+        self.backend = backend
+        self.namespace = namespace
+
+    def make_key(self, question: str) -> str:
+        """
+        Gera a chave de cache para uma pergunta.
+        """
+
+        raw = f"{self.namespace}\x00{normalize_question(question)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, question: str) -> Optional[QuestionResponse]:
+        """
+        Busca a resposta de uma pergunta no cache.
+
+        Returns:
+            QuestionResponse armazenada ou None se não houver entrada válida
+        """
+
+        value = self.backend.get(self.make_key(question))
+        if value is None:
+            return None
+
+        return QuestionResponse.model_validate_json(value)
+
+    def set(self, question: str, response: QuestionResponse) -> None:
+        """
+        Armazena a resposta de uma pergunta.
+        """
+
+        self.backend.set(self.make_key(question), response.model_dump_json())
+
+
+def create_response_cache(namespace: str) -> Optional[ResponseCache]:
+    """
+    Cria o cache de respostas a partir das variáveis de ambiente.
+
+    Variáveis:
+        RESPONSE_CACHE_BACKEND: "memory" (padrão), "sqlite" ou "none"
+        RESPONSE_CACHE_MAX_ENTRIES: Limite de entradas (padrão: 1000)
+        RESPONSE_CACHE_TTL_SECONDS: Tempo de vida em segundos (padrão: 3600)
+        RESPONSE_CACHE_PATH: Arquivo do backend SQLite
+
+    Args:
+        namespace: Versão do índice + configuração de prompt/modelo
+
+    Returns:
+        ResponseCache configurado, ou None se o cache estiver desativado
+    """
+
+    backend_name = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+    max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1000))
+    ttl_seconds = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 3600))
+
+    if backend_name in ("none", "off", "disabled", ""):
+        return None
+
+    if backend_name == "memory":
+        backend = InMemoryCacheBackend(max_entries, ttl_seconds)
+    elif backend_name == "sqlite":
+        backend = SQLiteCacheBackend(
+            os.getenv("RESPONSE_CACHE_PATH", ".cache/responses.sqlite3"),
+            max_entries,
+            ttl_seconds,
+        )
+    else:
+        raise ValueError(
+            f"RESPONSE_CACHE_BACKEND inválido: '{backend_name}'. "
+            f"Use 'memory', 'sqlite' ou 'none'."
+        )
+
+    return ResponseCache(backend, namespace=namespace)
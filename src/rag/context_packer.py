@@ -0,0 +1,253 @@
+"""
+Empacotamento do contexto do prompt em um orçamento de tokens.
+
+O gerador juntava o conteúdo inteiro de cada chunk recuperado. Aqui, antes
+da geração, os chunks são encaixados em CONTEXT_MAX_TOKENS:
+- chunks redundantes (termos quase iguais aos de um chunk já incluído,
+  por exemplo trechos vizinhos com overlap) são descartados
+- os chunks entram na ordem da busca (do mais relevante para o menos); o
+  que não cabe inteiro é cortado em fronteiras de frase, em volta da frase
+  com mais termos da pergunta
+- quando não sobra espaço nem para um trecho mínimo, os chunks restantes
+  (os de menor score) ficam de fora
+
+O PackingReport registra quantos tokens foram economizados. Como a latência
+e o custo da geração crescem com o prompt, isso reduz os dois.
+"""
+
+import os
+import re
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Set, Tuple
+
+from dotenv import load_dotenv
+
+from ..core.lexical_index import tokenize
+from ..utils.tokens import count_tokens
+
+load_dotenv()
+
+# Fim de frase: pontuação seguida de espaço, ou quebra de linha
+_SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+|\n+")
+
+# Separador entre chunks no contexto (ver ResponseGenerator.build_context)
+CHUNK_SEPARATOR = "\n\n---\n\n"
+
+
+@dataclass
+class PackingReport:
+    """
+    Resumo do empacotamento de um contexto.
+
+    Attributes:
+        input_chunks: Chunks recebidos
+        packed_chunks: Chunks enviados ao LLM
+        dropped_redundant: Chunks descartados por redundância
+        dropped_budget: Chunks que não couberam no orçamento
+        trimmed_chunks: Chunks cortados em fronteiras de frase
+        input_tokens: Tokens do contexto sem empacotamento
+        packed_tokens: Tokens do contexto empacotado
+        elapsed_ms: Tempo do empacotamento
+    """
+
+    input_chunks: int = 0
+    packed_chunks: int = 0
+    dropped_redundant: int = 0
+    dropped_budget: int = 0
+    trimmed_chunks: int = 0
+    input_tokens: int = 0
+    packed_tokens: int = 0
+    elapsed_ms: float = 0.0
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.input_tokens - self.packed_tokens
+
+
+class ContextPacker:
+    """
+    Encaixa os chunks recuperados em um orçamento de tokens.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 1500,
+        redundancy_threshold: float = 0.8,
+        min_chunk_tokens: int = 32,
+        model: Optional[str] = None,
+    ):
+        """
+        Args:
+            max_tokens: Orçamento de tokens do contexto
+            redundancy_threshold: Fração dos termos de um chunk já presente
+                                  em um chunk incluído a partir da qual ele é
+                                  descartado (1 ou mais desativa)
+            min_chunk_tokens: Menor trecho que vale a pena incluir
+            model: Modelo cujo tokenizer é usado na contagem
+        """
+
+        self.max_tokens = max_tokens
+        self.redundancy_threshold = redundancy_threshold
+        self.min_chunk_tokens = min_chunk_tokens
+        self.model = model
+        self._separator_tokens = count_tokens(CHUNK_SEPARATOR, model)
+
+    @classmethod
+    def from_env(cls) -> Optional["ContextPacker"]:
+        """
+        Cria o packer a partir de CONTEXT_MAX_TOKENS (0 desativa),
+        CONTEXT_REDUNDANCY_THRESHOLD e CONTEXT_MIN_CHUNK_TOKENS.
+        """
+
+        max_tokens = int(os.getenv("CONTEXT_MAX_TOKENS") or 0)
+        if max_tokens <= 0:
+            return None
+
+        return cls(
+            max_tokens=max_tokens,
+            redundancy_threshold=float(
+                os.getenv("CONTEXT_REDUNDANCY_THRESHOLD") or 0.8
+            ),
+            min_chunk_tokens=int(os.getenv("CONTEXT_MIN_CHUNK_TOKENS") or 32),
+            model=os.getenv("MODEL_NAME"),
+        )
+
+    def pack(
+        self, question: str, chunks: Sequence[dict]
+    ) -> Tuple[List[dict], PackingReport]:
+        """
+        Seleciona e corta os chunks para caberem no orçamento.
+
+        Args:
+            question: Pergunta do usuário (guia o corte das frases)
+            chunks: Chunks na ordem da busca
+
+        Returns:
+            Tupla (chunks empacotados, relatório). Chunks cortados são cópias
+            com o conteúdo reduzido e a chave "trimmed".
+        """
+
+        start = time.perf_counter()
+        report = PackingReport(input_chunks=len(chunks))
+        query_terms = set(tokenize(question))
+
+        remaining = self.max_tokens
+        packed: List[dict] = []
+        packed_terms: List[Set[str]] = []
+
+        for chunk in chunks:
+            tokens = self._block_tokens(chunk, chunk["content"])
+            if report.input_tokens:
+                report.input_tokens += self._separator_tokens
+            report.input_tokens += tokens
+
+            terms = set(tokenize(chunk["content"]))
+            if self._is_redundant(terms, packed_terms):
+                report.dropped_redundant += 1
+                continue
+
+            cost = tokens + (self._separator_tokens if packed else 0)
+            if cost <= remaining:
+                packed.append(chunk)
+            else:
+                available = remaining - (self._separator_tokens if packed else 0)
+                trimmed = self._trim(chunk, query_terms, available)
+                if trimmed is None:
+                    report.dropped_budget += 1
+                    continue
+                packed.append(trimmed)
+                report.trimmed_chunks += 1
+                cost = self._block_tokens(trimmed, trimmed["content"]) + (
+                    self._separator_tokens if len(packed) > 1 else 0
+                )
+
+            packed_terms.append(terms)
+            remaining -= cost
+            report.packed_tokens += cost
+
+        report.packed_chunks = len(packed)
+        report.elapsed_ms = (time.perf_counter() - start) * 1000
+        return packed, report
+
+    def _block_tokens(self, chunk: dict, content: str) -> int:
+        return count_tokens(f"[Fonte: {chunk['source']}]\n{content}", self.model)
+
+    def _is_redundant(self, terms: Set[str], packed_terms: List[Set[str]]) -> bool:
+        if not terms or self.redundancy_threshold >= 1:
+            return False
+        return any(
+            len(terms & other) / len(terms) >= self.redundancy_threshold
+            for other in packed_terms
+        )
+
+    def _trim(
+        self, chunk: dict, query_terms: Set[str], available: int
+    ) -> Optional[dict]:
+        """
+        Corta o chunk em volta da frase com mais termos da pergunta.
+
+        A janela começa na melhor frase e cresce para o vizinho (anterior ou
+        seguinte) com mais termos da pergunta enquanto couber em available.
+        Se nem a melhor frase couber (trechos sem pontuação, como tabelas),
+        ela é cortada em palavras. Retorna None se sobrar menos que
+        min_chunk_tokens.
+        """
+
+        if available < self.min_chunk_tokens:
+            return None
+
+        sentences = [s for s in _SENTENCE_END.split(chunk["content"]) if s.strip()]
+        if not sentences:
+            return None
+
+        scores = [len(query_terms & set(tokenize(s))) for s in sentences]
+        best = max(range(len(sentences)), key=lambda i: (scores[i], -i))
+
+        def cost(first: int, last: int) -> int:
+            return self._block_tokens(chunk, " ".join(sentences[first : last + 1]))
+
+        if cost(best, best) > available:
+            content = self._cut_words(chunk, sentences[best], available)
+            if content is None:
+                return None
+            return {**chunk, "content": content, "trimmed": True}
+
+        first = last = best
+        while True:
+            candidates = []
+            if first > 0:
+                candidates.append((scores[first - 1], 0, first - 1, last))
+            if last < len(sentences) - 1:
+                candidates.append((scores[last + 1], 1, first, last + 1))
+            # Vizinho com mais termos da pergunta primeiro; empate vai para o
+            # seguinte. Se ele não couber, tenta o outro lado.
+            candidates.sort(reverse=True)
+            for _, _, new_first, new_last in candidates:
+                if cost(new_first, new_last) <= available:
+                    first, last = new_first, new_last
+                    break
+            else:
+                break
+
+        content = " ".join(sentences[first : last + 1])
+        return {**chunk, "content": content, "trimmed": True}
+
+    def _cut_words(self, chunk: dict, sentence: str, available: int) -> Optional[str]:
+        """
+        Maior prefixo da frase (em palavras) que cabe em available.
+        """
+
+        words = sentence.split()
+        low, high = 0, len(words)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self._block_tokens(chunk, " ".join(words[:middle])) <= available:
+                low = middle
+            else:
+                high = middle - 1
+
+        content = " ".join(words[:low])
+        if self._block_tokens(chunk, content) < self.min_chunk_tokens:
+            return None
+        return content
@@ -0,0 +1,583 @@
+"""
+Camada de embeddings de query usada pelo VectorRetriever.
+
+Combina duas otimizações sobre o cliente de embeddings:
+- QueryEmbeddingCache: LRU de vetores indexado por (modelo, query
+  normalizada), opcionalmente persistido em um arquivo float32 mapeado em
+  memória (np.memmap) que sobrevive a reinícios.
+- EmbeddingMicroBatcher: agrupa queries que chegam com poucos milissegundos
+  de diferença em uma única chamada à API de embeddings.
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from .cache import normalize_question
+
+# Versão do layout do arquivo persistido (linhas com o hash da chave)
+PERSIST_FORMAT = 2
+KEY_BYTES = 20
+
+
+@dataclass
+class EmbeddingTimings:
+    """
+    Tempos gastos para obter o embedding de uma query.
+
+    Attributes:
+        cache_ms: Tempo de consulta/escrita no cache de embeddings
+        embedding_ms: Tempo da chamada ao provedor de embeddings (0 em hit)
+        cache_hit: True se o vetor veio do cache
+    """
+
+    cache_ms: float = 0.0
+    embedding_ms: float = 0.0
+    cache_hit: bool = False
+
+
+class QueryEmbeddingCache:
+    """
+    Cache LRU de embeddings de query.
+
+    Os vetores ficam em uma matriz float32 (capacidade x dimensão). Com
+    persist_path, a matriz é um np.memmap em disco e as chaves de cada linha
+    são salvas em um arquivo JSON ao lado.
+
+    Cada linha guarda também o hash da chave que a ocupa. O índice
+    chave -> linha de cada processo pode estar desatualizado: o JSON só é
+    gravado a cada flush_every inserções, e outro worker que abra o mesmo
+    arquivo reaproveita linhas por conta própria. Por isso get() confere o
+    hash antes e depois de copiar o vetor, e uma linha tomada por outra
+    chave conta como miss.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_entries: int = 2048,
+        persist_path: Optional[str] = None,
+        flush_every: int = 64,
+    ):
+        """
+        Args:
+            model_name: Modelo de embeddings (faz parte da chave)
+            max_entries: Número máximo de vetores armazenados
+            persist_path: Arquivo .f32 para persistir os vetores (opcional)
+            flush_every: Salva o índice de chaves a cada N inserções
+        """
+
+        self.model_name = model_name
+        self.max_entries = max(1, max_entries)
+        self.persist_path = persist_path
+        self.flush_every = max(1, flush_every)
+
+        self._slots: "OrderedDict[str, int]" = OrderedDict()
+        self._free_slots: List[int] = []
+        self._rows: Optional[np.ndarray] = None
+        self._keys: Optional[np.ndarray] = None
+        self._vectors: Optional[np.ndarray] = None
+        self._dimension: Optional[int] = None
+        self._dirty = 0
+        self._lock = threading.Lock()
+
+        if persist_path:
+            self._open_persisted()
+
+    def make_key(self, query: str) -> str:
+        """
+        Gera a chave do cache para uma query.
+        """
+
+        raw = f"{self.model_name}\x00{normalize_question(query)}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """
+        Retorna o embedding armazenado para a query, se houver.
+        """
+
+        key = self.make_key(query)
+        digest = _key_digest(key)
+
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                return None
+
+            vector = None
+            if np.array_equal(self._keys[slot], digest):
+                vector = np.array(self._vectors[slot], dtype=np.float32)
+            if vector is None or not np.array_equal(self._keys[slot], digest):
+                # Linha reaproveitada por outro processo (ou por uma versão
+                # do índice que não chegou a ser gravada)
+                del self._slots[key]
+                self._free_slots.append(slot)
+                return None
+
+            self._slots.move_to_end(key)
+            return vector
+
+    def put(self, query: str, vector) -> None:
+        """
+        Armazena o embedding de uma query.
+        """
+
+        key = self.make_key(query)
+        vector = np.asarray(vector, dtype=np.float32)
+
+        with self._lock:
+            if self._vectors is None:
+                self._allocate(vector.shape[0])
+
+            if vector.shape[0] != self._dimension:
+                raise ValueError(
+                    f"Dimensão do embedding ({vector.shape[0]}) diferente da "
+                    f"dimensão do cache ({self._dimension})."
+                )
+
+            slot = self._slots.get(key)
+            if slot is None:
+                if self._free_slots:
+                    slot = self._free_slots.pop()
+                else:
+                    _, slot = self._slots.popitem(last=False)
+                self._slots[key] = slot
+            else:
+                self._slots.move_to_end(key)
+
+            # Invalida a linha antes de trocar o vetor, para que um leitor em
+            # outro processo nunca veja o hash novo com o vetor antigo
+            self._keys[slot] = 0
+            self._vectors[slot] = vector
+            self._keys[slot] = _key_digest(key)
+
+            self._dirty += 1
+            if self.persist_path and self._dirty >= self.flush_every:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        """
+        Grava no disco os vetores e o índice de chaves (se persistido).
+        """
+
+        with self._lock:
+            self._flush_locked()
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _allocate(self, dimension: int) -> None:
+        self._dimension = dimension
+        self._free_slots = list(reversed(range(self.max_entries)))
+
+        if self.persist_path:
+            directory = os.path.dirname(self.persist_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            rows = np.memmap(
+                self.persist_path,
+                dtype=_row_dtype(dimension),
+                mode="w+",
+                shape=(self.max_entries,),
+            )
+        else:
+            rows = np.zeros(self.max_entries, dtype=_row_dtype(dimension))
+
+        self._set_rows(rows)
+
+    def _set_rows(self, rows: np.ndarray) -> None:
+        self._rows = rows
+        self._keys = rows["key"]
+        self._vectors = rows["vector"]
+
+    def _open_persisted(self) -> None:
+        meta_path = f"{self.persist_path}.json"
+        if not (os.path.exists(self.persist_path) and os.path.exists(meta_path)):
+            return
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+        dimension = int(meta.get("dimension") or 0)
+        if (
+            meta.get("format") != PERSIST_FORMAT
+            or meta.get("model") != self.model_name
+            or meta.get("capacity") != self.max_entries
+            or os.path.getsize(self.persist_path)
+            != _row_dtype(dimension).itemsize * self.max_entries
+        ):
+            # Arquivo de outro modelo, capacidade ou formato: recomeça do zero
+            return
+
+        self._dimension = dimension
+        self._set_rows(
+            np.memmap(
+                self.persist_path,
+                dtype=_row_dtype(dimension),
+                mode="r+",
+                shape=(self.max_entries,),
+            )
+        )
+
+        used = set()
+        for key, slot in meta["slots"]:
+            # Linhas reaproveitadas depois do último flush ficam de fora
+            if np.array_equal(self._keys[slot], _key_digest(key)):
+                self._slots[key] = slot
+                used.add(slot)
+        self._free_slots = [
+            slot for slot in reversed(range(self.max_entries)) if slot not in used
+        ]
+
+    def _flush_locked(self) -> None:
+        if not self.persist_path or self._rows is None:
+            return
+
+        self._rows.flush()
+
+        meta = {
+            "format": PERSIST_FORMAT,
+            "model": self.model_name,
+            "dimension": self._dimension,
+            "capacity": self.max_entries,
+            # Ordem LRU: do menos para o mais recentemente usado
+            "slots": list(self._slots.items()),
+        }
+        tmp_path = f"{self.persist_path}.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, f"{self.persist_path}.json")
+
+        self._dirty = 0
+
+
+def _row_dtype(dimension: int) -> np.dtype:
+    """
+    Linha do cache: hash da chave (sha1) seguido do vetor float32.
+    """
+
+    return np.dtype(
+        [("key", np.uint8, (KEY_BYTES,)), ("vector", np.float32, (dimension,))]
+    )
+
+
+def _key_digest(key: str) -> np.ndarray:
+    return np.frombuffer(bytes.fromhex(key), dtype=np.uint8)
+
+
+class EmbeddingMicroBatcher:
+    """
+    Agrupa queries concorrentes em uma única chamada aembed_documents.
+
+    A primeira query de um lote abre uma janela de window_ms; todas as que
+    chegarem nesse intervalo (até max_batch_size) seguem juntas na mesma
+    requisição ao provedor.
+    """
+
+    def __init__(self, embeddings, window_ms: float = 5.0, max_batch_size: int = 64):
+        """
+        Args:
+            embeddings: Cliente de embeddings (interface LangChain)
+            window_ms: Janela de espera para formar o lote
+            max_batch_size: Tamanho máximo do lote
+        """
+
+        self.embeddings = embeddings
+        self.window_ms = window_ms
+        self.max_batch_size = max(1, max_batch_size)
+
+        self.batches = 0
+        self.batched_queries = 0
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Referências aos lotes em andamento (o loop só guarda referências
+        # fracas às tarefas)
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Enfileira uma query e aguarda o embedding do lote.
+        """
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(functools.partial(self._batch_done, batch))
+
+    def _batch_done(
+        self, batch: List[Tuple[str, asyncio.Future]], task: asyncio.Task
+    ) -> None:
+        """
+        Repassa a falha (ou o cancelamento) do lote a quem ainda espera.
+        """
+
+        self._tasks.discard(task)
+
+        error = None if task.cancelled() else task.exception()
+        for _, future in batch:
+            if future.done():
+                continue
+            if task.cancelled():
+                future.cancel()
+            elif error is not None:
+                future.set_exception(error)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        # Queries repetidas no mesmo lote são embeddadas uma vez só
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+
+        vectors = await self.embeddings.aembed_documents(unique_texts)
+
+        by_text = dict(zip(unique_texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+        self.batches += 1
+        self.batched_queries += len(batch)
+
+
+class QueryEmbedder:
+    """
+    Ponto único para obter embeddings de query com cache e micro-batching.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        cache: Optional[QueryEmbeddingCache] = None,
+        batcher: Optional[EmbeddingMicroBatcher] = None,
+        batch_size: int = 64,
+    ):
+        """
+        Args:
+            embeddings: Cliente de embeddings (interface LangChain)
+            cache: Cache LRU de vetores (opcional)
+            batcher: Micro-batcher para o caminho assíncrono (opcional)
+            batch_size: Textos por chamada em embed_many()
+        """
+
+        self.embeddings = embeddings
+        self.cache = cache
+        self.batcher = batcher
+        self.batch_size = max(1, batch_size)
+
+    @classmethod
+    def from_env(cls, embeddings, model_name: str) -> "QueryEmbedder":
+        """
+        Cria o embedder a partir das variáveis de ambiente.
+
+        Variáveis:
+            QUERY_EMBEDDING_CACHE_SIZE: Capacidade do LRU (0 desativa)
+            QUERY_EMBEDDING_CACHE_PATH: Arquivo .f32 para persistir o cache
+            EMBEDDING_BATCH_WINDOW_MS: Janela do micro-batching (0 desativa)
+            EMBEDDING_MAX_BATCH_SIZE: Tamanho máximo de cada lote (também
+                usado por embed_many)
+        """
+
+        cache_size = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 2048))
+        cache_path = os.getenv("QUERY_EMBEDDING_CACHE_PATH") or None
+        window_ms = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", 0))
+        max_batch = int(os.getenv("EMBEDDING_MAX_BATCH_SIZE", 64))
+
+        cache = (
+            QueryEmbeddingCache(model_name, cache_size, persist_path=cache_path)
+            if cache_size > 0
+            else None
+        )
+        batcher = (
+            EmbeddingMicroBatcher(embeddings, window_ms, max_batch)
+            if window_ms > 0
+            else None
+        )
+
+        return cls(embeddings, cache=cache, batcher=batcher, batch_size=max_batch)
+
+    def embed(self, query: str) -> Tuple[np.ndarray, EmbeddingTimings]:
+        """
+        Retorna o embedding da query e os tempos gastos.
+        """
+
+        vector, timings = self._from_cache(query)
+        if vector is not None:
+            return vector, timings
+
+        start = time.time()
+        vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+        timings.embedding_ms = (time.time() - start) * 1000
+
+        self._store(query, vector, timings)
+        return vector, timings
+
+    async def aembed(self, query: str) -> Tuple[np.ndarray, EmbeddingTimings]:
+        """
+        Versão assíncrona de embed(), usando o micro-batcher se habilitado.
+        """
+
+        vector, timings = self._from_cache(query)
+        if vector is not None:
+            return vector, timings
+
+        start = time.time()
+        if self.batcher is not None:
+            raw = await self.batcher.embed(query)
+        else:
+            raw = await self.embeddings.aembed_query(query)
+        vector = np.asarray(raw, dtype=np.float32)
+        timings.embedding_ms = (time.time() - start) * 1000
+
+        self._store(query, vector, timings)
+        return vector, timings
+
+    def embed_many(
+        self, queries: List[str], batch_size: Optional[int] = None
+    ) -> Tuple[np.ndarray, EmbeddingTimings]:
+        """
+        Embeddings de várias queries, em chamadas em lote ao provedor.
+
+        Queries já em cache não vão ao provedor; as demais (sem repetição)
+        seguem em lotes de batch_size via embed_documents.
+
+        Args:
+            queries: Lista de queries
+            batch_size: Textos por chamada ao provedor (padrão: self.batch_size)
+
+        Returns:
+            Tupla (matriz float32 n x d, tempos agregados). cache_hit é True
+            só se todas as queries vieram do cache.
+        """
+
+        vectors, missing, timings = self._many_from_cache(queries)
+
+        start = time.time()
+        for batch in _batches(missing, batch_size or self.batch_size):
+            raw = self.embeddings.embed_documents(batch)
+            for query, vector in zip(batch, raw):
+                vectors[query] = np.asarray(vector, dtype=np.float32)
+        timings.embedding_ms = (time.time() - start) * 1000
+
+        return self._store_many(queries, missing, vectors, timings)
+
+    async def aembed_many(
+        self, queries: List[str], batch_size: Optional[int] = None
+    ) -> Tuple[np.ndarray, EmbeddingTimings]:
+        """
+        Versão assíncrona de embed_many(); os lotes são enviados em paralelo.
+        """
+
+        vectors, missing, timings = self._many_from_cache(queries)
+
+        start = time.time()
+        batches = list(_batches(missing, batch_size or self.batch_size))
+        results = await asyncio.gather(
+            *(self.embeddings.aembed_documents(batch) for batch in batches)
+        )
+        for batch, raw in zip(batches, results):
+            for query, vector in zip(batch, raw):
+                vectors[query] = np.asarray(vector, dtype=np.float32)
+        timings.embedding_ms = (time.time() - start) * 1000
+
+        return self._store_many(queries, missing, vectors, timings)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Contadores do cache e do micro-batcher.
+        """
+
+        return {
+            "cached_embeddings": len(self.cache) if self.cache is not None else 0,
+            "batches": self.batcher.batches if self.batcher is not None else 0,
+            "batched_queries": (
+                self.batcher.batched_queries if self.batcher is not None else 0
+            ),
+        }
+
+    def _from_cache(
+        self, query: str
+    ) -> Tuple[Optional[np.ndarray], EmbeddingTimings]:
+        timings = EmbeddingTimings()
+        if self.cache is None:
+            return None, timings
+
+        start = time.time()
+        vector = self.cache.get(query)
+        timings.cache_ms = (time.time() - start) * 1000
+        timings.cache_hit = vector is not None
+
+        return vector, timings
+
+    def _many_from_cache(
+        self, queries: List[str]
+    ) -> Tuple[Dict[str, np.ndarray], List[str], EmbeddingTimings]:
+        timings = EmbeddingTimings()
+        vectors: Dict[str, np.ndarray] = {}
+
+        start = time.time()
+        if self.cache is not None:
+            for query in dict.fromkeys(queries):
+                vector = self.cache.get(query)
+                if vector is not None:
+                    vectors[query] = vector
+        timings.cache_ms = (time.time() - start) * 1000
+
+        missing = [q for q in dict.fromkeys(queries) if q not in vectors]
+        timings.cache_hit = bool(queries) and not missing
+
+        return vectors, missing, timings
+
+    def _store_many(
+        self,
+        queries: List[str],
+        missing: List[str],
+        vectors: Dict[str, np.ndarray],
+        timings: EmbeddingTimings,
+    ) -> Tuple[np.ndarray, EmbeddingTimings]:
+        for query in missing:
+            self._store(query, vectors[query], timings)
+
+        if not queries:
+            return np.zeros((0, 0), dtype=np.float32), timings
+
+        return np.stack([vectors[q] for q in queries]), timings
+
+    def _store(self, query: str, vector: np.ndarray, timings: EmbeddingTimings) -> None:
+        if self.cache is None:
+            return
+
+        start = time.time()
+        self.cache.put(query, vector)
+        timings.cache_ms += (time.time() - start) * 1000
+
+
+def _batches(items: List[str], size: int):
+    size = max(1, size)
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
@@ -1,11 +1,25 @@
+import asyncio
+import hashlib
 import os
+import queue
+import threading
 import time
-from typing import List, Tuple
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
 
+from .context_packer import CHUNK_SEPARATOR
+from .hedging import (
+    Attempt,
+    AttemptRace,
+    GenerationReport,
+    HedgePolicy,
+    LatencyTracker,
+)
+from ..core.http_client import HttpClients
+from ..utils.tokens import TokenUsage, count_chat_tokens, count_tokens
+
 load_dotenv()
 
 
@@ -14,22 +28,46 @@ class ResponseGenerator:
     Classe para gerar respostas usando LLM + RAG.
     """
 
-    def __init__(self):
+    def __init__(self, http_clients: Optional[HttpClients] = None):
         """
         Inicializar o gerador de configs da LLM.
+
+        Args:
+            http_clients: Clientes HTTP compartilhados com os embeddings
+                          (padrão: os do SDK)
         """
 
         api_key = os.getenv("OPENAI_API_KEY")
         base_url = os.getenv("OPENAI_API_BASE_URL")
         model_name = os.getenv("MODEL_NAME")
 
-        self.llm = ChatOpenAI(
-            model=model_name,
+        self.model_name = model_name
+        self.temperature = 0.3
+        self.max_tokens = 500
+
+        client_kwargs = {}
+        if http_clients is not None:
+            client_kwargs = {
+                "http_client": http_clients.sync_client,
+                "http_async_client": http_clients.async_client,
+                "max_retries": http_clients.max_retries,
+            }
+
+        self._llm_kwargs = dict(
             openai_api_key=api_key,
             openai_api_base=base_url,
-            temperature=0.3,
-            max_tokens=500,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            # Pede o bloco usage também no streaming (stream_options)
+            stream_usage=True,
+            **client_kwargs,
         )
+        self.llm = ChatOpenAI(model=model_name, **self._llm_kwargs)
+
+        # Hedging e fallback (LLM_HEDGE_*, LLM_FALLBACK_*; ver hedging.py)
+        self.hedge_policy = HedgePolicy.from_env()
+        self.first_token_latency = LatencyTracker()
+        self._fallback_chains: Dict[str, object] = {}
 
         self.prompt = ChatPromptTemplate.from_messages(
             [
@@ -56,12 +94,17 @@ Resposta baseada no contexto acima:""",
             ]
         )
 
-        self.chain = self.prompt | self.llm | StrOutputParser()
+        # Sem StrOutputParser: a mensagem traz o usage_metadata do provedor
+        self.chain = self.prompt | self.llm
 
         print(f" Gerador inicializado com o modelo: {model_name} ")
 
     def generate(
-        self, question: str, retrieved_chunks: List[dict]
+        self,
+        question: str,
+        retrieved_chunks: List[dict],
+        deadline: Optional[float] = None,
+        report: Optional[GenerationReport] = None,
     ) -> Tuple[str, float, int, int]:
         """
         Gerar resposta baseada nos chunks recuperados.
@@ -69,28 +112,388 @@ Resposta baseada no contexto acima:""",
         Args:
             question (str): Pergunta do usuário.
             retrieved_chunks: Lista de chunks do retriever
+            deadline: Prazo para o primeiro token (time.time()), ou None
+            report: Preenchido com a tentativa vencedora (opcional)
 
         Returns:
             Tupla com (resposta, latencia_ms, prompt_tokens, completion_tokens)
+
+        Raises:
+            DeadlineExceeded: Se o prazo passar sem nenhum token
         """
 
-        context_parts = []
-        for i, chunk in enumerate(retrieved_chunks, 1):
-            context_parts.append(f"[Fonte: {chunk['source']}]\n{chunk['content']}")
+        context = self.build_context(retrieved_chunks)
+        inputs = {"context": context, "question": question}
+
+        start_time = time.time()
+
+        if self._racing(deadline):
+            usage = TokenUsage()
+            parts = []
+            for chunk in self._race(inputs, deadline, report):
+                usage.update_from_message(chunk)
+                parts.append(chunk.content)
+            response = "".join(parts)
+        else:
+            message = self.chain.invoke(inputs)
+            response = message.content
+            usage = TokenUsage.from_message(message)
+            self._single_attempt(report)
+
+        generation_latency = (time.time() - start_time) * 1000
+
+        prompt_tokens, completion_tokens = self.count_tokens(
+            question, context, response, usage=usage
+        )
+
+        return response, generation_latency, prompt_tokens, completion_tokens
+
+    async def agenerate(
+        self,
+        question: str,
+        retrieved_chunks: List[dict],
+        deadline: Optional[float] = None,
+        report: Optional[GenerationReport] = None,
+    ) -> Tuple[str, float, int, int]:
+        """
+        Versão assíncrona de generate(), usando chain.ainvoke (ou a corrida
+        de tentativas em streaming, com hedging ou prazo).
+
+        Args:
+            question (str): Pergunta do usuário.
+            retrieved_chunks: Lista de chunks do retriever
+            deadline: Prazo para o primeiro token (time.time()), ou None
+            report: Preenchido com a tentativa vencedora (opcional)
+
+        Returns:
+            Tupla com (resposta, latencia_ms, prompt_tokens, completion_tokens)
+
+        Raises:
+            DeadlineExceeded: Se o prazo passar sem nenhum token
+        """
 
-        context = "\n\n---\n\n".join(context_parts)
+        context = self.build_context(retrieved_chunks)
+        inputs = {"context": context, "question": question}
 
         start_time = time.time()
 
-        response = self.chain.invoke({"context": context, "question": question})
+        if self._racing(deadline):
+            usage = TokenUsage()
+            parts = []
+            async for chunk in self._arace(inputs, deadline, report):
+                usage.update_from_message(chunk)
+                parts.append(chunk.content)
+            response = "".join(parts)
+        else:
+            message = await self.chain.ainvoke(inputs)
+            response = message.content
+            usage = TokenUsage.from_message(message)
+            self._single_attempt(report)
 
         generation_latency = (time.time() - start_time) * 1000
 
-        prompt_tokens = len(context + question) // 4
-        completion_tokens = len(response) // 4
+        prompt_tokens, completion_tokens = self.count_tokens(
+            question, context, response, usage=usage
+        )
 
         return response, generation_latency, prompt_tokens, completion_tokens
 
+    async def astream(
+        self,
+        question: str,
+        retrieved_chunks: List[dict],
+        usage: Optional[TokenUsage] = None,
+        deadline: Optional[float] = None,
+        report: Optional[GenerationReport] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Gera a resposta em streaming, token a token, via chain.astream.
+
+        Args:
+            question (str): Pergunta do usuário.
+            retrieved_chunks: Lista de chunks do retriever
+            usage: Preenchido com o bloco usage do provedor, que chega no
+                   último chunk do stream (opcional)
+            deadline: Prazo para o primeiro token (time.time()), ou None
+            report: Preenchido com a tentativa vencedora (opcional)
+
+        Yields:
+            Trechos de texto da resposta na ordem em que chegam do LLM.
+        """
+
+        context = self.build_context(retrieved_chunks)
+        inputs = {"context": context, "question": question}
+
+        if self._racing(deadline):
+            chunks = self._arace(inputs, deadline, report)
+        else:
+            chunks = self.chain.astream(inputs)
+            self._single_attempt(report)
+
+        async for chunk in chunks:
+            if usage is not None:
+                usage.update_from_message(chunk)
+            if chunk.content:
+                yield chunk.content
+
+    def _racing(self, deadline: Optional[float]) -> bool:
+        """
+        A corrida de tentativas só é usada com hedging ligado ou com prazo;
+        fora isso a geração faz uma chamada direta.
+        """
+
+        return self.hedge_policy.hedging or deadline is not None
+
+    def _single_attempt(self, report: Optional[GenerationReport]) -> None:
+        if report is not None:
+            report.attempts = report.winner = 1
+            report.winner_kind = "primary"
+            report.model = self.model_name
+
+    def _chain_for(self, model: str):
+        """
+        Chain do modelo da tentativa (o principal ou um de fallback).
+        """
+
+        if model == self.model_name:
+            return self.chain
+
+        chain = self._fallback_chains.get(model)
+        if chain is None:
+            chain = self.prompt | ChatOpenAI(model=model, **self._llm_kwargs)
+            self._fallback_chains[model] = chain
+        return chain
+
+    def _new_race(
+        self, deadline: Optional[float], report: Optional[GenerationReport]
+    ) -> AttemptRace:
+        return AttemptRace(
+            self.hedge_policy,
+            self.model_name,
+            self.first_token_latency,
+            deadline=deadline,
+            report=report,
+        )
+
+    @staticmethod
+    def _before_winner(race: AttemptRace, number: int, kind: str, payload):
+        """
+        Aplica um evento recebido antes de haver vencedora.
+
+        Returns:
+            Tupla (tentativas a disparar, primeiro chunk da vencedora,
+            vencedora já terminou)
+        """
+
+        if kind == "error":
+            return race.on_error(number, payload), None, False
+        if kind == "done":
+            return [], None, race.on_done(number)
+        if payload.content and race.on_token(number):
+            return [], payload, False
+        return [], None, False
+
+    def _race(
+        self,
+        inputs: dict,
+        deadline: Optional[float],
+        report: Optional[GenerationReport],
+    ) -> Iterator:
+        """
+        Corrida de tentativas com threads (caminho síncrono).
+
+        Cada tentativa consome o stream do LLM em uma thread e manda os
+        chunks para uma fila; as perdedoras param no próximo chunk.
+        """
+
+        race = self._new_race(deadline, report)
+        events: queue.Queue = queue.Queue()
+        stops: Dict[int, threading.Event] = {}
+
+        def launch(attempts: List[Attempt]) -> None:
+            for attempt in attempts:
+                stops[attempt.number] = threading.Event()
+                threading.Thread(
+                    target=self._pump,
+                    args=(attempt, inputs, events, stops[attempt.number]),
+                    name=f"llm-attempt-{attempt.number}",
+                    daemon=True,
+                ).start()
+
+        try:
+            launch(race.start())
+            first, finished = None, False
+            while race.winner is None:
+                try:
+                    number, kind, payload = events.get(timeout=race.next_timeout())
+                except queue.Empty:
+                    launch(race.on_timeout())
+                    continue
+                launched, first, finished = self._before_winner(
+                    race, number, kind, payload
+                )
+                launch(launched)
+
+            for loser in race.losers():
+                stops[loser.number].set()
+
+            if first is not None:
+                yield first
+            while not finished:
+                number, kind, payload = events.get()
+                if number != race.winner.number:
+                    continue
+                if kind == "error":
+                    raise payload
+                if kind == "done":
+                    break
+                yield payload
+        finally:
+            for stop in stops.values():
+                stop.set()
+
+    def _pump(
+        self,
+        attempt: Attempt,
+        inputs: dict,
+        events: queue.Queue,
+        stop: threading.Event,
+    ) -> None:
+        try:
+            for chunk in self._chain_for(attempt.model).stream(inputs):
+                if stop.is_set():
+                    return
+                events.put((attempt.number, "chunk", chunk))
+            events.put((attempt.number, "done", None))
+        except Exception as e:
+            events.put((attempt.number, "error", e))
+
+    async def _arace(
+        self,
+        inputs: dict,
+        deadline: Optional[float],
+        report: Optional[GenerationReport],
+    ) -> AsyncIterator:
+        """
+        Corrida de tentativas com tarefas asyncio; as perdedoras são
+        canceladas (o que fecha as conexões delas).
+        """
+
+        race = self._new_race(deadline, report)
+        events: asyncio.Queue = asyncio.Queue()
+        tasks: Dict[int, asyncio.Task] = {}
+
+        def launch(attempts: List[Attempt]) -> None:
+            for attempt in attempts:
+                tasks[attempt.number] = asyncio.create_task(
+                    self._apump(attempt, inputs, events)
+                )
+
+        try:
+            launch(race.start())
+            first, finished = None, False
+            while race.winner is None:
+                try:
+                    number, kind, payload = await asyncio.wait_for(
+                        events.get(), race.next_timeout()
+                    )
+                except asyncio.TimeoutError:
+                    launch(race.on_timeout())
+                    continue
+                launched, first, finished = self._before_winner(
+                    race, number, kind, payload
+                )
+                launch(launched)
+
+            for loser in race.losers():
+                tasks[loser.number].cancel()
+
+            if first is not None:
+                yield first
+            while not finished:
+                number, kind, payload = await events.get()
+                if number != race.winner.number:
+                    continue
+                if kind == "error":
+                    raise payload
+                if kind == "done":
+                    break
+                yield payload
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    async def _apump(
+        self, attempt: Attempt, inputs: dict, events: asyncio.Queue
+    ) -> None:
+        try:
+            async for chunk in self._chain_for(attempt.model).astream(inputs):
+                events.put_nowait((attempt.number, "chunk", chunk))
+            events.put_nowait((attempt.number, "done", None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            events.put_nowait((attempt.number, "error", e))
+
+    def config_fingerprint(self) -> str:
+        """
+        Identifica a configuração de prompt e modelo usada na geração.
+
+        Usado na chave do cache de respostas: mudar o prompt, o modelo ou
+        os parâmetros de amostragem invalida as respostas armazenadas.
+        """
+
+        raw = "|".join(
+            [
+                str(self.model_name),
+                str(self.temperature),
+                str(self.max_tokens),
+                repr(self.prompt),
+            ]
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+    def count_tokens(
+        self,
+        question: str,
+        context: str,
+        response: str,
+        usage: Optional[TokenUsage] = None,
+    ) -> Tuple[int, int]:
+        """
+        Tokens de prompt e de completion de uma geração.
+
+        Usa o bloco usage devolvido pelo provedor; se ele não vier, conta
+        com o tiktoken o prompt completo (system + contexto + pergunta, com
+        o overhead do formato de chat) e a resposta.
+
+        Returns:
+            Tupla com (prompt_tokens, completion_tokens)
+        """
+
+        if usage is not None and usage.reported:
+            return usage.prompt_tokens, usage.completion_tokens
+
+        messages = self.prompt.format_messages(context=context, question=question)
+        prompt_tokens = count_chat_tokens(
+            (message.content for message in messages), self.model_name
+        )
+        completion_tokens = count_tokens(response, self.model_name)
+
+        return prompt_tokens, completion_tokens
+
+    @staticmethod
+    def build_context(retrieved_chunks: List[dict]) -> str:
+        """
+        Monta o contexto do prompt a partir dos chunks recuperados.
+        """
+
+        context_parts = []
+        for chunk in retrieved_chunks:
+            context_parts.append(f"[Fonte: {chunk['source']}]\n{chunk['content']}")
+
+        return CHUNK_SEPARATOR.join(context_parts)
+
 
 # Teste
 if __name__ == "__main__":
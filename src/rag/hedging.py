@@ -0,0 +1,339 @@
+"""
+Prazo por requisição, requisições duplicadas (hedging) e modelos de fallback
+na geração.
+
+O p99 da API é dominado por gerações em que o provedor demora a mandar o
+primeiro token. Com LLM_HEDGE_PERCENTILE ligado, a geração passa a usar o
+streaming do LLM e corre as tentativas:
+- "primary": a chamada normal, com o modelo principal
+- "hedge": cópia da mesma chamada, disparada se a primária não mandou
+  nenhum token depois do percentil configurado do tempo até o primeiro
+  token (medido nas gerações anteriores; LLM_HEDGE_MIN_DELAY_MS até haver
+  amostras suficientes)
+- "fallback": chamada com o próximo modelo de LLM_FALLBACK_MODELS (mais
+  barato/rápido), disparada quando faltam LLM_FALLBACK_MARGIN_MS para o
+  prazo da requisição sem nenhum token, ou quando todas as tentativas em
+  andamento falharam
+
+A primeira tentativa que manda um token vence; as outras são canceladas.
+O prazo vale até o primeiro token: uma resposta que já começou a chegar
+não é interrompida. Se o prazo passar sem nenhum token, a geração levanta
+DeadlineExceeded.
+
+AttemptRace só decide o que disparar e quando; ResponseGenerator executa
+as tentativas com asyncio (agenerate/astream) ou com threads (generate).
+"""
+
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class DeadlineExceeded(TimeoutError):
+    """
+    O prazo da requisição passou sem nenhum token do LLM.
+    """
+
+
+class LatencyTracker:
+    """
+    Janela das últimas latências (ms) para calcular percentis.
+    """
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        """
+        Args:
+            window: Número de amostras mantidas
+            min_samples: Amostras necessárias para percentile() responder
+        """
+
+        self.min_samples = min_samples
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency_ms: float) -> None:
+        with self._lock:
+            self._samples.append(latency_ms)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Percentil p (0-100) das amostras, ou None se ainda houver poucas.
+        """
+
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+
+        rank = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+        return ordered[rank]
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+
+@dataclass
+class HedgePolicy:
+    """
+    Configuração do hedging e do fallback.
+
+    Attributes:
+        hedge_percentile: Percentil do tempo até o primeiro token que dispara
+                          a cópia (0 desativa o hedging)
+        min_delay_ms: Espera mínima antes da cópia (e a usada enquanto não
+                      há amostras)
+        max_attempts: Tentativas simultâneas no máximo, somando cópia e
+                      fallbacks
+        fallback_models: Modelos usados quando o prazo se aproxima
+        fallback_margin_ms: Antecedência, em relação ao prazo, do fallback
+    """
+
+    hedge_percentile: float = 0.0
+    min_delay_ms: float = 500.0
+    max_attempts: int = 3
+    fallback_models: List[str] = field(default_factory=list)
+    fallback_margin_ms: float = 2000.0
+
+    @classmethod
+    def from_env(cls) -> "HedgePolicy":
+        """
+        Lê LLM_HEDGE_PERCENTILE, LLM_HEDGE_MIN_DELAY_MS, LLM_MAX_ATTEMPTS,
+        LLM_FALLBACK_MODELS (separados por vírgula) e LLM_FALLBACK_MARGIN_MS.
+        """
+
+        models = os.getenv("LLM_FALLBACK_MODELS") or ""
+        return cls(
+            hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE") or 0),
+            min_delay_ms=float(os.getenv("LLM_HEDGE_MIN_DELAY_MS") or 500),
+            max_attempts=max(1, int(os.getenv("LLM_MAX_ATTEMPTS") or 3)),
+            fallback_models=[m.strip() for m in models.split(",") if m.strip()],
+            fallback_margin_ms=float(os.getenv("LLM_FALLBACK_MARGIN_MS") or 2000),
+        )
+
+    @property
+    def hedging(self) -> bool:
+        return self.hedge_percentile > 0 and self.max_attempts > 1
+
+    def hedge_delay_ms(self, tracker: LatencyTracker) -> float:
+        """
+        Espera antes da cópia: o percentil observado, nunca abaixo de
+        min_delay_ms.
+        """
+
+        observed = tracker.percentile(self.hedge_percentile)
+        return max(self.min_delay_ms, observed or 0.0)
+
+
+@dataclass
+class GenerationReport:
+    """
+    Resultado da corrida de tentativas de uma geração.
+
+    Attributes:
+        attempts: Tentativas disparadas
+        winner: Número da tentativa vencedora (1 = primária)
+        winner_kind: "primary", "hedge" ou "fallback"
+        model: Modelo que gerou a resposta
+        first_token_ms: Tempo até o primeiro token da vencedora, contado do
+                        início da geração
+        discarded_models: Modelos das tentativas canceladas quando a
+                          vencedora chegou; o provedor já recebeu o prompt
+                          delas e cobra a entrada (as que falharam não entram)
+    """
+
+    attempts: int = 0
+    winner: Optional[int] = None
+    winner_kind: Optional[str] = None
+    model: Optional[str] = None
+    first_token_ms: Optional[float] = None
+    discarded_models: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Attempt:
+    """
+    Uma tentativa disparada pela corrida.
+    """
+
+    number: int
+    model: str
+    kind: str
+    started_at: float
+    failed: bool = False
+
+
+class AttemptRace:
+    """
+    Decide quando disparar cópias e fallbacks e qual tentativa vence.
+
+    O executor chama start(), espera eventos das tentativas até
+    next_timeout(), e repassa cada evento (on_token, on_error, on_done) ou o
+    fim da espera (on_timeout). Os métodos devolvem as tentativas a disparar.
+    """
+
+    def __init__(
+        self,
+        policy: HedgePolicy,
+        model: str,
+        tracker: LatencyTracker,
+        deadline: Optional[float] = None,
+        report: Optional[GenerationReport] = None,
+    ):
+        """
+        Args:
+            policy: Configuração do hedging e do fallback
+            model: Modelo principal
+            tracker: Tempos até o primeiro token das gerações anteriores
+            deadline: Prazo da requisição (time.time()), ou None
+            report: Preenchido com o resultado da corrida (opcional)
+        """
+
+        self.policy = policy
+        self.model = model
+        self.tracker = tracker
+        self.deadline = deadline
+        self.report = report if report is not None else GenerationReport()
+
+        self.attempts: Dict[int, Attempt] = {}
+        self.winner: Optional[Attempt] = None
+        self._fallbacks = list(policy.fallback_models)
+        self._started_at = 0.0
+        self._hedge_at: Optional[float] = None
+        self._fallback_at: Optional[float] = None
+        self._errors: List[Exception] = []
+
+    def start(self) -> List[Attempt]:
+        now = time.time()
+        if self.deadline is not None and now >= self.deadline:
+            raise DeadlineExceeded("prazo da requisição esgotado antes da geração")
+
+        self._started_at = now
+        if self.policy.hedging:
+            self._hedge_at = now + self.policy.hedge_delay_ms(self.tracker) / 1000
+        if self.deadline is not None and self._fallbacks:
+            self._fallback_at = self.deadline - self.policy.fallback_margin_ms / 1000
+
+        return [self._launch(self.model, "primary", now)]
+
+    def next_timeout(self) -> Optional[float]:
+        """
+        Segundos até o próximo evento de tempo (cópia, fallback ou prazo),
+        ou None se não houver nenhum.
+        """
+
+        moments = [
+            t for t in (self._hedge_at, self._fallback_at, self.deadline) if t is not None
+        ]
+        if not moments:
+            return None
+        return max(0.0, min(moments) - time.time())
+
+    def on_timeout(self) -> List[Attempt]:
+        now = time.time()
+        if self.deadline is not None and now >= self.deadline:
+            raise DeadlineExceeded(
+                f"nenhum token do LLM em {len(self.attempts)} tentativa(s) "
+                f"antes do prazo"
+            )
+
+        launched = []
+        if self._hedge_at is not None and now >= self._hedge_at:
+            self._hedge_at = None
+            if self._can_launch():
+                launched.append(self._launch(self.model, "hedge", now))
+
+        if self._fallback_at is not None and now >= self._fallback_at:
+            self._fallback_at = None
+            launched.extend(self._launch_fallback(now))
+
+        return launched
+
+    def on_token(self, number: int) -> bool:
+        """
+        Registra um token da tentativa; retorna True se ela venceu agora.
+        """
+
+        if self.winner is not None:
+            return False
+
+        attempt = self.attempts[number]
+        now = time.time()
+        self.winner = attempt
+        self._hedge_at = self._fallback_at = None
+
+        self.tracker.record((now - attempt.started_at) * 1000)
+        self.report.winner = attempt.number
+        self.report.winner_kind = attempt.kind
+        self.report.model = attempt.model
+        self.report.first_token_ms = (now - self._started_at) * 1000
+        self.report.discarded_models = [
+            a.model for a in self.losers() if not a.failed
+        ]
+        return True
+
+    def on_done(self, number: int) -> bool:
+        """
+        Tentativa terminou sem tokens (resposta vazia): vence do mesmo jeito.
+        """
+
+        return self.on_token(number)
+
+    def on_error(self, number: int, error: Exception) -> List[Attempt]:
+        """
+        Registra a falha de uma tentativa. Se não sobrar nenhuma em
+        andamento, dispara o próximo fallback ou levanta o erro.
+        """
+
+        self.attempts[number].failed = True
+        self._errors.append(error)
+
+        if any(not a.failed for a in self.attempts.values()):
+            return []
+
+        launched = self._launch_fallback(time.time(), force=True)
+        if not launched:
+            raise self._errors[0]
+        return launched
+
+    def losers(self) -> List[Attempt]:
+        """
+        Tentativas a cancelar depois que uma venceu.
+        """
+
+        return [a for a in self.attempts.values() if a is not self.winner]
+
+    def _can_launch(self) -> bool:
+        running = sum(1 for a in self.attempts.values() if not a.failed)
+        return running < self.policy.max_attempts
+
+    def _launch_fallback(self, now: float, force: bool = False) -> List[Attempt]:
+        if not self._fallbacks or not (force or self._can_launch()):
+            return []
+        return [self._launch(self._fallbacks.pop(0), "fallback", now)]
+
+    def _launch(self, model: str, kind: str, now: float) -> Attempt:
+        attempt = Attempt(
+            number=len(self.attempts) + 1, model=model, kind=kind, started_at=now
+        )
+        self.attempts[attempt.number] = attempt
+        self.report.attempts = len(self.attempts)
+        return attempt
+
+
+def deadline_from_ms(start: float, deadline_ms: Optional[float]) -> Optional[float]:
+    """
+    Converte um prazo em ms (a partir de start, em time.time()) no instante
+    absoluto usado pela corrida; None ou 0 = sem prazo.
+    """
+
+    if not deadline_ms or deadline_ms <= 0:
+        return None
+    return start + deadline_ms / 1000
@@ -1,16 +1,91 @@
+import asyncio
 import os
 import time
-from typing import Dict, Tuple, Optional
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Tuple, Optional
 from dotenv import load_dotenv
 
-from .retriever import VectorRetriever
+from .retriever import BatchRetrievalTimings, RetrievalTimings, VectorRetriever
 from .generator import ResponseGenerator
-from ..schemas.response import QuestionResponse, Citation, Metrics
+from .reranker import CrossEncoderReranker, RerankTimings
+from .context_packer import ContextPacker, PackingReport
+from .hedging import GenerationReport, deadline_from_ms
+from .cache import create_response_cache
+from .semantic_cache import SemanticCache
+from .embedding_cache import EmbeddingTimings
+from ..schemas.response import (
+    BatchMetrics,
+    BatchQuestionResponse,
+    Citation,
+    Metrics,
+    QuestionResponse,
+    SourceReference,
+)
+from ..core.http_client import HttpClients
 from ..guardrails import validate_question
+from ..utils.pricing import ModelPricing, get_model_pricing
+from ..utils.tokens import TokenUsage
 
 load_dotenv()
 
 
+@dataclass
+class StageTimings:
+    """
+    Tempos dos guardrails e do retrieval, e quanto os dois se sobrepuseram.
+
+    Attributes:
+        guardrails_ms: Tempo da validação da pergunta
+        speculative: True se o retrieval começou antes da validação terminar
+        overlap_ms: Tempo em que guardrails e retrieval rodaram juntos
+    """
+
+    guardrails_ms: float = 0.0
+    speculative: bool = False
+    overlap_ms: float = 0.0
+
+
+@dataclass
+class RetrievalOutcome:
+    """
+    Resultado da etapa de retrieval do pipeline.
+
+    Attributes:
+        chunks: Chunks recuperados do índice
+        query_embedding: Embedding da pergunta (reutilizado pelo cache semântico)
+        embedding_timings: Tempos de cache e de chamada ao provedor de embeddings
+        search_latency_ms: Tempo da busca no índice
+        search_timings: Tempos de cada etapa da busca (FAISS, BM25, fusão)
+        rerank_timings: Tempos do reranking (None se desabilitado)
+        packing: Relatório do empacotamento do contexto (None se desabilitado)
+        cache_lookup_ms: Tempo acumulado de consulta aos caches de resposta
+        cached_response: Resposta pronta, quando o cache semântico respondeu
+        stages: Tempos dos guardrails e sobreposição com o retrieval
+    """
+
+    chunks: List[dict] = field(default_factory=list)
+    query_embedding: Any = None
+    embedding_timings: EmbeddingTimings = field(default_factory=EmbeddingTimings)
+    search_latency_ms: float = 0.0
+    search_timings: RetrievalTimings = field(default_factory=RetrievalTimings)
+    rerank_timings: Optional[RerankTimings] = None
+    packing: Optional[PackingReport] = None
+    cache_lookup_ms: Optional[float] = None
+    cached_response: Optional[QuestionResponse] = None
+    stages: StageTimings = field(default_factory=StageTimings)
+
+    @property
+    def retrieval_latency_ms(self) -> float:
+        """Latência total do retrieval: embedding + cache + busca + rerank."""
+        return (
+            self.embedding_timings.embedding_ms
+            + self.embedding_timings.cache_ms
+            + self.search_latency_ms
+            + (self.rerank_timings.rerank_ms if self.rerank_timings else 0.0)
+        )
+
+
 class RAGPipeline:
     """
     Pipeline completo de RAG: retrieval + gen + metrics.
@@ -25,22 +100,111 @@ class RAGPipeline:
         """
         print(f" Inicializando RAG Pipeline...")
 
-        self.retriever = VectorRetriever(index_path=index_path)
-        self.generator = ResponseGenerator()
+        # Um pool de conexões para embeddings e LLM (keep-alive entre perguntas)
+        self.http_clients = HttpClients.from_env()
+        self.retriever = VectorRetriever(
+            index_path=index_path, http_clients=self.http_clients
+        )
+        self.generator = ResponseGenerator(http_clients=self.http_clients)
 
         self.top_k = int(os.getenv("TOP_K", 3))
+        self.batch_max_concurrency = int(os.getenv("BATCH_MAX_CONCURRENCY", 8))
+        # Prazo padrão por pergunta até o primeiro token do LLM (0 = sem prazo)
+        self.request_deadline_ms = float(os.getenv("REQUEST_DEADLINE_MS") or 0)
+        # Retrieval especulativo: embedding e busca começam junto com os
+        # guardrails e são descartados se a pergunta for bloqueada
+        self.speculative_retrieval = (
+            os.getenv("SPECULATIVE_RETRIEVAL", "false").lower() == "true"
+        )
+        # Threads do caminho síncrono; limitam os retrievals especulativos
+        # simultâneos (os demais esperam na fila do pool)
+        self.speculative_workers = max(
+            1, int(os.getenv("SPECULATIVE_RETRIEVAL_WORKERS") or 4)
+        )
+        self._speculative_executor: Optional[ThreadPoolExecutor] = None
+
+        # Preço por modelo (tabela em src/utils/pricing.py; COST_PER_1M_*
+        # substituem), consultado uma vez por modelo: a resposta pode vir de
+        # um modelo de fallback
+        self.model_name = os.getenv("MODEL_NAME")
+        self._model_pricing: Dict[Optional[str], ModelPricing] = {}
+        self._pricing(self.model_name)
 
-        self.cost_per_1m_prompt = 0.12
-        self.cost_per_1m_completion = 0.12
+        # Reranking opcional (RERANK_ENABLED): busca RERANK_CANDIDATES chunks
+        # e mantém os top_k melhores segundo o cross-encoder
+        self.reranker = CrossEncoderReranker.from_env()
+        # Orçamento de tokens do contexto (CONTEXT_MAX_TOKENS; 0 desativa)
+        self.context_packer = ContextPacker.from_env()
+
+        self.response_cache = create_response_cache(namespace=self._cache_namespace())
+        self.semantic_cache = SemanticCache.from_env(
+            index_version=self.retriever.index_version
+        )
 
         print(" Pipeline pronto...")
 
-    def process_question(self, question: str) -> QuestionResponse:
+    def process_question(
+        self, question: str, deadline_ms: Optional[float] = None
+    ) -> QuestionResponse:
         """
         Processa uma pergunta do inicio ao fim do fluxo.
 
         Args:
             question: Pergunta do usuário.
+            deadline_ms: Prazo da pergunta, contado da chegada até o primeiro
+                         token do LLM (padrão: REQUEST_DEADLINE_MS)
+
+        Returns:
+            QuestionResponse com resposta, citações e métricas.
+
+        Raises:
+            DeadlineExceeded: Se o prazo passar sem resposta do LLM
+        """
+
+        total_start = time.time()
+
+        early, retrieval = self._guarded_retrieval(question, total_start)
+        if early is not None:
+            return early
+        if retrieval.cached_response is not None:
+            return retrieval.cached_response
+
+        generation = GenerationReport()
+        answer, generation_latency, prompt_tokens, completion_tokens = (
+            self.generator.generate(
+                question,
+                retrieval.chunks,
+                deadline=self._deadline(total_start, deadline_ms),
+                report=generation,
+            )
+        )
+
+        response = self._build_response(
+            answer,
+            retrieval,
+            total_start,
+            generation_latency,
+            prompt_tokens,
+            completion_tokens,
+            generation=generation,
+        )
+        self._store_in_cache(question, response, retrieval.query_embedding)
+
+        return response
+
+    async def aprocess_question(
+        self, question: str, deadline_ms: Optional[float] = None
+    ) -> QuestionResponse:
+        """
+        Versão assíncrona de process_question().
+
+        Aguarda o embedding da query e a chamada ao LLM sem bloquear o event
+        loop, permitindo que várias perguntas fiquem em andamento no mesmo
+        worker.
+
+        Args:
+            question: Pergunta do usuário.
+            deadline_ms: Prazo da pergunta (padrão: REQUEST_DEADLINE_MS)
 
         Returns:
             QuestionResponse com resposta, citações e métricas.
@@ -48,37 +212,977 @@ class RAGPipeline:
 
         total_start = time.time()
 
+        early, retrieval = await self._aguarded_retrieval(question, total_start)
+        if early is not None:
+            return early
+        if retrieval.cached_response is not None:
+            return retrieval.cached_response
+
+        generation = GenerationReport()
+        answer, generation_latency, prompt_tokens, completion_tokens = (
+            await self.generator.agenerate(
+                question,
+                retrieval.chunks,
+                deadline=self._deadline(total_start, deadline_ms),
+                report=generation,
+            )
+        )
+
+        response = self._build_response(
+            answer,
+            retrieval,
+            total_start,
+            generation_latency,
+            prompt_tokens,
+            completion_tokens,
+            generation=generation,
+        )
+        self._store_in_cache(question, response, retrieval.query_embedding)
+
+        return response
+
+    async def astream_question(
+        self, question: str, deadline_ms: Optional[float] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Processa uma pergunta emitindo eventos à medida que ficam prontos.
+
+        Ordem dos eventos:
+        - "citations": lista de citações, logo após o retrieval
+        - "token": cada trecho da resposta vindo do LLM
+        - "metrics": métricas completas, incluindo time_to_first_token_ms
+
+        Perguntas bloqueadas emitem "blocked" seguido de "metrics".
+
+        Args:
+            question: Pergunta do usuário.
+            deadline_ms: Prazo até o primeiro token (padrão:
+                         REQUEST_DEADLINE_MS)
+
+        Yields:
+            Dicionários com as chaves "event" e "data".
+        """
+
+        total_start = time.time()
+
+        blocked, retrieval = await self._aguarded_retrieval(question, total_start)
+        if blocked is not None and blocked.is_blocked:
+            yield {
+                "event": "blocked",
+                "data": {
+                    "block_reason": blocked.block_reason,
+                    "block_message": blocked.block_message,
+                },
+            }
+            yield {"event": "metrics", "data": blocked.metrics.model_dump()}
+            return
+
+        if blocked is not None:
+            for event in self._cached_events(blocked):
+                yield event
+            return
+
+        if retrieval.cached_response is not None:
+            for event in self._cached_events(retrieval.cached_response):
+                yield event
+            return
+
+        yield {
+            "event": "citations",
+            "data": [
+                citation.model_dump()
+                for citation in self._build_citations(retrieval.chunks)
+            ],
+        }
+
+        generation_start = time.time()
+        time_to_first_token = None
+        answer_parts = []
+        usage = TokenUsage()
+        generation = GenerationReport()
+
+        async for token in self.generator.astream(
+            question,
+            retrieval.chunks,
+            usage=usage,
+            deadline=self._deadline(total_start, deadline_ms),
+            report=generation,
+        ):
+            if time_to_first_token is None:
+                time_to_first_token = (time.time() - total_start) * 1000
+            answer_parts.append(token)
+            yield {"event": "token", "data": {"text": token}}
+
+        generation_latency = (time.time() - generation_start) * 1000
+        answer = "".join(answer_parts)
+
+        prompt_tokens, completion_tokens = self.generator.count_tokens(
+            question,
+            self.generator.build_context(retrieval.chunks),
+            answer,
+            usage=usage,
+        )
+
+        response = self._build_response(
+            answer,
+            retrieval,
+            total_start,
+            generation_latency,
+            prompt_tokens,
+            completion_tokens,
+            time_to_first_token=time_to_first_token,
+            generation=generation,
+        )
+        self._store_in_cache(question, response, retrieval.query_embedding)
+
+        yield {"event": "metrics", "data": response.metrics.model_dump()}
+
+    def process_many(
+        self, questions: List[str], max_concurrency: Optional[int] = None
+    ) -> BatchQuestionResponse:
+        """
+        Processa um lote de perguntas (avaliações, pré-aquecimento de cache).
+
+        Guardrails e cache de respostas são aplicados a cada pergunta; as
+        restantes têm os embeddings gerados em chamadas em lote e são buscadas
+        em um único index.search. Com reranking, os candidatos de cada
+        pergunta passam pelo cross-encoder antes do contexto, como no /ask.
+        A geração roda em paralelo, com no máximo max_concurrency chamadas ao
+        LLM ao mesmo tempo.
+
+        Args:
+            questions: Perguntas do lote.
+            max_concurrency: Limite de gerações simultâneas
+                             (padrão: BATCH_MAX_CONCURRENCY).
+
+        Returns:
+            BatchQuestionResponse com as respostas na ordem das perguntas e as
+            métricas agregadas.
+        """
+
+        total_start = time.time()
+        limit = max(1, max_concurrency or self.batch_max_concurrency)
+
+        responses, pending = self._prepare_batch(questions, total_start)
+
+        timings = BatchRetrievalTimings(queries=len(pending))
+        outcomes: Dict[int, RetrievalOutcome] = {}
+        if pending:
+            # Modo lexical: sem embeddings (nem cache semântico), só BM25
+            matrix, embedding_timings = None, EmbeddingTimings()
+            if self.retriever.retrieval_mode != "lexical":
+                matrix, embedding_timings = self.retriever.embed_many(
+                    [questions[i] for i in pending]
+                )
+            rows = self._batch_semantic_lookup(
+                pending, matrix, total_start, responses
+            )
+            results, timings = self.retriever.retrieve_many(
+                [questions[i] for i in rows],
+                top_k=self._search_top_k(),
+                embeddings=matrix[list(rows.values())] if matrix is not None else None,
+            )
+            outcomes = self._batch_outcomes(
+                rows, matrix, results, embedding_timings, timings
+            )
+            for i, outcome in outcomes.items():
+                if self.reranker is not None:
+                    outcome.chunks, outcome.rerank_timings = self.reranker.rerank(
+                        questions[i], outcome.chunks, self.top_k
+                    )
+                self._pack_context(questions[i], outcome)
+
+        generation_start = time.time()
+        with ThreadPoolExecutor(max_workers=limit) as executor:
+            futures = [
+                executor.submit(self.generator.generate, questions[i], outcomes[i].chunks)
+                for i in outcomes
+            ]
+            generated = []
+            for future in futures:
+                try:
+                    generated.append(future.result())
+                except Exception as e:
+                    generated.append(e)
+        generation_ms = (time.time() - generation_start) * 1000
+
+        self._finish_batch(questions, outcomes, generated, total_start, responses)
+
+        return self._batch_response(
+            responses, timings, generation_ms, total_start, limit
+        )
+
+    async def aprocess_many(
+        self, questions: List[str], max_concurrency: Optional[int] = None
+    ) -> BatchQuestionResponse:
+        """
+        Versão assíncrona de process_many(), usada pelo POST /ask/batch.
+
+        As gerações são disparadas como tarefas e limitadas por um semáforo.
+        """
+
+        total_start = time.time()
+        limit = max(1, max_concurrency or self.batch_max_concurrency)
+
+        responses, pending = self._prepare_batch(questions, total_start)
+
+        timings = BatchRetrievalTimings(queries=len(pending))
+        outcomes: Dict[int, RetrievalOutcome] = {}
+        if pending:
+            # Modo lexical: sem embeddings (nem cache semântico), só BM25
+            matrix, embedding_timings = None, EmbeddingTimings()
+            if self.retriever.retrieval_mode != "lexical":
+                matrix, embedding_timings = await self.retriever.aembed_many(
+                    [questions[i] for i in pending]
+                )
+            rows = self._batch_semantic_lookup(
+                pending, matrix, total_start, responses
+            )
+            results, timings = await self.retriever.aretrieve_many(
+                [questions[i] for i in rows],
+                top_k=self._search_top_k(),
+                embeddings=matrix[list(rows.values())] if matrix is not None else None,
+            )
+            outcomes = self._batch_outcomes(
+                rows, matrix, results, embedding_timings, timings
+            )
+            if self.reranker is not None:
+                reranked = await asyncio.gather(
+                    *(
+                        self.reranker.arerank(questions[i], outcome.chunks, self.top_k)
+                        for i, outcome in outcomes.items()
+                    )
+                )
+                for outcome, (chunks, rerank_timings) in zip(outcomes.values(), reranked):
+                    outcome.chunks, outcome.rerank_timings = chunks, rerank_timings
+            for i, outcome in outcomes.items():
+                self._pack_context(questions[i], outcome)
+
+        semaphore = asyncio.Semaphore(limit)
+
+        async def generate(i: int):
+            async with semaphore:
+                return await self.generator.agenerate(questions[i], outcomes[i].chunks)
+
+        generation_start = time.time()
+        generated = await asyncio.gather(
+            *(generate(i) for i in outcomes), return_exceptions=True
+        )
+        generation_ms = (time.time() - generation_start) * 1000
+
+        self._finish_batch(questions, outcomes, generated, total_start, responses)
+
+        return self._batch_response(
+            responses, timings, generation_ms, total_start, limit
+        )
+
+    def _prepare_batch(
+        self, questions: List[str], total_start: float
+    ) -> Tuple[List[Optional[QuestionResponse]], List[int]]:
+        """
+        Aplica guardrails e cache de respostas a cada pergunta do lote.
+
+        Returns:
+            Tupla com a lista de respostas (já preenchida para bloqueadas e
+            hits de cache) e os índices das perguntas que seguem no pipeline.
+        """
+
+        responses: List[Optional[QuestionResponse]] = [None] * len(questions)
+        pending = []
+
+        for i, question in enumerate(questions):
+            validation_result = validate_question(question)
+            if not validation_result.is_valid:
+                responses[i] = self._blocked_response(validation_result, total_start)
+                continue
+
+            cached, cache_lookup = self._lookup_cache(question)
+            if cached is not None:
+                responses[i] = self._cache_hit_response(
+                    cached, total_start, cache_lookup
+                )
+                continue
+
+            pending.append(i)
+
+        return responses, pending
+
+    def _batch_semantic_lookup(
+        self,
+        pending: List[int],
+        matrix,
+        total_start: float,
+        responses: List[Optional[QuestionResponse]],
+    ) -> Dict[int, int]:
+        """
+        Consulta o cache semântico para cada linha da matriz de embeddings
+        (nenhuma consulta sem matriz, no modo lexical).
+
+        Returns:
+            Mapa índice da pergunta -> linha da matriz, só para as perguntas
+            que ainda precisam de busca e geração.
+        """
+
+        rows = {}
+        for row, i in enumerate(pending):
+            if self.semantic_cache is not None and matrix is not None:
+                semantic_hit, _ = self._semantic_lookup(matrix[row], total_start, None)
+                if semantic_hit is not None:
+                    responses[i] = semantic_hit
+                    continue
+            rows[i] = row
+
+        return rows
+
+    @staticmethod
+    def _batch_outcomes(
+        rows: Dict[int, int],
+        matrix,
+        results: List[List[dict]],
+        embedding_timings: EmbeddingTimings,
+        timings: BatchRetrievalTimings,
+    ) -> Dict[int, RetrievalOutcome]:
+        """
+        Monta um RetrievalOutcome por pergunta a partir do retrieval em lote.
+
+        Os tempos de embedding e de busca são do lote inteiro; cada pergunta
+        recebe a sua parte (tempo / número de perguntas).
+        """
+
+        timings.embedding_ms = embedding_timings.embedding_ms
+        timings.embedding_cache_ms = embedding_timings.cache_ms
+
+        count = max(1, len(rows))
+        outcomes = {}
+        for (i, row), chunks in zip(rows.items(), results):
+            outcomes[i] = RetrievalOutcome(
+                chunks=chunks,
+                query_embedding=matrix[row] if matrix is not None else None,
+                embedding_timings=EmbeddingTimings(
+                    cache_ms=embedding_timings.cache_ms / count,
+                    embedding_ms=embedding_timings.embedding_ms / count,
+                    cache_hit=embedding_timings.cache_hit,
+                ),
+                search_latency_ms=timings.search_ms / count,
+                search_timings=RetrievalTimings(mode=timings.mode),
+            )
+
+        return outcomes
+
+    def _finish_batch(
+        self,
+        questions: List[str],
+        outcomes: Dict[int, RetrievalOutcome],
+        generated: List[Any],
+        total_start: float,
+        responses: List[Optional[QuestionResponse]],
+    ) -> None:
+        """
+        Monta as respostas geradas do lote e as grava nos caches.
+
+        Uma geração que falhou (exceção no lugar do resultado) vira uma
+        resposta com o erro só para aquela pergunta, e não vai para o cache.
+        """
+
+        for (i, retrieval), result in zip(outcomes.items(), generated):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                print(f" Erro ao gerar a resposta do lote: {str(result)}")
+                responses[i] = self._failed_response(result, total_start)
+                continue
+
+            answer, generation_latency, prompt_tokens, completion_tokens = result
+            response = self._build_response(
+                answer,
+                retrieval,
+                total_start,
+                generation_latency,
+                prompt_tokens,
+                completion_tokens,
+            )
+            self._store_in_cache(questions[i], response, retrieval.query_embedding)
+            responses[i] = response
+
+    @staticmethod
+    def _batch_response(
+        responses: List[QuestionResponse],
+        timings: BatchRetrievalTimings,
+        generation_ms: float,
+        total_start: float,
+        max_concurrency: int,
+    ) -> BatchQuestionResponse:
+        """
+        Agrega as métricas do lote.
+        """
+
+        metrics = BatchMetrics(
+            questions=len(responses),
+            total_latency_ms=round((time.time() - total_start) * 1000, 2),
+            embedding_latency_ms=round(timings.embedding_ms, 2),
+            search_latency_ms=round(timings.search_ms, 2),
+            generation_latency_ms=round(generation_ms, 2),
+            total_tokens=sum(r.metrics.total_tokens for r in responses),
+            estimated_cost_usd=round(
+                sum(r.metrics.estimated_cost_usd for r in responses), 6
+            ),
+            cache_hits=sum(1 for r in responses if r.metrics.cache_hit),
+            blocked=sum(1 for r in responses if r.is_blocked),
+            errors=sum(1 for r in responses if r.error is not None),
+            max_concurrency=max_concurrency,
+        )
+
+        return BatchQuestionResponse(responses=responses, metrics=metrics)
+
+    def _guarded_retrieval(
+        self, question: str, total_start: float
+    ) -> Tuple[Optional[QuestionResponse], Optional[RetrievalOutcome]]:
+        """
+        Guardrails, cache de respostas e retrieval.
+
+        No modo normal as etapas rodam em sequência. Com
+        SPECULATIVE_RETRIEVAL=true, o retrieval começa em outra thread antes
+        da validação (depois só da consulta ao cache exato, que é local); se
+        a pergunta for bloqueada, o resultado é descartado.
+
+        Returns:
+            Tupla (resposta antecipada, retrieval): a resposta bloqueada ou do
+            cache exato, ou None e o resultado do retrieval.
+        """
+
+        speculative, cached, cache_lookup = None, None, None
+        if self.speculative_retrieval:
+            cached, cache_lookup = self._lookup_cache(question)
+            if cached is None:
+                speculative = self._speculation_pool().submit(
+                    self._timed, self._run_retrieval, question, total_start, cache_lookup
+                )
+
+        guard_start = time.time()
         validation_result = validate_question(question)
+        guard_end = time.time()
+
+        if not validation_result.is_valid:
+            if speculative is not None:
+                speculative.cancel()
+            return self._blocked_response(
+                validation_result, total_start, (guard_end - guard_start) * 1000
+            ), None
+
+        if not self.speculative_retrieval:
+            cached, cache_lookup = self._lookup_cache(question)
+        if cached is not None:
+            return self._cache_hit_response(cached, total_start, cache_lookup), None
+
+        if speculative is not None:
+            retrieval, started, finished = speculative.result()
+        else:
+            retrieval, started, finished = self._timed(
+                self._run_retrieval, question, total_start, cache_lookup
+            )
+
+        retrieval.stages = self._stage_timings(guard_start, guard_end, started, finished)
+        return None, retrieval
+
+    async def _aguarded_retrieval(
+        self, question: str, total_start: float
+    ) -> Tuple[Optional[QuestionResponse], Optional[RetrievalOutcome]]:
+        """
+        Versão assíncrona de _guarded_retrieval().
+
+        No modo especulativo o retrieval é uma tarefa asyncio, e a validação
+        roda no executor para as duas etapas avançarem juntas; se a pergunta
+        for bloqueada, a tarefa é cancelada (com a chamada de embeddings).
+        """
+
+        speculative, cached, cache_lookup = None, None, None
+        if self.speculative_retrieval:
+            cached, cache_lookup = self._lookup_cache(question)
+            if cached is None:
+                speculative = asyncio.create_task(
+                    self._atimed(
+                        self._arun_retrieval(question, total_start, cache_lookup)
+                    )
+                )
+
+        guard_start = time.time()
+        if speculative is not None:
+            validation_result = await asyncio.get_running_loop().run_in_executor(
+                None, validate_question, question
+            )
+        else:
+            validation_result = validate_question(question)
+        guard_end = time.time()
+
         if not validation_result.is_valid:
-            metrics = Metrics(
-                total_latency_ms=round((time.time() - total_start) * 1000, 2),
-                retrieval_latency_ms=0.0,
-                generation_latency_ms=0.0,
-                prompt_tokens=0,
-                completion_tokens=0,
-                total_tokens=0,
-                estimated_cost_usd=0.0,
-                top_k=0,
-                context_size=0,
-            )
-            return QuestionResponse(
-                answer="",
-                citations=[],
-                metrics=metrics,
-                is_blocked=True,
-                block_reason=validation_result.block_reason,
-                block_message=validation_result.block_message,
-            )
-
-        retrieved_chunks, retrieval_latency = self.retriever.retrieve(
-            question, top_k=self.top_k
+            if speculative is not None:
+                # Se a tarefa já terminou com erro, o erro é só descartado
+                speculative.add_done_callback(
+                    lambda task: task.cancelled() or task.exception()
+                )
+                speculative.cancel()
+            return self._blocked_response(
+                validation_result, total_start, (guard_end - guard_start) * 1000
+            ), None
+
+        if not self.speculative_retrieval:
+            cached, cache_lookup = self._lookup_cache(question)
+        if cached is not None:
+            return self._cache_hit_response(cached, total_start, cache_lookup), None
+
+        if speculative is not None:
+            retrieval, started, finished = await speculative
+        else:
+            retrieval, started, finished = await self._atimed(
+                self._arun_retrieval(question, total_start, cache_lookup)
+            )
+
+        retrieval.stages = self._stage_timings(guard_start, guard_end, started, finished)
+        return None, retrieval
+
+    @staticmethod
+    def _timed(function, *args):
+        started = time.time()
+        result = function(*args)
+        return result, started, time.time()
+
+    @staticmethod
+    async def _atimed(coroutine):
+        started = time.time()
+        result = await coroutine
+        return result, started, time.time()
+
+    @staticmethod
+    def _stage_timings(
+        guard_start: float, guard_end: float, started: float, finished: float
+    ) -> StageTimings:
+        overlap = min(guard_end, finished) - max(guard_start, started)
+        return StageTimings(
+            guardrails_ms=(guard_end - guard_start) * 1000,
+            speculative=started < guard_end,
+            overlap_ms=max(0.0, overlap) * 1000,
         )
 
-        answer, generation_latency, prompt_tokens, completion_tokens = (
-            self.generator.generate(question, retrieved_chunks)
+    def _speculation_pool(self) -> ThreadPoolExecutor:
+        if self._speculative_executor is None:
+            self._speculative_executor = ThreadPoolExecutor(
+                max_workers=self.speculative_workers,
+                thread_name_prefix="speculative-retrieval",
+            )
+        return self._speculative_executor
+
+    def _run_retrieval(
+        self, question: str, total_start: float, cache_lookup: Optional[float]
+    ) -> RetrievalOutcome:
+        """
+        Etapa de retrieval: embedding da query (com cache), consulta ao cache
+        semântico e busca no índice.
+
+        No modo lexical (RETRIEVAL_MODE=lexical) a pergunta não é embeddada.
+        Se o embedding passar de EMBEDDING_TIMEOUT_MS ou falhar e houver
+        índice lexical, a busca cai para o BM25 (modo degradado) em vez de
+        esperar a API. Com reranking habilitado, a busca traz
+        RERANK_CANDIDATES chunks e o cross-encoder escolhe os top_k.
+
+        Args:
+            question: Pergunta do usuário.
+            total_start: Início do processamento (time.time()).
+            cache_lookup: Tempo já gasto no cache de respostas (ms).
+
+        Returns:
+            RetrievalOutcome com os chunks e tempos de cada sub-etapa, ou com
+            cached_response preenchido se o cache semântico respondeu.
+        """
+
+        query_embedding, embedding_timings = None, EmbeddingTimings()
+        if self.retriever.retrieval_mode != "lexical":
+            query_embedding, embedding_timings = self.retriever.embed_query_timed(
+                question, allow_degraded=True
+            )
+        search_timings = RetrievalTimings(degraded=query_embedding is None)
+
+        if self.semantic_cache is not None and query_embedding is not None:
+            semantic_hit, cache_lookup = self._semantic_lookup(
+                query_embedding, total_start, cache_lookup
+            )
+            if semantic_hit is not None:
+                return RetrievalOutcome(cached_response=semantic_hit)
+
+        chunks, search_latency = self.retriever.retrieve(
+            question,
+            top_k=self._search_top_k(),
+            embedding=query_embedding,
+            timings=search_timings,
+            mode="lexical" if query_embedding is None else None,
         )
 
-        total_latency = (time.time() - total_start) * 1000
+        rerank_timings = None
+        if self.reranker is not None:
+            chunks, rerank_timings = self.reranker.rerank(question, chunks, self.top_k)
+
+        return self._pack_context(
+            question,
+            RetrievalOutcome(
+                chunks=chunks,
+                query_embedding=query_embedding,
+                embedding_timings=embedding_timings,
+                search_latency_ms=search_latency,
+                search_timings=search_timings,
+                rerank_timings=rerank_timings,
+                cache_lookup_ms=cache_lookup,
+            ),
+        )
+
+    async def _arun_retrieval(
+        self, question: str, total_start: float, cache_lookup: Optional[float]
+    ) -> RetrievalOutcome:
+        """
+        Versão assíncrona de _run_retrieval().
+        """
+
+        query_embedding, embedding_timings = None, EmbeddingTimings()
+        if self.retriever.retrieval_mode != "lexical":
+            query_embedding, embedding_timings = (
+                await self.retriever.aembed_query_timed(question, allow_degraded=True)
+            )
+        search_timings = RetrievalTimings(degraded=query_embedding is None)
+
+        if self.semantic_cache is not None and query_embedding is not None:
+            semantic_hit, cache_lookup = self._semantic_lookup(
+                query_embedding, total_start, cache_lookup
+            )
+            if semantic_hit is not None:
+                return RetrievalOutcome(cached_response=semantic_hit)
+
+        chunks, search_latency = await self.retriever.aretrieve(
+            question,
+            top_k=self._search_top_k(),
+            embedding=query_embedding,
+            timings=search_timings,
+            mode="lexical" if query_embedding is None else None,
+        )
+
+        rerank_timings = None
+        if self.reranker is not None:
+            chunks, rerank_timings = await self.reranker.arerank(
+                question, chunks, self.top_k
+            )
+
+        return self._pack_context(
+            question,
+            RetrievalOutcome(
+                chunks=chunks,
+                query_embedding=query_embedding,
+                embedding_timings=embedding_timings,
+                search_latency_ms=search_latency,
+                search_timings=search_timings,
+                rerank_timings=rerank_timings,
+                cache_lookup_ms=cache_lookup,
+            ),
+        )
+
+    def _pack_context(self, question: str, outcome: RetrievalOutcome) -> RetrievalOutcome:
+        """
+        Encaixa os chunks recuperados no orçamento de tokens do contexto.
+
+        As citações passam a refletir os chunks (e trechos) enviados ao LLM.
+        """
+
+        if self.context_packer is not None:
+            outcome.chunks, outcome.packing = self.context_packer.pack(
+                question, outcome.chunks
+            )
+        return outcome
+
+    def _search_top_k(self) -> int:
+        """
+        Chunks buscados no índice: top_k, ou os candidatos do reranking.
+        """
+
+        if self.reranker is None:
+            return self.top_k
+        return max(self.top_k, self.reranker.candidates)
+
+    def _blocked_response(
+        self,
+        validation_result,
+        total_start: float,
+        guardrails_ms: Optional[float] = None,
+    ) -> QuestionResponse:
+        """
+        Monta a resposta de uma pergunta bloqueada pelos guardrails.
+        """
+
+        metrics = Metrics(
+            total_latency_ms=round((time.time() - total_start) * 1000, 2),
+            retrieval_latency_ms=0.0,
+            generation_latency_ms=0.0,
+            prompt_tokens=0,
+            completion_tokens=0,
+            total_tokens=0,
+            estimated_cost_usd=0.0,
+            top_k=0,
+            context_size=0,
+            guardrails_ms=(
+                round(guardrails_ms, 3) if guardrails_ms is not None else None
+            ),
+        )
+        return QuestionResponse(
+            answer="",
+            citations=[],
+            metrics=metrics,
+            is_blocked=True,
+            block_reason=validation_result.block_reason,
+            block_message=validation_result.block_message,
+        )
+
+    def _failed_response(self, error: Exception, total_start: float) -> QuestionResponse:
+        """
+        Monta a resposta de uma pergunta do lote cuja geração falhou.
+        """
+
+        metrics = Metrics(
+            total_latency_ms=round((time.time() - total_start) * 1000, 2),
+            retrieval_latency_ms=0.0,
+            generation_latency_ms=0.0,
+            prompt_tokens=0,
+            completion_tokens=0,
+            total_tokens=0,
+            estimated_cost_usd=0.0,
+            top_k=0,
+            context_size=0,
+        )
+        return QuestionResponse(
+            answer="",
+            citations=[],
+            metrics=metrics,
+            error=f"Erro interno ao processar a pergunta: {str(error)}",
+        )
+
+    def _lookup_cache(
+        self, question: str
+    ) -> Tuple[Optional[QuestionResponse], Optional[float]]:
+        """
+        Consulta o cache de respostas.
+
+        Returns:
+            Tupla com (resposta em cache ou None, tempo da consulta em ms).
+            O tempo é None quando o cache está desativado.
+        """
+
+        if self.response_cache is None:
+            return None, None
+
+        start = time.time()
+        cached = self.response_cache.get(question)
+        lookup_ms = round((time.time() - start) * 1000, 3)
+
+        return cached, lookup_ms
+
+    def _semantic_lookup(
+        self,
+        query_embedding: List[float],
+        total_start: float,
+        cache_lookup: Optional[float],
+    ) -> Tuple[Optional[QuestionResponse], float]:
+        """
+        Consulta o cache semântico com o embedding da pergunta.
+
+        Returns:
+            Tupla com (resposta adaptada ou None, tempo acumulado de consulta
+            aos caches em ms)
+        """
+
+        start = time.time()
+        hit = self.semantic_cache.lookup(
+            query_embedding, index_version=self.retriever.index_version
+        )
+        lookup_ms = round((cache_lookup or 0.0) + (time.time() - start) * 1000, 3)
+
+        if hit is None:
+            return None, lookup_ms
+
+        cached, _ = hit
+        response = self._cache_hit_response(
+            cached, total_start, lookup_ms, cache_type="semantic"
+        )
+        return response, lookup_ms
+
+    @staticmethod
+    def _cached_events(response: QuestionResponse) -> List[Dict]:
+        """
+        Eventos de streaming para uma resposta vinda do cache.
+        """
+
+        response.metrics.time_to_first_token_ms = response.metrics.total_latency_ms
+
+        return [
+            {
+                "event": "citations",
+                "data": [citation.model_dump() for citation in response.citations],
+            },
+            {"event": "token", "data": {"text": response.answer}},
+            {"event": "metrics", "data": response.metrics.model_dump()},
+        ]
+
+    def _cache_hit_response(
+        self,
+        cached: QuestionResponse,
+        total_start: float,
+        lookup_ms: float,
+        cache_type: str = "exact",
+    ) -> QuestionResponse:
+        """
+        Adapta uma resposta do cache: nenhuma chamada externa foi feita, então
+        latências de retrieval/geração, tokens e custo são zerados.
+        """
+
+        metrics = cached.metrics.model_copy(
+            update={
+                "total_latency_ms": round((time.time() - total_start) * 1000, 2),
+                "retrieval_latency_ms": 0.0,
+                "generation_latency_ms": 0.0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "total_tokens": 0,
+                "estimated_cost_usd": 0.0,
+                "time_to_first_token_ms": None,
+                "cache_hit": True,
+                "cache_type": cache_type,
+                "cache_lookup_ms": lookup_ms,
+            }
+        )
+
+        return cached.model_copy(update={"metrics": metrics})
+
+    def _store_in_cache(
+        self,
+        question: str,
+        response: QuestionResponse,
+        query_embedding: Optional[List[float]] = None,
+    ) -> None:
+        """
+        Armazena uma resposta gerada nos caches habilitados.
+
+        Respostas do modo degradado (só BM25) e respostas de um modelo de
+        fallback não são guardadas, para não servir uma resposta de menor
+        qualidade depois que a API voltar.
+        """
+
+        if response.metrics.retrieval_degraded:
+            return
+        if response.metrics.generation_winner == "fallback":
+            return
+
+        if self.response_cache is not None:
+            self.response_cache.set(question, response)
+
+        if self.semantic_cache is not None and query_embedding is not None:
+            self.semantic_cache.add(
+                query_embedding,
+                response,
+                index_version=self.retriever.index_version,
+            )
+
+    def cache_stats(self) -> Dict:
+        """
+        Retorna o estado dos caches do pipeline.
+        """
+
+        return {
+            "response_cache": (
+                {"entries": len(self.response_cache.backend)}
+                if self.response_cache is not None
+                else None
+            ),
+            "semantic_cache": (
+                self.semantic_cache.stats() if self.semantic_cache is not None else None
+            ),
+        }
+
+    def reload_index(self) -> None:
+        """
+        Recarrega o vector_index do disco após uma reindexação.
+
+        O namespace do cache de respostas passa a usar a nova versão do índice
+        e o cache semântico é esvaziado.
+        """
+
+        self.retriever.load_index()
+
+        if self.response_cache is not None:
+            self.response_cache.namespace = self._cache_namespace()
+
+        if self.semantic_cache is not None:
+            self.semantic_cache.invalidate()
+            self.semantic_cache.index_version = self.retriever.index_version
+
+    def _deadline(
+        self, total_start: float, deadline_ms: Optional[float]
+    ) -> Optional[float]:
+        """
+        Instante limite da pergunta (deadline_ms ou REQUEST_DEADLINE_MS).
+        """
+
+        if deadline_ms is None:
+            deadline_ms = self.request_deadline_ms
+        return deadline_from_ms(total_start, deadline_ms)
+
+    def close(self) -> None:
+        """
+        Libera recursos do pipeline no shutdown da aplicação.
+        """
+
+        self.retriever.close()
+
+        if self.reranker is not None:
+            self.reranker.close()
+
+        if self._speculative_executor is not None:
+            self._speculative_executor.shutdown(wait=False)
+
+        self.http_clients.close()
+
+    async def aclose(self) -> None:
+        """
+        Versão assíncrona de close(); também fecha o cliente HTTP assíncrono.
+        """
+
+        self.close()
+        await self.http_clients.aclose()
+
+    def _cache_namespace(self) -> str:
+        """
+        Namespace das chaves do cache: versão do índice + config de geração.
+        """
+
+        return (
+            f"{self.retriever.index_version}:"
+            f"{self.generator.config_fingerprint()}:{self.top_k}"
+            + (f":{self.reranker.model_name}" if self.reranker is not None else "")
+            + (
+                f":ctx{self.context_packer.max_tokens}"
+                if self.context_packer is not None
+                else ""
+            )
+        )
+
+    def _pricing(self, model: Optional[str]) -> ModelPricing:
+        """
+        Preço do modelo, consultado na tabela só na primeira vez.
+        """
+
+        pricing = self._model_pricing.get(model)
+        if pricing is None:
+            pricing = get_model_pricing(model)
+            self._model_pricing[model] = pricing
+        return pricing
+
+    @staticmethod
+    def _build_citations(retrieved_chunks: List[dict]) -> List[Citation]:
+        """
+        Converte os chunks recuperados em citações.
+        """
 
         citations = []
         for chunk in retrieved_chunks:
@@ -86,19 +1190,56 @@ class RAGPipeline:
                 source=chunk["source"],
                 excerpt=chunk["content"][:200] + "...",
                 chunk_id=chunk["chunk_id"],
+                page_start=chunk.get("page_start"),
+                page_end=chunk.get("page_end"),
+                also_in=[SourceReference(**d) for d in chunk.get("duplicates", [])],
             )
             citations.append(citation)
 
-        # Custo = (tokens / 1.000.000) * custo por 1M
-        prompt_cost = (prompt_tokens / 1_000_000) * self.cost_per_1m_prompt
-        completion_cost = (completion_tokens / 1_000_000) * self.cost_per_1m_completion
-        estimated_cost = prompt_cost + completion_cost
+        return citations
+
+    def _build_response(
+        self,
+        answer: str,
+        retrieval: RetrievalOutcome,
+        total_start: float,
+        generation_latency: float,
+        prompt_tokens: int,
+        completion_tokens: int,
+        time_to_first_token: Optional[float] = None,
+        generation: Optional[GenerationReport] = None,
+    ) -> QuestionResponse:
+        """
+        Monta a resposta final com citações e métricas.
+        """
+
+        if generation is not None and not generation.attempts:
+            generation = None
+
+        total_latency = (time.time() - total_start) * 1000
+        retrieved_chunks = retrieval.chunks
+        packing = retrieval.packing
+
+        citations = self._build_citations(retrieved_chunks)
+
+        # Custo = (tokens / 1.000.000) * custo por 1M, com o preço do modelo
+        # que respondeu. As tentativas canceladas já tinham enviado o mesmo
+        # prompt: a entrada delas também é cobrada
+        pricing = self._pricing(generation.model if generation else self.model_name)
+        prompt_cost = (prompt_tokens / 1_000_000) * pricing.prompt_per_1m
+        completion_cost = (completion_tokens / 1_000_000) * pricing.completion_per_1m
+        discarded_models = generation.discarded_models if generation else []
+        discarded_cost = sum(
+            (prompt_tokens / 1_000_000) * self._pricing(model).prompt_per_1m
+            for model in discarded_models
+        )
+        estimated_cost = prompt_cost + completion_cost + discarded_cost
 
         context_size = sum(len(chunk["content"]) for chunk in retrieved_chunks)
 
         metrics = Metrics(
             total_latency_ms=round(total_latency, 2),
-            retrieval_latency_ms=round(retrieval_latency, 2),
+            retrieval_latency_ms=round(retrieval.retrieval_latency_ms, 2),
             generation_latency_ms=round(generation_latency, 2),
             prompt_tokens=prompt_tokens,
             completion_tokens=completion_tokens,
@@ -106,6 +1247,52 @@ class RAGPipeline:
             estimated_cost_usd=round(estimated_cost, 6),
             top_k=self.top_k,
             context_size=context_size,
+            time_to_first_token_ms=(
+                round(time_to_first_token, 2)
+                if time_to_first_token is not None
+                else None
+            ),
+            cache_hit=False,
+            cache_lookup_ms=retrieval.cache_lookup_ms,
+            embedding_latency_ms=round(retrieval.embedding_timings.embedding_ms, 2),
+            embedding_cache_ms=round(retrieval.embedding_timings.cache_ms, 3),
+            embedding_cache_hit=retrieval.embedding_timings.cache_hit,
+            search_latency_ms=round(retrieval.search_latency_ms, 2),
+            retrieval_mode=retrieval.search_timings.mode,
+            vector_search_ms=round(retrieval.search_timings.vector_ms, 3),
+            lexical_search_ms=round(retrieval.search_timings.lexical_ms, 3),
+            fusion_ms=round(retrieval.search_timings.fusion_ms, 3),
+            retrieval_degraded=retrieval.search_timings.degraded,
+            rerank_latency_ms=(
+                round(retrieval.rerank_timings.rerank_ms, 2)
+                if retrieval.rerank_timings is not None
+                else None
+            ),
+            reranked=(
+                retrieval.rerank_timings.applied
+                if retrieval.rerank_timings is not None
+                else None
+            ),
+            context_tokens=(
+                packing.packed_tokens if packing is not None else None
+            ),
+            context_tokens_saved=(
+                packing.saved_tokens if packing is not None else None
+            ),
+            context_chunks_dropped=(
+                packing.dropped_redundant + packing.dropped_budget
+                if packing is not None
+                else None
+            ),
+            generation_attempts=generation.attempts if generation else None,
+            generation_winner=generation.winner_kind if generation else None,
+            generation_model=generation.model if generation else None,
+            discarded_prompt_tokens=(
+                prompt_tokens * len(discarded_models) if generation else None
+            ),
+            guardrails_ms=round(retrieval.stages.guardrails_ms, 3),
+            speculative_retrieval=retrieval.stages.speculative,
+            stage_overlap_ms=round(retrieval.stages.overlap_ms, 3),
         )
 
         response = QuestionResponse(
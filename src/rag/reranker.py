@@ -0,0 +1,242 @@
+"""
+Reordenação dos chunks recuperados com um cross-encoder local (CPU).
+
+O retriever traz mais candidatos do que vão para o prompt (RERANK_CANDIDATES,
+ex.: 20); o cross-encoder pontua cada par (pergunta, chunk) em lotes e só os
+top_k melhores seguem para o LLM. Com o contexto mais bem ordenado dá para
+usar um TOP_K menor, o que encurta o prompt e o tempo de geração.
+
+A etapa tem um orçamento de tempo por requisição (RERANK_BUDGET_MS): a
+inferência roda em uma thread e, se o orçamento estourar, a resposta segue
+com a ordem da busca vetorial; os lotes que ainda não começaram são
+cancelados.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+
+@dataclass
+class RerankTimings:
+    """
+    Resultado da etapa de reranking.
+
+    Attributes:
+        candidates: Chunks recebidos do retriever
+        rerank_ms: Tempo da etapa (limitado pelo orçamento)
+        applied: True se a ordem do cross-encoder foi usada; False se o
+                 orçamento estourou ou a inferência falhou
+    """
+
+    candidates: int = 0
+    rerank_ms: float = 0.0
+    applied: bool = False
+
+
+class CrossEncoderReranker:
+    """
+    Reranker com sentence-transformers CrossEncoder e orçamento de tempo.
+    """
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_RERANK_MODEL,
+        candidates: int = 20,
+        budget_ms: float = 150.0,
+        batch_size: int = 16,
+        quantize: bool = True,
+        max_length: int = 512,
+        model=None,
+    ):
+        """
+        Args:
+            model_name: Modelo CrossEncoder (Hugging Face)
+            candidates: Chunks buscados no retriever antes do reranking
+            budget_ms: Tempo máximo da etapa por requisição (0 = sem limite)
+            batch_size: Pares (pergunta, chunk) por lote de inferência
+            quantize: Se True, quantiza as camadas lineares em int8
+            max_length: Tokens máximos de cada par
+            model: Modelo já carregado com predict() (opcional; evita
+                   carregar model_name)
+        """
+
+        self.model_name = model_name
+        self.candidates = max(1, candidates)
+        self.budget_ms = budget_ms
+        self.batch_size = max(1, batch_size)
+
+        if model is None:
+            from sentence_transformers import CrossEncoder
+
+            model = CrossEncoder(model_name, device="cpu", max_length=max_length)
+            if quantize:
+                import torch
+
+                torch.quantization.quantize_dynamic(
+                    model.model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+                )
+        self.model = model
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="reranker"
+        )
+
+    @classmethod
+    def from_env(cls) -> Optional["CrossEncoderReranker"]:
+        """
+        Cria o reranker a partir das variáveis de ambiente, ou retorna None
+        se RERANK_ENABLED não for "true".
+
+        Variáveis:
+            RERANK_MODEL: Modelo CrossEncoder
+            RERANK_CANDIDATES: Chunks buscados antes do reranking
+            RERANK_BUDGET_MS: Orçamento de tempo por requisição
+            RERANK_BATCH_SIZE: Pares por lote de inferência
+            RERANK_QUANTIZE: Quantização int8
+        """
+
+        if os.getenv("RERANK_ENABLED", "false").lower() != "true":
+            return None
+
+        return cls(
+            model_name=os.getenv("RERANK_MODEL") or DEFAULT_RERANK_MODEL,
+            candidates=int(os.getenv("RERANK_CANDIDATES") or 20),
+            budget_ms=float(os.getenv("RERANK_BUDGET_MS") or 150),
+            batch_size=int(os.getenv("RERANK_BATCH_SIZE") or 16),
+            quantize=os.getenv("RERANK_QUANTIZE", "true").lower() == "true",
+        )
+
+    def rerank(
+        self, query: str, chunks: List[dict], top_k: int
+    ) -> Tuple[List[dict], RerankTimings]:
+        """
+        Reordena os chunks pela relevância do cross-encoder.
+
+        Args:
+            query: Pergunta do usuário
+            chunks: Candidatos na ordem da busca
+            top_k: Número de chunks mantidos
+
+        Returns:
+            Tupla (top_k chunks, tempos). Se o orçamento estourar ou a
+            inferência falhar, os chunks seguem na ordem da busca.
+        """
+
+        start = time.perf_counter()
+        timings = RerankTimings(candidates=len(chunks))
+        if len(chunks) <= 1:
+            return chunks[:top_k], timings
+
+        cancelled = threading.Event()
+        future = self._executor.submit(self._score, query, chunks, cancelled)
+        try:
+            scores = future.result(timeout=self._timeout())
+        except Exception as e:
+            cancelled.set()
+            return self._fallback(chunks, top_k, timings, start, e)
+
+        return self._reorder(chunks, scores, top_k, timings, start)
+
+    async def arerank(
+        self, query: str, chunks: List[dict], top_k: int
+    ) -> Tuple[List[dict], RerankTimings]:
+        """
+        Versão assíncrona de rerank(); o event loop não fica bloqueado
+        durante a inferência.
+        """
+
+        start = time.perf_counter()
+        timings = RerankTimings(candidates=len(chunks))
+        if len(chunks) <= 1:
+            return chunks[:top_k], timings
+
+        cancelled = threading.Event()
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(
+            self._executor, self._score, query, chunks, cancelled
+        )
+        try:
+            scores = await asyncio.wait_for(future, self._timeout())
+        except Exception as e:
+            cancelled.set()
+            return self._fallback(chunks, top_k, timings, start, e)
+
+        return self._reorder(chunks, scores, top_k, timings, start)
+
+    def _timeout(self) -> Optional[float]:
+        return self.budget_ms / 1000 if self.budget_ms > 0 else None
+
+    def _score(
+        self, query: str, chunks: Sequence[dict], cancelled: threading.Event
+    ) -> np.ndarray:
+        """
+        Pontua os pares em lotes; para entre lotes se a espera foi abandonada.
+        """
+
+        pairs = [(query, chunk["content"]) for chunk in chunks]
+        scores = []
+        for i in range(0, len(pairs), self.batch_size):
+            if cancelled.is_set():
+                raise TimeoutError("reranking cancelado")
+            batch = self.model.predict(
+                pairs[i : i + self.batch_size],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            scores.extend(np.asarray(batch, dtype=np.float32).reshape(-1))
+        return np.asarray(scores, dtype=np.float32)
+
+    @staticmethod
+    def _reorder(
+        chunks: List[dict],
+        scores: np.ndarray,
+        top_k: int,
+        timings: RerankTimings,
+        start: float,
+    ) -> Tuple[List[dict], RerankTimings]:
+        # Estável: empates mantêm a ordem da busca
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        reranked = []
+        for i in order:
+            chunk = dict(chunks[i])
+            chunk["rerank_score"] = float(scores[i])
+            reranked.append(chunk)
+
+        timings.applied = True
+        timings.rerank_ms = (time.perf_counter() - start) * 1000
+        return reranked, timings
+
+    @staticmethod
+    def _fallback(
+        chunks: List[dict],
+        top_k: int,
+        timings: RerankTimings,
+        start: float,
+        error: Exception,
+    ) -> Tuple[List[dict], RerankTimings]:
+        timings.rerank_ms = (time.perf_counter() - start) * 1000
+        if not isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+            print(
+                f"    Reranking falhou ({type(error).__name__}: {error}); "
+                f"usando a ordem da busca."
+            )
+        return chunks[:top_k], timings
+
+    def close(self) -> None:
+        """
+        Encerra o pool de threads da inferência.
+        """
+
+        self._executor.shutdown(wait=False)
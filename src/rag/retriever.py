@@ -1,69 +1,621 @@
+import asyncio
+import hashlib
 import os
 import time
-from typing import List, Tuple
-from langchain_openai import OpenAIEmbeddings
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+import numpy as np
+import faiss
 from langchain_community.vectorstores import FAISS
 from dotenv import load_dotenv
 
+from .embedding_cache import EmbeddingTimings, QueryEmbedder
+from .search_engine import DocumentTable, FaissSearchEngine, reciprocal_rank_fusion
+from ..core.chunk_store import ChunkStore, load_chunk_store
+from ..core.embeddings import get_embedding_provider
+from ..core.http_client import HttpClients
+from ..core.faiss_index import apply_search_params, search_params_from_env
+from ..core.index_generation import index_dir
+from ..core.index_metadata import check_embedding_compatibility, read_index_metadata
+from ..core.lexical_index import LexicalIndex, load_lexical_index
+
 load_dotenv()
 
+RETRIEVAL_MODES = ("vector", "hybrid", "lexical")
+
+
+@dataclass
+class RetrievalTimings:
+    """
+    Tempos de cada etapa de uma busca.
+
+    Attributes:
+        mode: Modo usado na busca ("vector", "hybrid" ou "lexical")
+        vector_ms: Tempo da busca no FAISS
+        lexical_ms: Tempo da busca no índice BM25
+        fusion_ms: Tempo da fusão das listas (RRF) e montagem dos chunks
+        degraded: True se a busca caiu para o modo lexical porque o
+                  embedding da query demorou ou falhou
+    """
+
+    mode: str = "vector"
+    vector_ms: float = 0.0
+    lexical_ms: float = 0.0
+    fusion_ms: float = 0.0
+    degraded: bool = False
+
+
+@dataclass
+class BatchRetrievalTimings:
+    """
+    Tempos agregados de um retrieve_many().
+
+    Attributes:
+        queries: Número de queries do lote
+        embedding_ms: Tempo das chamadas em lote ao provedor de embeddings
+        embedding_cache_ms: Tempo de consulta/escrita no cache de embeddings
+        search_ms: Tempo da busca única sobre a matriz de queries (no modo
+                   híbrido, inclui o BM25 e a fusão de cada query)
+        total_ms: Tempo total do lote
+        mode: Modo de busca usado no lote
+    """
+
+    queries: int = 0
+    embedding_ms: float = 0.0
+    embedding_cache_ms: float = 0.0
+    search_ms: float = 0.0
+    total_ms: float = 0.0
+    mode: str = "vector"
+
 
 class VectorRetriever:
     """
     Classe responsável por buscar chunks relevantes no indice do vetor
     """
 
-    def __init__(self, index_path: str = "vector_index"):
+    def __init__(
+        self,
+        index_path: str = "vector_index",
+        http_clients: Optional[HttpClients] = None,
+    ):
         """
         Inicializa o retriever carrefando o indice FAISS
 
         Args:
             index_path: Caminho onde o indice FAISS foi salvo
+            http_clients: Clientes HTTP compartilhados com o gerador
+                          (padrão: os do SDK)
         """
 
-        api_key = os.getenv("OPENAI_API_KEY")
-        base_url = os.getenv("OPENAI_API_BASE_URL")
-        embedding_model = os.getenv("EMBEDDING_MODEL", "openai/text-embedding-3-small")
+        self.embedding_provider = get_embedding_provider(http_clients=http_clients)
+        self.embeddings = self.embedding_provider.embeddings
+        self.query_embedder = QueryEmbedder.from_env(
+            self.embeddings, self.embedding_provider.cache_key
+        )
+
+        self.index_path = index_path
+
+        # Busca: "vector" (só FAISS), "hybrid" (FAISS + BM25 com RRF) ou
+        # "lexical" (só BM25, sem chamar a API de embeddings)
+        self.retrieval_mode = os.getenv("RETRIEVAL_MODE", "vector").lower()
+        if self.retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(
+                f"RETRIEVAL_MODE inválido: {self.retrieval_mode} "
+                f"(opções: {', '.join(RETRIEVAL_MODES)})"
+            )
+        self.hybrid_candidates = int(os.getenv("HYBRID_CANDIDATES") or 20)
+        self.rrf_k = int(os.getenv("RRF_K") or 60)
+        # Acima deste tempo (ms) o embedding da query é abandonado e a busca
+        # segue só com o BM25 (0 = sem limite)
+        self.embedding_timeout_ms = float(os.getenv("EMBEDDING_TIMEOUT_MS") or 0)
+        self._embedding_executor: Optional[ThreadPoolExecutor] = None
+
+        self.load_index()
+
+    def load_index(self) -> None:
+        """
+        Carrega (ou recarrega) o índice FAISS do disco.
 
-        self.embeddings = OpenAIEmbeddings(
-            model=embedding_model, openai_api_key=api_key, openai_api_base=base_url
+        Os arquivos são lidos da geração atual do índice (current.json,
+        resolvido uma vez), então vetores, chunks e BM25 vêm sempre da mesma
+        indexação. Se ela tiver um chunk store (chunks.bin + colunas .npy), o
+        índice FAISS é lido direto e os textos ficam mapeados em memória, sem
+        desserializar o docstore em pickle. Índices antigos continuam sendo
+        carregados pelo LangChain (FAISS.load_local), e os chunks do docstore
+        são copiados uma vez para uma DocumentTable.
+
+        Nos dois casos as buscas passam pelo FaissSearchEngine, que chama
+        faiss.Index.search diretamente. O índice lexical (BM25) gravado na
+        indexação também é aberto, se existir.
+
+        Após uma reindexação, chamar este método troca o índice em uso e
+        atualiza index_version, o que invalida os caches que dependem dele.
+
+        Raises:
+            ValueError: Se o índice foi construído com outro provedor, modelo
+                        ou dimensão de embeddings
+        """
+
+        path = index_dir(self.index_path)
+        self.index_metadata = read_index_metadata(path)
+
+        chunk_store = load_chunk_store(path)
+        if chunk_store is not None:
+            vector_store = None
+            index = faiss.read_index(os.path.join(path, "index.faiss"))
+            chunks = chunk_store
+        else:
+            vector_store = FAISS.load_local(
+                path, self.embeddings, allow_dangerous_deserialization=True
+            )
+            index = vector_store.index
+            chunks = DocumentTable.from_vector_store(vector_store)
+
+        check_embedding_compatibility(
+            self.index_metadata,
+            provider=self.embedding_provider.name,
+            model=self.embedding_provider.model,
+            dimension=self.embedding_provider.dimension,
+            index_dimension=getattr(index, "d", None),
         )
 
-        self.vector_store = FAISS.load_local(
-            index_path, self.embeddings, allow_dangerous_deserialization=True
+        # nprobe / efSearch persistidos, com override por FAISS_NPROBE e
+        # FAISS_EF_SEARCH (sem efeito em índices Flat)
+        self.index_params = (self.index_metadata or {}).get("index")
+        apply_search_params(index, self.index_params, **search_params_from_env())
+
+        # O chunk store anterior não é fechado aqui: buscas em andamento nos
+        # executores ainda podem estar lendo dele. O mmap é liberado quando a
+        # última referência (o search engine antigo) for coletada
+        self.vector_store = vector_store
+        self.chunk_store: Optional[ChunkStore] = chunk_store
+        self.search_engine = FaissSearchEngine(index, chunks)
+        self.lexical_index = self._load_lexical_index(path, chunks)
+
+        self.index_version = compute_index_version(self.index_path)
+
+        print(f"    Indice carregado de: {self.index_path}")
+
+    def _load_lexical_index(self, path: str, chunks) -> Optional[LexicalIndex]:
+        """
+        Abre o índice BM25 da geração em uso.
+
+        Índices gravados antes da busca híbrida não têm índice lexical; nos
+        modos hybrid e lexical ele é montado em memória a partir dos chunks.
+        """
+
+        lexical_index = load_lexical_index(path)
+        if lexical_index is not None and len(lexical_index) != len(chunks):
+            print("    Índice lexical desatualizado; ignorando.")
+            lexical_index = None
+
+        if lexical_index is None and self.retrieval_mode != "vector":
+            print("    Montando índice lexical em memória...")
+            lexical_index = LexicalIndex.build(
+                chunks.get(row)["content"] for row in range(len(chunks))
+            )
+
+        return lexical_index
+
+    def set_search_params(
+        self, nprobe: Optional[int] = None, ef_search: Optional[int] = None
+    ) -> None:
+        """
+        Ajusta a busca aproximada em tempo de execução.
+
+        Args:
+            nprobe: Listas visitadas por busca em índices IVF
+            ef_search: Tamanho da fila de candidatos em índices HNSW
+        """
+
+        apply_search_params(
+            self.search_engine.index,
+            self.index_params,
+            nprobe=nprobe,
+            ef_search=ef_search,
         )
 
-        print(f"    Indice carregado de: {index_path}")
+    def embed_query(self, query: str) -> np.ndarray:
+        """
+        Gera o embedding de uma query (passando pelo cache de embeddings).
+
+        Útil quando o vetor é usado em mais de um lugar (cache semântico e
+        busca), evitando embeddar a mesma pergunta duas vezes.
+        """
+
+        return self.query_embedder.embed(query)[0]
+
+    async def aembed_query(self, query: str) -> np.ndarray:
+        """
+        Versão assíncrona de embed_query().
+        """
+
+        return (await self.query_embedder.aembed(query))[0]
 
-    def retrieve(self, query: str, top_k: int = 3) -> Tuple[List[dict], float]:
+    def embed_query_timed(
+        self, query: str, allow_degraded: bool = False
+    ) -> Tuple[Optional[np.ndarray], EmbeddingTimings]:
+        """
+        Igual a embed_query(), retornando também os tempos de cache e de
+        chamada ao provedor.
+
+        Args:
+            query: Pergunta do usuário
+            allow_degraded: Com índice lexical disponível, retorna None em vez
+                            do vetor se o embedding passar de
+                            EMBEDDING_TIMEOUT_MS ou falhar; a busca deve então
+                            seguir no modo lexical. A chamada abandonada
+                            continua em segundo plano e preenche o cache de
+                            embeddings.
+        """
+
+        if not self._can_degrade(allow_degraded):
+            return self.query_embedder.embed(query)
+
+        if self._embedding_executor is None:
+            self._embedding_executor = ThreadPoolExecutor(
+                thread_name_prefix="query-embedding"
+            )
+
+        start = time.time()
+        future = self._embedding_executor.submit(self.query_embedder.embed, query)
+        try:
+            return future.result(timeout=self.embedding_timeout_ms / 1000 or None)
+        except Exception as e:
+            return self._degraded_embedding(e, start)
+
+    async def aembed_query_timed(
+        self, query: str, allow_degraded: bool = False
+    ) -> Tuple[Optional[np.ndarray], EmbeddingTimings]:
+        """
+        Versão assíncrona de embed_query_timed().
+        """
+
+        if not self._can_degrade(allow_degraded):
+            return await self.query_embedder.aembed(query)
+
+        start = time.time()
+        task = asyncio.ensure_future(self.query_embedder.aembed(query))
+        # Evita o aviso de exceção não lida se a tarefa abandonada falhar
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(task), self.embedding_timeout_ms / 1000 or None
+            )
+        except Exception as e:
+            return self._degraded_embedding(e, start)
+
+    def _can_degrade(self, allow_degraded: bool) -> bool:
+        return allow_degraded and self.lexical_index is not None
+
+    @staticmethod
+    def _degraded_embedding(
+        error: Exception, start: float
+    ) -> Tuple[None, EmbeddingTimings]:
+        elapsed = (time.time() - start) * 1000
+        reason = (
+            "timeout"
+            if isinstance(error, (TimeoutError, asyncio.TimeoutError))
+            else f"{type(error).__name__}: {error}"
+        )
+        print(f"    Embedding da query indisponível ({reason}); usando busca lexical.")
+        return None, EmbeddingTimings(embedding_ms=elapsed)
+
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = 3,
+        embedding: Optional[List[float]] = None,
+        timings: Optional[RetrievalTimings] = None,
+        mode: Optional[str] = None,
+    ) -> Tuple[List[dict], float]:
         """
         Busca os chunks mais similares a query no indice.
 
         Args:
             query: Pergunta do usuário
             top_k: Número de chunks a serem retornados (padrão: 3)
+            embedding: Embedding da query já calculado (opcional). Quando
+                       informado, a busca não passa pela camada de embeddings
+                       e a latência retornada é só a da busca (FAISS direto).
+            timings: RetrievalTimings a preencher com os tempos de cada etapa
+                     (opcional)
+            mode: "vector", "hybrid" ou "lexical" (padrão: RETRIEVAL_MODE)
 
         Returns:
             Uma tupla contendo uma lista de dicionários com os chunks encontrados e o tempo de busca em segundos.
         """
 
         start_time = time.time()
+        mode = self._resolve_mode(mode)
+
+        if embedding is None and mode != "lexical":
+            embedding = self.embed_query(query)
 
-        results = self.vector_store.similarity_search_with_score(query, k=top_k)
+        chunks = self._search(query, top_k, embedding, mode, timings)
 
         retrieval_latency = (time.time() - start_time) * 1000
 
-        retrieved_chunks = []
-        for doc, score in results:
-            chunk_info = {
-                "content": doc.page_content,
-                "source": doc.metadata.get("source", "unknown"),
-                "chunk_id": doc.metadata.get("chunk_id", 0),
-                "similarity_score": float(score),
-            }
-            retrieved_chunks.append(chunk_info)
+        return chunks, retrieval_latency
+
+    async def aretrieve(
+        self,
+        query: str,
+        top_k: int = 3,
+        embedding: Optional[List[float]] = None,
+        timings: Optional[RetrievalTimings] = None,
+        mode: Optional[str] = None,
+    ) -> Tuple[List[dict], float]:
+        """
+        Versão assíncrona de retrieve().
+
+        O embedding da query é aguardado (aembed_query, com micro-batching se
+        habilitado) em vez de bloquear o event loop, e a busca no FAISS roda
+        no executor padrão do loop.
+
+        Args:
+            query: Pergunta do usuário
+            top_k: Número de chunks a serem retornados (padrão: 3)
+            embedding: Embedding da query já calculado (opcional)
+            timings: RetrievalTimings a preencher (opcional)
+            mode: "vector", "hybrid" ou "lexical" (padrão: RETRIEVAL_MODE)
+
+        Returns:
+            Tupla com a lista de chunks encontrados e a latência em ms.
+        """
+
+        start_time = time.time()
+        mode = self._resolve_mode(mode)
+
+        if embedding is None and mode != "lexical":
+            embedding = await self.aembed_query(query)
+
+        loop = asyncio.get_running_loop()
+        chunks = await loop.run_in_executor(
+            None, self._search, query, top_k, embedding, mode, timings
+        )
+
+        retrieval_latency = (time.time() - start_time) * 1000
+
+        return chunks, retrieval_latency
+
+    def _resolve_mode(self, mode: Optional[str]) -> str:
+        mode = mode or self.retrieval_mode
+        if mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Modo de busca inválido: {mode}")
+        if mode != "vector" and self.lexical_index is None:
+            raise ValueError("Índice lexical indisponível para a busca " + mode)
+        return mode
+
+    def _search(
+        self,
+        query: str,
+        top_k: int,
+        embedding,
+        mode: str,
+        timings: Optional[RetrievalTimings] = None,
+    ) -> List[dict]:
+        """
+        Busca no FAISS, no BM25 ou nos dois, fundindo as listas com RRF.
+
+        No modo híbrido cada lista traz max(top_k, HYBRID_CANDIDATES)
+        candidatos. Os chunks fundidos têm rrf_score, e também
+        similarity_score (distância do FAISS) e bm25_score quando vieram da
+        lista correspondente.
+        """
+
+        timings = timings if timings is not None else RetrievalTimings()
+        timings.mode = mode
+
+        if mode == "vector":
+            start = time.perf_counter()
+            chunks = self.search_engine.retrieve(embedding, top_k)
+            timings.vector_ms = (time.perf_counter() - start) * 1000
+            return chunks
+
+        candidates = top_k if mode == "lexical" else max(top_k, self.hybrid_candidates)
+
+        start = time.perf_counter()
+        lexical_scores, lexical_rows = self.lexical_index.search(query, candidates)
+        timings.lexical_ms = (time.perf_counter() - start) * 1000
+
+        if mode == "lexical":
+            start = time.perf_counter()
+            chunks = self._lexical_chunks(lexical_rows, lexical_scores)
+            timings.fusion_ms = (time.perf_counter() - start) * 1000
+            return chunks
+
+        start = time.perf_counter()
+        vector_scores, vector_rows = self.search_engine.search(embedding, candidates)
+        timings.vector_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        fused = reciprocal_rank_fusion(
+            [vector_rows[0], lexical_rows], top_k, k=self.rrf_k
+        )
+        distances = {
+            int(row): float(score)
+            for row, score in zip(vector_rows[0], vector_scores[0])
+            if row >= 0
+        }
+        bm25 = {int(row): float(score) for row, score in zip(lexical_rows, lexical_scores)}
+
+        chunks = []
+        for row, score in fused:
+            chunk = self.search_engine.chunks.get(row)
+            chunk["rrf_score"] = score
+            if row in distances:
+                chunk["similarity_score"] = distances[row]
+            if row in bm25:
+                chunk["bm25_score"] = bm25[row]
+            chunks.append(chunk)
+        timings.fusion_ms = (time.perf_counter() - start) * 1000
+
+        return chunks
+
+    def _lexical_chunks(self, rows, scores) -> List[dict]:
+        chunks = []
+        for row, score in zip(rows, scores):
+            chunk = self.search_engine.chunks.get(int(row))
+            chunk["bm25_score"] = float(score)
+            chunks.append(chunk)
+        return chunks
+
+    def embed_many(self, queries: List[str]) -> Tuple[np.ndarray, EmbeddingTimings]:
+        """
+        Embeddings de várias queries em chamadas em lote (com cache).
+
+        Returns:
+            Tupla (matriz float32 n x d, tempos agregados)
+        """
+
+        return self.query_embedder.embed_many(queries)
+
+    async def aembed_many(
+        self, queries: List[str]
+    ) -> Tuple[np.ndarray, EmbeddingTimings]:
+        """
+        Versão assíncrona de embed_many().
+        """
+
+        return await self.query_embedder.aembed_many(queries)
+
+    def retrieve_many(
+        self,
+        queries: List[str],
+        top_k: int = 3,
+        embeddings: Optional[np.ndarray] = None,
+    ) -> Tuple[List[List[dict]], BatchRetrievalTimings]:
+        """
+        Busca os chunks de várias queries de uma vez.
+
+        Os embeddings são gerados em chamadas em lote ao provedor e a busca é
+        um único index.search sobre a matriz de queries. No modo lexical
+        (RETRIEVAL_MODE) não há embeddings: cada query passa só pelo BM25.
+
+        Args:
+            queries: Lista de perguntas
+            top_k: Número de chunks por query (padrão: 3)
+            embeddings: Matriz n x d de embeddings já calculados (opcional;
+                        ignorada no modo lexical)
+
+        Returns:
+            Tupla com os chunks de cada query (na ordem de entrada) e os
+            tempos agregados do lote.
+        """
+
+        start_time = time.time()
+        timings = BatchRetrievalTimings(queries=len(queries))
+
+        if embeddings is None and self.retrieval_mode != "lexical":
+            matrix, embedding_timings = self.embed_many(queries)
+            embeddings = self._record_embedding(matrix, embedding_timings, timings)
+
+        results = self._search_many(queries, embeddings, top_k, timings)
+        timings.total_ms = (time.time() - start_time) * 1000
+
+        return results, timings
+
+    async def aretrieve_many(
+        self,
+        queries: List[str],
+        top_k: int = 3,
+        embeddings: Optional[np.ndarray] = None,
+    ) -> Tuple[List[List[dict]], BatchRetrievalTimings]:
+        """
+        Versão assíncrona de retrieve_many(); a busca roda no executor padrão.
+        """
+
+        start_time = time.time()
+        timings = BatchRetrievalTimings(queries=len(queries))
+
+        if embeddings is None and self.retrieval_mode != "lexical":
+            matrix, embedding_timings = await self.aembed_many(queries)
+            embeddings = self._record_embedding(matrix, embedding_timings, timings)
+
+        loop = asyncio.get_running_loop()
+        results = await loop.run_in_executor(
+            None, self._search_many, queries, embeddings, top_k, timings
+        )
+        timings.total_ms = (time.time() - start_time) * 1000
+
+        return results, timings
+
+    @staticmethod
+    def _record_embedding(
+        matrix: np.ndarray,
+        embedding_timings: EmbeddingTimings,
+        timings: BatchRetrievalTimings,
+    ) -> np.ndarray:
+        timings.embedding_ms = embedding_timings.embedding_ms
+        timings.embedding_cache_ms = embedding_timings.cache_ms
+        return matrix
+
+    def _search_many(
+        self,
+        queries: List[str],
+        embeddings: Optional[np.ndarray],
+        top_k: int,
+        timings: BatchRetrievalTimings,
+    ) -> List[List[dict]]:
+        if not queries:
+            return []
+
+        timings.mode = self._resolve_mode(None)
+
+        start = time.time()
+        if timings.mode == "vector":
+            results = self.search_engine.retrieve_batch(embeddings, top_k)
+        elif timings.mode == "lexical":
+            results = [self._search(query, top_k, None, "lexical") for query in queries]
+        else:
+            results = [
+                self._search(query, top_k, embedding, "hybrid")
+                for query, embedding in zip(queries, embeddings)
+            ]
+        timings.search_ms = (time.time() - start) * 1000
+
+        return results
+
+    def close(self) -> None:
+        """
+        Grava em disco o cache de embeddings persistido (se houver) e libera
+        o mapeamento do chunk store.
+        """
+
+        if self.query_embedder.cache is not None:
+            self.query_embedder.cache.flush()
+
+        if self.chunk_store is not None:
+            self.chunk_store.close()
+
+        if self._embedding_executor is not None:
+            self._embedding_executor.shutdown(wait=False)
+
+
+def compute_index_version(index_path: str) -> str:
+    """
+    Calcula um identificador da versão do índice salvo em disco.
+
+    Usa nome, tamanho e data de modificação dos arquivos do diretório, o que
+    é suficiente para detectar uma reindexação sem ler os arquivos inteiros.
+
+    Args:
+        index_path: Diretório do índice FAISS
+
+    Returns:
+        Hash hexadecimal curto que muda sempre que o índice é reescrito
+    """
+
+    digest = hashlib.sha256()
+
+    if os.path.isdir(index_path):
+        for name in sorted(os.listdir(index_path)):
+            stat = os.stat(os.path.join(index_path, name))
+            digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns};".encode())
 
-        return retrieved_chunks, retrieval_latency
+    return digest.hexdigest()[:16]
 
 
 # Teste
@@ -86,6 +638,9 @@ if __name__ == "__main__":
         print(f"--- Chunk {i} ---")
         print(f"Fonte: {chunk['source']}")
         print(f"Chunk ID: {chunk['chunk_id']}")
-        print(f"Score: {chunk['similarity_score']:.4f}")
+        if "similarity_score" in chunk:
+            print(f"Score: {chunk['similarity_score']:.4f}")
+        if "bm25_score" in chunk:
+            print(f"BM25: {chunk['bm25_score']:.4f}")
         print(f"Conteúdo: {chunk['content'][:200]}...")
         print()
@@ -0,0 +1,298 @@
+"""
+Motor de busca direto no FAISS, sem os wrappers do LangChain.
+
+O caminho FAISS.similarity_search_with_score_by_vector converte o vetor em
+lista, consulta o docstore por UUID e cria um Document para cada resultado.
+Aqui a busca chama faiss.Index.search sobre uma matriz float32 contígua e
+os ids retornados viram chunks por meio de um array pré-calculado
+(id do FAISS -> linha da tabela de chunks).
+
+Tabelas de chunks suportadas:
+- ChunkStore (src/core/chunk_store.py): colunas mapeadas em memória
+- DocumentTable: colunas montadas uma vez a partir do docstore do LangChain,
+  para índices antigos sem chunk store
+
+Benchmark contra o caminho do LangChain:
+    python -m src.rag.search_engine vector_index
+"""
+
+import sys
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..core.chunk_store import SPAN_FIELDS
+from ..core.faiss_index import index_labels
+from ..core.index_generation import index_dir
+
+_EXTRA_KEYS = SPAN_FIELDS + ("duplicates",)
+
+
+class DocumentTable:
+    """
+    Chunks de um índice LangChain em listas, indexados pela linha do FAISS.
+    """
+
+    def __init__(
+        self,
+        contents: List[str],
+        sources: List[str],
+        chunk_ids: List[int],
+        extras: Optional[List[Dict]] = None,
+    ):
+        self.contents = contents
+        self.sources = sources
+        self.chunk_ids = chunk_ids
+        # Páginas, intervalos e duplicatas absorvidas, quando gravados
+        self.extras = extras
+
+    @classmethod
+    def from_vector_store(cls, vector_store) -> "DocumentTable":
+        """
+        Monta a tabela a partir de um FAISS do LangChain.
+
+        Os Documents são lidos do docstore uma única vez, na carga do índice,
+        na ordem das linhas do FAISS (index_to_docstore_id é indexado pelo
+        id retornado na busca, que em índices com IDMap não é a linha).
+        """
+
+        contents, sources, chunk_ids, extras = [], [], [], []
+        for label in index_labels(vector_store.index):
+            doc_id = vector_store.index_to_docstore_id[int(label)]
+            doc = vector_store.docstore.search(doc_id)
+            contents.append(doc.page_content)
+            sources.append(doc.metadata.get("source", "unknown"))
+            chunk_ids.append(doc.metadata.get("chunk_id", 0))
+            extras.append({k: doc.metadata[k] for k in _EXTRA_KEYS if k in doc.metadata})
+
+        return cls(contents, sources, chunk_ids, extras if any(extras) else None)
+
+    def __len__(self) -> int:
+        return len(self.contents)
+
+    def get(self, row: int) -> Dict:
+        """
+        Retorna um chunk no formato usado pelo pipeline.
+        """
+
+        chunk = {
+            "content": self.contents[row],
+            "source": self.sources[row],
+            "chunk_id": self.chunk_ids[row],
+        }
+        if self.extras is not None:
+            chunk.update(self.extras[row])
+        return chunk
+
+
+class FaissSearchEngine:
+    """
+    Busca vetorial chamando faiss.Index.search diretamente.
+    """
+
+    def __init__(self, index, chunks, id_to_row: Optional[np.ndarray] = None):
+        """
+        Args:
+            index: Índice FAISS
+            chunks: Tabela de chunks com get(row) (ChunkStore ou DocumentTable)
+            id_to_row: Array que leva o id retornado pelo FAISS à linha da
+                       tabela de chunks (-1 = sem chunk). Se omitido, é
+                       calculado a partir do índice.
+        """
+
+        self.index = index
+        self.chunks = chunks
+        self.id_to_row = (
+            id_to_row if id_to_row is not None else build_id_to_row(index)
+        )
+
+    @property
+    def dimension(self) -> int:
+        return self.index.d
+
+    def search(self, queries, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Busca os top_k vizinhos de uma ou mais queries.
+
+        Args:
+            queries: Vetor (d,) ou matriz (n, d) de embeddings já calculados
+            top_k: Número de vizinhos por query
+
+        Returns:
+            Tupla (scores, rows) com formato (n, top_k); rows já são linhas
+            da tabela de chunks, com -1 onde não há resultado
+        """
+
+        matrix = as_query_matrix(queries)
+        scores, ids = self.index.search(matrix, top_k)
+
+        rows = np.full(ids.shape, -1, dtype=np.int64)
+        valid = (ids >= 0) & (ids < len(self.id_to_row))
+        rows[valid] = self.id_to_row[ids[valid]]
+
+        return scores, rows
+
+    def retrieve(self, embedding, top_k: int) -> List[Dict]:
+        """
+        Retorna os chunks mais próximos de um embedding de query.
+
+        Os scores são as distâncias do índice, como no caminho do LangChain.
+        """
+
+        scores, rows = self.search(embedding, top_k)
+        return self.to_chunks(rows[0], scores[0])
+
+    def retrieve_batch(self, embeddings, top_k: int) -> List[List[Dict]]:
+        """
+        Versão de retrieve() para uma matriz de queries, em uma única busca.
+        """
+
+        scores, rows = self.search(embeddings, top_k)
+        return [self.to_chunks(r, s) for r, s in zip(rows, scores)]
+
+    def to_chunks(self, rows: Sequence[int], scores: Sequence[float]) -> List[Dict]:
+        """
+        Converte linhas e scores em dicionários de chunk (ignorando -1).
+        """
+
+        chunks = []
+        for row, score in zip(rows, scores):
+            if row < 0:
+                continue
+            chunk = self.chunks.get(int(row))
+            chunk["similarity_score"] = float(score)
+            chunks.append(chunk)
+
+        return chunks
+
+
+def as_query_matrix(queries) -> np.ndarray:
+    """
+    Converte embeddings de query em uma matriz float32 contígua (n, d).
+
+    Não copia se a entrada já estiver no formato esperado.
+    """
+
+    matrix = np.asarray(queries, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    return np.ascontiguousarray(matrix)
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[int]], top_k: int, k: int = 60
+) -> List[Tuple[int, float]]:
+    """
+    Funde listas ordenadas de linhas com Reciprocal Rank Fusion.
+
+    Cada linha recebe a soma de 1 / (k + posição) nas listas em que aparece
+    (posição a partir de 1); os scores originais (distância do FAISS, BM25)
+    não precisam estar na mesma escala.
+
+    Args:
+        rankings: Listas de linhas, da mais relevante para a menos
+        top_k: Número de linhas retornadas
+        k: Constante do RRF (60 no artigo original)
+
+    Returns:
+        Lista de (linha, score RRF) em ordem decrescente de score
+    """
+
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for position, row in enumerate(ranking, 1):
+            if row < 0:
+                continue
+            scores[int(row)] = scores.get(int(row), 0.0) + 1.0 / (k + position)
+
+    fused = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return fused[:top_k]
+
+
+def build_id_to_row(index) -> np.ndarray:
+    """
+    Calcula o array id do FAISS -> linha da tabela de chunks.
+
+    Em índices comuns o id já é a linha (identidade). Em índices com IDMap,
+    os ids externos são lidos de id_map e a linha é a posição de inserção.
+    """
+
+    ids = index_labels(index)
+    if not hasattr(index, "id_map"):
+        return ids
+
+    id_to_row = np.full(int(ids.max()) + 1 if len(ids) else 0, -1, dtype=np.int64)
+    id_to_row[ids] = np.arange(len(ids), dtype=np.int64)
+    return id_to_row
+
+
+def benchmark_against_langchain(
+    index_path: str = "vector_index",
+    num_queries: int = 200,
+    top_k: int = 3,
+    seed: int = 0,
+) -> Dict[str, float]:
+    """
+    Compara o FaissSearchEngine com o caminho do LangChain.
+
+    As queries são vetores do próprio índice com ruído, então nenhuma
+    chamada à API de embeddings é feita.
+
+    Returns:
+        Latência média (ms) de cada caminho e se os resultados são idênticos
+    """
+
+    from langchain_community.vectorstores import FAISS
+
+    vector_store = FAISS.load_local(
+        index_dir(index_path), None, allow_dangerous_deserialization=True
+    )
+    engine = FaissSearchEngine(
+        vector_store.index, DocumentTable.from_vector_store(vector_store)
+    )
+
+    rng = np.random.default_rng(seed)
+    base_rows = rng.integers(0, vector_store.index.ntotal, size=num_queries)
+    queries = np.stack(
+        [vector_store.index.reconstruct(int(row)) for row in base_rows]
+    )
+    queries += rng.normal(0, 0.01, size=queries.shape).astype(np.float32)
+
+    start = time.perf_counter()
+    langchain_results = [
+        vector_store.similarity_search_with_score_by_vector(q.tolist(), k=top_k)
+        for q in queries
+    ]
+    langchain_ms = (time.perf_counter() - start) * 1000 / num_queries
+
+    start = time.perf_counter()
+    engine_results = [engine.retrieve(q, top_k) for q in queries]
+    engine_ms = (time.perf_counter() - start) * 1000 / num_queries
+
+    identical = all(
+        [(d.page_content, d.metadata.get("source"), d.metadata.get("chunk_id")) for d, _ in lc]
+        == [(c["content"], c["source"], c["chunk_id"]) for c in ours]
+        and np.allclose([s for _, s in lc], [c["similarity_score"] for c in ours])
+        for lc, ours in zip(langchain_results, engine_results)
+    )
+
+    return {
+        "queries": num_queries,
+        "top_k": top_k,
+        "langchain_ms": langchain_ms,
+        "engine_ms": engine_ms,
+        "speedup": langchain_ms / engine_ms if engine_ms else float("inf"),
+        "identical": identical,
+    }
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "vector_index"
+    report = benchmark_against_langchain(path)
+
+    print(f" Benchmark de busca ({report['queries']} queries, top_k={report['top_k']})")
+    print(f"    LangChain:         {report['langchain_ms']:.3f} ms/query")
+    print(f"    FaissSearchEngine: {report['engine_ms']:.3f} ms/query")
+    print(f"    Speedup:           {report['speedup']:.1f}x")
+    print(f"    Resultados iguais: {report['identical']}")
@@ -0,0 +1,187 @@
+"""
+Cache semântico de respostas.
+
+Guarda os embeddings de perguntas já respondidas em um pequeno índice FAISS
+(produto interno sobre vetores normalizados = similaridade de cosseno).
+Quando uma nova pergunta é parecida o bastante com uma anterior, a resposta
+armazenada é reutilizada e a geração é pulada.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from ..schemas.response import QuestionResponse
+
+
+class SemanticCache:
+    """
+    Cache de QuestionResponse indexado pelo embedding da pergunta.
+
+    Attributes:
+        threshold: Similaridade de cosseno mínima para considerar um acerto
+        max_entries: Número máximo de perguntas armazenadas (LRU)
+        hits: Quantidade de consultas que encontraram resposta
+        misses: Quantidade de consultas sem resposta
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 500,
+        index_version: str = "",
+    ):
+        """
+        Args:
+            threshold: Similaridade de cosseno mínima (0 a 1)
+            max_entries: Limite de entradas antes de descartar a menos usada
+            index_version: Versão do índice de documentos; se mudar, o cache
+                           é esvaziado na próxima consulta
+        """
+
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.index_version = index_version
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self._index: Optional[faiss.IndexIDMap2] = None
+        self._responses: "OrderedDict[int, QuestionResponse]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, index_version: str = "") -> Optional["SemanticCache"]:
+        """
+        Cria o cache a partir de SEMANTIC_CACHE_ENABLED,
+        SEMANTIC_CACHE_THRESHOLD e SEMANTIC_CACHE_MAX_ENTRIES.
+
+        Returns:
+            SemanticCache configurado, ou None se estiver desativado
+        """
+
+        enabled = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower()
+        if enabled not in ("1", "true", "yes", "on"):
+            return None
+
+        return cls(
+            threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95)),
+            max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 500)),
+            index_version=index_version,
+        )
+
+    def lookup(
+        self, embedding: List[float], index_version: Optional[str] = None
+    ) -> Optional[Tuple[QuestionResponse, float]]:
+        """
+        Procura uma pergunta semelhante já respondida.
+
+        Args:
+            embedding: Embedding da nova pergunta
+            index_version: Versão atual do índice de documentos
+
+        Returns:
+            Tupla (resposta armazenada, similaridade) ou None
+        """
+
+        vector = self._normalize(embedding)
+
+        with self._lock:
+            self._check_version(index_version)
+
+            if self._index is None or self._index.ntotal == 0:
+                self.misses += 1
+                return None
+
+            scores, ids = self._index.search(vector, 1)
+            similarity, entry_id = float(scores[0][0]), int(ids[0][0])
+
+            if entry_id < 0 or similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            self._responses.move_to_end(entry_id)
+            self.hits += 1
+            return self._responses[entry_id], similarity
+
+    def add(
+        self,
+        embedding: List[float],
+        response: QuestionResponse,
+        index_version: Optional[str] = None,
+    ) -> None:
+        """
+        Armazena a resposta de uma pergunta.
+
+        Args:
+            embedding: Embedding da pergunta
+            response: Resposta gerada
+            index_version: Versão do índice usada para gerar a resposta
+        """
+
+        vector = self._normalize(embedding)
+
+        with self._lock:
+            self._check_version(index_version)
+
+            if self._index is None:
+                self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(vector.shape[1]))
+
+            entry_id = self._next_id
+            self._next_id += 1
+
+            self._index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+            self._responses[entry_id] = response
+
+            while len(self._responses) > self.max_entries:
+                oldest_id, _ = self._responses.popitem(last=False)
+                self._index.remove_ids(np.array([oldest_id], dtype=np.int64))
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        """
+        Esvazia o cache (por exemplo, após reconstruir o vector_index).
+        """
+
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Retorna contadores de uso do cache.
+        """
+
+        total = self.hits + self.misses
+
+        return {
+            "entries": len(self._responses),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "threshold": self.threshold,
+        }
+
+    def _check_version(self, index_version: Optional[str]) -> None:
+        if index_version is not None and index_version != self.index_version:
+            self._clear()
+            self.index_version = index_version
+
+    def _clear(self) -> None:
+        self._index = None
+        self._responses.clear()
+        self.invalidations += 1
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).reshape(1, -1).copy()
+        faiss.normalize_L2(vector)
+        return vector
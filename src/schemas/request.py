@@ -1,5 +1,9 @@
+from typing import Annotated, List, Optional
+
 from pydantic import BaseModel, Field
 
+MAX_BATCH_QUESTIONS = 100
+
 
 class QuestionRequest(BaseModel):
     """
@@ -13,6 +17,13 @@ class QuestionRequest(BaseModel):
         description="Pergunta do usuário sobre festão de estoques",
         examples=["Como funciona a gestão de estoques?"],
     )
+    deadline_ms: Optional[int] = Field(
+        None,
+        ge=100,
+        le=120_000,
+        description="Prazo (ms) até o primeiro token da resposta; perto dele "
+        "a geração usa um modelo de fallback. Padrão: REQUEST_DEADLINE_MS",
+    )
 
     class Config:
         json_schema_extra = {
@@ -20,3 +31,17 @@ class QuestionRequest(BaseModel):
                 "question": "Quais os métodos primoriais de controle de estoque?"
             }
         }
+
+
+class BatchQuestionRequest(BaseModel):
+    """
+    Schema do endpoint de perguntas em lote
+    """
+
+    questions: List[Annotated[str, Field(min_length=3, max_length=500)]] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_BATCH_QUESTIONS,
+        description="Perguntas processadas em lote (embeddings e busca únicos)",
+        examples=[["O que é curva ABC?", "Como calcular o estoque mínimo?"]],
+    )
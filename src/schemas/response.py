@@ -2,6 +2,17 @@ from pydantic import BaseModel, Field
 from typing import Optional, List
 
 
+class SourceReference(BaseModel):
+    """
+    Outra fonte com o mesmo trecho (quase duplicata removida na indexação).
+    """
+
+    source: str = Field(..., description="Nome do arquivo fonte")
+    chunk_id: int = Field(..., description="ID do chunk na fonte")
+    page_start: Optional[int] = Field(None, description="Primeira página do trecho")
+    page_end: Optional[int] = Field(None, description="Última página do trecho")
+
+
 class Citation(BaseModel):
     """
     Citação de fonte utilizada na resposta.
@@ -10,6 +21,16 @@ class Citation(BaseModel):
     source: str = Field(..., description="Nome do arquivo fonte da citação")
     excerpt: str = Field(..., description="Trecho que for relevante extraído da fonte")
     chunk_id: int = Field(..., description="ID do chunk usado")
+    page_start: Optional[int] = Field(
+        None, description="Primeira página do trecho citado (1 = primeira do PDF)"
+    )
+    page_end: Optional[int] = Field(
+        None, description="Última página do trecho citado"
+    )
+    also_in: List[SourceReference] = Field(
+        default_factory=list,
+        description="Outras fontes com o mesmo trecho, mescladas na deduplicação",
+    )
 
 
 class Metrics(BaseModel):
@@ -34,6 +55,95 @@ class Metrics(BaseModel):
     )
     top_k: int = Field(..., description="Número de chunks recuperados para a resposta")
     context_size: int = Field(..., description="Tamanho do contexto em caracteres")
+    time_to_first_token_ms: Optional[float] = Field(
+        None,
+        description="Tempo até o primeiro token da resposta (apenas em streaming)",
+    )
+    cache_hit: bool = Field(
+        False, description="Indica se a resposta veio do cache de respostas"
+    )
+    cache_type: Optional[str] = Field(
+        None, description="Tipo de cache que respondeu: 'exact' ou 'semantic'"
+    )
+    cache_lookup_ms: Optional[float] = Field(
+        None, description="Tempo de consulta ao cache em milissegundos"
+    )
+    embedding_latency_ms: Optional[float] = Field(
+        None, description="Parte do retrieval gasta na API de embeddings (ms)"
+    )
+    embedding_cache_ms: Optional[float] = Field(
+        None, description="Parte do retrieval gasta no cache de embeddings (ms)"
+    )
+    embedding_cache_hit: Optional[bool] = Field(
+        None, description="Indica se o embedding da pergunta veio do cache"
+    )
+    search_latency_ms: Optional[float] = Field(
+        None, description="Parte do retrieval gasta na busca no índice (ms)"
+    )
+    retrieval_mode: Optional[str] = Field(
+        None, description="Modo da busca: 'vector', 'hybrid' ou 'lexical'"
+    )
+    vector_search_ms: Optional[float] = Field(
+        None, description="Parte da busca gasta no índice FAISS (ms)"
+    )
+    lexical_search_ms: Optional[float] = Field(
+        None, description="Parte da busca gasta no índice BM25 (ms)"
+    )
+    fusion_ms: Optional[float] = Field(
+        None, description="Tempo da fusão dos resultados (RRF) em ms"
+    )
+    retrieval_degraded: Optional[bool] = Field(
+        None,
+        description="Indica se a busca caiu para o BM25 porque o embedding "
+        "da pergunta demorou ou falhou",
+    )
+    rerank_latency_ms: Optional[float] = Field(
+        None, description="Parte do retrieval gasta no reranking (ms)"
+    )
+    reranked: Optional[bool] = Field(
+        None,
+        description="Indica se a ordem do cross-encoder foi usada (False se o "
+        "orçamento de tempo estourou e a ordem da busca foi mantida)",
+    )
+    context_tokens: Optional[int] = Field(
+        None, description="Tokens do contexto enviado ao LLM após o empacotamento"
+    )
+    context_tokens_saved: Optional[int] = Field(
+        None,
+        description="Tokens removidos do contexto pelo empacotamento (chunks "
+        "redundantes, cortados ou fora do orçamento)",
+    )
+    context_chunks_dropped: Optional[int] = Field(
+        None, description="Chunks descartados pelo empacotamento do contexto"
+    )
+    generation_attempts: Optional[int] = Field(
+        None,
+        description="Chamadas ao LLM disparadas (1 sem hedging nem fallback)",
+    )
+    generation_winner: Optional[str] = Field(
+        None,
+        description="Tentativa que gerou a resposta: primary, hedge (cópia "
+        "disparada pela demora do primeiro token) ou fallback",
+    )
+    generation_model: Optional[str] = Field(
+        None, description="Modelo que gerou a resposta"
+    )
+    discarded_prompt_tokens: Optional[int] = Field(
+        None,
+        description="Tokens de entrada das tentativas canceladas (cópias e "
+        "fallbacks que perderam); já somados em estimated_cost_usd",
+    )
+    guardrails_ms: Optional[float] = Field(
+        None, description="Tempo da validação da pergunta (guardrails) em ms"
+    )
+    speculative_retrieval: Optional[bool] = Field(
+        None,
+        description="Indica se o retrieval começou antes do fim dos guardrails "
+        "(SPECULATIVE_RETRIEVAL)",
+    )
+    stage_overlap_ms: Optional[float] = Field(
+        None, description="Tempo em que guardrails e retrieval rodaram juntos (ms)"
+    )
 
 
 class QuestionResponse(BaseModel):
@@ -49,6 +159,9 @@ class QuestionResponse(BaseModel):
     block_message: Optional[str] = Field(
         None, description="Mensagem de recusa ao usuário"
     )
+    error: Optional[str] = Field(
+        None, description="Erro ao gerar a resposta (só no lote, quando esta pergunta falhou)"
+    )
 
     class Config:
         json_schema_extra = {
@@ -76,6 +189,43 @@ class QuestionResponse(BaseModel):
         }
 
 
+class BatchMetrics(BaseModel):
+    """
+    Métricas agregadas de um lote de perguntas.
+    """
+
+    questions: int = Field(..., description="Número de perguntas do lote")
+    total_latency_ms: float = Field(..., description="Latência total do lote (ms)")
+    embedding_latency_ms: float = Field(
+        ..., description="Tempo das chamadas em lote à API de embeddings (ms)"
+    )
+    search_latency_ms: float = Field(
+        ..., description="Tempo da busca única no índice para todo o lote (ms)"
+    )
+    generation_latency_ms: float = Field(
+        ..., description="Tempo da etapa de geração, com chamadas concorrentes (ms)"
+    )
+    total_tokens: int = Field(..., description="Tokens usados por todas as respostas")
+    estimated_cost_usd: float = Field(..., description="Custo estimado do lote")
+    cache_hits: int = Field(..., description="Respostas servidas pelos caches")
+    blocked: int = Field(..., description="Perguntas bloqueadas pelos guardrails")
+    errors: int = Field(0, description="Perguntas cuja geração falhou")
+    max_concurrency: int = Field(
+        ..., description="Limite de gerações simultâneas usado no lote"
+    )
+
+
+class BatchQuestionResponse(BaseModel):
+    """
+    Schema para a saída do endpoint de perguntas em lote
+    """
+
+    responses: List[QuestionResponse] = Field(
+        ..., description="Respostas na mesma ordem das perguntas"
+    )
+    metrics: BatchMetrics = Field(..., description="Métricas agregadas do lote")
+
+
 class ErrorResponse(BaseModel):
     """
     Schema para respostas de erro
@@ -0,0 +1,92 @@
+"""
+Controle de concorrência para os endpoints da API.
+
+Limita quantas perguntas são processadas ao mesmo tempo e quantas podem
+esperar na fila. Quando a fila está cheia, a requisição é recusada na hora
+(backpressure) em vez de acumular latência indefinidamente.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+
+class ConcurrencyLimitExceeded(Exception):
+    """
+    Levantada quando não há vaga de execução nem espaço na fila.
+    """
+
+
+class ConcurrencyLimiter:
+    """
+    Semáforo assíncrono com limite de fila.
+
+    Attributes:
+        max_concurrent: Número máximo de perguntas em execução simultânea
+        max_queue: Número máximo de perguntas aguardando uma vaga
+    """
+
+    def __init__(self, max_concurrent: int = 32, max_queue: int = 64):
+        """
+        Inicializa o limitador.
+
+        Args:
+            max_concurrent: Perguntas em execução simultânea (mínimo 1)
+            max_queue: Perguntas aguardando vaga antes de recusar (mínimo 0)
+        """
+
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max(0, max_queue)
+
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._pending = 0
+        self._active = 0
+
+    @classmethod
+    def from_env(cls) -> "ConcurrencyLimiter":
+        """
+        Cria o limitador a partir de MAX_CONCURRENT_REQUESTS e
+        MAX_QUEUED_REQUESTS.
+        """
+
+        return cls(
+            max_concurrent=int(os.getenv("MAX_CONCURRENT_REQUESTS", 32)),
+            max_queue=int(os.getenv("MAX_QUEUED_REQUESTS", 64)),
+        )
+
+    @property
+    def in_flight(self) -> int:
+        """Perguntas em execução no momento."""
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        """Perguntas aguardando uma vaga."""
+        return self._pending - self._active
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Reserva uma vaga de execução, aguardando na fila se necessário.
+
+        Raises:
+            ConcurrencyLimitExceeded: Se todas as vagas e a fila estão ocupadas
+        """
+
+        if self._pending >= self.max_concurrent + self.max_queue:
+            raise ConcurrencyLimitExceeded(
+                f"Limite de concorrência atingido: {self.in_flight} em "
+                f"execução, {self.queued} na fila."
+            )
+
+        self._pending += 1
+        try:
+            async with self._semaphore:
+                self._active += 1
+                try:
+                    yield
+                finally:
+                    self._active -= 1
+        finally:
+            self._pending -= 1
@@ -0,0 +1,96 @@
+"""
+Preço por modelo, usado no custo estimado de cada resposta.
+
+Valores em USD por 1M de tokens (preços de lista da OpenAI). O nome do
+modelo é procurado sem o prefixo do provedor ("openai/gpt-4.1-nano") e
+pelo prefixo mais longo, então versões datadas ("gpt-4o-mini-2024-07-18")
+usam o preço do modelo base.
+
+COST_PER_1M_PROMPT e COST_PER_1M_COMPLETION substituem a tabela (por
+exemplo, para provedores com preço próprio).
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+@dataclass(frozen=True)
+class ModelPricing:
+    """
+    Preço de um modelo.
+
+    Attributes:
+        prompt_per_1m: USD por 1M de tokens de entrada
+        completion_per_1m: USD por 1M de tokens gerados
+    """
+
+    prompt_per_1m: float
+    completion_per_1m: float
+
+    def cost(self, prompt_tokens: int, completion_tokens: int) -> float:
+        """
+        Custo em USD de uma chamada.
+        """
+
+        return (
+            prompt_tokens * self.prompt_per_1m
+            + completion_tokens * self.completion_per_1m
+        ) / 1_000_000
+
+
+MODEL_PRICING: Dict[str, ModelPricing] = {
+    "gpt-4.1": ModelPricing(2.00, 8.00),
+    "gpt-4.1-mini": ModelPricing(0.40, 1.60),
+    "gpt-4.1-nano": ModelPricing(0.10, 0.40),
+    "gpt-4o": ModelPricing(2.50, 10.00),
+    "gpt-4o-mini": ModelPricing(0.15, 0.60),
+    "gpt-4-turbo": ModelPricing(10.00, 30.00),
+    "gpt-3.5-turbo": ModelPricing(0.50, 1.50),
+    "o3-mini": ModelPricing(1.10, 4.40),
+    "o4-mini": ModelPricing(1.10, 4.40),
+}
+
+# Usado para modelos fora da tabela (mesmo valor fixo de antes da tabela)
+DEFAULT_PRICING = ModelPricing(0.12, 0.12)
+
+
+def get_model_pricing(model: Optional[str]) -> ModelPricing:
+    """
+    Retorna o preço do modelo.
+
+    Args:
+        model: Nome do modelo, com ou sem prefixo de provedor
+
+    Returns:
+        ModelPricing da tabela, com as variáveis COST_PER_1M_* aplicadas
+        por cima; DEFAULT_PRICING se o modelo não estiver na tabela
+    """
+
+    pricing = _lookup(model)
+    if pricing is None:
+        pricing = DEFAULT_PRICING
+        if not (os.getenv("COST_PER_1M_PROMPT") and os.getenv("COST_PER_1M_COMPLETION")):
+            print(
+                f"    Preço do modelo {model} desconhecido; usando "
+                f"{DEFAULT_PRICING.prompt_per_1m}/{DEFAULT_PRICING.completion_per_1m} "
+                f"USD por 1M de tokens (ajuste COST_PER_1M_PROMPT/COMPLETION)."
+            )
+
+    return ModelPricing(
+        prompt_per_1m=float(os.getenv("COST_PER_1M_PROMPT") or pricing.prompt_per_1m),
+        completion_per_1m=float(
+            os.getenv("COST_PER_1M_COMPLETION") or pricing.completion_per_1m
+        ),
+    )
+
+
+def _lookup(model: Optional[str]) -> Optional[ModelPricing]:
+    if not model:
+        return None
+
+    name = model.split("/")[-1].lower()
+    matches = [key for key in MODEL_PRICING if name == key or name.startswith(f"{key}-")]
+    if not matches:
+        return None
+    return MODEL_PRICING[max(matches, key=len)]
@@ -0,0 +1,78 @@
+"""
+Limite de tokens por minuto para chamadas a APIs com cota (TPM).
+
+Balde de tokens que enche continuamente a tokens_per_minute / 60 por
+segundo. Cada chamada reserva seus tokens antes de ir para a API; se o
+balde ficar negativo, a chamada dorme o tempo necessário para pagá-lo.
+A reserva é feita sob lock e a espera fora dele, então threads
+concorrentes entram em fila na ordem em que reservaram.
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+
+class TokenRateLimiter:
+    """
+    Balde de tokens thread-safe.
+
+    Attributes:
+        tokens_per_minute: Cota de tokens por minuto (capacidade do balde)
+    """
+
+    def __init__(
+        self,
+        tokens_per_minute: int,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Args:
+            tokens_per_minute: Cota de tokens por minuto (mínimo 1)
+            clock: Relógio monotônico (substituível em testes)
+            sleep: Função de espera (substituível em testes)
+        """
+
+        self.tokens_per_minute = max(1, int(tokens_per_minute))
+        self._rate = self.tokens_per_minute / 60.0
+        self._available = float(self.tokens_per_minute)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int) -> float:
+        """
+        Reserva tokens, esperando se a cota do minuto estiver esgotada.
+
+        Uma chamada maior que a cota inteira é permitida, mas deixa o balde
+        negativo e atrasa as seguintes.
+
+        Returns:
+            Segundos esperados
+        """
+
+        with self._lock:
+            now = self._clock()
+            self._available = min(
+                float(self.tokens_per_minute),
+                self._available + (now - self._updated) * self._rate,
+            )
+            self._updated = now
+            self._available -= tokens
+            wait = -self._available / self._rate if self._available < 0 else 0.0
+
+        if wait > 0:
+            self._sleep(wait)
+        return wait
+
+
+def limiter_from_tpm(tokens_per_minute: Optional[int]) -> Optional[TokenRateLimiter]:
+    """
+    Cria um limitador, ou None se a cota não estiver definida (ou for 0).
+    """
+
+    if not tokens_per_minute:
+        return None
+    return TokenRateLimiter(tokens_per_minute)
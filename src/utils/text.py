@@ -0,0 +1,19 @@
+"""
+Normalização de texto compartilhada pelo índice lexical, pelos guardrails e
+pela deduplicação da indexação.
+"""
+
+import re
+import unicodedata
+
+# Palavras: sequências de letras, dígitos ou "_"; pontuação e hífen separam
+WORD = re.compile(r"\w+")
+
+
+def fold_accents(text: str) -> str:
+    """
+    Remove acentos (NFKD sem os caracteres combinantes).
+    """
+
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c))
@@ -0,0 +1,142 @@
+"""
+Contagem de tokens com tiktoken, com o encoder carregado uma vez por processo.
+
+Se o tiktoken não estiver instalado ou o arquivo do encoding não puder ser
+obtido (ambiente sem rede), a contagem cai para a estimativa de ~4
+caracteres por token.
+
+Na geração, a contagem do tiktoken só é usada quando o provedor não devolve
+o bloco usage da resposta (ver TokenUsage).
+"""
+
+import math
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Optional
+
+DEFAULT_ENCODING = "cl100k_base"
+CHARS_PER_TOKEN = 4
+
+# Modelos mais novos que o mapeamento da versão instalada do tiktoken
+MODEL_PREFIX_ENCODINGS = (
+    ("gpt-4.1", "o200k_base"),
+    ("gpt-4.5", "o200k_base"),
+    ("gpt-5", "o200k_base"),
+    ("o1", "o200k_base"),
+    ("o3", "o200k_base"),
+    ("o4", "o200k_base"),
+)
+
+# Formato de chat da OpenAI: cada mensagem custa alguns tokens além do
+# conteúdo, e a resposta do assistente é iniciada com mais 3
+TOKENS_PER_MESSAGE = 3
+TOKENS_REPLY_PRIMING = 3
+
+
+@lru_cache(maxsize=None)
+def get_encoder(model: Optional[str] = None):
+    """
+    Retorna o encoder do tiktoken para um modelo (ou o padrão).
+
+    Args:
+        model: Nome do modelo, com ou sem prefixo de provedor
+               ("openai/gpt-4.1-nano")
+
+    Returns:
+        tiktoken.Encoding, ou None se o tiktoken não estiver disponível
+    """
+
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    try:
+        if model:
+            name = model.split("/")[-1]
+            try:
+                return tiktoken.encoding_for_model(name)
+            except KeyError:
+                for prefix, encoding in MODEL_PREFIX_ENCODINGS:
+                    if name.startswith(prefix):
+                        return tiktoken.get_encoding(encoding)
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimativa de tokens sem tokenizer (~4 caracteres por token).
+    """
+
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Conta os tokens de um texto.
+
+    Args:
+        text: Texto a contar
+        model: Modelo cujo encoding deve ser usado (padrão: cl100k_base)
+
+    Returns:
+        Número de tokens (estimado se o tiktoken não estiver disponível)
+    """
+
+    encoder = get_encoder(model)
+    if encoder is None:
+        return estimate_tokens(text)
+    return len(encoder.encode(text, disallowed_special=()))
+
+
+def count_chat_tokens(messages: Iterable[str], model: Optional[str] = None) -> int:
+    """
+    Conta os tokens de prompt de uma conversa (conteúdo de cada mensagem
+    mais o overhead do formato de chat).
+
+    Args:
+        messages: Conteúdo das mensagens enviadas (system, user, ...)
+        model: Modelo cujo encoding deve ser usado
+    """
+
+    return TOKENS_REPLY_PRIMING + sum(
+        count_tokens(content, model) + TOKENS_PER_MESSAGE for content in messages
+    )
+
+
+@dataclass
+class TokenUsage:
+    """
+    Tokens informados pelo provedor no bloco usage da resposta.
+
+    Attributes:
+        prompt_tokens: Tokens de entrada (None se o provedor não informou)
+        completion_tokens: Tokens gerados (None se o provedor não informou)
+    """
+
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+
+    @property
+    def reported(self) -> bool:
+        return self.prompt_tokens is not None and self.completion_tokens is not None
+
+    def update_from_message(self, message) -> None:
+        """
+        Lê o usage_metadata de uma mensagem (ou chunk de streaming) do
+        LangChain, se houver.
+        """
+
+        usage = getattr(message, "usage_metadata", None)
+        if not usage:
+            return
+        self.prompt_tokens = int(usage.get("input_tokens", 0))
+        self.completion_tokens = int(usage.get("output_tokens", 0))
+
+    @classmethod
+    def from_message(cls, message) -> "TokenUsage":
+        usage = cls()
+        usage.update_from_message(message)
+        return usage
@@ -0,0 +1,217 @@
+"""
+Testes para os endpoints da API FastAPI.
+
+Valida, com o pipeline mockado:
+- /ask usa o caminho assíncrono e respeita o limite de concorrência
+- /ask/stream emite citações, tokens e métricas via SSE
+- /ask/batch processa várias perguntas com aprocess_many
+"""
+
+import asyncio
+import json
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from fastapi.testclient import TestClient
+
+import src.main as main
+from src.rag.hedging import DeadlineExceeded
+from src.schemas.request import QuestionRequest
+from src.schemas.response import (
+    BatchMetrics,
+    BatchQuestionResponse,
+    Citation,
+    Metrics,
+    QuestionResponse,
+)
+from src.utils.concurrency import ConcurrencyLimiter
+
+
+def _metrics(**overrides) -> Metrics:
+    values = dict(
+        total_latency_ms=10.0,
+        retrieval_latency_ms=2.0,
+        generation_latency_ms=8.0,
+        prompt_tokens=10,
+        completion_tokens=5,
+        total_tokens=15,
+        estimated_cost_usd=0.0,
+        top_k=1,
+        context_size=20,
+    )
+    values.update(overrides)
+    return Metrics(**values)
+
+
+def _parse_sse(body: str) -> list:
+    """Converte o corpo SSE em uma lista de (evento, dados)."""
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """Fixture: cliente HTTP com pipeline mockado (sem lifespan)."""
+    pipeline = MagicMock()
+    monkeypatch.setattr(main, "rag_pipeline", pipeline)
+    monkeypatch.setattr(main, "request_limiter", ConcurrencyLimiter(2, 2))
+    return TestClient(main.app), pipeline
+
+
+class TestAskEndpoint:
+    """Testes do endpoint /ask."""
+
+    def test_ask_uses_async_pipeline(self, client):
+        """Teste: /ask aguarda aprocess_question."""
+        http, pipeline = client
+        pipeline.aprocess_question = AsyncMock(
+            return_value=QuestionResponse(
+                answer="Resposta", citations=[], metrics=_metrics()
+            )
+        )
+
+        response = http.post("/ask", json={"question": "O que é estoque?"})
+
+        assert response.status_code == 200
+        assert response.json()["answer"] == "Resposta"
+        pipeline.aprocess_question.assert_awaited_once_with(
+            "O que é estoque?", deadline_ms=None
+        )
+
+    def test_ask_returns_504_on_deadline(self, client):
+        """Teste: prazo esgotado sem resposta do LLM vira 504."""
+        http, pipeline = client
+        pipeline.aprocess_question = AsyncMock(side_effect=DeadlineExceeded("prazo"))
+
+        response = http.post(
+            "/ask", json={"question": "O que é estoque?", "deadline_ms": 3000}
+        )
+
+        assert response.status_code == 504
+        pipeline.aprocess_question.assert_awaited_once_with(
+            "O que é estoque?", deadline_ms=3000
+        )
+
+    def test_ask_returns_429_when_saturated(self, client, monkeypatch):
+        """Teste: /ask responde 429 quando não há vaga nem fila."""
+        http, _ = client
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=0)
+        limiter._pending = 1
+        monkeypatch.setattr(main, "request_limiter", limiter)
+
+        response = http.post("/ask", json={"question": "O que é estoque?"})
+
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "1"
+
+
+class TestAskStreamEndpoint:
+    """Testes do endpoint /ask/stream."""
+
+    def test_stream_event_order(self, client):
+        """Teste: citações, tokens e métricas chegam nessa ordem."""
+        http, pipeline = client
+
+        async def events(question, deadline_ms=None):
+            citation = Citation(source="a.pdf", excerpt="...", chunk_id=0)
+            yield {"event": "citations", "data": [citation.model_dump()]}
+            yield {"event": "token", "data": {"text": "Olá"}}
+            yield {"event": "token", "data": {"text": " mundo"}}
+            yield {
+                "event": "metrics",
+                "data": _metrics(time_to_first_token_ms=3.0).model_dump(),
+            }
+
+        pipeline.astream_question = events
+
+        response = http.post("/ask/stream", json={"question": "O que é estoque?"})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+
+        events_received = _parse_sse(response.text)
+        names = [name for name, _ in events_received]
+        assert names == ["citations", "token", "token", "metrics"]
+        assert events_received[-1][1]["time_to_first_token_ms"] == 3.0
+        assert main.request_limiter.in_flight == 0
+
+    def test_slot_released_when_body_never_read(self, client):
+        """Teste: cliente que desconecta antes de ler o corpo não prende a vaga."""
+        _, pipeline = client
+        pipeline.astream_question = MagicMock()
+
+        async def scenario():
+            response = await main.ask_question_stream(
+                QuestionRequest(question="O que é estoque?")
+            )
+            assert main.request_limiter.in_flight == 1
+
+            async def receive():
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                raise OSError("conexão fechada")
+
+            # O anyio agrupa o erro do send em um ExceptionGroup
+            with pytest.raises(Exception, match="conexão fechada|unhandled errors"):
+                await response({"type": "http"}, receive, send)
+
+            assert main.request_limiter.in_flight == 0
+
+        asyncio.run(scenario())
+        pipeline.astream_question.assert_not_called()
+
+
+class TestAskBatchEndpoint:
+    """Testes do endpoint /ask/batch."""
+
+    def test_batch_uses_aprocess_many(self, client):
+        """Teste: /ask/batch repassa as perguntas e devolve as métricas."""
+        http, pipeline = client
+        pipeline.aprocess_many = AsyncMock(
+            return_value=BatchQuestionResponse(
+                responses=[
+                    QuestionResponse(answer="A", citations=[], metrics=_metrics()),
+                    QuestionResponse(answer="B", citations=[], metrics=_metrics()),
+                ],
+                metrics=BatchMetrics(
+                    questions=2,
+                    total_latency_ms=20.0,
+                    embedding_latency_ms=3.0,
+                    search_latency_ms=1.0,
+                    generation_latency_ms=15.0,
+                    total_tokens=30,
+                    estimated_cost_usd=0.0,
+                    cache_hits=0,
+                    blocked=0,
+                    max_concurrency=8,
+                ),
+            )
+        )
+
+        response = http.post(
+            "/ask/batch", json={"questions": ["O que é estoque?", "O que é ABC?"]}
+        )
+
+        assert response.status_code == 200
+        body = response.json()
+        assert [r["answer"] for r in body["responses"]] == ["A", "B"]
+        assert body["metrics"]["questions"] == 2
+        pipeline.aprocess_many.assert_awaited_once_with(
+            ["O que é estoque?", "O que é ABC?"]
+        )
+
+    def test_batch_rejects_empty_list(self, client):
+        """Teste: lote vazio é recusado na validação."""
+        http, _ = client
+
+        response = http.post("/ask/batch", json={"questions": []})
+
+        assert response.status_code == 422
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,378 @@
+"""
+Testes para o cache de respostas.
+
+Valida:
+- Normalização das perguntas usadas como chave
+- Eviction LRU e expiração por TTL dos backends
+- Persistência do backend SQLite
+- Cache semântico (limiar de similaridade, eviction e invalidação)
+- Cache de embeddings de query (memmap) e micro-batching
+- Integração com o RAGPipeline (cache_hit nas métricas)
+"""
+
+import asyncio
+import os
+
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.rag.cache import (
+    InMemoryCacheBackend,
+    ResponseCache,
+    SQLiteCacheBackend,
+    normalize_question,
+)
+from src.rag.embedding_cache import (
+    EmbeddingMicroBatcher,
+    EmbeddingTimings,
+    QueryEmbedder,
+    QueryEmbeddingCache,
+)
+from src.rag.pipeline import RAGPipeline
+from src.rag.semantic_cache import SemanticCache
+from src.schemas.response import Metrics, QuestionResponse
+
+
+def _response(answer: str = "Resposta") -> QuestionResponse:
+    metrics = Metrics(
+        total_latency_ms=4000.0,
+        retrieval_latency_ms=1000.0,
+        generation_latency_ms=3000.0,
+        prompt_tokens=800,
+        completion_tokens=100,
+        total_tokens=900,
+        estimated_cost_usd=0.0001,
+        top_k=3,
+        context_size=2400,
+    )
+    return QuestionResponse(answer=answer, citations=[], metrics=metrics)
+
+
+class TestNormalizeQuestion:
+    """Testa a normalização das chaves de cache."""
+
+    def test_folds_case_accents_punctuation_and_spaces(self):
+        """Teste: variações triviais geram a mesma chave."""
+        variants = [
+            "O que é gestão de estoques?",
+            "o que e gestao de estoques",
+            "  O QUE É GESTÃO   DE ESTOQUES ?!",
+        ]
+        normalized = {normalize_question(v) for v in variants}
+        assert normalized == {"o que e gestao de estoques"}
+
+    def test_namespace_changes_key(self):
+        """Teste: versão do índice/config diferente gera outra chave."""
+        backend = InMemoryCacheBackend()
+        old = ResponseCache(backend, namespace="indice-v1")
+        new = ResponseCache(backend, namespace="indice-v2")
+        assert old.make_key("estoque") != new.make_key("estoque")
+
+
+class TestInMemoryCacheBackend:
+    """Testa o backend em memória."""
+
+    def test_lru_eviction(self):
+        """Teste: a entrada menos usada recentemente é descartada."""
+        backend = InMemoryCacheBackend(max_entries=2, ttl_seconds=0)
+        backend.set("a", "1")
+        backend.set("b", "2")
+        backend.get("a")
+        backend.set("c", "3")
+
+        assert backend.get("a") == "1"
+        assert backend.get("b") is None
+        assert backend.get("c") == "3"
+
+    def test_ttl_expiration(self):
+        """Teste: entradas expiradas não são retornadas."""
+        backend = InMemoryCacheBackend(max_entries=10, ttl_seconds=60)
+        with patch("src.rag.cache.time.time", return_value=1000.0):
+            backend.set("a", "1")
+        with patch("src.rag.cache.time.time", return_value=1061.0):
+            assert backend.get("a") is None
+        assert len(backend) == 0
+
+
+class TestSQLiteCacheBackend:
+    """Testa o backend persistente."""
+
+    def test_survives_reopen(self, tmp_path):
+        """Teste: entradas persistem entre instâncias."""
+        path = str(tmp_path / "cache.sqlite3")
+        cache = ResponseCache(SQLiteCacheBackend(path), namespace="v1")
+        cache.set("O que é estoque?", _response("Persistida"))
+
+        reopened = ResponseCache(SQLiteCacheBackend(path), namespace="v1")
+        cached = reopened.get("o que e estoque")
+        assert cached is not None
+        assert cached.answer == "Persistida"
+
+    def test_lru_eviction(self, tmp_path):
+        """Teste: respeita o limite de entradas."""
+        backend = SQLiteCacheBackend(str(tmp_path / "c.sqlite3"), max_entries=2)
+        with patch("src.rag.cache.time.time", side_effect=[1.0, 2.0, 3.0, 4.0]):
+            backend.set("a", "1")
+            backend.set("b", "2")
+            backend.get("a")
+            backend.set("c", "3")
+
+        assert len(backend) == 2
+        assert backend.get("b") is None
+
+
+class TestPipelineResponseCache:
+    """Testa o cache integrado ao pipeline."""
+
+    @pytest.fixture
+    def pipeline(self):
+        with patch("src.rag.pipeline.VectorRetriever"):
+            with patch("src.rag.pipeline.ResponseGenerator"):
+                pipeline = RAGPipeline(index_path="vector_index")
+        pipeline.retriever.embed_query_timed.return_value = (
+            [1.0, 0.0],
+            EmbeddingTimings(),
+        )
+        pipeline.retriever.retrieve.return_value = (
+            [{"content": "Texto", "source": "a.pdf", "chunk_id": 0}],
+            900.0,
+        )
+        pipeline.generator.generate.return_value = ("Resposta", 3000.0, 800, 100)
+        return pipeline
+
+    def test_second_call_is_cache_hit(self, pipeline):
+        """Teste: pergunta equivalente não chama retriever nem generator."""
+        first = pipeline.process_question("O que é gestão de estoques?")
+        second = pipeline.process_question("o que e gestao de estoques")
+
+        assert first.metrics.cache_hit is False
+        assert second.metrics.cache_hit is True
+        assert second.metrics.cache_lookup_ms is not None
+        assert second.metrics.total_tokens == 0
+        assert second.answer == "Resposta"
+        assert pipeline.generator.generate.call_count == 1
+
+
+class TestSemanticCache:
+    """Testa o cache semântico baseado em FAISS."""
+
+    def test_hit_above_threshold(self):
+        """Teste: vetor muito parecido reutiliza a resposta."""
+        cache = SemanticCache(threshold=0.95)
+        cache.add([1.0, 0.0, 0.0], _response("Armazenada"))
+
+        hit = cache.lookup([0.99, 0.05, 0.0])
+        assert hit is not None
+        assert hit[0].answer == "Armazenada"
+        assert cache.lookup([0.0, 1.0, 0.0]) is None
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_size_bounded_eviction(self):
+        """Teste: descarta a entrada menos usada ao passar do limite."""
+        cache = SemanticCache(threshold=0.99, max_entries=2)
+        cache.add([1.0, 0.0, 0.0], _response("a"))
+        cache.add([0.0, 1.0, 0.0], _response("b"))
+        cache.lookup([1.0, 0.0, 0.0])
+        cache.add([0.0, 0.0, 1.0], _response("c"))
+
+        assert cache.lookup([0.0, 1.0, 0.0]) is None
+        assert cache.lookup([1.0, 0.0, 0.0])[0].answer == "a"
+        assert cache.stats()["evictions"] == 1
+
+    def test_invalidated_when_index_version_changes(self):
+        """Teste: reconstruir o vector_index esvazia o cache."""
+        cache = SemanticCache(threshold=0.9, index_version="v1")
+        cache.add([1.0, 0.0], _response(), index_version="v1")
+
+        assert cache.lookup([1.0, 0.0], index_version="v2") is None
+        assert cache.stats()["entries"] == 0
+
+
+class TestPipelineSemanticCache:
+    """Testa o cache semântico integrado ao pipeline."""
+
+    @pytest.fixture
+    def pipeline(self):
+        env = {"SEMANTIC_CACHE_ENABLED": "true", "RESPONSE_CACHE_BACKEND": "none"}
+        with patch.dict(os.environ, env):
+            with patch("src.rag.pipeline.VectorRetriever"):
+                with patch("src.rag.pipeline.ResponseGenerator"):
+                    pipeline = RAGPipeline(index_path="vector_index")
+        pipeline.retriever.index_version = "v1"
+        pipeline.retriever.retrieve.return_value = (
+            [{"content": "Texto", "source": "a.pdf", "chunk_id": 0}],
+            5.0,
+        )
+        pipeline.generator.generate.return_value = ("Resposta", 3000.0, 800, 100)
+        return pipeline
+
+    def test_paraphrase_skips_generation(self, pipeline):
+        """Teste: paráfrase com embedding próximo não chama o generator."""
+        pipeline.retriever.embed_query_timed.side_effect = [
+            ([1.0, 0.0, 0.0], EmbeddingTimings()),
+            ([0.98, 0.02, 0.0], EmbeddingTimings()),
+        ]
+
+        first = pipeline.process_question("O que é curva ABC?")
+        second = pipeline.process_question("Explique a curva ABC")
+
+        assert first.metrics.cache_hit is False
+        assert second.metrics.cache_hit is True
+        assert second.metrics.cache_type == "semantic"
+        assert pipeline.generator.generate.call_count == 1
+        _, kwargs = pipeline.retriever.retrieve.call_args
+        assert kwargs["embedding"] == [1.0, 0.0, 0.0]
+
+
+class TestQueryEmbeddingCache:
+    """Testa o cache de embeddings de query."""
+
+    def test_lru_reuses_slots(self):
+        """Teste: ao passar da capacidade, a query mais antiga sai."""
+        cache = QueryEmbeddingCache("modelo", max_entries=2)
+        cache.put("a", [1.0, 0.0])
+        cache.put("b", [0.0, 1.0])
+        cache.get("a")
+        cache.put("c", [0.5, 0.5])
+
+        assert cache.get("b") is None
+        np.testing.assert_allclose(cache.get("a"), [1.0, 0.0])
+        np.testing.assert_allclose(cache.get("c"), [0.5, 0.5])
+
+    def test_model_is_part_of_key(self):
+        """Teste: modelos diferentes não compartilham vetores."""
+        assert (
+            QueryEmbeddingCache("modelo-a").make_key("estoque")
+            != QueryEmbeddingCache("modelo-b").make_key("estoque")
+        )
+
+    def test_memmap_persistence(self, tmp_path):
+        """Teste: vetores persistidos são lidos após reabrir o arquivo."""
+        path = str(tmp_path / "queries.f32")
+        cache = QueryEmbeddingCache("modelo", max_entries=4, persist_path=path)
+        cache.put("O que é estoque?", [0.25, 0.5, 0.75])
+        cache.flush()
+
+        reopened = QueryEmbeddingCache("modelo", max_entries=4, persist_path=path)
+        np.testing.assert_allclose(
+            reopened.get("o que e estoque"), [0.25, 0.5, 0.75]
+        )
+
+    def test_slot_reused_by_other_process_is_a_miss(self, tmp_path):
+        """Teste: linha reaproveitada por outro worker não devolve o vetor errado."""
+        path = str(tmp_path / "queries.f32")
+        worker_a = QueryEmbeddingCache("modelo", max_entries=2, persist_path=path)
+        worker_a.put("a", [1.0, 0.0])
+        worker_a.put("b", [0.0, 1.0])
+        worker_a.flush()
+
+        worker_b = QueryEmbeddingCache("modelo", max_entries=2, persist_path=path)
+        worker_b.put("c", [0.5, 0.5])
+
+        assert worker_a.get("a") is None
+        np.testing.assert_allclose(worker_a.get("b"), [0.0, 1.0])
+        np.testing.assert_allclose(worker_b.get("c"), [0.5, 0.5])
+
+    def test_unflushed_eviction_after_restart(self, tmp_path):
+        """Teste: eviction que não chegou ao índice em disco vira miss."""
+        path = str(tmp_path / "queries.f32")
+        cache = QueryEmbeddingCache(
+            "modelo", max_entries=2, persist_path=path, flush_every=1000
+        )
+        cache.put("a", [1.0, 0.0])
+        cache.put("b", [0.0, 1.0])
+        cache.flush()
+        cache.put("c", [0.5, 0.5])
+
+        reopened = QueryEmbeddingCache("modelo", max_entries=2, persist_path=path)
+
+        assert reopened.get("a") is None
+        np.testing.assert_allclose(reopened.get("b"), [0.0, 1.0])
+        assert len(reopened) == 1
+
+
+class TestEmbedMany:
+    """Testa o embedding de várias queries em lote."""
+
+    def test_only_misses_go_to_provider_in_batches(self):
+        """Teste: hits do cache não são reenviados e os lotes têm batch_size."""
+        embeddings = MagicMock()
+        embeddings.embed_documents.side_effect = lambda texts: [
+            [float(len(t)), 0.0] for t in texts
+        ]
+        embedder = QueryEmbedder(
+            embeddings, cache=QueryEmbeddingCache("modelo"), batch_size=2
+        )
+        embedder.cache.put("a", [9.0, 9.0])
+
+        matrix, timings = embedder.embed_many(["a", "bb", "ccc", "dddd", "bb"])
+
+        assert matrix.shape == (5, 2)
+        np.testing.assert_allclose(matrix[:, 0], [9.0, 2.0, 3.0, 4.0, 2.0])
+        assert [c.args[0] for c in embeddings.embed_documents.call_args_list] == [
+            ["bb", "ccc"],
+            ["dddd"],
+        ]
+        assert timings.cache_hit is False
+        assert embedder.embed_many(["bb", "dddd"])[1].cache_hit is True
+
+    @pytest.mark.asyncio
+    async def test_aembed_many(self):
+        """Teste: versão assíncrona usa aembed_documents."""
+        embeddings = MagicMock()
+        embeddings.aembed_documents = AsyncMock(
+            side_effect=lambda texts: [[1.0] for _ in texts]
+        )
+        embedder = QueryEmbedder(embeddings, batch_size=1)
+
+        matrix, _ = await embedder.aembed_many(["a", "b"])
+
+        assert matrix.shape == (2, 1)
+        assert embeddings.aembed_documents.await_count == 2
+
+
+class TestEmbeddingMicroBatcher:
+    """Testa o agrupamento de queries concorrentes."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_queries_share_one_call(self):
+        """Teste: queries dentro da janela viram uma única chamada."""
+        embeddings = MagicMock()
+        embeddings.aembed_documents = AsyncMock(
+            side_effect=lambda texts: [[float(len(t))] for t in texts]
+        )
+        batcher = EmbeddingMicroBatcher(embeddings, window_ms=20)
+
+        results = await asyncio.gather(
+            batcher.embed("a"), batcher.embed("bb"), batcher.embed("a")
+        )
+
+        assert results == [[1.0], [2.0], [1.0]]
+        embeddings.aembed_documents.assert_awaited_once_with(["a", "bb"])
+        assert batcher.batches == 1
+        assert batcher.batched_queries == 3
+
+    @pytest.mark.asyncio
+    async def test_batch_failure_reaches_waiters(self):
+        """Teste: erro do lote chega a quem espera, sem travar."""
+        embeddings = MagicMock()
+        # Provedor devolve menos vetores que textos
+        embeddings.aembed_documents = AsyncMock(return_value=[[1.0]])
+        batcher = EmbeddingMicroBatcher(embeddings, window_ms=5)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                batcher.embed("a"), batcher.embed("bb"), return_exceptions=True
+            ),
+            timeout=1,
+        )
+
+        assert results[0] == [1.0]
+        assert isinstance(results[1], KeyError)
+        assert not batcher._tasks
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
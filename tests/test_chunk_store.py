@@ -0,0 +1,107 @@
+"""
+Testes para o chunk store colunar.
+
+Valida:
+- Gravação e leitura via mmap (textos UTF-8 e metadados)
+- Conversão de resultados do FAISS (linhas -1 ignoradas)
+- VectorRetriever usando o chunk store no lugar do docstore em pickle
+"""
+
+import os
+
+import faiss
+import numpy as np
+import pytest
+from unittest.mock import patch
+
+from src.core.chunk_store import ChunkStore, load_chunk_store
+from src.rag.retriever import VectorRetriever
+from src.rag.search_engine import FaissSearchEngine
+
+
+CHUNKS = [
+    {"content": "Gestão de estoques", "source": "a.pdf", "chunk_id": 0, "total_chunks": 2},
+    {"content": "Curva ABC — classificação", "source": "a.pdf", "chunk_id": 1, "total_chunks": 2},
+    {"content": "Inventário rotativo", "source": "b.pdf", "chunk_id": 0, "total_chunks": 1},
+]
+
+
+class TestChunkStore:
+    """Testa a gravação e a leitura do chunk store."""
+
+    def test_roundtrip(self, tmp_path):
+        """Teste: textos com acentos e metadados voltam iguais."""
+        ChunkStore.write(str(tmp_path), CHUNKS)
+        store = ChunkStore(str(tmp_path))
+
+        assert len(store) == 3
+        assert store.get(1) == {
+            "content": "Curva ABC — classificação",
+            "source": "a.pdf",
+            "chunk_id": 1,
+        }
+        assert store.get(2)["source"] == "b.pdf"
+        assert list(store.sources) == ["a.pdf", "b.pdf"]
+        store.close()
+
+    def test_to_chunks_skips_missing_rows(self, tmp_path):
+        """Teste: linhas -1 do FAISS não viram chunks."""
+        ChunkStore.write(str(tmp_path), CHUNKS)
+        engine = FaissSearchEngine(faiss.IndexFlatL2(3), ChunkStore(str(tmp_path)))
+
+        chunks = engine.to_chunks(np.array([2, -1]), np.array([0.5, 0.0]))
+
+        assert len(chunks) == 1
+        assert chunks[0]["content"] == "Inventário rotativo"
+        assert chunks[0]["similarity_score"] == 0.5
+
+    def test_missing_store(self, tmp_path):
+        """Teste: índice sem chunk store retorna None."""
+        assert load_chunk_store(str(tmp_path)) is None
+
+    def test_empty_store(self, tmp_path):
+        """Teste: índice vazio pode ser gravado e aberto."""
+        ChunkStore.write(str(tmp_path), [])
+        assert len(ChunkStore(str(tmp_path))) == 0
+
+
+class TestRetrieverWithChunkStore:
+    """Testa o VectorRetriever lendo chunks do chunk store."""
+
+    @pytest.fixture
+    def index_path(self, tmp_path):
+        index = faiss.IndexFlatL2(3)
+        index.add(np.eye(3, dtype=np.float32))
+        faiss.write_index(index, os.path.join(tmp_path, "index.faiss"))
+        ChunkStore.write(str(tmp_path), CHUNKS)
+        return str(tmp_path)
+
+    def test_retrieve_without_docstore(self, index_path):
+        """Teste: retrieve não carrega o pickle e lê os chunks do mmap."""
+        with patch("src.rag.retriever.FAISS") as langchain_faiss:
+            with patch("src.core.embeddings.OpenAIEmbeddings"):
+                retriever = VectorRetriever(index_path=index_path)
+
+        langchain_faiss.load_local.assert_not_called()
+        assert retriever.vector_store is None
+
+        chunks, _ = retriever.retrieve("q", top_k=2, embedding=[0.0, 1.0, 0.0])
+
+        assert [c["content"] for c in chunks][0] == "Curva ABC — classificação"
+        assert chunks[0]["similarity_score"] == 0.0
+        assert len(chunks) == 2
+
+    @pytest.mark.asyncio
+    async def test_aretrieve_without_docstore(self, index_path):
+        """Teste: caminho assíncrono usa o mesmo chunk store."""
+        with patch("src.rag.retriever.FAISS"):
+            with patch("src.core.embeddings.OpenAIEmbeddings"):
+                retriever = VectorRetriever(index_path=index_path)
+
+        chunks, _ = await retriever.aretrieve("q", top_k=1, embedding=[0.0, 0.0, 1.0])
+
+        assert chunks[0]["source"] == "b.pdf"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
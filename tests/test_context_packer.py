@@ -0,0 +1,144 @@
+"""
+Testes para o empacotamento do contexto no orçamento de tokens.
+
+Valida:
+- Descarte de chunks redundantes
+- Corte em fronteiras de frase em volta do trecho mais relevante
+- Descarte dos chunks que não cabem e contagem dos tokens economizados
+- Integração com o pipeline (chunks enviados ao LLM e métricas)
+"""
+
+import os
+
+import pytest
+from unittest.mock import patch
+
+from src.rag.context_packer import ContextPacker
+from src.rag.embedding_cache import EmbeddingTimings
+from src.rag.generator import ResponseGenerator
+from src.rag.pipeline import RAGPipeline
+from src.utils.tokens import count_tokens
+
+
+FILLER = " ".join(
+    f"Frase de enchimento número {i} sobre almoxarifado e compras." for i in range(12)
+)
+
+CHUNKS = [
+    {
+        "content": f"{FILLER} O método PEPS consome primeiro os lotes antigos. {FILLER}",
+        "source": "b.pdf",
+        "chunk_id": 0,
+    },
+    {
+        "content": "Curva ABC classifica os itens pelo valor de consumo anual.",
+        "source": "a.pdf",
+        "chunk_id": 1,
+    },
+    {
+        "content": "Curva ABC: classifica os itens pelo valor do consumo anual!",
+        "source": "a.pdf",
+        "chunk_id": 2,
+    },
+]
+
+
+def _context_tokens(chunks):
+    return count_tokens(ResponseGenerator.build_context(chunks))
+
+
+class TestContextPacker:
+    """Testa o ContextPacker isolado."""
+
+    def test_fits_without_changes(self):
+        """Teste: contexto dentro do orçamento só perde os redundantes."""
+        packer = ContextPacker(max_tokens=10_000)
+
+        packed, report = packer.pack("O que é a curva ABC?", CHUNKS)
+
+        assert packed == CHUNKS[:2]
+        assert report.dropped_redundant == 1
+        assert report.trimmed_chunks == 0
+        assert report.saved_tokens > 0
+
+    def test_trims_around_best_sentence(self):
+        """Teste: chunk grande é cortado em volta da frase da pergunta."""
+        packer = ContextPacker(max_tokens=80, min_chunk_tokens=8)
+
+        packed, report = packer.pack("Como funciona o PEPS?", CHUNKS[:1])
+
+        assert len(packed) == 1 and packed[0]["trimmed"] is True
+        content = packed[0]["content"]
+        assert "O método PEPS consome primeiro os lotes antigos." in content
+        assert content.endswith(".")
+        assert len(content) < len(CHUNKS[0]["content"])
+        assert "trimmed" not in CHUNKS[0]
+
+        assert report.packed_tokens <= 80
+        assert _context_tokens(packed) <= 80
+        assert report.saved_tokens == report.input_tokens - report.packed_tokens > 0
+
+    def test_drops_chunks_over_budget(self):
+        """Teste: chunks que não cabem nem como trecho mínimo ficam de fora."""
+        budget = count_tokens("[Fonte: a.pdf]\n" + CHUNKS[1]["content"])
+        packer = ContextPacker(max_tokens=budget, min_chunk_tokens=64)
+
+        packed, report = packer.pack("curva ABC", [CHUNKS[1], CHUNKS[0]])
+
+        assert packed == [CHUNKS[1]]
+        assert report.dropped_budget == 1
+        assert report.packed_tokens == budget
+
+    def test_cuts_words_without_punctuation(self):
+        """Teste: trecho sem pontuação (ex.: tabela) é cortado em palavras."""
+        chunk = {"content": " ".join(["estoque"] * 400), "source": "t.pdf"}
+        packer = ContextPacker(max_tokens=50, min_chunk_tokens=8)
+
+        packed, report = packer.pack("estoque", [chunk])
+
+        assert packed[0]["content"].startswith("estoque estoque")
+        assert report.packed_tokens <= 50
+        assert report.trimmed_chunks == 1
+
+    def test_disabled_by_default(self):
+        """Teste: sem CONTEXT_MAX_TOKENS o packer não é criado."""
+        with patch.dict(os.environ, {"CONTEXT_MAX_TOKENS": "0"}):
+            assert ContextPacker.from_env() is None
+        with patch.dict(os.environ, {"CONTEXT_MAX_TOKENS": "900"}):
+            assert ContextPacker.from_env().max_tokens == 900
+
+
+class TestPipelinePacking:
+    """Testa o empacotamento integrado ao pipeline."""
+
+    @pytest.fixture
+    def pipeline(self):
+        with patch("src.rag.pipeline.VectorRetriever"):
+            with patch("src.rag.pipeline.ResponseGenerator"):
+                pipeline = RAGPipeline(index_path="vector_index")
+        pipeline.context_packer = ContextPacker(max_tokens=80, min_chunk_tokens=8)
+        pipeline.retriever.embed_query_timed.return_value = (
+            [1.0, 0.0],
+            EmbeddingTimings(embedding_ms=5.0),
+        )
+        pipeline.retriever.retrieve.return_value = (CHUNKS, 10.0)
+        pipeline.generator.generate.return_value = ("Resposta", 100.0, 50, 10)
+        return pipeline
+
+    def test_sends_packed_context(self, pipeline):
+        """Teste: o LLM recebe o contexto empacotado e as métricas o registram."""
+        response = pipeline.process_question("Como funciona o PEPS?")
+
+        sent = pipeline.generator.generate.call_args.args[1]
+        assert _context_tokens(sent) <= 80
+        assert "PEPS" in sent[0]["content"]
+
+        metrics = response.metrics
+        assert 0 < metrics.context_tokens <= 80
+        assert metrics.context_tokens_saved > 0
+        assert metrics.context_chunks_dropped == 3 - len(sent)
+        assert len(response.citations) == len(sent)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
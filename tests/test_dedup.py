@@ -0,0 +1,141 @@
+"""
+Testes para a remoção de quase duplicatas na indexação.
+
+Valida:
+- Quase duplicatas removidas e trechos diferentes mantidos
+- Origem das duplicatas preservada para as citações
+- Origem gravada no chunk store, inclusive em streaming
+"""
+
+import pytest
+
+from src.core.chunk_store import ChunkStore
+from src.ingestion.dedup import NearDuplicateFilter, deduplicate_chunks
+from src.rag.pipeline import RAGPipeline
+
+
+BASE = (
+    "A curva ABC classifica os itens do estoque de acordo com o valor "
+    "consumido no periodo, separando poucos itens de alto valor dos muitos "
+    "itens de baixo valor, o que orienta a politica de reposicao e o nivel "
+    "de controle aplicado a cada classe de produto."
+)
+
+
+def _chunk(content, source, chunk_id, **extra):
+    return {
+        "content": content,
+        "source": source,
+        "chunk_id": chunk_id,
+        "total_chunks": 10,
+        **extra,
+    }
+
+
+@pytest.fixture
+def chunks():
+    """Fixture: um trecho repetido em dois PDFs (com pequena variação)."""
+    return [
+        _chunk(BASE, "a.pdf", 0, page_start=3, page_end=3),
+        _chunk("Inventario rotativo confere o saldo fisico dos itens.", "a.pdf", 1),
+        _chunk(BASE.replace("periodo", "período"), "b.pdf", 4, page_start=7, page_end=8),
+        _chunk("\n\n--- Página 2 ---\n" + BASE, "c.pdf", 9),
+    ]
+
+
+class TestNearDuplicateFilter:
+    """Testa a detecção de quase duplicatas."""
+
+    def test_duplicates_removed(self, chunks):
+        """Teste: variações do mesmo trecho são removidas."""
+        kept, report = deduplicate_chunks(chunks)
+
+        assert [c["source"] for c in kept] == ["a.pdf", "a.pdf"]
+        assert report.input_chunks == 4
+        assert report.removed_chunks == 2
+        assert report.merged_chunks == 1
+        assert report.removed_ratio == 0.5
+        assert report.removed_chars == len(chunks[2]["content"]) + len(chunks[3]["content"])
+
+    def test_provenance_kept(self, chunks):
+        """Teste: chunk mantido lista a origem das duplicatas."""
+        kept, _ = deduplicate_chunks(chunks)
+
+        assert kept[0]["duplicates"] == [
+            {"source": "b.pdf", "chunk_id": 4, "page_start": 7, "page_end": 8},
+            {"source": "c.pdf", "chunk_id": 9},
+        ]
+        assert "duplicates" not in kept[1]
+
+    def test_distinct_texts_kept(self):
+        """Teste: textos diferentes não são confundidos."""
+        texts = [f"Item {i} tem lote economico de {i * 7} unidades por pedido." for i in range(30)]
+        kept, report = deduplicate_chunks(
+            [_chunk(t, "a.pdf", i) for i, t in enumerate(texts)]
+        )
+
+        assert len(kept) == 30
+        assert report.removed_chunks == 0
+
+    def test_threshold(self):
+        """Teste: limiar alto mantém trechos só parecidos."""
+        first = BASE
+        second = BASE.rsplit(",", 1)[0] + ", com revisao trimestral das classes e metas."
+        dedup = NearDuplicateFilter(threshold=0.99)
+
+        kept = list(dedup.filter([_chunk(first, "a.pdf", 0), _chunk(second, "b.pdf", 1)]))
+
+        assert len(kept) == 2
+
+    def test_similarity_estimate(self):
+        """Teste: assinatura aproxima a similaridade de Jaccard."""
+        dedup = NearDuplicateFilter(num_perm=256, bands=32)
+        a, b = BASE, BASE.replace("valor", "custo")
+        sa, sb = dedup.shingles(a), dedup.shingles(b)
+        jaccard = len(sa & sb) / len(sa | sb)
+
+        estimate = (dedup.signature(a) == dedup.signature(b)).mean()
+
+        assert abs(estimate - jaccard) < 0.15
+
+
+class TestDuplicatesInChunkStore:
+    """Testa a origem das duplicatas no chunk store e nas citações."""
+
+    def test_streaming_filter_to_store(self, tmp_path, chunks):
+        """Teste: duplicatas anotadas durante o gerador são gravadas."""
+        dedup = NearDuplicateFilter()
+
+        count = ChunkStore.write(str(tmp_path), dedup.filter(chunks), dedup.duplicates)
+
+        store = ChunkStore(str(tmp_path))
+        assert count == 2
+        assert [d["source"] for d in store.get(0)["duplicates"]] == ["b.pdf", "c.pdf"]
+        assert "duplicates" not in store.get(1)
+        store.close()
+
+    def test_rewrite_without_duplicates(self, tmp_path, chunks):
+        """Teste: regravar sem duplicatas apaga a origem antiga."""
+        kept, _ = deduplicate_chunks(chunks)
+        ChunkStore.write(str(tmp_path), kept)
+        ChunkStore.write(str(tmp_path), chunks[:2])
+
+        store = ChunkStore(str(tmp_path))
+        assert store.duplicates == {}
+        store.close()
+
+    def test_citation_lists_every_source(self, chunks):
+        """Teste: citação traz as outras fontes em also_in."""
+        kept, _ = deduplicate_chunks(chunks)
+
+        citation = RAGPipeline._build_citations([kept[0]])[0]
+
+        assert citation.source == "a.pdf"
+        assert [(s.source, s.page_start) for s in citation.also_in] == [
+            ("b.pdf", 7),
+            ("c.pdf", None),
+        ]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,152 @@
+"""
+Testes para o job de embeddings da indexação.
+
+Valida:
+- Lotes embeddados em paralelo e devolvidos na ordem
+- Backoff exponencial em erros temporários e falha imediata em erros de
+  requisição
+- Retomada a partir dos checkpoints de lotes concluídos
+- Cota de tokens por minuto
+"""
+
+import os
+
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+
+from src.ingestion.embedding_job import EmbeddingJob
+from src.utils.rate_limit import TokenRateLimiter
+
+
+def _vector(text):
+    return [float(len(text)), float(sum(map(ord, text)) % 97)]
+
+
+class FlakyEmbeddings:
+    """Embeddings falsos que falham nas chamadas indicadas."""
+
+    def __init__(self, fail_on=(), error=None):
+        self.calls = []
+        self.fail_on = set(fail_on)
+        self.error = error or RuntimeError("timeout")
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        if len(self.calls) in self.fail_on:
+            raise self.error
+        return [_vector(t) for t in texts]
+
+
+TEXTS = [f"chunk {i}" for i in range(10)]
+
+
+class TestEmbeddingJob:
+    """Testa lotes, concorrência e retomada."""
+
+    def test_batches_in_order(self):
+        """Teste: vetores na ordem dos textos, em lotes de batch_size."""
+        embeddings = FlakyEmbeddings()
+        job = EmbeddingJob(embeddings, batch_size=3, max_concurrency=4)
+
+        vectors = job.run(TEXTS)
+
+        np.testing.assert_array_equal(vectors, np.array([_vector(t) for t in TEXTS]))
+        assert sorted(len(c) for c in embeddings.calls) == [1, 3, 3, 3]
+        assert job.report.batches == 4
+        assert job.report.chunks == 10
+        assert job.report.tokens > 0
+
+    def test_retries_with_backoff(self):
+        """Teste: erro temporário é repetido com espera crescente."""
+        sleeps = []
+        embeddings = FlakyEmbeddings(fail_on={1, 2})
+        job = EmbeddingJob(
+            embeddings, batch_size=10, backoff_base=1.0, sleep=sleeps.append
+        )
+
+        vectors = job.run(TEXTS)
+
+        assert vectors.shape == (10, 2)
+        assert job.report.retries == 2
+        assert 0.5 <= sleeps[0] <= 1.0
+        assert 1.0 <= sleeps[1] <= 2.0
+
+    def test_request_errors_are_not_retried(self):
+        """Teste: erro 400 falha na hora."""
+        error = RuntimeError("bad request")
+        error.status_code = 400
+        job = EmbeddingJob(
+            FlakyEmbeddings(fail_on={1}, error=error), sleep=MagicMock()
+        )
+
+        with pytest.raises(RuntimeError):
+            job.run(TEXTS)
+
+        assert job.report.retries == 0
+
+    def test_resume_from_checkpoints(self, tmp_path):
+        """Teste: lotes concluídos não vão de novo para a API."""
+        checkpoint_dir = str(tmp_path / "ckpt")
+        failing = FlakyEmbeddings(fail_on={3})
+        job = EmbeddingJob(
+            failing, checkpoint_dir, batch_size=3, max_concurrency=1, max_retries=0
+        )
+        with pytest.raises(RuntimeError):
+            job.run(TEXTS)
+        assert len(os.listdir(checkpoint_dir)) == 2
+
+        embeddings = FlakyEmbeddings()
+        resumed = EmbeddingJob(embeddings, checkpoint_dir, batch_size=3)
+        vectors = resumed.run(TEXTS)
+
+        assert resumed.report.resumed_batches == 2
+        assert sorted(embeddings.calls) == sorted([TEXTS[6:9], TEXTS[9:]])
+        np.testing.assert_array_equal(vectors, np.array([_vector(t) for t in TEXTS]))
+
+        resumed.clear_checkpoints()
+        assert not os.path.exists(checkpoint_dir)
+
+    def test_changed_batch_is_not_reused(self, tmp_path):
+        """Teste: checkpoint de texto diferente não é aproveitado."""
+        checkpoint_dir = str(tmp_path / "ckpt")
+        EmbeddingJob(FlakyEmbeddings(), checkpoint_dir, batch_size=5).run(TEXTS)
+
+        embeddings = FlakyEmbeddings()
+        job = EmbeddingJob(embeddings, checkpoint_dir, batch_size=5)
+        job.run(TEXTS[:5] + ["outro texto"] + TEXTS[6:])
+
+        assert job.report.resumed_batches == 1
+        assert len(embeddings.calls) == 1
+
+
+class TestTokenRateLimiter:
+    """Testa a cota de tokens por minuto."""
+
+    def test_waits_when_quota_is_spent(self):
+        """Teste: passar da cota espera o tempo de recarga."""
+        now = [0.0]
+        sleeps = []
+        limiter = TokenRateLimiter(600, clock=lambda: now[0], sleep=sleeps.append)
+
+        assert limiter.acquire(600) == 0.0
+        waited = limiter.acquire(100)
+
+        # 600 tokens/min = 10 tokens/s
+        assert waited == pytest.approx(10.0)
+        assert sleeps == [pytest.approx(10.0)]
+
+    def test_refills_over_time(self):
+        """Teste: o balde enche com o tempo, até a cota."""
+        now = [0.0]
+        limiter = TokenRateLimiter(600, clock=lambda: now[0], sleep=MagicMock())
+
+        limiter.acquire(600)
+        now[0] = 30.0
+
+        assert limiter.acquire(300) == 0.0
+        assert limiter.acquire(10) == pytest.approx(1.0)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,166 @@
+"""
+Testes para os provedores de embeddings e metadados do índice.
+
+Valida:
+- Seleção de provedor via get_embedding_provider
+- Backend local (sentence-transformers mockado) em lotes e assíncrono
+- Recusa de índices construídos com outro provedor/modelo/dimensão
+"""
+
+import os
+
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.core.embeddings import (
+    EMBEDDING_PROVIDERS,
+    EmbeddingProvider,
+    LocalEmbeddings,
+    get_embedding_provider,
+    register_embedding_provider,
+)
+from src.core.index_metadata import (
+    check_embedding_compatibility,
+    read_index_metadata,
+    write_index_metadata,
+)
+from src.ingestion.indexer import create_vector_index
+from src.rag.retriever import VectorRetriever
+
+
+@pytest.fixture
+def fake_sentence_transformer():
+    """Fixture: SentenceTransformer falso com dimensão 4."""
+    model = MagicMock()
+    model.get_sentence_embedding_dimension.return_value = 4
+    model.encode.side_effect = lambda texts, **kwargs: np.ones(
+        (len(texts), 4), dtype=np.float32
+    )
+    with patch("sentence_transformers.SentenceTransformer", return_value=model):
+        yield model
+
+
+class TestEmbeddingProviders:
+    """Testa o registro e a criação de provedores."""
+
+    def test_unknown_provider(self):
+        """Teste: provedor desconhecido gera erro claro."""
+        with pytest.raises(ValueError, match="desconhecido"):
+            get_embedding_provider("inexistente")
+
+    def test_register_custom_provider(self):
+        """Teste: provedores podem ser registrados em tempo de execução."""
+        fake = EmbeddingProvider(name="fake", model="m", embeddings=MagicMock())
+        register_embedding_provider("fake", lambda model: fake)
+
+        try:
+            assert get_embedding_provider("fake") is fake
+            assert fake.cache_key == "fake:m"
+        finally:
+            EMBEDDING_PROVIDERS.pop("fake")
+
+    def test_local_provider(self, fake_sentence_transformer):
+        """Teste: provedor local expõe modelo e dimensão."""
+        with patch("torch.quantization.quantize_dynamic") as quantize:
+            provider = get_embedding_provider("local", model="modelo-local")
+
+        assert provider.name == "local"
+        assert provider.dimension == 4
+        quantize.assert_called_once()
+
+
+class TestLocalEmbeddings:
+    """Testa o backend local de embeddings."""
+
+    def test_embed_documents_in_batches(self, fake_sentence_transformer):
+        """Teste: textos são enviados ao modelo com batch_size."""
+        embeddings = LocalEmbeddings("modelo", quantize=False, batch_size=8)
+
+        vectors = embeddings.embed_documents(["a", "b", "c"])
+
+        assert len(vectors) == 3
+        _, kwargs = fake_sentence_transformer.encode.call_args
+        assert kwargs["batch_size"] == 8
+
+    @pytest.mark.asyncio
+    async def test_aembed_query(self, fake_sentence_transformer):
+        """Teste: caminho assíncrono roda no pool de threads."""
+        embeddings = LocalEmbeddings("modelo", quantize=False)
+
+        vector = await embeddings.aembed_query("estoque")
+
+        assert vector == [1.0, 1.0, 1.0, 1.0]
+
+    def test_invalid_backend(self, fake_sentence_transformer):
+        """Teste: backend inválido é recusado."""
+        with pytest.raises(ValueError):
+            LocalEmbeddings("modelo", backend="gpu")
+
+
+class TestIndexMetadata:
+    """Testa a verificação de compatibilidade do índice."""
+
+    def test_roundtrip(self, tmp_path):
+        """Teste: metadados gravados são lidos de volta."""
+        write_index_metadata(str(tmp_path), {"embedding_provider": "local"})
+        assert read_index_metadata(str(tmp_path)) == {"embedding_provider": "local"}
+        assert read_index_metadata(str(tmp_path / "vazio")) is None
+
+    def test_rejects_other_provider(self):
+        """Teste: índice local não pode ser consultado com OpenAI."""
+        metadata = {"embedding_provider": "local", "embedding_model": "m"}
+        with pytest.raises(ValueError, match="provedor"):
+            check_embedding_compatibility(metadata, "openai", "m", None)
+
+    def test_rejects_dimension_mismatch(self):
+        """Teste: dimensões diferentes são recusadas."""
+        metadata = {"embedding_provider": "local", "embedding_model": "m"}
+        with pytest.raises(ValueError, match="Dimensão"):
+            check_embedding_compatibility(
+                metadata, "local", "m", dimension=384, index_dimension=768
+            )
+
+    def test_legacy_index_assumes_openai(self):
+        """Teste: índice sem metadados é tratado como OpenAI."""
+        check_embedding_compatibility(
+            None, "openai", "openai/text-embedding-3-small", None
+        )
+        with pytest.raises(ValueError):
+            check_embedding_compatibility(None, "local", "m", 384)
+
+    def test_openrouter_prefix_is_equivalent(self):
+        """Teste: prefixo 'openai/' do OpenRouter não conta como outro modelo."""
+        metadata = {
+            "embedding_provider": "openai",
+            "embedding_model": "text-embedding-3-small",
+        }
+        check_embedding_compatibility(
+            metadata, "openai", "openai/text-embedding-3-small", None
+        )
+
+    def test_indexer_and_retriever_resolve_same_model(
+        self, tmp_path, fake_sentence_transformer
+    ):
+        """Teste: o indexer grava o mesmo modelo que o retriever resolve."""
+        env = {
+            "EMBEDDING_PROVIDER": "local",
+            "LOCAL_EMBEDDING_MODEL": "modelo-local",
+            "EMBEDDINGS_MODEL": "outro-modelo",
+        }
+        chunks = [
+            {"content": "Curva ABC", "source": "a.pdf", "chunk_id": 0, "total_chunks": 1}
+        ]
+        with patch.dict(os.environ, env), patch("torch.quantization.quantize_dynamic"):
+            create_vector_index(
+                chunks, index_path=str(tmp_path), index_type="flat", index_params={}
+            )
+            retriever = VectorRetriever(index_path=str(tmp_path))
+
+        metadata = read_index_metadata(str(tmp_path))
+        assert metadata["embedding_model"] == "modelo-local"
+        assert retriever.embedding_provider.model == "modelo-local"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
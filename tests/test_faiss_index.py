@@ -0,0 +1,185 @@
+"""
+Testes para os tipos de índice FAISS (Flat, IVF-Flat, IVF-PQ, HNSW).
+
+Valida:
+- Parâmetros padrão ajustados ao tamanho do corpus
+- Construção/treino de cada tipo e ajuste de nprobe/efSearch
+- Parâmetros persistidos em index_meta.json e aplicados pelo retriever
+- Relatório de recall x latência contra o Flat
+"""
+
+import os
+
+import faiss
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.core.embeddings import EmbeddingProvider
+from src.core.faiss_index import (
+    INDEX_TYPES,
+    apply_search_params,
+    build_index,
+    recall_latency_report,
+    resolve_index_params,
+)
+from src.core.index_metadata import read_index_metadata
+from src.ingestion.indexer import create_vector_index
+from src.rag.retriever import VectorRetriever
+
+
+@pytest.fixture
+def vectors():
+    """Fixture: 600 vetores aleatórios de dimensão 16."""
+    return np.random.default_rng(0).normal(size=(600, 16)).astype(np.float32)
+
+
+class TestResolveIndexParams:
+    """Testa os parâmetros padrão de cada tipo."""
+
+    def test_unknown_type(self):
+        """Teste: tipo desconhecido gera erro claro."""
+        with pytest.raises(ValueError, match="desconhecido"):
+            resolve_index_params("lsh", 100, 16)
+
+    def test_nlist_limited_by_training_points(self):
+        """Teste: nlist garante ao menos 39 vetores de treino por lista."""
+        params = resolve_index_params("ivf_flat", 361, 1536)
+        assert params["nlist"] == 9
+        assert resolve_index_params("ivf_flat", 100_000, 1536)["nlist"] == 1264
+
+    def test_pq_defaults(self):
+        """Teste: pq_m divide a dimensão e nbits cabe no corpus."""
+        params = resolve_index_params("ivf_pq", 361, 1536)
+        assert 1536 % params["pq_m"] == 0
+        assert 2 ** params["pq_nbits"] * 39 <= 361
+
+    def test_overrides(self):
+        """Teste: parâmetros explícitos prevalecem."""
+        params = resolve_index_params("hnsw", 10, 8, hnsw_m=8, ef_search=None)
+        assert params == {
+            "type": "hnsw",
+            "hnsw_m": 8,
+            "ef_construction": 200,
+            "ef_search": 64,
+        }
+
+
+class TestBuildIndex:
+    """Testa a construção e a busca em cada tipo de índice."""
+
+    @pytest.mark.parametrize("index_type", INDEX_TYPES)
+    def test_build_and_search(self, vectors, index_type):
+        """Teste: todo tipo treina, indexa e encontra o próprio vetor."""
+        params = resolve_index_params(index_type, len(vectors), vectors.shape[1])
+        index = build_index(vectors, params)
+
+        assert index.ntotal == len(vectors)
+        _, ids = index.search(vectors[:5], 1)
+        if index_type != "ivf_pq":
+            assert ids[:, 0].tolist() == [0, 1, 2, 3, 4]
+
+    def test_search_params_applied(self, vectors):
+        """Teste: nprobe e efSearch são ajustáveis após a construção."""
+        ivf = build_index(vectors, resolve_index_params("ivf_flat", 600, 16, nprobe=3))
+        assert faiss.extract_index_ivf(ivf).nprobe == 3
+
+        apply_search_params(ivf, {"nprobe": 3}, nprobe=5)
+        assert faiss.extract_index_ivf(ivf).nprobe == 5
+
+        hnsw = build_index(vectors, resolve_index_params("hnsw", 600, 16))
+        apply_search_params(hnsw, None, ef_search=128)
+        assert hnsw.hnsw.efSearch == 128
+
+    def test_search_params_through_idmap(self, vectors):
+        """Teste: índices envolvidos por IDMap também são ajustados."""
+        params = resolve_index_params("hnsw", 600, 16)
+        index = faiss.IndexIDMap2(faiss.IndexHNSWFlat(16, 8))
+
+        apply_search_params(index, params, ef_search=99)
+
+        assert faiss.downcast_index(index.index).hnsw.efSearch == 99
+
+
+class TestRecallLatencyReport:
+    """Testa o relatório de recall x latência."""
+
+    def test_flat_has_full_recall(self, vectors):
+        """Teste: Flat é a referência (recall 1.0) e nprobe maior não piora."""
+        rows = recall_latency_report(
+            vectors,
+            vectors[:20],
+            [
+                {"type": "flat"},
+                {"type": "ivf_flat", "nprobe": 1},
+                {"type": "ivf_flat", "nprobe": 15},
+            ],
+            top_k=5,
+        )
+
+        assert rows[0]["recall"] == 1.0
+        assert rows[2]["recall"] >= rows[1]["recall"]
+        assert rows[2]["recall"] == 1.0
+        assert all(row["latency_ms"] > 0 for row in rows)
+
+
+class TestIndexerWithIndexType:
+    """Testa o indexer e o retriever com índices aproximados."""
+
+    def test_params_persisted_and_applied(self, tmp_path, vectors):
+        """Teste: parâmetros vão para index_meta.json e o retriever os usa."""
+        embeddings = MagicMock()
+        embeddings.embed_documents.side_effect = lambda texts: [
+            vectors[int(t.split()[1])].tolist() for t in texts
+        ]
+        provider = EmbeddingProvider(name="fake", model="m", embeddings=embeddings)
+        chunks = [
+            {"content": f"chunk {i}", "source": "a.pdf", "chunk_id": i, "total_chunks": 600}
+            for i in range(600)
+        ]
+
+        with patch("src.ingestion.indexer.get_embedding_provider", return_value=provider):
+            create_vector_index(
+                chunks,
+                index_path=str(tmp_path),
+                index_type="ivf_flat",
+                index_params={"nlist": 10, "nprobe": 4},
+            )
+
+        metadata = read_index_metadata(str(tmp_path))
+        assert metadata["index"]["type"] == "ivf_flat"
+        assert metadata["index"]["nprobe"] == 4
+
+        with patch("src.rag.retriever.get_embedding_provider", return_value=provider):
+            retriever = VectorRetriever(index_path=str(tmp_path))
+
+        ivf = faiss.extract_index_ivf(retriever.search_engine.index)
+        assert ivf.nprobe == 4
+
+        retriever.set_search_params(nprobe=10)
+        assert ivf.nprobe == 10
+
+        chunks_found, _ = retriever.retrieve("q", top_k=1, embedding=vectors[7])
+        assert chunks_found[0]["content"] == "chunk 7"
+
+    def test_empty_index_type_env_means_flat(self, tmp_path, vectors):
+        """Teste: VECTOR_INDEX_TYPE vazio cai no padrão flat."""
+        embeddings = MagicMock()
+        embeddings.embed_documents.side_effect = lambda texts: [
+            vectors[int(t.split()[1])].tolist() for t in texts
+        ]
+        provider = EmbeddingProvider(name="fake", model="m", embeddings=embeddings)
+        chunks = [
+            {"content": f"chunk {i}", "source": "a.pdf", "chunk_id": i, "total_chunks": 10}
+            for i in range(10)
+        ]
+
+        with patch.dict(os.environ, {"VECTOR_INDEX_TYPE": ""}):
+            with patch("src.ingestion.indexer.get_embedding_provider", return_value=provider):
+                create_vector_index(chunks, index_path=str(tmp_path), index_params={})
+
+        assert read_index_metadata(str(tmp_path))["index"]["type"] == "flat"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
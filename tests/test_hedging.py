@@ -0,0 +1,290 @@
+"""
+Testes para o prazo, o hedging e o fallback da geração.
+
+Valida:
+- Percentil da janela de latências
+- Cópia da requisição quando o primeiro token demora (síncrono e async)
+- Fallback para outro modelo perto do prazo e quando a chamada falha
+- DeadlineExceeded sem nenhum token e métricas da tentativa vencedora
+"""
+
+import asyncio
+import itertools
+import os
+import time
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+from unittest.mock import patch
+
+from src.rag.embedding_cache import EmbeddingTimings
+from src.rag.generator import ResponseGenerator
+from src.rag.hedging import (
+    DeadlineExceeded,
+    GenerationReport,
+    HedgePolicy,
+    LatencyTracker,
+)
+from src.rag.pipeline import RAGPipeline
+from src.utils.pricing import ModelPricing
+
+
+CHUNKS = [
+    {"content": "PEPS: primeiro a entrar, primeiro a sair.", "source": "a.pdf", "chunk_id": 0}
+]
+
+
+class FakeChain:
+    """
+    Chain falsa em streaming: a n-ésima chamada espera delays[n] antes do
+    primeiro token (None = falha).
+    """
+
+    def __init__(self, name, delays):
+        self.name = name
+        self.delays = itertools.chain(delays, itertools.repeat(delays[-1]))
+        self.calls = 0
+
+    def _plan(self):
+        self.calls += 1
+        return next(self.delays)
+
+    def _chunks(self):
+        return [
+            AIMessageChunk(content=f"{self.name} "),
+            AIMessageChunk(content="ok"),
+            AIMessageChunk(
+                content="",
+                usage_metadata={"input_tokens": 50, "output_tokens": 2, "total_tokens": 52},
+            ),
+        ]
+
+    def invoke(self, inputs):
+        self._plan()
+        return AIMessage(content=f"{self.name} ok")
+
+    def stream(self, inputs):
+        delay = self._plan()
+        if delay is None:
+            raise RuntimeError("503")
+        time.sleep(delay)
+        yield from self._chunks()
+
+    async def astream(self, inputs):
+        delay = self._plan()
+        if delay is None:
+            raise RuntimeError("503")
+        await asyncio.sleep(delay)
+        for chunk in self._chunks():
+            yield chunk
+
+
+def _generator(policy, primary, fallbacks=None):
+    with patch("src.rag.generator.ChatOpenAI"):
+        generator = ResponseGenerator()
+    generator.model_name = "principal"
+    generator.hedge_policy = policy
+    generator.chain = primary
+    generator._fallback_chains = dict(fallbacks or {})
+    return generator
+
+
+class TestLatencyTracker:
+    """Testa a janela de latências."""
+
+    def test_percentile(self):
+        """Teste: percentil só responde com amostras suficientes."""
+        tracker = LatencyTracker(window=100, min_samples=10)
+        for ms in range(1, 10):
+            tracker.record(ms)
+        assert tracker.percentile(95) is None
+
+        for ms in range(10, 101):
+            tracker.record(ms)
+        assert tracker.percentile(95) == 95
+        assert tracker.percentile(50) == 50
+
+    def test_hedge_delay_floor(self):
+        """Teste: a espera da cópia nunca fica abaixo do mínimo."""
+        policy = HedgePolicy(hedge_percentile=90, min_delay_ms=200)
+        tracker = LatencyTracker(min_samples=1)
+        assert policy.hedge_delay_ms(tracker) == 200
+
+        tracker.record(50)
+        assert policy.hedge_delay_ms(tracker) == 200
+        tracker.record(900)
+        assert policy.hedge_delay_ms(tracker) == 900
+
+
+class TestHedgedGeneration:
+    """Testa a corrida de tentativas no ResponseGenerator."""
+
+    def test_hedge_wins_when_primary_stalls(self):
+        """Teste: a cópia vence quando a primeira chamada trava."""
+        primary = FakeChain("principal", [1.0, 0.0])
+        generator = _generator(HedgePolicy(hedge_percentile=95, min_delay_ms=50), primary)
+        report = GenerationReport()
+
+        start = time.time()
+        answer, latency, prompt_tokens, _ = generator.generate(
+            "O que é PEPS?", CHUNKS, report=report
+        )
+
+        assert time.time() - start < 0.5
+        assert answer == "principal ok"
+        assert prompt_tokens == 50
+        assert (report.attempts, report.winner, report.winner_kind) == (2, 2, "hedge")
+        assert report.discarded_models == ["principal"]
+        assert len(generator.first_token_latency) == 1
+
+    def test_no_hedge_when_first_token_is_fast(self):
+        """Teste: sem demora, só uma chamada é feita."""
+        primary = FakeChain("principal", [0.0])
+        generator = _generator(HedgePolicy(hedge_percentile=95, min_delay_ms=200), primary)
+        report = GenerationReport()
+
+        generator.generate("O que é PEPS?", CHUNKS, report=report)
+
+        assert primary.calls == 1
+        assert report.winner_kind == "primary"
+
+    @pytest.mark.asyncio
+    async def test_async_hedge(self):
+        """Teste: caminho assíncrono também dispara a cópia."""
+        primary = FakeChain("principal", [1.0, 0.0])
+        generator = _generator(HedgePolicy(hedge_percentile=95, min_delay_ms=50), primary)
+        report = GenerationReport()
+
+        start = time.time()
+        answer, _, _, _ = await generator.agenerate(
+            "O que é PEPS?", CHUNKS, report=report
+        )
+
+        assert time.time() - start < 0.5
+        assert answer == "principal ok"
+        assert report.winner_kind == "hedge"
+
+    @pytest.mark.asyncio
+    async def test_fallback_near_deadline(self):
+        """Teste: perto do prazo o modelo de fallback é disparado e vence."""
+        primary = FakeChain("principal", [1.0])
+        fast = FakeChain("rapido", [0.0])
+        policy = HedgePolicy(fallback_models=["rapido"], fallback_margin_ms=250)
+        generator = _generator(policy, primary, {"rapido": fast})
+        report = GenerationReport()
+
+        answer, _, _, _ = await generator.agenerate(
+            "O que é PEPS?", CHUNKS, deadline=time.time() + 0.4, report=report
+        )
+
+        assert answer == "rapido ok"
+        assert (report.winner_kind, report.model) == ("fallback", "rapido")
+
+    def test_fallback_on_error(self):
+        """Teste: falha da chamada principal dispara o fallback na hora."""
+        primary = FakeChain("principal", [None])
+        fast = FakeChain("rapido", [0.0])
+        generator = _generator(HedgePolicy(fallback_models=["rapido"]), primary, {"rapido": fast})
+        report = GenerationReport()
+
+        answer, _, _, _ = generator.generate(
+            "O que é PEPS?", CHUNKS, deadline=time.time() + 5, report=report
+        )
+
+        assert answer == "rapido ok"
+        assert report.winner_kind == "fallback"
+        # A principal falhou antes: não entra no custo
+        assert report.discarded_models == []
+
+    def test_error_without_fallback_propagates(self):
+        """Teste: sem fallback, o erro da chamada chega ao pipeline."""
+        generator = _generator(
+            HedgePolicy(hedge_percentile=95), FakeChain("principal", [None])
+        )
+
+        with pytest.raises(RuntimeError):
+            generator.generate("O que é PEPS?", CHUNKS)
+
+    @pytest.mark.asyncio
+    async def test_deadline_exceeded(self):
+        """Teste: prazo sem nenhum token levanta DeadlineExceeded a tempo."""
+        generator = _generator(HedgePolicy(), FakeChain("principal", [2.0]))
+
+        start = time.time()
+        with pytest.raises(DeadlineExceeded):
+            await generator.agenerate(
+                "O que é PEPS?", CHUNKS, deadline=time.time() + 0.1
+            )
+        assert time.time() - start < 0.5
+
+    def test_policy_from_env(self):
+        """Teste: configuração lida do ambiente; hedging desligado por padrão."""
+        env = {"LLM_FALLBACK_MODELS": "openai/gpt-4o-mini, openai/gpt-4.1-nano"}
+        with patch.dict(os.environ, env):
+            policy = HedgePolicy.from_env()
+
+        assert policy.fallback_models == ["openai/gpt-4o-mini", "openai/gpt-4.1-nano"]
+        with patch.dict(os.environ, {"LLM_HEDGE_PERCENTILE": "0"}):
+            assert HedgePolicy.from_env().hedging is False
+
+
+class TestPipelineDeadline:
+    """Testa o prazo integrado ao pipeline."""
+
+    @pytest.fixture
+    def pipeline(self):
+        with patch.dict(os.environ, {"RESPONSE_CACHE_BACKEND": "memory"}):
+            with patch("src.rag.pipeline.VectorRetriever"):
+                with patch("src.rag.pipeline.ResponseGenerator"):
+                    pipeline = RAGPipeline(index_path="vector_index")
+        pipeline.retriever.embed_query_timed.return_value = (
+            [1.0, 0.0],
+            EmbeddingTimings(embedding_ms=5.0),
+        )
+        pipeline.retriever.retrieve.return_value = (CHUNKS, 10.0)
+        pipeline.generator = _generator(
+            HedgePolicy(fallback_models=["rapido"], fallback_margin_ms=250),
+            FakeChain("principal", [1.0]),
+            {"rapido": FakeChain("rapido", [0.0])},
+        )
+        return pipeline
+
+    def test_deadline_runs_through_pipeline(self, pipeline):
+        """Teste: o prazo da pergunta leva ao fallback e aparece nas métricas."""
+        response = pipeline.process_question("O que é PEPS?", deadline_ms=400)
+
+        metrics = response.metrics
+        assert response.answer == "rapido ok"
+        assert metrics.generation_winner == "fallback"
+        assert metrics.generation_model == "rapido"
+        assert metrics.generation_attempts == 2
+        assert metrics.total_latency_ms < 900
+
+        # Resposta do fallback não vai para o cache
+        pipeline.generator.chain = FakeChain("principal", [0.0])
+        assert pipeline.process_question("O que é PEPS?").answer == "principal ok"
+
+    def test_cost_uses_winner_model_and_discarded_prompts(self, pipeline):
+        """Teste: custo com o preço do fallback mais o prompt da primária cancelada."""
+        prices = {
+            "principal": ModelPricing(10.0, 40.0),
+            "rapido": ModelPricing(1.0, 4.0),
+        }
+        pipeline._model_pricing.clear()
+        with patch(
+            "src.rag.pipeline.get_model_pricing", side_effect=prices.get
+        ) as lookup:
+            response = pipeline.process_question("O que é PEPS?", deadline_ms=400)
+            pipeline.process_question("Qual a diferença entre PEPS e UEPS?", deadline_ms=400)
+
+        metrics = response.metrics
+        assert metrics.generation_model == "rapido"
+        assert metrics.discarded_prompt_tokens == 50
+        # rapido: 50 * 1.0 + 2 * 4.0; principal cancelada: 50 * 10.0
+        assert metrics.estimated_cost_usd == pytest.approx((50 + 8 + 500) / 1_000_000)
+        # Uma consulta por modelo
+        assert lookup.call_count == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
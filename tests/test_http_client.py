@@ -0,0 +1,131 @@
+"""
+Testes para os clientes HTTP compartilhados.
+
+Valida:
+- Pool, timeouts e retries lidos do ambiente (HTTP/2 só com o pacote h2)
+- Reuso da conexão (keep-alive) entre requisições
+- Mesmos clientes repassados aos embeddings e ao LLM
+"""
+
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from unittest.mock import patch
+
+from src.core.embeddings import get_embedding_provider
+from src.core.http_client import HttpClients, http2_available
+from src.rag.generator import ResponseGenerator
+from src.rag.pipeline import RAGPipeline
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.ports.add(self.client_address[1])
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.ports = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestHttpClients:
+    """Testa a criação e o reuso dos clientes."""
+
+    def test_from_env(self):
+        """Teste: pool, timeouts e retries vêm das variáveis de ambiente."""
+        env = {
+            "HTTP_MAX_CONNECTIONS": "32",
+            "HTTP_CONNECT_TIMEOUT_S": "2",
+            "HTTP_READ_TIMEOUT_S": "15",
+            "HTTP_MAX_RETRIES": "1",
+            "HTTP2": "true",
+        }
+        with patch.dict(os.environ, env):
+            clients = HttpClients.from_env()
+
+        timeout = clients.async_client.timeout
+        assert (timeout.connect, timeout.read) == (2.0, 15.0)
+        assert clients.max_retries == 1
+        assert clients.http2 is http2_available()
+        clients.close()
+
+    def test_http2_can_be_disabled(self):
+        """Teste: HTTP2=false força HTTP/1.1."""
+        with patch.dict(os.environ, {"HTTP2": "false"}):
+            assert HttpClients.from_env().http2 is False
+
+    def test_reuses_connection(self, server):
+        """Teste: requisições seguidas usam a mesma conexão TCP."""
+        clients = HttpClients.from_env()
+        url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+        for _ in range(3):
+            assert clients.sync_client.get(url).text == "ok"
+
+        assert len(server.ports) == 1
+        clients.close()
+
+    @pytest.mark.asyncio
+    async def test_async_reuses_connection(self, server):
+        """Teste: o cliente assíncrono também mantém a conexão aberta."""
+        clients = HttpClients.from_env()
+        url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+        for _ in range(3):
+            assert (await clients.async_client.get(url)).text == "ok"
+
+        assert len(server.ports) == 1
+        await clients.aclose()
+
+
+class TestSharedClients:
+    """Testa o repasse dos clientes aos componentes."""
+
+    def test_embeddings_and_llm_receive_clients(self):
+        """Teste: OpenAIEmbeddings e ChatOpenAI recebem os mesmos clientes."""
+        clients = HttpClients.from_env()
+
+        with patch("src.core.embeddings.OpenAIEmbeddings") as embeddings:
+            get_embedding_provider("openai", http_clients=clients)
+        with patch("src.rag.generator.ChatOpenAI") as chat:
+            ResponseGenerator(http_clients=clients)
+
+        for mock in (embeddings, chat):
+            kwargs = mock.call_args.kwargs
+            assert kwargs["http_client"] is clients.sync_client
+            assert kwargs["http_async_client"] is clients.async_client
+            assert kwargs["max_retries"] == clients.max_retries
+
+    def test_pipeline_shares_clients(self):
+        """Teste: o pipeline cria um par de clientes para os dois lados."""
+        with patch("src.rag.pipeline.VectorRetriever") as retriever:
+            with patch("src.rag.pipeline.ResponseGenerator") as generator:
+                pipeline = RAGPipeline(index_path="vector_index")
+
+        clients = pipeline.http_clients
+        assert retriever.call_args.kwargs["http_clients"] is clients
+        assert generator.call_args.kwargs["http_clients"] is clients
+
+        pipeline.close()
+        assert clients.sync_client.is_closed
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
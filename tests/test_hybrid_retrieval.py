@@ -0,0 +1,252 @@
+"""
+Testes para a busca híbrida (BM25 + FAISS).
+
+Valida:
+- Tokenização em português (acentos, stopwords, plural)
+- Ranking BM25 e leitura do índice lexical via mmap
+- Fusão das listas com Reciprocal Rank Fusion e tempos por etapa
+- Modo degradado (só BM25) quando o embedding da query demora ou falha
+"""
+
+import asyncio
+import os
+import time
+
+import faiss
+import numpy as np
+import pytest
+from unittest.mock import patch
+
+from src.core.chunk_store import ChunkStore
+from src.core.lexical_index import LexicalIndex, tokenize, write_lexical_index
+from src.rag.embedding_cache import EmbeddingTimings
+from src.rag.pipeline import RAGPipeline
+from src.rag.retriever import RetrievalTimings, VectorRetriever
+from src.rag.search_engine import reciprocal_rank_fusion
+
+
+CHUNKS = [
+    {"content": "Gestão de estoques na empresa", "source": "a.pdf", "chunk_id": 0},
+    {"content": "Curva ABC: classificação dos itens", "source": "a.pdf", "chunk_id": 1},
+    {"content": "O método PEPS (FIFO) de avaliação", "source": "b.pdf", "chunk_id": 0},
+    {"content": "Lote econômico de compra e os lotes", "source": "b.pdf", "chunk_id": 1},
+]
+
+
+class TestLexicalIndex:
+    """Testa a tokenização e o ranking BM25."""
+
+    def test_tokenize(self):
+        """Teste: acentos e stopwords saem, plural vira singular."""
+        assert tokenize("O que é o Lote Econômico?") == ["lote", "economico"]
+        assert tokenize("--- Página 3 ---\nEstoques e lotes") == ["estoque", "lote"]
+
+    def test_exact_jargon_ranks_first(self):
+        """Teste: termos exatos do domínio trazem o chunk certo."""
+        index = LexicalIndex.build(c["content"] for c in CHUNKS)
+
+        _, rows = index.search("Como funciona o PEPS?", top_k=3)
+        assert list(rows) == [2]
+
+        _, rows = index.search("lote economico", top_k=3)
+        assert rows[0] == 3
+
+    def test_no_match(self):
+        """Teste: query sem termos do índice não retorna nada."""
+        index = LexicalIndex.build(c["content"] for c in CHUNKS)
+        scores, rows = index.search("o que é", top_k=3)
+
+        assert len(rows) == 0 and len(scores) == 0
+
+    def test_roundtrip(self, tmp_path):
+        """Teste: índice gravado e aberto via mmap dá o mesmo ranking."""
+        built = write_lexical_index(str(tmp_path), (c["content"] for c in CHUNKS))
+        loaded = LexicalIndex.load(str(tmp_path))
+
+        assert isinstance(loaded.rows, np.memmap)
+        for query in ("curva abc", "estoques", "fifo lote"):
+            expected, got = built.search(query, 4), loaded.search(query, 4)
+            assert list(expected[1]) == list(got[1])
+            assert np.allclose(expected[0], got[0])
+
+
+class TestReciprocalRankFusion:
+    """Testa a fusão das listas."""
+
+    def test_fusion(self):
+        """Teste: linha presente nas duas listas fica em primeiro."""
+        fused = reciprocal_rank_fusion([[0, 1, 2], [2, 3]], top_k=3, k=60)
+
+        # 1 e 3 empatam (segunda posição); o empate sai pela linha
+        assert [row for row, _ in fused] == [2, 0, 1]
+        assert fused[0][1] == pytest.approx(1 / 63 + 1 / 61)
+
+    def test_skips_missing_rows(self):
+        """Teste: linhas -1 do FAISS são ignoradas."""
+        assert reciprocal_rank_fusion([[1, -1]], top_k=5) == [(1, 1 / 61)]
+
+
+def _write_index(path, with_lexical=True):
+    index = faiss.IndexFlatL2(4)
+    index.add(np.eye(4, dtype=np.float32))
+    faiss.write_index(index, os.path.join(path, "index.faiss"))
+    ChunkStore.write(path, CHUNKS)
+    if with_lexical:
+        write_lexical_index(path, (c["content"] for c in CHUNKS))
+    return path
+
+
+def _retriever(index_path, **env):
+    with patch.dict(os.environ, env):
+        with patch("src.rag.retriever.FAISS"):
+            with patch("src.core.embeddings.OpenAIEmbeddings"):
+                return VectorRetriever(index_path=index_path)
+
+
+class TestHybridRetriever:
+    """Testa o VectorRetriever nos modos hybrid e lexical."""
+
+    def test_hybrid_fuses_both_lists(self, tmp_path):
+        """Teste: resultado traz o vizinho do FAISS e o acerto do BM25."""
+        retriever = _retriever(_write_index(str(tmp_path)), RETRIEVAL_MODE="hybrid")
+        timings = RetrievalTimings()
+
+        chunks, _ = retriever.retrieve(
+            "PEPS", top_k=2, embedding=[1.0, 0.0, 0.0, 0.0], timings=timings
+        )
+
+        assert {c["chunk_id"] for c in chunks} == {0}
+        assert {c["source"] for c in chunks} == {"a.pdf", "b.pdf"}
+        peps = next(c for c in chunks if c["source"] == "b.pdf")
+        assert peps["bm25_score"] > 0 and "rrf_score" in peps
+        assert timings.mode == "hybrid"
+        assert timings.lexical_ms > 0 and timings.vector_ms > 0
+
+    def test_lexical_mode_skips_embeddings(self, tmp_path):
+        """Teste: modo lexical não chama a API de embeddings."""
+        retriever = _retriever(_write_index(str(tmp_path)), RETRIEVAL_MODE="lexical")
+
+        chunks, _ = retriever.retrieve("curva ABC", top_k=3)
+
+        assert [c["chunk_id"] for c in chunks] == [1]
+        retriever.embeddings.embed_query.assert_not_called()
+
+    def test_lexical_batch_skips_embeddings(self, tmp_path):
+        """Teste: lote no modo lexical busca só no BM25, sem embeddings."""
+        retriever = _retriever(_write_index(str(tmp_path)), RETRIEVAL_MODE="lexical")
+
+        results, timings = retriever.retrieve_many(["curva ABC", "PEPS"], top_k=1)
+
+        assert [r[0]["source"] for r in results] == ["a.pdf", "b.pdf"]
+        assert all("bm25_score" in r[0] for r in results)
+        assert timings.mode == "lexical"
+        retriever.embeddings.embed_documents.assert_not_called()
+        retriever.embeddings.embed_query.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_async_lexical_batch_skips_embeddings(self, tmp_path):
+        """Teste: versão assíncrona do lote lexical também não chama a API."""
+        retriever = _retriever(_write_index(str(tmp_path)), RETRIEVAL_MODE="lexical")
+
+        results, timings = await retriever.aretrieve_many(["curva ABC"], top_k=1)
+
+        assert results[0][0]["chunk_id"] == 1
+        assert timings.mode == "lexical"
+        retriever.embeddings.aembed_documents.assert_not_called()
+
+    def test_vector_mode_unchanged(self, tmp_path):
+        """Teste: modo vector mantém o resultado só do FAISS."""
+        retriever = _retriever(_write_index(str(tmp_path)))
+
+        chunks, _ = retriever.retrieve("PEPS", top_k=1, embedding=[0.0, 1.0, 0.0, 0.0])
+
+        assert chunks[0]["content"].startswith("Curva ABC")
+        assert "rrf_score" not in chunks[0]
+
+    def test_builds_lexical_index_for_old_indexes(self, tmp_path):
+        """Teste: índice sem arquivos BM25 é indexado em memória."""
+        path = _write_index(str(tmp_path), with_lexical=False)
+        retriever = _retriever(path, RETRIEVAL_MODE="hybrid")
+
+        assert len(retriever.lexical_index) == len(CHUNKS)
+        assert not LexicalIndex.exists(path)
+
+    def test_invalid_mode(self, tmp_path):
+        """Teste: RETRIEVAL_MODE desconhecido é recusado."""
+        with pytest.raises(ValueError):
+            _retriever(_write_index(str(tmp_path)), RETRIEVAL_MODE="sparse")
+
+
+class TestDegradedMode:
+    """Testa a queda para o BM25 quando o embedding não chega a tempo."""
+
+    def test_slow_embedding_degrades(self, tmp_path):
+        """Teste: embedding acima do timeout retorna None."""
+        retriever = _retriever(_write_index(str(tmp_path)), EMBEDDING_TIMEOUT_MS="50")
+        retriever.embeddings.embed_query.side_effect = lambda q: (
+            time.sleep(0.5) or [1.0, 0.0, 0.0, 0.0]
+        )
+
+        start = time.time()
+        vector, timings = retriever.embed_query_timed("PEPS", allow_degraded=True)
+
+        assert vector is None
+        assert time.time() - start < 0.4
+        assert timings.embedding_ms >= 50
+        retriever.close()
+
+    def test_failed_embedding_degrades(self, tmp_path):
+        """Teste: erro na API de embeddings também cai para o BM25."""
+        retriever = _retriever(_write_index(str(tmp_path)))
+        retriever.embeddings.embed_query.side_effect = RuntimeError("503")
+
+        vector, _ = retriever.embed_query_timed("PEPS", allow_degraded=True)
+        assert vector is None
+
+        with pytest.raises(RuntimeError):
+            retriever.embed_query_timed("PEPS")
+
+    @pytest.mark.asyncio
+    async def test_async_slow_embedding_degrades(self, tmp_path):
+        """Teste: caminho assíncrono respeita o mesmo timeout."""
+
+        async def slow(query):
+            await asyncio.sleep(0.5)
+            return [1.0, 0.0, 0.0, 0.0]
+
+        retriever = _retriever(_write_index(str(tmp_path)), EMBEDDING_TIMEOUT_MS="50")
+        retriever.embeddings.aembed_query = slow
+
+        vector, _ = await retriever.aembed_query_timed("PEPS", allow_degraded=True)
+        assert vector is None
+
+    def test_pipeline_uses_lexical_search(self):
+        """Teste: sem embedding, o pipeline busca no BM25 e não guarda cache."""
+        with patch.dict(os.environ, {"RESPONSE_CACHE_BACKEND": "memory"}):
+            with patch("src.rag.pipeline.VectorRetriever"):
+                with patch("src.rag.pipeline.ResponseGenerator"):
+                    pipeline = RAGPipeline(index_path="vector_index")
+
+        pipeline.retriever.embed_query_timed.return_value = (
+            None,
+            EmbeddingTimings(embedding_ms=50.0),
+        )
+        pipeline.retriever.retrieve.return_value = (
+            [{"content": "O método PEPS", "source": "b.pdf", "chunk_id": 0}],
+            1.0,
+        )
+        pipeline.generator.generate.return_value = ("Resposta", 10.0, 100, 20)
+
+        response = pipeline.process_question("O que é PEPS?")
+
+        _, kwargs = pipeline.retriever.retrieve.call_args
+        assert kwargs["mode"] == "lexical"
+        assert kwargs["embedding"] is None
+        assert response.metrics.retrieval_degraded is True
+
+        pipeline.process_question("O que é PEPS?")
+        assert pipeline.generator.generate.call_count == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
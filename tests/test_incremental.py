@@ -0,0 +1,179 @@
+"""
+Testes para a reindexação incremental.
+
+Valida:
+- Primeira execução cria índice IDMap, chunk store e manifesto
+- Arquivos sem mudança não são lidos nem embeddados de novo
+- Arquivos alterados só embeddam os chunks novos
+- Arquivos removidos têm os vetores removidos do índice
+- Reindexação completa descarta o manifesto anterior
+"""
+
+import hashlib
+
+import fitz
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.core.embeddings import EmbeddingProvider
+from src.ingestion.incremental import read_manifest, update_vector_index
+from src.ingestion.indexer import create_vector_index
+from src.rag.retriever import VectorRetriever
+
+
+def _write_pdf(path, pages):
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+
+
+def _fake_vectors(texts):
+    # Vetor determinístico por texto
+    return [
+        list(np.frombuffer(hashlib.sha256(t.encode()).digest()[:16], dtype=np.uint8) / 255.0)
+        for t in texts
+    ]
+
+
+@pytest.fixture
+def provider():
+    """Fixture: provedor de embeddings falso e determinístico."""
+    embeddings = MagicMock()
+    embeddings.embed_documents.side_effect = _fake_vectors
+    provider = EmbeddingProvider(name="fake", model="m", embeddings=embeddings)
+    with patch("src.ingestion.incremental.get_embedding_provider", return_value=provider):
+        yield provider
+
+
+def _update(data_dir, index_path):
+    return update_vector_index(
+        str(data_dir), str(index_path), chunk_size=60, chunk_overlap=0
+    )
+
+
+class TestIncrementalIndexing:
+    """Testa o ciclo de atualizações incrementais."""
+
+    @pytest.fixture
+    def dirs(self, tmp_path):
+        data_dir = tmp_path / "data"
+        data_dir.mkdir()
+        _write_pdf(data_dir / "a.pdf", ["Curva ABC classifica itens", "Estoque minimo"])
+        _write_pdf(data_dir / "b.pdf", ["Inventario rotativo mensal"])
+        return data_dir, tmp_path / "index"
+
+    def test_first_run_builds_everything(self, dirs, provider):
+        """Teste: primeira execução embedda todos os chunks."""
+        data_dir, index_path = dirs
+
+        report = _update(data_dir, index_path)
+
+        assert sorted(report.added_files) == ["a.pdf", "b.pdf"]
+        assert report.embedded_chunks == report.total_chunks > 0
+        manifest = read_manifest(str(index_path))
+        assert set(manifest["files"]) == {"a.pdf", "b.pdf"}
+        assert manifest["next_id"] == report.total_chunks
+
+    def test_unchanged_run_embeds_nothing(self, dirs, provider):
+        """Teste: sem mudanças, nenhuma chamada de embeddings."""
+        data_dir, index_path = dirs
+        _update(data_dir, index_path)
+        provider.embeddings.embed_documents.reset_mock()
+
+        with patch("src.ingestion.incremental.load_pdf") as load_pdf:
+            report = _update(data_dir, index_path)
+
+        load_pdf.assert_not_called()
+        provider.embeddings.embed_documents.assert_not_called()
+        assert report.unchanged_files == 2
+        assert not report.has_changes
+
+    def test_changed_file_embeds_only_new_chunks(self, dirs, provider):
+        """Teste: página alterada embedda só o chunk novo."""
+        data_dir, index_path = dirs
+        first = _update(data_dir, index_path)
+        _write_pdf(data_dir / "a.pdf", ["Curva ABC classifica itens", "Ponto de pedido"])
+        provider.embeddings.embed_documents.reset_mock()
+
+        report = _update(data_dir, index_path)
+
+        assert report.changed_files == ["a.pdf"]
+        assert report.unchanged_files == 1
+        embedded = provider.embeddings.embed_documents.call_args.args[0]
+        assert all("Ponto de pedido" in text for text in embedded)
+        assert report.removed_vectors == len(embedded)
+        assert report.total_chunks == first.total_chunks
+
+    def test_removed_file_vectors_are_deleted(self, dirs, provider):
+        """Teste: arquivo removido sai do índice e do chunk store."""
+        data_dir, index_path = dirs
+        _update(data_dir, index_path)
+        (data_dir / "b.pdf").unlink()
+
+        report = _update(data_dir, index_path)
+
+        assert report.removed_files == ["b.pdf"]
+        assert report.removed_vectors > 0
+
+        with patch("src.rag.retriever.get_embedding_provider", return_value=provider):
+            retriever = VectorRetriever(index_path=str(index_path))
+
+        query = np.array(_fake_vectors(["Inventario rotativo mensal"])[0])
+        chunks, _ = retriever.retrieve("q", top_k=10, embedding=query)
+        assert {c["source"] for c in chunks} == {"a.pdf"}
+        assert len(chunks) == report.total_chunks
+
+    def test_search_finds_reused_chunks_after_update(self, dirs, provider):
+        """Teste: ids preservados continuam apontando para o texto certo."""
+        data_dir, index_path = dirs
+        _update(data_dir, index_path)
+        _write_pdf(data_dir / "c.pdf", ["Lote economico de compra"])
+        _update(data_dir, index_path)
+
+        with patch("src.rag.retriever.get_embedding_provider", return_value=provider):
+            retriever = VectorRetriever(index_path=str(index_path))
+
+        # Cada chunk é encontrado pelo vetor do próprio texto
+        store = retriever.chunk_store
+        contents = [store.content(row) for row in range(len(store))]
+        assert any("Lote economico de compra" in c for c in contents)
+        for content in contents:
+            chunks, _ = retriever.retrieve(
+                "q", top_k=1, embedding=np.array(_fake_vectors([content])[0])
+            )
+            assert chunks[0]["content"] == content
+
+    def test_full_rebuild_drops_manifest(self, dirs, provider):
+        """Teste: create_vector_index apaga o manifesto e o incremental recomeça."""
+        data_dir, index_path = dirs
+        _update(data_dir, index_path)
+
+        chunks = [
+            {"content": text, "source": "x.pdf", "chunk_id": i, "total_chunks": 2}
+            for i, text in enumerate(["Giro de estoque", "Ponto de pedido"])
+        ]
+        with patch("src.ingestion.indexer.get_embedding_provider", return_value=provider):
+            create_vector_index(chunks, index_path=str(index_path), index_type="flat")
+
+        assert read_manifest(str(index_path)) is None
+
+        report = _update(data_dir, index_path)
+        assert sorted(report.added_files) == ["a.pdf", "b.pdf"]
+
+        with patch("src.rag.retriever.get_embedding_provider", return_value=provider):
+            retriever = VectorRetriever(index_path=str(index_path))
+        store = retriever.chunk_store
+        for row in range(len(store)):
+            content = store.content(row)
+            found, _ = retriever.retrieve(
+                "q", top_k=1, embedding=np.array(_fake_vectors([content])[0])
+            )
+            assert found[0]["content"] == content
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,145 @@
+"""
+Testes para as gerações do índice em disco.
+
+Valida:
+- Todos os arquivos do índice trocam juntos, com um único ponteiro
+- Indexação interrompida não altera o índice em uso
+- Leitor aberto antes da troca continua na geração dele
+- Índices antigos (arquivos soltos) são lidos e substituídos
+"""
+
+import os
+
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.core.embeddings import EmbeddingProvider
+from src.core.index_generation import IndexGeneration, index_dir
+from src.core.index_metadata import read_index_metadata
+from src.ingestion.indexer import create_vector_index
+from src.rag.retriever import VectorRetriever
+
+
+def _chunks(*texts):
+    return [
+        {"content": text, "source": "a.pdf", "chunk_id": i, "total_chunks": len(texts)}
+        for i, text in enumerate(texts)
+    ]
+
+
+def _vector(text):
+    rng = np.random.default_rng(sum(text.encode()))
+    return rng.normal(size=8).tolist()
+
+
+@pytest.fixture
+def provider():
+    """Fixture: provedor de embeddings falso, um vetor por texto."""
+    embeddings = MagicMock()
+    embeddings.embed_documents.side_effect = lambda texts: [_vector(t) for t in texts]
+    provider = EmbeddingProvider(name="fake", model="m", embeddings=embeddings)
+    with patch("src.ingestion.indexer.get_embedding_provider", return_value=provider):
+        with patch("src.rag.retriever.get_embedding_provider", return_value=provider):
+            yield provider
+
+
+def _index(path, chunks):
+    create_vector_index(chunks, index_path=str(path), index_type="flat", index_params={})
+
+
+def _generations(path):
+    return sorted(n for n in os.listdir(path) if n.startswith("generation-"))
+
+
+class TestIndexGeneration:
+    """Testa a troca das gerações do índice."""
+
+    def test_all_files_live_in_the_generation(self, tmp_path, provider):
+        """Teste: índice, chunks, BM25 e metadados ficam na mesma pasta."""
+        _index(tmp_path, _chunks("Curva ABC", "Estoque mínimo"))
+
+        current = index_dir(str(tmp_path))
+        assert os.path.dirname(current) == str(tmp_path)
+        for name in ("index.faiss", "chunks.bin", "lexical_vocab.json", "index_meta.json"):
+            assert os.path.exists(os.path.join(current, name))
+            assert not os.path.exists(tmp_path / name)
+        assert read_index_metadata(str(tmp_path))["num_chunks"] == 2
+
+    def test_failed_indexing_keeps_current_index(self, tmp_path, provider):
+        """Teste: erro no meio da gravação não troca nenhum arquivo."""
+        _index(tmp_path, _chunks("Curva ABC", "Estoque mínimo", "Lote econômico"))
+
+        with patch(
+            "src.ingestion.indexer.write_lexical_index", side_effect=OSError("disco cheio")
+        ):
+            with pytest.raises(OSError):
+                _index(tmp_path, _chunks("Giro de estoque"))
+
+        assert len(_generations(tmp_path)) == 1
+        retriever = VectorRetriever(index_path=str(tmp_path))
+        assert retriever.search_engine.index.ntotal == len(retriever.chunk_store) == 3
+        found, _ = retriever.retrieve("q", top_k=1, embedding=np.array(_vector("Lote econômico")))
+        assert found[0]["content"] == "Lote econômico"
+
+    def test_open_reader_keeps_its_generation(self, tmp_path, provider):
+        """Teste: retriever aberto antes da troca lê só a geração dele."""
+        _index(tmp_path, _chunks("Curva ABC", "Estoque mínimo"))
+        old = VectorRetriever(index_path=str(tmp_path))
+
+        _index(tmp_path, _chunks("Giro de estoque"))
+        new = VectorRetriever(index_path=str(tmp_path))
+
+        assert old.search_engine.index.ntotal == len(old.chunk_store) == 2
+        assert old.chunk_store.content(1) == "Estoque mínimo"
+        assert new.search_engine.index.ntotal == len(new.chunk_store) == 1
+        assert old.index_version != new.index_version
+
+    def test_reload_keeps_previous_engine_readable(self, tmp_path, provider):
+        """Teste: busca em andamento no engine antigo sobrevive ao load_index."""
+        _index(tmp_path, _chunks("Curva ABC", "Estoque mínimo"))
+        retriever = VectorRetriever(index_path=str(tmp_path))
+        in_flight = retriever.search_engine
+
+        _index(tmp_path, _chunks("Giro de estoque"))
+        retriever.load_index()
+
+        assert len(retriever.chunk_store) == 1
+        found = in_flight.retrieve(np.array(_vector("Estoque mínimo")), top_k=1)
+        assert found[0]["content"] == "Estoque mínimo"
+
+    def test_keeps_current_and_previous_generation(self, tmp_path, provider):
+        """Teste: só a geração atual e a anterior ficam no disco."""
+        for _ in range(3):
+            _index(tmp_path, _chunks("Curva ABC"))
+
+        assert len(_generations(tmp_path)) == 2
+
+    def test_unpublished_generation_is_discarded(self, tmp_path):
+        """Teste: bloco sem publish() apaga a pasta e não muda o ponteiro."""
+        with IndexGeneration(str(tmp_path)) as generation:
+            open(os.path.join(generation.path, "index.faiss"), "wb").close()
+
+        assert _generations(tmp_path) == []
+        assert index_dir(str(tmp_path)) == str(tmp_path)
+
+    def test_reads_and_replaces_legacy_layout(self, tmp_path, provider):
+        """Teste: índice antigo (arquivos soltos) é lido e some na regravação."""
+        _index(tmp_path, _chunks("Curva ABC", "Estoque mínimo"))
+        generation = index_dir(str(tmp_path))
+        for name in os.listdir(generation):
+            os.replace(os.path.join(generation, name), os.path.join(tmp_path, name))
+        os.rmdir(generation)
+        os.remove(tmp_path / "current.json")
+
+        assert len(VectorRetriever(index_path=str(tmp_path)).chunk_store) == 2
+
+        _index(tmp_path, _chunks("Giro de estoque"))
+
+        assert not os.path.exists(tmp_path / "chunks.bin")
+        assert not os.path.exists(tmp_path / "index.faiss")
+        assert len(VectorRetriever(index_path=str(tmp_path)).chunk_store) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
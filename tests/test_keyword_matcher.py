@@ -0,0 +1,132 @@
+"""
+Testes para o KeywordMatcher (Aho-Corasick) dos guardrails.
+
+Valida:
+- Normalização (acentos, maiúsculas, pontuação, plural simples)
+- Fronteiras de palavra ("rg" não casa dentro de "carga")
+- Palavras-chave de várias palavras sobrepostas (links de falha)
+- Radicais com "*" para as flexões ("abus*" casa com "abusou")
+- Todas as categorias em uma única busca, com listas grandes
+"""
+
+import pytest
+
+from src.guardrails import InputValidator
+from src.guardrails.keyword_matcher import KeywordMatcher, normalize_words
+
+
+class TestNormalizeWords:
+    """Testa a normalização do texto."""
+
+    def test_folds_accents_and_case(self):
+        """Teste: acentos e maiúsculas são normalizados."""
+        assert normalize_words("Previsão do TEMPO") == ["previsao", "do", "tempo"]
+
+    def test_splits_punctuation(self):
+        """Teste: pontuação e hífen separam palavras."""
+        assert normalize_words("e-mail, pessoal?") == ["e", "mail", "pessoal"]
+
+    def test_simple_singular(self):
+        """Teste: plural simples vira singular."""
+        assert normalize_words("lotes armazéns") == ["lote", "armazem"]
+
+
+class TestKeywordMatcher:
+    """Testa a busca das palavras-chave."""
+
+    @pytest.fixture
+    def matcher(self):
+        return KeywordMatcher(
+            {
+                "fora": ["rg", "cpf", "cartão de crédito"],
+                "dominio": ["estoque", "estoque de segurança", "de segurança máximo"],
+            }
+        )
+
+    def test_word_boundaries(self, matcher):
+        """Teste: palavra-chave curta não casa dentro de outra palavra."""
+        assert matcher.find_all("Qual a carga do caminhão?") == {}
+        assert matcher.find_all("Informe o RG.") == {"fora": ["rg"]}
+
+    def test_accents_in_question(self, matcher):
+        """Teste: pergunta sem acentos casa com a palavra-chave acentuada."""
+        found = matcher.find_all("numero do CARTAO DE CREDITO")
+        assert found == {"fora": ["cartão de crédito"]}
+
+    def test_overlapping_keywords(self, matcher):
+        """Teste: palavras-chave sobrepostas são todas encontradas."""
+        found = matcher.find_all("estoques de segurança máximo")
+
+        assert found == {
+            "dominio": ["estoque", "estoque de segurança", "de segurança máximo"]
+        }
+
+    def test_all_categories_in_one_pass(self, matcher):
+        """Teste: uma busca devolve todas as categorias, sem repetição."""
+        found = matcher.find_all("cpf, estoque e cpf de novo")
+
+        assert found == {"fora": ["cpf"], "dominio": ["estoque"]}
+
+    def test_large_rule_lists(self):
+        """Teste: milhares de palavras-chave, sem falsos positivos."""
+        keywords = [f"termo{i} proibido" for i in range(5000)]
+        matcher = KeywordMatcher({"bloqueio": keywords, "outra": ["termo42"]})
+
+        assert len(matcher) == 5001
+        assert matcher.find_all("o termo4999 proibido") == {
+            "bloqueio": ["termo4999 proibido"]
+        }
+        assert matcher.find_all("o termo42 permitido") == {"outra": ["termo42"]}
+        assert matcher.find_all("o termo50000 proibido") == {}
+
+    def test_stem_keywords(self):
+        """Teste: "*" casa com as palavras que começam com o radical."""
+        matcher = KeywordMatcher(
+            {"ruim": ["abus*", "insult*", "fraud*"], "dominio": ["abuso de poder"]}
+        )
+
+        assert matcher.find_all("ele abusou do cliente") == {"ruim": ["abus*"]}
+        assert matcher.find_all("Insultou o gerente") == {"ruim": ["insult*"]}
+        assert matcher.find_all("fornecedor fraudulento") == {"ruim": ["fraud*"]}
+        assert matcher.find_all("abusos de poder") == {
+            "ruim": ["abus*"],
+            "dominio": ["abuso de poder"],
+        }
+        # Radical só no começo da palavra
+        assert matcher.find_all("o desabuso") == {}
+
+    def test_longest_stem_wins(self):
+        """Teste: com radicais encaixados, vale o mais longo."""
+        matcher = KeywordMatcher({"a": ["esto*"], "b": ["estoqu* minimo"]})
+
+        assert matcher.find_all("estoques mínimos") == {"b": ["estoqu* minimo"]}
+        assert matcher.find_all("estocagem") == {"a": ["esto*"]}
+
+
+class TestValidatorIntegration:
+    """Testa o matcher integrado ao InputValidator."""
+
+    def test_no_false_positive_inside_words(self):
+        """Teste: "carga" não é bloqueada por conter "rg"."""
+        result = InputValidator().validate("Qual a carga máxima do armazém?")
+        assert result.is_valid is True
+
+    @pytest.mark.parametrize(
+        "question",
+        ["Como ele abusou do estoque?", "O gerente insultou o estoquista", "Fraudaram o inventário"],
+    )
+    def test_blocks_inflections(self, question):
+        """Teste: flexões que a busca por substring pegava continuam bloqueadas."""
+        result = InputValidator().validate(question)
+        assert result.block_reason == "inappropriate_content_detected"
+
+    def test_blocks_unaccented_keyword(self):
+        """Teste: palavra-chave sem acento também bloqueia."""
+        result = InputValidator().validate("qual a previsao do tempo amanha?")
+        assert result.is_valid is False
+        assert result.block_reason == "out_of_domain_request"
+        assert "previsão do tempo" in result.details
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,132 @@
+"""
+Testes para o chunking com páginas.
+
+Valida:
+- Offsets de página calculados pelo loader
+- page_start/page_end e intervalo de caracteres de cada chunk
+- Colunas de páginas no chunk store (e stores antigos sem elas)
+- Páginas nas citações da resposta
+"""
+
+import os
+
+import pytest
+
+from src.core.chunk_store import ChunkStore
+from src.ingestion.chunker import create_text_splitter, split_document
+from src.ingestion.loader import join_pages
+from src.rag.pipeline import RAGPipeline
+
+
+PAGES = [
+    "Gestão de estoques. " * 8,
+    "Curva ABC classifica itens pelo valor. " * 6,
+    "Inventário rotativo.",
+]
+
+
+@pytest.fixture
+def document():
+    """Fixture: documento de 3 páginas no formato do loader."""
+    content, page_offsets = join_pages(PAGES)
+    return {
+        "source": "a.pdf",
+        "content": content,
+        "num_pages": 3,
+        "page_offsets": page_offsets,
+    }
+
+
+class TestPageOffsets:
+    """Testa os offsets de página do loader."""
+
+    def test_offsets_point_to_page_markers(self, document):
+        """Teste: cada offset é o início do marcador da página."""
+        for page_num, offset in enumerate(document["page_offsets"]):
+            marker = f"\n\n--- Página {page_num} ---\n"
+            assert document["content"].startswith(marker, offset)
+
+
+class TestPageAwareChunks:
+    """Testa as páginas e os intervalos de cada chunk."""
+
+    def test_spans_and_pages(self, document):
+        """Teste: o intervalo recupera o texto e as páginas conferem."""
+        chunks = split_document(document, create_text_splitter(120, 20))
+        offsets = document["page_offsets"]
+
+        assert len(chunks) > 3
+        for chunk in chunks:
+            start, end = chunk["char_start"], chunk["char_end"]
+            assert document["content"][start:end] == chunk["content"]
+            assert offsets[chunk["page_start"] - 1] <= start
+            assert chunk["page_start"] <= chunk["page_end"]
+            if chunk["page_end"] < 3:
+                assert end <= offsets[chunk["page_end"]]
+
+        assert chunks[0]["page_start"] == 1
+        assert chunks[-1]["page_end"] == 3
+
+    def test_chunk_across_pages(self, document):
+        """Teste: chunk que cruza a quebra de página tem duas páginas."""
+        chunks = split_document(document, create_text_splitter(4000, 0))
+
+        assert len(chunks) == 1
+        assert (chunks[0]["page_start"], chunks[0]["page_end"]) == (1, 3)
+
+    def test_without_page_offsets(self, document):
+        """Teste: documento sem offsets gera chunks sem páginas."""
+        del document["page_offsets"]
+
+        chunks = split_document(document, create_text_splitter(120, 20))
+
+        assert "page_start" not in chunks[0]
+
+
+class TestChunkStoreSpans:
+    """Testa as colunas de páginas no chunk store."""
+
+    def test_roundtrip(self, tmp_path, document):
+        """Teste: páginas e intervalos voltam do chunk store."""
+        chunks = split_document(document, create_text_splitter(120, 20))
+        ChunkStore.write(str(tmp_path), chunks)
+
+        store = ChunkStore(str(tmp_path))
+        row = store.get(len(chunks) - 1)
+
+        for key in ("page_start", "page_end", "char_start", "char_end"):
+            assert row[key] == chunks[-1][key]
+        store.close()
+
+    def test_store_without_span_column(self, tmp_path):
+        """Teste: store antigo (sem chunk_spans.npy) continua legível."""
+        ChunkStore.write(
+            str(tmp_path),
+            [{"content": "x", "source": "a.pdf", "chunk_id": 0, "total_chunks": 1}],
+        )
+        os.remove(tmp_path / "chunk_spans.npy")
+
+        store = ChunkStore(str(tmp_path))
+
+        assert store.get(0) == {"content": "x", "source": "a.pdf", "chunk_id": 0}
+        store.close()
+
+
+class TestCitationPages:
+    """Testa as páginas nas citações."""
+
+    def test_citations_carry_pages(self):
+        """Teste: citação recebe page_start/page_end do chunk."""
+        citations = RAGPipeline._build_citations(
+            [
+                {"content": "a", "source": "a.pdf", "chunk_id": 0, "page_start": 2, "page_end": 3},
+                {"content": "b", "source": "b.pdf", "chunk_id": 1},
+            ]
+        )
+
+        assert (citations[0].page_start, citations[0].page_end) == (2, 3)
+        assert citations[1].page_start is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
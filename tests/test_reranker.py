@@ -0,0 +1,199 @@
+"""
+Testes para o reranking com cross-encoder.
+
+Valida:
+- Reordenação pelos scores do modelo, em lotes
+- Volta para a ordem da busca quando o orçamento de tempo estoura
+- Integração com o pipeline (busca de candidatos e métricas), também no lote
+"""
+
+import os
+import re
+import time
+
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src.rag.embedding_cache import EmbeddingTimings
+from src.rag.pipeline import RAGPipeline
+from src.rag.retriever import BatchRetrievalTimings
+from src.rag.reranker import CrossEncoderReranker
+
+
+class FakeCrossEncoder:
+    """Modelo falso: score = ocorrências das palavras da query no texto."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batches = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.batches.append(len(pairs))
+        time.sleep(self.delay)
+        return [
+            sum(text.lower().count(word) for word in re.findall(r"\w{4,}", query.lower()))
+            for query, text in pairs
+        ]
+
+
+CHUNKS = [
+    {"content": "Gestão de estoques", "source": "a.pdf", "chunk_id": 0},
+    {"content": "PEPS: primeiro a entrar. O PEPS...", "source": "b.pdf", "chunk_id": 0},
+    {"content": "Curva ABC", "source": "a.pdf", "chunk_id": 1},
+    {"content": "Exemplo de PEPS", "source": "b.pdf", "chunk_id": 1},
+]
+
+
+class TestCrossEncoderReranker:
+    """Testa o CrossEncoderReranker com um modelo falso."""
+
+    def test_reorders_by_score(self):
+        """Teste: chunks mais relevantes sobem e o resto é cortado."""
+        model = FakeCrossEncoder()
+        reranker = CrossEncoderReranker(model=model, batch_size=3, budget_ms=0)
+
+        chunks, timings = reranker.rerank("peps", CHUNKS, top_k=2)
+
+        assert [(c["source"], c["chunk_id"]) for c in chunks] == [
+            ("b.pdf", 0),
+            ("b.pdf", 1),
+        ]
+        assert chunks[0]["rerank_score"] == 2.0
+        assert model.batches == [3, 1]
+        assert timings.applied is True
+        assert timings.candidates == 4
+        assert "rerank_score" not in CHUNKS[1]
+
+    def test_budget_exceeded_keeps_search_order(self):
+        """Teste: orçamento estourado devolve a ordem da busca a tempo."""
+        reranker = CrossEncoderReranker(
+            model=FakeCrossEncoder(delay=0.3), batch_size=2, budget_ms=30
+        )
+
+        start = time.perf_counter()
+        chunks, timings = reranker.rerank("peps", CHUNKS, top_k=2)
+
+        assert (time.perf_counter() - start) < 0.25
+        assert chunks == CHUNKS[:2]
+        assert timings.applied is False
+        assert timings.rerank_ms >= 30
+
+    def test_model_error_keeps_search_order(self):
+        """Teste: erro na inferência não derruba a requisição."""
+        model = FakeCrossEncoder()
+        model.predict = lambda *args, **kwargs: 1 / 0
+        reranker = CrossEncoderReranker(model=model)
+
+        chunks, timings = reranker.rerank("peps", CHUNKS, top_k=3)
+
+        assert chunks == CHUNKS[:3]
+        assert timings.applied is False
+
+    @pytest.mark.asyncio
+    async def test_async_budget(self):
+        """Teste: caminho assíncrono respeita o mesmo orçamento."""
+        fast = CrossEncoderReranker(model=FakeCrossEncoder(), budget_ms=1000)
+        slow = CrossEncoderReranker(
+            model=FakeCrossEncoder(delay=0.3), batch_size=2, budget_ms=30
+        )
+
+        chunks, timings = await fast.arerank("peps", CHUNKS, top_k=1)
+        assert chunks[0]["chunk_id"] == 0 and chunks[0]["source"] == "b.pdf"
+        assert timings.applied is True
+
+        chunks, timings = await slow.arerank("peps", CHUNKS, top_k=1)
+        assert chunks == CHUNKS[:1]
+        assert timings.applied is False
+
+    def test_disabled_by_default(self):
+        """Teste: sem RERANK_ENABLED o reranker não é criado."""
+        with patch.dict(os.environ, {"RERANK_ENABLED": "false"}):
+            assert CrossEncoderReranker.from_env() is None
+
+
+class TestPipelineRerank:
+    """Testa o reranking integrado ao pipeline."""
+
+    @pytest.fixture
+    def pipeline(self):
+        with patch("src.rag.pipeline.VectorRetriever"):
+            with patch("src.rag.pipeline.ResponseGenerator"):
+                pipeline = RAGPipeline(index_path="vector_index")
+        pipeline.top_k = 2
+        pipeline.reranker = CrossEncoderReranker(
+            model=FakeCrossEncoder(), candidates=20, budget_ms=1000
+        )
+        pipeline.retriever.embed_query_timed.return_value = (
+            [1.0, 0.0],
+            EmbeddingTimings(embedding_ms=5.0),
+        )
+        pipeline.retriever.retrieve.return_value = (CHUNKS, 10.0)
+        pipeline.generator.generate.return_value = ("Resposta", 100.0, 50, 10)
+        return pipeline
+
+    def test_over_fetches_and_reranks(self, pipeline):
+        """Teste: busca os candidatos e envia só os top_k ao LLM."""
+        response = pipeline.process_question("Como funciona o PEPS?")
+
+        _, kwargs = pipeline.retriever.retrieve.call_args
+        assert kwargs["top_k"] == 20
+
+        sent = pipeline.generator.generate.call_args.args[1]
+        assert len(sent) == 2
+        assert [c["source"] for c in sent] == ["b.pdf", "b.pdf"]
+
+        assert response.metrics.reranked is True
+        assert response.metrics.rerank_latency_ms is not None
+        assert response.metrics.retrieval_latency_ms >= 15.0
+
+    QUESTIONS = ["Como funciona o PEPS?", "O que é a curva ABC?"]
+
+    @pytest.fixture
+    def batch_pipeline(self, pipeline):
+        matrix = np.eye(2, dtype=np.float32)
+        timings = BatchRetrievalTimings(queries=2, search_ms=4.0)
+        pipeline.response_cache = None
+        pipeline.retriever.embed_many.return_value = (matrix, EmbeddingTimings())
+        pipeline.retriever.aembed_many = AsyncMock(
+            return_value=(matrix, EmbeddingTimings())
+        )
+        pipeline.retriever.retrieve_many.return_value = ([CHUNKS, CHUNKS], timings)
+        pipeline.retriever.aretrieve_many = AsyncMock(
+            return_value=([CHUNKS, CHUNKS], timings)
+        )
+        pipeline.generator.agenerate = AsyncMock(return_value=("Resposta", 100.0, 50, 10))
+        return pipeline
+
+    def _assert_batch_reranked(self, batch, sent, kwargs):
+        assert kwargs["top_k"] == 20
+        assert [c["source"] for c in sent[0]] == ["b.pdf", "b.pdf"]
+        assert [c["content"] for c in sent[1]][0] == "Curva ABC"
+        assert all(r.metrics.reranked is True for r in batch.responses)
+
+    def test_batch_reranks_each_question(self, batch_pipeline):
+        """Teste: o lote também busca candidatos e reordena cada pergunta."""
+        batch = batch_pipeline.process_many(self.QUESTIONS)
+
+        sent = {
+            c.args[0]: c.args[1] for c in batch_pipeline.generator.generate.call_args_list
+        }
+        self._assert_batch_reranked(
+            batch,
+            [sent[q] for q in self.QUESTIONS],
+            batch_pipeline.retriever.retrieve_many.call_args.kwargs,
+        )
+
+    @pytest.mark.asyncio
+    async def test_async_batch_reranks_each_question(self, batch_pipeline):
+        """Teste: no caminho assíncrono o lote também é reordenado."""
+        batch = await batch_pipeline.aprocess_many(self.QUESTIONS)
+
+        sent = [c.args[1] for c in batch_pipeline.generator.agenerate.call_args_list]
+        self._assert_batch_reranked(
+            batch, sent, batch_pipeline.retriever.aretrieve_many.call_args.kwargs
+        )
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
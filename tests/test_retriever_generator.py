@@ -4,8 +4,11 @@ Testes para os componentes individuais do RAG.
 Valida retriever e generator em isolamento.
 """
 
+import faiss
+import numpy as np
 import pytest
-from unittest.mock import patch, MagicMock
+from langchain_core.messages import AIMessage
+from unittest.mock import AsyncMock, patch, MagicMock
 from src.rag.retriever import VectorRetriever
 from src.rag.generator import ResponseGenerator
 
@@ -15,33 +18,34 @@ class TestVectorRetriever:
 
     @pytest.fixture
     def mock_retriever(self):
-        """Fixture: cria um retriever com FAISS mockado."""
-        with patch("src.rag.retriever.FAISS"):
-            with patch("src.rag.retriever.OpenAIEmbeddings"):
+        """Fixture: cria um retriever com um índice LangChain pequeno mockado."""
+        vector_store = MagicMock()
+        vector_store.index = faiss.IndexFlatL2(3)
+        vector_store.index.add(
+            np.array([[0.1 * i, 0.2, 0.3] for i in range(5)], dtype=np.float32)
+        )
+        vector_store.index_to_docstore_id = {i: f"doc-{i}" for i in range(5)}
+        vector_store.docstore.search.side_effect = lambda doc_id: MagicMock(
+            page_content=f"Conteúdo {doc_id}",
+            metadata={"source": "test.pdf", "chunk_id": int(doc_id[-1])},
+        )
+
+        with patch("src.rag.retriever.FAISS") as mock_faiss:
+            mock_faiss.load_local.return_value = vector_store
+            with patch("src.core.embeddings.OpenAIEmbeddings"):
                 retriever = VectorRetriever(index_path="vector_index")
-                # Mock o vector store
-                retriever.vector_store = MagicMock()
+                # Mock o provedor de embeddings
+                retriever.embeddings.embed_query.return_value = [0.1, 0.2, 0.3]
                 return retriever
 
     def test_retriever_initialization(self, mock_retriever):
         """Teste: retriever inicializa corretamente."""
         assert mock_retriever.embeddings is not None
         assert mock_retriever.vector_store is not None
+        assert len(mock_retriever.search_engine.chunks) == 5
 
     def test_retrieve_returns_tuple(self, mock_retriever):
         """Teste: retrieve retorna (chunks, latency)."""
-        # Mock a resposta de similaridade
-        mock_obj = MagicMock(
-            page_content="Conteúdo do chunk",
-            metadata={
-                "source": "test.pdf",
-                "chunk_id": 0,
-            },
-        )
-        mock_retriever.vector_store.similarity_search_with_score.return_value = [
-            (mock_obj, 0.95)
-        ]
-
         chunks, latency = mock_retriever.retrieve("test query", top_k=3)
 
         assert isinstance(chunks, list)
@@ -50,17 +54,6 @@ class TestVectorRetriever:
 
     def test_retrieve_chunk_structure(self, mock_retriever):
         """Teste: chunks têm estrutura esperada."""
-        mock_obj = MagicMock(
-            page_content="Conteúdo do chunk",
-            metadata={
-                "source": "test.pdf",
-                "chunk_id": 0,
-            },
-        )
-        mock_retriever.vector_store.similarity_search_with_score.return_value = [
-            (mock_obj, 0.95)
-        ]
-
         chunks, _ = mock_retriever.retrieve("query")
 
         assert len(chunks) > 0
@@ -69,30 +62,53 @@ class TestVectorRetriever:
         assert "source" in chunk
         assert "chunk_id" in chunk
         assert "similarity_score" in chunk
+        # O vetor da query é idêntico ao do chunk 1
+        assert chunk["chunk_id"] == 1
+        assert chunk["content"] == "Conteúdo doc-1"
 
     def test_retrieve_top_k(self, mock_retriever):
         """Teste: retrieve respeita top_k."""
-        # Mock 5 resultados
-        mock_docs = [
-            (
-                MagicMock(
-                    page_content=f"Conteúdo {i}",
-                    metadata={"source": "test.pdf", "chunk_id": i},
-                ),
-                0.9 - i * 0.05,
-            )
-            for i in range(5)
+        chunks, _ = mock_retriever.retrieve("query", top_k=3)
+        assert len(chunks) == 3
+
+        chunks, _ = mock_retriever.retrieve("query", top_k=10)
+        assert len(chunks) == 5
+
+    def test_retrieve_bypasses_langchain(self, mock_retriever):
+        """Teste: a busca não passa pelos wrappers do LangChain."""
+        mock_retriever.retrieve("query", embedding=np.array([0.4, 0.2, 0.3]))
+
+        mock_retriever.vector_store.similarity_search_with_score_by_vector.assert_not_called()
+        mock_retriever.embeddings.embed_query.assert_not_called()
+
+    def test_retrieve_many(self, mock_retriever):
+        """Teste: lote usa uma chamada de embeddings e uma busca."""
+        mock_retriever.embeddings.embed_documents.return_value = [
+            [0.0, 0.2, 0.3],
+            [0.4, 0.2, 0.3],
         ]
-        return_value = mock_docs[:3]
-        return_value = mock_docs[:3]
-        mock_ret = mock_retriever.vector_store
-        mock_ret.similarity_search_with_score.return_value = return_value
 
-        chunks, _ = mock_retriever.retrieve("query", top_k=3)
+        results, timings = mock_retriever.retrieve_many(
+            ["query a", "query b", "query a"], top_k=2
+        )
+
+        mock_retriever.embeddings.embed_documents.assert_called_once_with(
+            ["query a", "query b"]
+        )
+        assert [r[0]["chunk_id"] for r in results] == [0, 4, 0]
+        assert all(len(r) == 2 for r in results)
+        assert timings.queries == 3
+        assert timings.total_ms >= timings.search_ms
+
+    def test_query_embedding_is_cached(self, mock_retriever):
+        """Teste: a mesma query (normalizada) só chama a API uma vez."""
+        mock_retriever.retrieve("O que é estoque?")
+        mock_retriever.retrieve("o que e estoque")
 
-        # Verifica que é chamado com k=3
-        call = mock_retriever.vector_store.similarity_search_with_score
-        call.assert_called_with("query", k=3)
+        assert mock_retriever.embeddings.embed_query.call_count == 1
+        _, timings = mock_retriever.embed_query_timed("O que é estoque?")
+        assert timings.cache_hit is True
+        assert timings.embedding_ms == 0.0
 
 
 class TestResponseGenerator:
@@ -102,11 +118,10 @@ class TestResponseGenerator:
     def mock_generator(self):
         """Fixture: cria um generator com LLM mockado."""
         with patch("src.rag.generator.ChatOpenAI"):
-            with patch("src.rag.generator.ChatPromptTemplate"):
-                generator = ResponseGenerator()
-                # Mock a chain
-                generator.chain = MagicMock()
-                return generator
+            generator = ResponseGenerator()
+            # Mock a chain
+            generator.chain = MagicMock()
+            return generator
 
     def test_generator_initialization(self, mock_generator):
         """Teste: generator inicializa corretamente."""
@@ -116,7 +131,9 @@ class TestResponseGenerator:
 
     def test_generate_returns_tuple(self, mock_generator):
         """Teste: generate retorna tupla esperada."""
-        mock_generator.chain.invoke.return_value = "Resposta gerada do LLM"
+        mock_generator.chain.invoke.return_value = AIMessage(
+            content="Resposta gerada do LLM"
+        )
 
         chunks = [
             {
@@ -141,8 +158,8 @@ class TestResponseGenerator:
 
     def test_generate_with_multiple_chunks(self, mock_generator):
         """Teste: generator processa múltiplos chunks."""
-        mock_generator.chain.invoke.return_value = (
-            "Resposta baseada em múltiplos chunks"
+        mock_generator.chain.invoke.return_value = AIMessage(
+            content="Resposta baseada em múltiplos chunks"
         )
 
         chunks = [{"content": f"Chunk {i}", "source": f"file{i}.pdf"} for i in range(3)]
@@ -160,6 +177,22 @@ class TestResponseGenerator:
         assert "Chunk 1" in context
         assert "Chunk 2" in context
 
+    @pytest.mark.asyncio
+    async def test_agenerate_uses_ainvoke(self, mock_generator):
+        """Teste: agenerate aguarda chain.ainvoke em vez de invoke."""
+        mock_generator.chain.ainvoke = AsyncMock(
+            return_value=AIMessage(content="Resposta async")
+        )
+
+        answer, latency, _, _ = await mock_generator.agenerate(
+            question="question",
+            retrieved_chunks=[{"content": "Chunk", "source": "file.pdf"}],
+        )
+
+        assert answer == "Resposta async"
+        mock_generator.chain.ainvoke.assert_awaited_once()
+        mock_generator.chain.invoke.assert_not_called()
+
 
 class TestRetrieverAndGeneratorIntegration:
     """Testes de integração retriever + generator."""
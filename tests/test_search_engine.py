@@ -0,0 +1,93 @@
+"""
+Testes para o FaissSearchEngine.
+
+Valida:
+- Resultados idênticos aos do caminho do LangChain
+- Busca em lote sobre uma matriz de queries
+- Mapeamento de ids em índices com IDMap
+"""
+
+import faiss
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+from langchain_community.vectorstores import FAISS
+
+from src.rag.search_engine import (
+    DocumentTable,
+    FaissSearchEngine,
+    as_query_matrix,
+    build_id_to_row,
+)
+
+
+@pytest.fixture
+def vector_store():
+    """Fixture: FAISS do LangChain com 20 vetores aleatórios."""
+    rng = np.random.default_rng(42)
+    vectors = rng.normal(size=(20, 8)).astype(np.float32)
+    return FAISS.from_embeddings(
+        [(f"chunk {i}", vectors[i].tolist()) for i in range(20)],
+        MagicMock(),
+        metadatas=[{"source": f"{i % 3}.pdf", "chunk_id": i} for i in range(20)],
+    )
+
+
+class TestFaissSearchEngine:
+    """Testa a busca direta no FAISS."""
+
+    def test_matches_langchain(self, vector_store):
+        """Teste: mesmos chunks, na mesma ordem e com os mesmos scores."""
+        engine = FaissSearchEngine(
+            vector_store.index, DocumentTable.from_vector_store(vector_store)
+        )
+        query = np.random.default_rng(7).normal(size=8).astype(np.float32)
+
+        expected = vector_store.similarity_search_with_score_by_vector(
+            query.tolist(), k=4
+        )
+        chunks = engine.retrieve(query, top_k=4)
+
+        assert [c["content"] for c in chunks] == [d.page_content for d, _ in expected]
+        assert [c["source"] for c in chunks] == [
+            d.metadata["source"] for d, _ in expected
+        ]
+        np.testing.assert_allclose(
+            [c["similarity_score"] for c in chunks], [s for _, s in expected], rtol=1e-6
+        )
+
+    def test_retrieve_batch(self, vector_store):
+        """Teste: várias queries em uma busca dão o mesmo que buscas isoladas."""
+        engine = FaissSearchEngine(
+            vector_store.index, DocumentTable.from_vector_store(vector_store)
+        )
+        queries = np.random.default_rng(3).normal(size=(5, 8)).astype(np.float32)
+
+        batch = engine.retrieve_batch(queries, top_k=3)
+
+        assert batch == [engine.retrieve(q, top_k=3) for q in queries]
+
+    def test_idmap_ids_are_mapped_to_rows(self):
+        """Teste: ids externos de um IDMap viram linhas da tabela."""
+        index = faiss.IndexIDMap2(faiss.IndexFlatL2(2))
+        index.add_with_ids(
+            np.array([[0.0, 0.0], [1.0, 1.0]], dtype=np.float32),
+            np.array([10, 3], dtype=np.int64),
+        )
+        table = DocumentTable(["a", "b"], ["x.pdf", "y.pdf"], [0, 1])
+
+        engine = FaissSearchEngine(index, table)
+        chunks = engine.retrieve([1.0, 1.0], top_k=2)
+
+        assert build_id_to_row(index)[[3, 10]].tolist() == [1, 0]
+        assert [c["content"] for c in chunks] == ["b", "a"]
+
+    def test_query_matrix_is_not_copied(self):
+        """Teste: matriz float32 contígua é usada sem cópia."""
+        matrix = np.zeros((2, 4), dtype=np.float32)
+        assert as_query_matrix(matrix) is matrix
+        assert as_query_matrix([1, 2, 3]).shape == (1, 3)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,206 @@
+"""
+Testes para a ingestão paralela em streaming.
+
+Valida:
+- Documentos e chunks idênticos aos do loader/chunker em série
+- Extração em faixas de páginas, com e sem pool de processos
+- PDFs ilegíveis reportados sem interromper a ingestão
+- Índice montado em lotes e lido pelo VectorRetriever (com o índice BM25)
+"""
+
+import hashlib
+
+import fitz
+import numpy as np
+import pytest
+from unittest.mock import MagicMock, patch
+
+from src.core.embeddings import EmbeddingProvider
+from src.core.index_metadata import read_index_metadata
+from src.ingestion.chunker import chunk_documents
+from src.ingestion.loader import list_pdf_files, load_pdf
+from src.ingestion.streaming import (
+    ingest_directory,
+    iter_batches,
+    iter_chunks,
+    iter_documents,
+)
+from src.rag.retriever import VectorRetriever
+
+
+def _write_pdf(path, pages):
+    doc = fitz.open()
+    for text in pages:
+        page = doc.new_page()
+        page.insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+
+
+def _fake_vectors(texts):
+    return [
+        list(np.frombuffer(hashlib.sha256(t.encode()).digest()[:16], dtype=np.uint8) / 255.0)
+        for t in texts
+    ]
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    """Fixture: pasta com dois PDFs de várias páginas."""
+    directory = tmp_path / "data"
+    directory.mkdir()
+    _write_pdf(directory / "a.pdf", [f"Pagina {i} sobre estoque" for i in range(7)])
+    _write_pdf(directory / "b.pdf", [f"Inventario {i}" for i in range(3)])
+    return directory
+
+
+@pytest.fixture
+def provider():
+    """Fixture: provedor de embeddings falso e determinístico."""
+    embeddings = MagicMock()
+    embeddings.embed_documents.side_effect = _fake_vectors
+    provider = EmbeddingProvider(name="fake", model="m", embeddings=embeddings)
+    with patch("src.ingestion.streaming.get_embedding_provider", return_value=provider):
+        yield provider
+
+
+class TestIterDocuments:
+    """Testa a extração paralela em faixas de páginas."""
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_matches_serial_loader(self, data_dir, workers):
+        """Teste: mesmo conteúdo do load_pdf, na mesma ordem."""
+        pdf_files = list_pdf_files(str(data_dir))
+
+        documents = list(iter_documents(pdf_files, workers=workers, pages_per_task=2))
+
+        assert documents == [load_pdf(pdf_file) for pdf_file in pdf_files]
+
+    def test_chunks_match_chunk_documents(self, data_dir):
+        """Teste: iter_chunks gera os mesmos chunks de chunk_documents."""
+        pdf_files = list_pdf_files(str(data_dir))
+        serial = chunk_documents([load_pdf(f) for f in pdf_files], 40, 0)
+
+        streamed = list(iter_chunks(iter_documents(pdf_files, workers=1), 40, 0))
+
+        assert streamed == serial
+
+    def test_unreadable_pdf_is_reported(self, data_dir):
+        """Teste: PDF inválido vai para failed e os outros seguem."""
+        (data_dir / "broken.pdf").write_bytes(b"not a pdf")
+        failed = []
+
+        documents = list(
+            iter_documents(list_pdf_files(str(data_dir)), workers=1, failed=failed)
+        )
+
+        assert [d["source"] for d in documents] == ["a.pdf", "b.pdf"]
+        assert failed == ["broken.pdf"]
+
+    def test_iter_batches(self):
+        """Teste: último lote pode ser menor."""
+        assert list(iter_batches(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+
+class TestIngestDirectory:
+    """Testa a indexação completa em streaming."""
+
+    def test_builds_index_in_batches(self, data_dir, tmp_path, provider):
+        """Teste: embeddings em lotes e índice lido pelo retriever."""
+        index_path = tmp_path / "index"
+
+        report = ingest_directory(
+            str(data_dir),
+            str(index_path),
+            chunk_size=40,
+            chunk_overlap=0,
+            workers=1,
+            batch_size=3,
+        )
+
+        assert report.files == 2
+        assert report.pages == 10
+        assert report.embedding_batches == -(-report.chunks // 3)
+        assert all(
+            len(call.args[0]) <= 3
+            for call in provider.embeddings.embed_documents.call_args_list
+        )
+        assert not (index_path / "index.pkl").exists()
+        assert read_index_metadata(str(index_path))["num_chunks"] == report.chunks
+
+        with patch("src.rag.retriever.get_embedding_provider", return_value=provider):
+            retriever = VectorRetriever(index_path=str(index_path))
+
+        store = retriever.chunk_store
+        for row in range(len(store)):
+            content = store.content(row)
+            chunks, _ = retriever.retrieve(
+                "q", top_k=1, embedding=np.array(_fake_vectors([content])[0])
+            )
+            assert chunks[0]["content"] == content
+
+        # Índice BM25 gravado com as mesmas linhas do chunk store
+        assert len(retriever.lexical_index) == len(store)
+        chunks, _ = retriever.retrieve("inventário", top_k=10, mode="lexical")
+        assert {c["source"] for c in chunks} == {"b.pdf"}
+
+    def test_ivf_index_is_trained_on_all_vectors(self, data_dir, tmp_path, provider):
+        """Teste: IVF espera todos os lotes para treinar."""
+        index_path = tmp_path / "index"
+
+        report = ingest_directory(
+            str(data_dir),
+            str(index_path),
+            index_type="ivf_flat",
+            index_params={},
+            chunk_size=40,
+            chunk_overlap=0,
+            workers=1,
+            batch_size=2,
+        )
+
+        metadata = read_index_metadata(str(index_path))
+        assert metadata["index"]["type"] == "ivf_flat"
+        assert metadata["num_chunks"] == report.chunks
+
+    def test_duplicated_pdf_is_deduplicated(self, data_dir, tmp_path, provider):
+        """Teste: PDF repetido não gera vetores e vira origem extra."""
+        (data_dir / "c.pdf").write_bytes((data_dir / "a.pdf").read_bytes())
+        index_path = tmp_path / "index"
+
+        report = ingest_directory(str(data_dir), str(index_path), workers=1)
+
+        assert (report.dedup.input_chunks, report.dedup.removed_chunks) == (3, 1)
+        assert report.chunks == 2
+
+        with patch("src.rag.retriever.get_embedding_provider", return_value=provider):
+            retriever = VectorRetriever(index_path=str(index_path))
+        first = retriever.chunk_store.get(0)
+        assert first["source"] == "a.pdf"
+        assert first["duplicates"][0]["source"] == "c.pdf"
+
+    def test_failed_extraction_keeps_current_index(self, data_dir, tmp_path, provider):
+        """Teste: se nenhum PDF for extraído, o índice em uso não muda."""
+        index_path = tmp_path / "index"
+        report = ingest_directory(str(data_dir), str(index_path), workers=1)
+
+        broken_dir = tmp_path / "broken"
+        broken_dir.mkdir()
+        (broken_dir / "x.pdf").write_bytes(b"not a pdf")
+        with pytest.raises(ValueError, match="Nenhum chunk"):
+            ingest_directory(str(broken_dir), str(index_path), workers=1)
+
+        with patch("src.rag.retriever.get_embedding_provider", return_value=provider):
+            retriever = VectorRetriever(index_path=str(index_path))
+        assert len(retriever.chunk_store) == report.chunks
+        assert retriever.search_engine.index.ntotal == report.chunks
+        assert len([p for p in index_path.iterdir() if p.name.startswith("generation-")]) == 1
+
+    def test_empty_directory(self, tmp_path, provider):
+        """Teste: pasta sem PDFs gera erro claro."""
+        with pytest.raises(ValueError, match="Nenhum PDF"):
+            ingest_directory(str(tmp_path), str(tmp_path / "index"))
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
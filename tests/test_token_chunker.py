@@ -0,0 +1,157 @@
+"""
+Testes para o chunking por tokens (tiktoken).
+
+Valida:
+- Chunks limitados em tokens, com overlap e cortes em fronteiras
+- Documento codificado uma única vez
+- Páginas e intervalos calculados a partir dos offsets dos tokens
+- Seleção do modo por CHUNKING_MODE
+"""
+
+import pytest
+import tiktoken
+from unittest.mock import patch
+
+from src.ingestion.chunker import (
+    TokenTextChunker,
+    chunking_config,
+    create_text_splitter,
+    split_document,
+)
+from src.ingestion.loader import join_pages
+
+
+@pytest.fixture(scope="module")
+def encoder():
+    """Fixture: encoding byte a byte (não depende de baixar cl100k_base)."""
+    return tiktoken.Encoding(
+        name="test_bytes",
+        pat_str=r"""\s+(?!\S)|\s+|\S+""",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={},
+    )
+
+
+class CountingEncoder:
+    """Encoder que conta as chamadas a encode."""
+
+    def __init__(self, encoder):
+        self.encoder = encoder
+        self.name = encoder.name
+        self.encode_calls = 0
+
+    def encode(self, text, **kwargs):
+        self.encode_calls += 1
+        return self.encoder.encode(text, **kwargs)
+
+    def decode_with_offsets(self, tokens):
+        return self.encoder.decode_with_offsets(tokens)
+
+
+TEXT = (
+    "Gestão de estoques envolve planejamento.\n\n"
+    "A curva ABC classifica os itens pelo valor consumido. " * 4
+    + "\nInventário rotativo confere o saldo físico periodicamente."
+)
+
+
+class TestTokenTextChunker:
+    """Testa o chunker por tokens."""
+
+    def test_chunks_fit_token_budget(self, encoder):
+        """Teste: nenhum chunk passa de chunk_tokens."""
+        chunker = TokenTextChunker(60, 10, encoder=encoder)
+
+        chunks = chunker.split_text(TEXT)
+
+        assert len(chunks) > 3
+        assert all(len(encoder.encode(c)) <= 60 for c in chunks)
+        assert all(c == c.strip() for c in chunks)
+
+    def test_spans_cover_text_with_overlap(self, encoder):
+        """Teste: intervalos em ordem, com overlap e cobrindo o texto."""
+        chunker = TokenTextChunker(60, 10, encoder=encoder)
+
+        spans = chunker.split_spans(TEXT)
+
+        assert spans[0][0] == 0
+        assert spans[-1][1] == len(TEXT.rstrip())
+        for (s1, e1), (s2, e2) in zip(spans, spans[1:]):
+            assert s1 < s2 < e1 < e2
+
+    def test_cuts_at_boundaries(self, encoder):
+        """Teste: cortes preferem espaço a meio de palavra."""
+        chunker = TokenTextChunker(50, 0, encoder=encoder)
+
+        spans = chunker.split_spans(TEXT)
+
+        for _, end in spans[:-1]:
+            assert TEXT[end].isspace()
+
+    def test_document_encoded_once(self, encoder):
+        """Teste: o documento é codificado uma única vez."""
+        counting = CountingEncoder(encoder)
+        chunker = TokenTextChunker(40, 5, encoder=counting)
+
+        chunker.split_text(TEXT)
+
+        assert counting.encode_calls == 1
+
+    def test_invalid_overlap(self, encoder):
+        """Teste: overlap >= chunk gera erro."""
+        with pytest.raises(ValueError, match="overlap"):
+            TokenTextChunker(10, 10, encoder=encoder)
+
+    def test_pages_from_token_offsets(self, encoder):
+        """Teste: split_document usa os intervalos dos tokens."""
+        content, page_offsets = join_pages(["Página um. " * 10, "Página dois. " * 10])
+        document = {
+            "source": "a.pdf",
+            "content": content,
+            "num_pages": 2,
+            "page_offsets": page_offsets,
+        }
+
+        chunks = split_document(document, TokenTextChunker(64, 8, encoder=encoder))
+
+        for chunk in chunks:
+            assert content[chunk["char_start"] : chunk["char_end"]] == chunk["content"]
+        assert chunks[0]["page_start"] == 1
+        assert chunks[-1]["page_end"] == 2
+
+
+class TestChunkingMode:
+    """Testa a seleção do modo de chunking."""
+
+    def test_mode_from_env(self, encoder, monkeypatch):
+        """Teste: CHUNKING_MODE=tokens usa CHUNK_SIZE_TOKENS."""
+        monkeypatch.setenv("CHUNKING_MODE", "tokens")
+        monkeypatch.setenv("CHUNK_SIZE_TOKENS", "120")
+        monkeypatch.setenv("CHUNK_OVERLAP_TOKENS", "12")
+
+        with patch("src.ingestion.chunker.get_encoder", return_value=encoder):
+            splitter = create_text_splitter()
+            config = chunking_config()
+
+        assert isinstance(splitter, TokenTextChunker)
+        assert (splitter.chunk_tokens, splitter.overlap_tokens) == (120, 12)
+        assert config == {
+            "mode": "tokens",
+            "chunk_tokens": 120,
+            "overlap_tokens": 12,
+            "encoding": "test_bytes",
+        }
+
+    def test_chars_mode_config_unchanged(self, monkeypatch):
+        """Teste: modo chars mantém o formato antigo do manifesto."""
+        monkeypatch.delenv("CHUNKING_MODE", raising=False)
+        assert chunking_config(800, 100) == {"chunk_size": 800, "chunk_overlap": 100}
+
+    def test_unknown_mode(self):
+        """Teste: modo desconhecido gera erro claro."""
+        with pytest.raises(ValueError, match="CHUNKING_MODE"):
+            create_text_splitter(mode="words")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
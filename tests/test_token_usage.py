@@ -0,0 +1,120 @@
+"""
+Testes para a contagem de tokens e o preço por modelo.
+
+Valida:
+- Uso do bloco usage devolvido pelo provedor
+- Contagem com tiktoken quando o provedor não informa o usage
+- Tabela de preços (prefixo do provedor, versões datadas, variáveis de
+  ambiente)
+"""
+
+import os
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src.rag.generator import ResponseGenerator
+from src.utils.pricing import DEFAULT_PRICING, MODEL_PRICING, get_model_pricing
+from src.utils.tokens import TokenUsage, count_chat_tokens, count_tokens
+
+
+CHUNKS = [{"content": "Estoque de segurança cobre a demanda.", "source": "a.pdf"}]
+
+
+@pytest.fixture
+def generator():
+    with patch("src.rag.generator.ChatOpenAI"):
+        generator = ResponseGenerator()
+    generator.chain = MagicMock()
+    return generator
+
+
+class TestGeneratorUsage:
+    """Testa os tokens informados pelo ResponseGenerator."""
+
+    def test_uses_provider_usage(self, generator):
+        """Teste: tokens vêm do usage_metadata da resposta."""
+        generator.chain.invoke.return_value = AIMessage(
+            content="Resposta",
+            usage_metadata={"input_tokens": 812, "output_tokens": 45, "total_tokens": 857},
+        )
+
+        _, _, prompt_tokens, completion_tokens = generator.generate("pergunta", CHUNKS)
+
+        assert (prompt_tokens, completion_tokens) == (812, 45)
+
+    def test_counts_full_prompt_without_usage(self, generator):
+        """Teste: sem usage, o prompt inteiro (com o system) é contado."""
+        generator.chain.invoke.return_value = AIMessage(content="Resposta curta")
+
+        _, _, prompt_tokens, completion_tokens = generator.generate("pergunta", CHUNKS)
+
+        context = generator.build_context(CHUNKS)
+        # Antes: só contexto + pergunta, sem o system prompt
+        assert prompt_tokens > count_tokens(context + "pergunta")
+        messages = generator.prompt.format_messages(context=context, question="pergunta")
+        assert prompt_tokens == count_chat_tokens(m.content for m in messages)
+        assert completion_tokens == count_tokens("Resposta curta")
+
+    @pytest.mark.asyncio
+    async def test_stream_fills_usage(self, generator):
+        """Teste: o usage do último chunk do stream é repassado."""
+
+        async def chunks(inputs):
+            yield AIMessageChunk(content="Esto")
+            yield AIMessageChunk(content="que")
+            yield AIMessageChunk(
+                content="",
+                usage_metadata={"input_tokens": 300, "output_tokens": 2, "total_tokens": 302},
+            )
+
+        generator.chain.astream = chunks
+        usage = TokenUsage()
+
+        tokens = [t async for t in generator.astream("pergunta", CHUNKS, usage=usage)]
+
+        assert tokens == ["Esto", "que"]
+        assert generator.count_tokens("pergunta", "", "Estoque", usage=usage) == (300, 2)
+
+    @pytest.mark.asyncio
+    async def test_agenerate_uses_provider_usage(self, generator):
+        """Teste: caminho assíncrono também lê o usage."""
+        generator.chain.ainvoke = AsyncMock(
+            return_value=AIMessage(
+                content="Resposta",
+                usage_metadata={"input_tokens": 10, "output_tokens": 1, "total_tokens": 11},
+            )
+        )
+
+        _, _, prompt_tokens, completion_tokens = await generator.agenerate(
+            "pergunta", CHUNKS
+        )
+        assert (prompt_tokens, completion_tokens) == (10, 1)
+
+
+class TestModelPricing:
+    """Testa a tabela de preços."""
+
+    def test_provider_prefix_and_dated_version(self):
+        """Teste: prefixo do provedor e sufixo de data são ignorados."""
+        with patch.dict(os.environ, {"COST_PER_1M_PROMPT": "", "COST_PER_1M_COMPLETION": ""}):
+            assert get_model_pricing("openai/gpt-4.1-nano") == MODEL_PRICING["gpt-4.1-nano"]
+            assert (
+                get_model_pricing("gpt-4o-mini-2024-07-18") == MODEL_PRICING["gpt-4o-mini"]
+            )
+            assert get_model_pricing("gpt-4o") == MODEL_PRICING["gpt-4o"]
+
+    def test_unknown_model_and_overrides(self):
+        """Teste: modelo desconhecido usa o padrão; variáveis substituem."""
+        with patch.dict(os.environ, {"COST_PER_1M_PROMPT": "", "COST_PER_1M_COMPLETION": ""}):
+            assert get_model_pricing("meta/llama-3") == DEFAULT_PRICING
+
+        with patch.dict(os.environ, {"COST_PER_1M_PROMPT": "1", "COST_PER_1M_COMPLETION": "2"}):
+            pricing = get_model_pricing("openai/gpt-4.1-nano")
+        assert (pricing.prompt_per_1m, pricing.completion_per_1m) == (1.0, 2.0)
+        assert pricing.cost(1_000_000, 500_000) == pytest.approx(2.0)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])